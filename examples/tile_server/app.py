@@ -0,0 +1,34 @@
+'''
+Minimal local XYZ tile server for a gridded netCDF dataset
+
+Usage: python app.py <netcdf_path_or_opendap_url> [<port>]
+Tiles are served at http://localhost:<port>/tiles/<z>/<x>/<y>.png (or .raw for float32 values)
+and can be added to web maps (e.g. Leaflet or OpenLayers) as an XYZ tile layer.
+Build overviews first with NetCDFGridUtils.build_overviews() for responsive display at small scales.
+'''
+import sys
+from flask import Flask, Response
+from geophys_utils import NetCDFGridUtils
+from geophys_utils._tile_utils import GridTileRenderer
+import logging
+
+# Setup logging handlers if required
+logger = logging.getLogger(__name__)  # Get logger
+logger.setLevel(logging.DEBUG)  # Initial logging level for this module
+
+app = Flask(__name__)
+tile_renderer = None
+
+
+@app.route('/tiles/<path:tile_path>', methods=['GET'])
+def get_tile(tile_path):
+    status, content_type, content = tile_renderer.handle_tile_request(tile_path)
+    return Response(content, status=status, mimetype=content_type)
+
+
+if __name__ == '__main__':
+    netcdf_grid_utils = NetCDFGridUtils(sys.argv[1], lazy=True)
+    tile_renderer = GridTileRenderer(netcdf_grid_utils)
+    logger.debug('Serving tiles for {} with value range {}'.format(sys.argv[1], tile_renderer.value_range))
+    # Single-threaded because netCDF access is not thread-safe
+    app.run(debug=False, threaded=False, port=(int(sys.argv[2]) if len(sys.argv) > 2 else 5000))
@@ -42,12 +42,24 @@ from geophys_utils._netcdf_grid_utils import NetCDFGridUtils
 from geophys_utils._netcdf_point_utils import NetCDFPointUtils
 from geophys_utils._netcdf_line_utils import NetCDFLineUtils
 from geophys_utils._csw_utils import CSWUtils
-from geophys_utils._array_pieces import array_pieces
-from geophys_utils._data_stats import DataStats
-from geophys_utils._polygon_utils import get_grid_edge_points, get_netcdf_edge_points, points2convex_hull, points2alpha_shape, netcdf2convex_hull
+from geophys_utils._array_pieces import array_pieces, map_pieces, ArraySink, ReduceSink, ListSink
+from geophys_utils._data_stats import DataStats, get_array_statistics
+from geophys_utils._polygon_utils import get_grid_edge_points, get_netcdf_edge_points, points2convex_hull, points2alpha_shape, netcdf2convex_hull, get_polygon_rings, get_polygon_cell_indices
 from geophys_utils._crs_utils import get_spatial_ref_from_wkt, get_wkt_from_spatial_ref, get_coordinate_transformation, get_utm_wkt, transform_coords
 from geophys_utils._gdal_grid_utils import get_gdal_wcs_dataset, get_gdal_grid_values
-from geophys_utils._transect_utils import line_length, point_along_line, utm_coords, coords2distance, sample_transect
+from geophys_utils._transect_utils import line_length, point_along_line, utm_coords, coords2distance, sample_transect, sample_transects
 from geophys_utils._dem_utils import DEMUtils
 from geophys_utils._array2file import array2file
 from geophys_utils._datetime_utils import date_string2datetime
+from geophys_utils._layer_utils import get_layer_top_depths, sample_layers_at_depths, get_layered_section
+from geophys_utils._parallel_utils import ordered_map
+from geophys_utils._netcdf_grid_writer import create_netcdf_grid
+from geophys_utils._block_cache import BlockCache
+from geophys_utils._resampling_utils import downsample_array
+from geophys_utils._tile_utils import GridTileRenderer
+from geophys_utils._mosaic_utils import build_mosaic
+from geophys_utils._drape_utils import drape_grids
+from geophys_utils._fft_utils import FFT_FILTERS
+from geophys_utils._chunk_utils import get_chunk_shape, explain_chunk_shape
+from geophys_utils._copy_checkpoint import CopyCheckpoint
+from geophys_utils._io_stats import IOStats, io_timer
@@ -25,22 +25,19 @@ import sys
 import netCDF4
 import math
 import itertools
+import threading
+import numpy as np
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from functools import reduce
+from geophys_utils._parallel_utils import ordered_map
 
-def array_pieces(ndarray, max_bytes=None, overlap=0):
+def _get_piece_slices(ndarray, max_bytes, overlap):
     '''
-    Generator to return a series of numpy arrays less than max_bytes in size and the offset within the complete data from a NetCDF variable
-    Parameters:
-        ndarray: Numpy array or NetCDF array variable
-        overlap: number of pixels to add to each edge
-        max_bytes: Maximum number of bytes to retrieve. Defaults to 500,000,000 for NCI's OPeNDAP
-
-    Yields:
-        piece_array: array subset less than max_bytes in size
-        array_offset: start indices of subset in whole array
+    Generator to return the slices and start indices of a series of pieces less than max_bytes in size, together with
+    the slices of the region of the whole array each piece covers without overlap (output_slices) and the slices 
+    which trim the overlap from the piece (trim_slices)
     '''
-    max_bytes = max_bytes or 500000000  # Defaults to 500MB for NCI's OPeNDAP
-
     array_shape = ndarray.shape
     array_dimensions = len(array_shape)
 
@@ -70,7 +67,7 @@ def array_pieces(ndarray, max_bytes=None, overlap=0):
                        * chunking[index] for index in range(array_dimensions)]
 
         # Determine total number of pieces in each axis
-        axis_pieces = [int(math.ceil(float(array_shape[index]) // piece_shape[index]))
+        axis_pieces = [int(math.ceil(float(array_shape[index]) / piece_shape[index]))
                        for index in range(array_dimensions)]
 
         # Iterate over every piece of array
@@ -81,6 +78,12 @@ def array_pieces(ndarray, max_bytes=None, overlap=0):
             start_indices = [piece_indices[dimension_index] * piece_shape[dimension_index]
                              for dimension_index in range(array_dimensions)]
             
+            # Compute end indices with no overlap
+            output_slices = tuple([slice(start_indices[dimension_index],
+                                         min(start_indices[dimension_index] + piece_shape[dimension_index],
+                                             array_shape[dimension_index]))
+                                   for dimension_index in range(array_dimensions)])
+            
             # Compute end indices plus overlap from start indices
             end_indices = [min(start_indices[dimension_index] + piece_shape[dimension_index] + overlap,
                                array_shape[dimension_index]) 
@@ -90,15 +93,209 @@ def array_pieces(ndarray, max_bytes=None, overlap=0):
             start_indices = [max(0, start_indices[dimension_index] - overlap)
                              for dimension_index in range(array_dimensions)]
             
-            array_slices = [slice(start_indices[dimension_index],
-                                  end_indices[dimension_index])
-                            for dimension_index in range(array_dimensions)]
+            array_slices = tuple([slice(start_indices[dimension_index],
+                                        end_indices[dimension_index])
+                                  for dimension_index in range(array_dimensions)])
+            
+            trim_slices = tuple([slice(output_slices[dimension_index].start - start_indices[dimension_index],
+                                       output_slices[dimension_index].stop - start_indices[dimension_index])
+                                 for dimension_index in range(array_dimensions)])
 
-            piece_array = ndarray[array_slices]
-            yield piece_array, tuple(start_indices)
+            yield array_slices, tuple(start_indices), output_slices, trim_slices
 
     else:  # Only one piece required
-        yield ndarray[...], (0, 0)
+        yield Ellipsis, (0, 0), Ellipsis, Ellipsis
+
+
+def _read_piece(ndarray, array_slices, read_lock=None):
+    '''
+    Helper function to read a single piece, holding read_lock (if any) while reading
+    '''
+    if read_lock is None:
+        return ndarray[array_slices]
+    with read_lock:
+        return ndarray[array_slices]
+
+
+def array_pieces(ndarray, max_bytes=None, overlap=0, prefetch=0, prefetch_threads=1, read_lock=None):
+    '''
+    Generator to return a series of numpy arrays less than max_bytes in size and the offset within the complete data from a NetCDF variable
+    Parameters:
+        ndarray: Numpy array or NetCDF array variable
+        overlap: number of pixels to add to each edge
+        max_bytes: Maximum number of bytes to retrieve. Defaults to 500,000,000 for NCI's OPeNDAP
+        prefetch: Maximum number of pieces to read ahead in background threads while the consumer works on the
+            current piece. Defaults to 0 for no background reads. Up to prefetch + 1 pieces may be held in memory at once
+        prefetch_threads: Number of background threads reading pieces when prefetch > 0. Defaults to 1
+        read_lock: Lock held while each piece is read in a background thread. Since the netCDF library is not 
+            thread-safe, a private lock is used for anything other than numpy arrays if none is supplied. Consumers
+            which access any netCDF dataset while iterating must supply a lock and hold it while doing so
+
+    Yields:
+        piece_array: array subset less than max_bytes in size
+        array_offset: start indices of subset in whole array
+    
+    Exceptions raised while reading are re-raised in the consuming thread. If the consumer stops early (e.g. by
+    breaking out of its loop or closing the generator), outstanding reads are cancelled and any in progress are
+    allowed to finish before the generator returns.
+    '''
+    max_bytes = max_bytes or 500000000  # Defaults to 500MB for NCI's OPeNDAP
+
+    for piece_array, piece_slices in _read_pieces(ndarray, _get_piece_slices(ndarray, max_bytes, overlap),
+                                                  prefetch, prefetch_threads, read_lock):
+        yield piece_array, piece_slices[1]
+
+
+def _read_pieces(ndarray, piece_slices_iterable, prefetch=0, prefetch_threads=1, read_lock=None):
+    '''
+    Generator to read pieces in order, optionally reading ahead in background threads
+    Yields (piece_array, piece_slices) tuples, where piece_slices is the corresponding item of piece_slices_iterable
+    '''
+    if not prefetch:  # Read each piece only when requested
+        for piece_slices in piece_slices_iterable:
+            yield ndarray[piece_slices[0]], piece_slices
+        return
+
+    if read_lock is None and not isinstance(ndarray, np.ndarray):
+        read_lock = threading.Lock()
+
+    # Bounded queue of (future, piece_slices) tuples for pieces being read ahead, in piece order
+    executor = ThreadPoolExecutor(max_workers=prefetch_threads)
+    pending = deque()
+    try:
+        for piece_slices in piece_slices_iterable:
+            pending.append((executor.submit(_read_piece, ndarray, piece_slices[0], read_lock), piece_slices))
+            if len(pending) > prefetch:
+                future, next_piece_slices = pending.popleft()
+                yield future.result(), next_piece_slices
+
+        while pending:
+            future, next_piece_slices = pending.popleft()
+            yield future.result(), next_piece_slices
+    finally:
+        for future, _piece_slices in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
+
+
+class ArraySink(object):
+    '''
+    ArraySink class writing piece results into the corresponding region of an output array (e.g. a numpy array or
+    a netCDF variable) with the same shape as the source
+    '''
+    def __init__(self, output_array):
+        '''
+        Constructor for ArraySink
+        @param output_array: numpy array or netCDF variable to which results are written
+        '''
+        self.output_array = output_array
+
+    def write(self, output_slices, result):
+        self.output_array[output_slices] = result
+
+    def get_result(self):
+        return self.output_array
+
+
+class ReduceSink(object):
+    '''
+    ReduceSink class combining piece results in piece order with a reduce function, e.g. to accumulate statistics
+    '''
+    def __init__(self, reduce_function, initial_value=None):
+        '''
+        Constructor for ReduceSink
+        @param reduce_function: function taking the value so far and a piece result and returning the new value
+        @param initial_value: initial value. The first piece result is used as the initial value if None
+        '''
+        self.reduce_function = reduce_function
+        self.value = initial_value
+
+    def write(self, output_slices, result):
+        self.value = result if self.value is None else self.reduce_function(self.value, result)
+
+    def get_result(self):
+        return self.value
+
+
+class ListSink(object):
+    '''
+    ListSink class collecting (output_slices, result) tuples for every piece in piece order
+    '''
+    def __init__(self):
+        self.results = []
+
+    def write(self, output_slices, result):
+        self.results.append((output_slices, result))
+
+    def get_result(self):
+        return self.results
+
+
+def apply_piece_function(arguments):
+    '''
+    Function to apply a piece function to a piece in a worker. Module-level so that it can be run in a process pool.
+    @param arguments: (function, piece_array, piece_slices) tuple as generated by map_pieces()
+
+    @return result: return value of function(piece_array, array_offset)
+    @return piece_shape: shape of piece_array
+    @return piece_slices: piece_slices from arguments
+    '''
+    function, piece_array, piece_slices = arguments
+    return function(piece_array, piece_slices[1]), piece_array.shape, piece_slices
+
+
+def map_pieces(ndarray, function, sink=None, overlap=0, max_bytes=None, workers=None, use_processes=False, 
+               prefetch=1, read_lock=None):
+    '''
+    Function to apply a function to every piece of an array in a pool of workers and pass the results to a sink
+    Pieces are read in the calling thread (or a single background thread if prefetch > 0), and results are passed to 
+    the sink in piece order in the calling thread, so the output is the same for any number of workers. Roughly 
+    prefetch + 2 * workers + 1 pieces may be held in memory at once.
+    Parameters:
+        ndarray: Numpy array or NetCDF array variable
+        function: function taking (piece_array, array_offset) arguments, as yielded by array_pieces(). Must be 
+            picklable (i.e. module-level, or a functools.partial of a module-level function) if use_processes is True.
+            Results with the same shape as the piece have the overlap trimmed before being passed to the sink
+        sink: ArraySink, ReduceSink or ListSink object (or any object with write(output_slices, result) and 
+            get_result() methods). Defaults to a new ListSink
+        overlap: number of pixels to add to each edge of each piece for the function
+        max_bytes: Maximum number of bytes to retrieve per piece. Defaults to 500,000,000 for NCI's OPeNDAP
+        workers: number of worker threads or processes. None or 1 applies function serially in the calling thread
+        use_processes: Boolean flag indicating whether a process pool should be used instead of a thread pool
+        prefetch: Maximum number of pieces to read ahead in a background thread. 0 for reads in the calling thread
+        read_lock: Lock held while each piece is read and while results are written to the sink when prefetch > 0. 
+            Since the netCDF library is not thread-safe, a private lock is used if none is supplied
+
+    Returns:
+        result: return value of sink.get_result()
+    '''
+    max_bytes = max_bytes or 500000000  # Defaults to 500MB for NCI's OPeNDAP
+    sink = sink if sink is not None else ListSink()
+    if prefetch and read_lock is None:
+        read_lock = threading.Lock()
+
+    piece_iterator = _read_pieces(ndarray, _get_piece_slices(ndarray, max_bytes, overlap), prefetch, 1, read_lock)
+    result_iterator = ordered_map(apply_piece_function,
+                                  ((function, piece_array, piece_slices) for piece_array, piece_slices in piece_iterator),
+                                  workers=workers,
+                                  use_processes=use_processes)
+    try:
+        for result, piece_shape, piece_slices in result_iterator:
+            _array_slices, _array_offset, output_slices, trim_slices = piece_slices
+            if isinstance(result, np.ndarray) and result.shape == piece_shape:
+                result = result[trim_slices]
+
+            if read_lock is None:
+                sink.write(output_slices, result)
+            else:
+                with read_lock:
+                    sink.write(output_slices, result)
+    finally:
+        # Shut down workers and background reads now rather than when the generators are garbage collected
+        result_iterator.close()
+        piece_iterator.close()
+
+    return sink.get_result()
 
 
 def main():
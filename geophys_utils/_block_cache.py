@@ -0,0 +1,265 @@
+#!/usr/bin/env python
+
+#===============================================================================
+#    Copyright 2026 Geoscience Australia
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+#===============================================================================
+'''
+BlockCache class to hold recently read array blocks in memory (and optionally on disk) to avoid re-reading
+the same netCDF chunks for repeated queries
+
+Created on 18Oct.,2026
+
+@author: agent
+'''
+import os
+import re
+import tempfile
+import zlib
+import numpy as np
+from collections import OrderedDict
+import logging
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO) # Initial logging level for this module
+
+
+class BlockCache(object):
+    '''
+    BlockCache class implementing a least-recently-used memory cache of numpy arrays with a byte budget,
+    backed by an optional on-disk tier of .npy files with its own byte budget.
+    Keys are tuples of strings and integers, e.g. (variable_name, block_row, block_column)
+    N.B: Cached arrays are returned read-only and should be copied before modification.
+    '''
+    DEFAULT_MAX_BYTES = 256000000 # Default memory budget of 256MB
+    DEFAULT_MAX_DISK_BYTES = 2000000000 # Default disk budget of 2GB
+
+    def __init__(self, max_bytes=None, disk_cache_dir=None, max_disk_bytes=None, source_signature=None):
+        '''
+        BlockCache Constructor
+        @parameter max_bytes: Maximum number of bytes held in memory. Defaults to BlockCache.DEFAULT_MAX_BYTES
+        @parameter disk_cache_dir: Directory for on-disk tier, or None for memory only. Created on first write
+        @parameter max_disk_bytes: Maximum number of bytes held in the on-disk tier. Least recently used files are removed
+            when this is exceeded. Defaults to BlockCache.DEFAULT_MAX_DISK_BYTES
+        @parameter source_signature: optional string identifying the version of the source data (e.g. as returned by
+            get_source_signature()). Included in disk file names so that blocks cached from other versions are never returned
+        '''
+        self.max_bytes = max_bytes or BlockCache.DEFAULT_MAX_BYTES
+        self.disk_cache_dir = disk_cache_dir
+        self.max_disk_bytes = max_disk_bytes or BlockCache.DEFAULT_MAX_DISK_BYTES
+        self.source_signature = source_signature
+
+        self._blocks = OrderedDict()
+        self.cached_bytes = 0
+        self._disk_bytes = None # Determined from directory contents on first write
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_evictions = 0
+
+    def get_disk_path(self, key):
+        '''
+        Returns path of .npy file for key in on-disk tier
+        @parameter key: tuple key for block
+        '''
+        key_elements = ((self.source_signature,) if self.source_signature else ()) + tuple(key)
+        return os.path.join(self.disk_cache_dir,
+                            re.sub('\W', '_', '_'.join([str(key_element) for key_element in key_elements])) + '.npy')
+
+    def get_disk_files(self):
+        '''
+        Returns list of (modification_time, size, path) tuples for .npy files in on-disk tier, least recently used first
+        '''
+        disk_files = []
+        if not (self.disk_cache_dir and os.path.isdir(self.disk_cache_dir)):
+            return disk_files
+
+        for filename in os.listdir(self.disk_cache_dir):
+            if not filename.endswith('.npy'):
+                continue
+            disk_path = os.path.join(self.disk_cache_dir, filename)
+            try:
+                file_stat = os.stat(disk_path)
+            except OSError: # Removed by another process
+                continue
+            disk_files.append((file_stat.st_mtime, file_stat.st_size, disk_path))
+
+        return sorted(disk_files)
+
+    def trim_disk(self):
+        '''
+        Function to remove least recently used files from on-disk tier until it is within self.max_disk_bytes
+        '''
+        disk_files = self.get_disk_files()
+        self._disk_bytes = sum([file_size for _modification_time, file_size, _disk_path in disk_files])
+        for _modification_time, file_size, disk_path in disk_files:
+            if self._disk_bytes <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(disk_path)
+                self.disk_evictions += 1
+            except OSError: # Removed by another process
+                pass
+            self._disk_bytes -= file_size
+
+    def get(self, key, read_function=None):
+        '''
+        Returns cached array for key, reading and caching it with read_function if not already cached
+        @parameter key: tuple key for block
+        @parameter read_function: function taking no arguments and returning a numpy array, or None to return None on a miss
+        '''
+        block_array = self._blocks.get(key)
+        if block_array is not None:
+            self._blocks.move_to_end(key) # Mark as most recently used
+            self.hits += 1
+            return block_array
+
+        if self.disk_cache_dir:
+            disk_path = self.get_disk_path(key)
+            if os.path.isfile(disk_path):
+                try:
+                    block_array = np.load(disk_path)
+                    os.utime(disk_path) # Mark as most recently used for on-disk tier
+                    self.disk_hits += 1
+                    logger.debug('Read block {} from disk cache {}'.format(key, disk_path))
+                    return self.put(key, block_array, write_disk=False)
+                except Exception as e:
+                    logger.warning('Unable to read disk cache file {}: {}'.format(disk_path, e))
+
+        self.misses += 1
+        if read_function is None:
+            return None
+
+        return self.put(key, read_function())
+
+    def put(self, key, block_array, write_disk=True):
+        '''
+        Adds array to cache, evicting least recently used arrays to stay within budget, and returns read-only array
+        Arrays larger than the whole memory budget are returned without being held in memory.
+        @parameter key: tuple key for block
+        @parameter block_array: numpy array to cache
+        @parameter write_disk: Boolean flag indicating whether array should be written to the on-disk tier (if any)
+        '''
+        block_array = np.asarray(block_array)
+        block_array.flags.writeable = False
+
+        if write_disk and self.disk_cache_dir:
+            disk_path = self.get_disk_path(key)
+            temp_path = disk_path + '.{}.tmp'.format(os.getpid())
+            try:
+                os.makedirs(self.disk_cache_dir, exist_ok=True)
+                with open(temp_path, 'wb') as temp_file:
+                    np.save(temp_file, block_array)
+                os.replace(temp_path, disk_path) # Atomic so that concurrent readers never see partial files
+
+                if self._disk_bytes is None:
+                    self.trim_disk()
+                else:
+                    self._disk_bytes += os.path.getsize(disk_path)
+                    if self._disk_bytes > self.max_disk_bytes:
+                        self.trim_disk()
+            except Exception as e:
+                logger.warning('Unable to write disk cache file {}: {}'.format(disk_path, e))
+
+        if block_array.nbytes > self.max_bytes:
+            return block_array
+
+        existing_array = self._blocks.pop(key, None)
+        if existing_array is not None:
+            self.cached_bytes -= existing_array.nbytes
+
+        self._blocks[key] = block_array
+        self.cached_bytes += block_array.nbytes
+
+        while self.cached_bytes > self.max_bytes:
+            _evicted_key, evicted_array = self._blocks.popitem(last=False)
+            self.cached_bytes -= evicted_array.nbytes
+            self.evictions += 1
+
+        return block_array
+
+    def clear(self, clear_disk=False):
+        '''
+        Function to empty memory cache and (optionally) on-disk tier, and reset statistics
+        @parameter clear_disk: Boolean flag indicating whether on-disk tier should also be emptied
+        '''
+        self._blocks.clear()
+        self.cached_bytes = 0
+        self.hits = self.disk_hits = self.misses = self.evictions = self.disk_evictions = 0
+
+        if clear_disk:
+            for _modification_time, _file_size, disk_path in self.get_disk_files():
+                os.remove(disk_path)
+            self._disk_bytes = None
+
+    def __len__(self):
+        return len(self._blocks)
+
+    def __contains__(self, key):
+        return key in self._blocks
+
+    @property
+    def statistics(self):
+        '''
+        Property getter function to return dict of cache statistics
+        '''
+        lookups = self.hits + self.disk_hits + self.misses
+        return {'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'disk_evictions': self.disk_evictions,
+                'hit_ratio': ((self.hits + self.disk_hits) / float(lookups)) if lookups else None,
+                'blocks': len(self._blocks),
+                'cached_bytes': self.cached_bytes,
+                'max_bytes': self.max_bytes,
+                'disk_bytes': self._disk_bytes,
+                'max_disk_bytes': self.max_disk_bytes,
+                }
+
+
+def get_default_disk_cache_dir(nc_path, class_name):
+    '''
+    Function to return a default on-disk cache directory for a dataset in the system temporary directory
+    @parameter nc_path: path or OPeNDAP URL of netCDF dataset
+    @parameter class_name: name of class using the cache (used as subdirectory name)
+    '''
+    return os.path.join(tempfile.gettempdir(), class_name,
+                        re.sub('\W', '_', os.path.splitext(nc_path)[0]) + '_blocks')
+
+
+def get_source_signature(nc_path, netcdf_dataset=None):
+    '''
+    Function to return a string identifying the version of a dataset for use as a BlockCache source_signature
+    Local files are identified by their modification time and size. Other datasets (e.g. OPeNDAP) are identified by
+    a checksum of their modification date, creation date, history and uuid attributes and dimension sizes.
+    @parameter nc_path: path or OPeNDAP URL of netCDF dataset
+    @parameter netcdf_dataset: optional open netCDF4.Dataset used for datasets which are not local files
+
+    @return source_signature: signature string, or None if the version cannot be determined
+    '''
+    if os.path.isfile(nc_path):
+        file_stat = os.stat(nc_path)
+        return '{}_{}'.format(file_stat.st_mtime_ns, file_stat.st_size)
+
+    if netcdf_dataset is None:
+        return None
+
+    version_list = ([(attribute_name, str(getattr(netcdf_dataset, attribute_name)))
+                     for attribute_name in ['date_modified', 'date_created', 'history', 'uuid']
+                     if hasattr(netcdf_dataset, attribute_name)]
+                    + [(dimension_name, len(dimension)) for dimension_name, dimension in netcdf_dataset.dimensions.items()])
+    return '{:08x}'.format(zlib.crc32(repr(version_list).encode('utf-8')))
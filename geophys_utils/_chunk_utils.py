@@ -0,0 +1,220 @@
+#!/usr/bin/env python
+
+#===============================================================================
+#    Copyright 2026 Geoscience Australia
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+#===============================================================================
+'''
+Functions to plan netCDF chunk shapes for a stated access pattern, and to estimate the number of chunks touched
+by typical queries against any chunk shape
+
+Dimensions are classified by position, as for the CF conventions followed by geophys_utils datasets:
+    - the last two dimensions of a variable with two or more dimensions are spatial (e.g. lat/lon or y/x)
+    - any dimensions before those (e.g. time or band) are series dimensions. For variables with fewer than three
+      dimensions, the first dimension is the series dimension
+    - the first dimension (e.g. point) is the scan dimension for point datasets
+
+Created on 18Oct.,2026
+
+@author: agent
+'''
+import math
+import numpy as np
+from collections import OrderedDict
+import logging
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO) # Initial logging level for this module
+
+ACCESS_PATTERNS = ['spatial', 'time_series', 'point_scan']
+DEFAULT_MIN_CHUNK_BYTES = 1000000 # 1MB lower bound for planned chunks
+DEFAULT_MAX_CHUNK_BYTES = 4000000 # 4MB upper bound for planned chunks
+
+TYPICAL_SPATIAL_WINDOW = 256 # Cells per spatial dimension for a typical spatial window query
+TYPICAL_SCAN_LENGTH = 100000 # Cells along scan dimension for a typical point scan query
+
+
+def _get_dimension_indices(ndims, access_pattern):
+    '''
+    Helper function to return a list of the dimension indices to which access_pattern applies
+    '''
+    if access_pattern == 'spatial':
+        return list(range(max(ndims - 2, 0), ndims))
+    elif access_pattern == 'time_series':
+        return list(range(ndims - 2)) if ndims > 2 else [0]
+    elif access_pattern == 'point_scan':
+        return [0]
+    else:
+        raise ValueError('Invalid access_pattern {}. Must be one of {}'.format(access_pattern, ACCESS_PATTERNS))
+
+
+def get_chunk_shape(shape, dtype, access_pattern='spatial', min_bytes=None, max_bytes=None):
+    '''
+    Function to return a chunk shape for an array variable given its expected access pattern
+    Chunks are sized to be no bigger than max_bytes and, unless the whole variable is smaller, no smaller than min_bytes.
+        - 'spatial': near-square chunks over the spatial dimensions, with size 1 in any series dimensions
+        - 'time_series': whole (or as long as possible) series dimensions, with small near-square spatial extents
+        - 'point_scan': long runs along the scan dimension, spanning any remaining dimensions entirely
+    @param shape: shape of variable
+    @param dtype: numpy dtype (or dtype string) of variable
+    @param access_pattern: one of 'spatial', 'time_series' or 'point_scan'
+    @param min_bytes: minimum number of bytes per chunk. Defaults to DEFAULT_MIN_CHUNK_BYTES
+    @param max_bytes: maximum number of bytes per chunk. Defaults to DEFAULT_MAX_CHUNK_BYTES
+
+    @return chunk_shape: list of chunk sizes for each dimension
+    '''
+    shape = [int(dimension_size) for dimension_size in shape]
+    ndims = len(shape)
+    itemsize = np.dtype(dtype).itemsize
+    min_bytes = min_bytes or DEFAULT_MIN_CHUNK_BYTES
+    max_bytes = max_bytes or DEFAULT_MAX_CHUNK_BYTES
+    assert min_bytes <= max_bytes, 'min_bytes must not exceed max_bytes'
+    max_elements = max(max_bytes // itemsize, 1)
+    min_elements = max(min_bytes // itemsize, 1)
+
+    if not ndims:
+        return []
+
+    pattern_dimension_indices = _get_dimension_indices(ndims, access_pattern)
+    chunk_shape = [1] * ndims
+
+    if access_pattern == 'point_scan':
+        # Remaining dimensions are taken whole (up to budget), then scan dimension gets what is left
+        free_dimension_indices = [dimension_index for dimension_index in range(ndims) if dimension_index not in pattern_dimension_indices]
+        balanced_dimension_indices = pattern_dimension_indices
+    elif access_pattern == 'time_series':
+        # Series dimensions are taken whole (up to budget), then spatial dimensions share what is left
+        free_dimension_indices = pattern_dimension_indices
+        balanced_dimension_indices = [dimension_index for dimension_index in range(ndims) if dimension_index not in pattern_dimension_indices]
+    else: # 'spatial'
+        free_dimension_indices = []
+        balanced_dimension_indices = pattern_dimension_indices
+
+    # Take whole dimensions (fastest-varying first) until budget is exhausted
+    remaining_elements = max_elements
+    for dimension_index in sorted(free_dimension_indices, reverse=True):
+        chunk_shape[dimension_index] = max(min(shape[dimension_index], remaining_elements), 1)
+        remaining_elements = max(remaining_elements // chunk_shape[dimension_index], 1)
+
+    # Share remaining budget as evenly as possible between balanced dimensions, smallest dimensions first
+    balanced_dimension_indices = sorted(balanced_dimension_indices, key=lambda dimension_index: shape[dimension_index])
+    for balanced_index, dimension_index in enumerate(balanced_dimension_indices):
+        side = int(math.floor(remaining_elements ** (1.0 / (len(balanced_dimension_indices) - balanced_index)) + 1e-9))
+        chunk_shape[dimension_index] = max(min(shape[dimension_index], side), 1)
+        remaining_elements = max(remaining_elements // chunk_shape[dimension_index], 1)
+
+    # Grow any remaining dimensions (slowest-varying last) if chunks are still smaller than min_bytes
+    chunk_elements = int(np.prod(chunk_shape))
+    for dimension_index in range(ndims - 1, -1, -1):
+        if chunk_elements >= min_elements:
+            break
+        if dimension_index in free_dimension_indices or dimension_index in balanced_dimension_indices:
+            continue
+        multiplier = min(int(math.ceil(float(min_elements) / chunk_elements)),
+                         max_elements // chunk_elements,
+                         shape[dimension_index])
+        chunk_shape[dimension_index] = max(multiplier, 1)
+        chunk_elements *= chunk_shape[dimension_index]
+
+    logger.debug('Chunk shape for {} {} variable of shape {}: {} ({} bytes)'.format(access_pattern,
+                                                                                    np.dtype(dtype),
+                                                                                    shape,
+                                                                                    chunk_shape,
+                                                                                    int(np.prod(chunk_shape)) * itemsize))
+    return chunk_shape
+
+
+def get_typical_query_shape(shape, access_pattern):
+    '''
+    Function to return the shape of a typical query for the given access pattern
+        - 'spatial': a TYPICAL_SPATIAL_WINDOW window in the spatial dimensions for a single series index
+        - 'time_series': the whole series for a single spatial cell
+        - 'point_scan': a run of TYPICAL_SCAN_LENGTH along the scan dimension spanning all remaining dimensions
+    '''
+    ndims = len(shape)
+    pattern_dimension_indices = _get_dimension_indices(ndims, access_pattern)
+    query_shape = []
+    for dimension_index in range(ndims):
+        if access_pattern == 'spatial':
+            query_size = TYPICAL_SPATIAL_WINDOW if dimension_index in pattern_dimension_indices else 1
+        elif access_pattern == 'time_series':
+            query_size = shape[dimension_index] if dimension_index in pattern_dimension_indices else 1
+        else: # 'point_scan'
+            query_size = TYPICAL_SCAN_LENGTH if dimension_index in pattern_dimension_indices else shape[dimension_index]
+        query_shape.append(min(query_size, shape[dimension_index]))
+    return query_shape
+
+
+def get_expected_chunks_touched(shape, chunk_shape, query_shape):
+    '''
+    Function to return the expected number of chunks touched by a query window of query_shape at a uniformly random
+    position in an array of the given shape and chunk shape. Along each dimension, a window of q cells at a random
+    offset touches (q + c - 1) / c chunks of size c on average, but never more than there are in total.
+    '''
+    expected_chunks = 1.0
+    for dimension_size, chunk_size, query_size in zip(shape, chunk_shape, query_shape):
+        expected_chunks *= min(float(query_size + chunk_size - 1) / chunk_size,
+                               math.ceil(float(dimension_size) / chunk_size))
+    return expected_chunks
+
+
+def explain_chunk_shape(shape, dtype, chunk_shape):
+    '''
+    Function to report the expected cost of typical queries for each access pattern against a chunk shape
+    @param shape: shape of variable
+    @param dtype: numpy dtype (or dtype string) of variable
+    @param chunk_shape: list of chunk sizes for each dimension, or None for contiguous storage
+
+    @return explanation: OrderedDict keyed by access pattern containing dicts with 'query_shape', 'chunks_touched'
+        and 'bytes_read' (i.e. the number of bytes which need to be read and decompressed to satisfy the query)
+    '''
+    shape = [int(dimension_size) for dimension_size in shape]
+    if chunk_shape:
+        chunk_shape = list(chunk_shape)
+    else: # Contiguous storage can only be read efficiently in runs along the fastest-varying dimension
+        chunk_shape = [1] * (len(shape) - 1) + shape[-1:]
+    chunk_bytes = np.dtype(dtype).itemsize * int(np.prod(chunk_shape))
+
+    explanation = OrderedDict()
+    for access_pattern in ACCESS_PATTERNS:
+        query_shape = get_typical_query_shape(shape, access_pattern)
+        chunks_touched = get_expected_chunks_touched(shape, chunk_shape, query_shape)
+        explanation[access_pattern] = {'query_shape': query_shape,
+                                       'chunks_touched': chunks_touched,
+                                       'bytes_read': int(round(chunks_touched * chunk_bytes)),
+                                       }
+    return explanation
+
+
+def get_explanation_lines(variable_name, shape, dtype, chunk_shape, planned_chunk_shape=None):
+    '''
+    Function to return a list of human-readable lines comparing typical query costs for chunk_shape and (optionally)
+    planned_chunk_shape
+    '''
+    def chunk_string(chunk_shape):
+        return ' x '.join([str(chunk_size) for chunk_size in chunk_shape]) if chunk_shape else 'contiguous'
+
+    explanations = [('current', chunk_shape, explain_chunk_shape(shape, dtype, chunk_shape))]
+    if planned_chunk_shape is not None:
+        explanations.append(('planned', planned_chunk_shape, explain_chunk_shape(shape, dtype, planned_chunk_shape)))
+
+    lines = ['{} {} {}:'.format(variable_name, np.dtype(dtype), chunk_string(shape))]
+    for label, explained_chunk_shape, explanation in explanations:
+        lines.append('  {} chunks {}'.format(label, chunk_string(explained_chunk_shape)))
+        for access_pattern, query_cost in explanation.items():
+            lines.append('    {:<12s} query {:<20s} {:>12.1f} chunks {:>14d} bytes'.format(access_pattern,
+                                                                                         chunk_string(query_cost['query_shape']),
+                                                                                         query_cost['chunks_touched'],
+                                                                                         query_cost['bytes_read']))
+    return lines
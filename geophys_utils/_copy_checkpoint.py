@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+
+#===============================================================================
+#    Copyright 2026 Geoscience Australia
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+#===============================================================================
+'''
+CopyCheckpoint class to record per-variable, per-piece progress of a netCDF copy in a JSON sidecar file so that an
+interrupted copy can be resumed
+
+Created on 18Oct.,2026
+
+@author: agent
+'''
+import os
+import json
+import time
+import zlib
+import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO) # Initial logging level for this module
+
+
+def get_piece_crc(piece_array, dtype):
+    '''
+    Function to return CRC32 checksum of an array piece as it would be read back from a variable of the given dtype.
+    Masked (i.e. no-data) values are ignored.
+    '''
+    piece_array = np.ma.asarray(piece_array)
+    if np.dtype(dtype).kind in 'OSUa': # Strings - checksum string representation
+        return zlib.crc32(str(piece_array.tolist()).encode('utf-8'))
+    return zlib.crc32(np.ascontiguousarray(np.ma.filled(piece_array.astype(dtype), 0)).tobytes())
+
+
+class CopyCheckpoint(object):
+    '''
+    CopyCheckpoint class recording the checksums of the pieces written for each variable of a copy.
+    Pieces are assumed to be written in order, so progress for each variable is the number of pieces completed.
+    The checkpoint file is replaced atomically, and is only saved after the output dataset has been synced to disk
+    so that it never records pieces which have not been written.
+    '''
+    FILE_SUFFIX = '.checkpoint.json'
+    DEFAULT_SAVE_SECONDS = 60.0 # Minimum time between checkpoint saves while copying pieces
+
+    def __init__(self, checkpoint_path, settings, save_seconds=None):
+        '''
+        Constructor for CopyCheckpoint
+        @param checkpoint_path: path of JSON checkpoint file
+        @param settings: JSON-serialisable dict of copy settings which must match for a copy to be resumed
+        @param save_seconds: minimum number of seconds between checkpoint saves. Defaults to DEFAULT_SAVE_SECONDS
+        '''
+        self.checkpoint_path = checkpoint_path
+        self.settings = json.loads(json.dumps(settings, sort_keys=True, default=str)) # Normalise for comparison
+        self.save_seconds = CopyCheckpoint.DEFAULT_SAVE_SECONDS if save_seconds is None else save_seconds
+        self.variables = {} # Dict of {'piece_count': <int>, 'piece_crcs': [<int>, ...]} dicts keyed by variable name
+        self.last_save_time = time.time()
+
+    def load(self):
+        '''
+        Function to load checkpoint file if it exists and matches the copy settings
+        @return loaded: Boolean flag indicating whether a matching checkpoint was loaded
+        '''
+        if not os.path.isfile(self.checkpoint_path):
+            return False
+
+        try:
+            with open(self.checkpoint_path, 'r') as checkpoint_file:
+                checkpoint_dict = json.load(checkpoint_file)
+        except Exception as e:
+            logger.warning('Unable to read checkpoint file {}: {}'.format(self.checkpoint_path, e))
+            return False
+
+        if checkpoint_dict.get('settings') != self.settings:
+            logger.warning('Copy settings differ from those in checkpoint file {}'.format(self.checkpoint_path))
+            return False
+
+        self.variables = checkpoint_dict.get('variables') or {}
+        logger.info('Loaded checkpoint file {} with progress for {} variables'.format(self.checkpoint_path, len(self.variables)))
+        return True
+
+    def save(self, sync_function=None):
+        '''
+        Function to atomically write checkpoint file
+        @param sync_function: function to flush output dataset to disk before saving, or None
+        '''
+        if sync_function:
+            sync_function()
+
+        temp_path = self.checkpoint_path + '.tmp'
+        with open(temp_path, 'w') as checkpoint_file:
+            json.dump({'settings': self.settings,
+                       'variables': self.variables,
+                       }, checkpoint_file)
+        os.replace(temp_path, self.checkpoint_path)
+        self.last_save_time = time.time()
+
+    def remove(self):
+        '''
+        Function to remove checkpoint file after a completed copy
+        '''
+        if os.path.isfile(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+
+    def resume_variable(self, variable_name, piece_count, read_piece_function=None, dtype=None):
+        '''
+        Function to start or resume copying pieces for a variable
+        The last completed piece is re-read from the partial output and checked against its recorded checksum, stepping
+        back through earlier pieces until one matches.
+        @param variable_name: name of variable being copied
+        @param piece_count: total number of pieces for variable
+        @param read_piece_function: function taking a piece index and returning the piece read from the partial output
+        @param dtype: output variable dtype
+
+        @return completed_piece_count: number of pieces which have already been written and need not be copied again
+        '''
+        variable_dict = self.variables.get(variable_name)
+        if not variable_dict or variable_dict.get('piece_count') != piece_count:
+            self.variables[variable_name] = {'piece_count': piece_count, 'piece_crcs': []}
+            return 0
+
+        piece_crcs = variable_dict['piece_crcs']
+        completed_piece_count = len(piece_crcs)
+        while completed_piece_count and read_piece_function is not None:
+            if get_piece_crc(read_piece_function(completed_piece_count - 1), dtype) == piece_crcs[completed_piece_count - 1]:
+                break
+            logger.warning('Piece {} of variable {} failed verification and will be copied again'.format(completed_piece_count - 1,
+                                                                                                         variable_name))
+            completed_piece_count -= 1
+
+        del piece_crcs[completed_piece_count:]
+        if completed_piece_count:
+            logger.info('\tResuming copy of {} after {} of {} pieces'.format(variable_name, completed_piece_count, piece_count))
+        return completed_piece_count
+
+    def piece_written(self, variable_name, piece_crc, sync_function=None):
+        '''
+        Function to record that the next piece of a variable has been written, saving the checkpoint if due
+        @param variable_name: name of variable being copied
+        @param piece_crc: checksum of piece as returned by get_piece_crc()
+        @param sync_function: function to flush output dataset to disk before saving, or None
+        '''
+        self.variables[variable_name]['piece_crcs'].append(piece_crc)
+        if time.time() - self.last_save_time >= self.save_seconds:
+            self.save(sync_function)
+
+    def get_incomplete_variable_names(self):
+        '''
+        Function to return a list of names of variables for which not every piece has been recorded as written
+        '''
+        return [variable_name for variable_name, variable_dict in self.variables.items()
+                if len(variable_dict['piece_crcs']) != variable_dict['piece_count']]
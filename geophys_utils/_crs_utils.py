@@ -21,6 +21,7 @@ Created on 16Nov.,2016
 @author: u76345
 '''
 import re
+import threading
 import numpy as np
 from osgeo.osr import SpatialReference, CoordinateTransformation
 
@@ -29,6 +30,11 @@ CRS_NAME_MAPPING = {'GDA94': 'EPSG:4283',
                     'EPSG:283': 'EPSG:4283', # EPSG Prefix for UTM zone
                     }
 
+TRANSFORMATION_CACHE_SIZE = 64 # Maximum number of CoordinateTransformation objects cached in each thread
+
+# CoordinateTransformation objects are not thread-safe, so each thread keeps its own cache
+_transformation_cache = threading.local()
+
 def get_spatial_ref_from_wkt(wkt_or_crs_name):
     '''
     Function to return SpatialReference object for supplied WKT
@@ -62,6 +68,14 @@ def get_spatial_ref_from_wkt(wkt_or_crs_name):
         spatial_ref.SetUTM(utm_zone, False) # Put this here to avoid potential side effects in downstream code
         return spatial_ref
 
+    # Try any other EPSG code. SetWellKnownGeogCS only accepts geographic CRSs, so projected CRSs such as
+    # EPSG:3857 or EPSG:3577 must be imported from the EPSG database
+    epsg_match = re.match('EPSG:(\d+)$', modified_crs_name)
+    if epsg_match:
+        result = spatial_ref.ImportFromEPSG(int(epsg_match.group(1)))
+        if not result:
+            return spatial_ref
+
     assert not result, 'Invalid WKT or CRS name'
 
 def get_wkt_from_spatial_ref(spatial_ref):
@@ -81,14 +95,31 @@ def get_coordinate_transformation(from_wkt, to_wkt):
     if from_wkt == to_wkt:
         return None
     
+    # Re-use cached transformation to avoid re-parsing WKT for every call (e.g. for each tile of a warp)
+    transformations = getattr(_transformation_cache, 'transformations', None)
+    if transformations is None:
+        transformations = {}
+        _transformation_cache.transformations = transformations
+    
+    try:
+        return transformations[(from_wkt, to_wkt)]
+    except KeyError:
+        pass
+    
     from_spatial_ref = get_spatial_ref_from_wkt(from_wkt)
     to_spatial_ref = get_spatial_ref_from_wkt(to_wkt)
 
     # This is probably redundant
     if from_spatial_ref.ExportToWkt() == to_spatial_ref.ExportToWkt():
-        return None
-
-    return CoordinateTransformation(from_spatial_ref, to_spatial_ref)
+        coord_trans = None
+    else:
+        coord_trans = CoordinateTransformation(from_spatial_ref, to_spatial_ref)
+    
+    if len(transformations) >= TRANSFORMATION_CACHE_SIZE:
+        transformations.clear()
+    transformations[(from_wkt, to_wkt)] = coord_trans
+    
+    return coord_trans
 
 def get_utm_wkt(coordinate, from_wkt):
     '''
@@ -24,7 +24,70 @@ import sys
 import os
 import netCDF4
 import numpy as np
-from geophys_utils._array_pieces import array_pieces
+from functools import partial
+from geophys_utils._array_pieces import map_pieces, ReduceSink
+
+
+def get_array_statistics(value_array, percentiles=None):
+    '''
+    Function to return a dict of statistics for all non-NaN values in an array
+    @param value_array: float array with NaN for no-data
+    @param percentiles: list of percentiles (0-100) to compute
+
+    @return statistics: dict with 'count', 'min', 'max', 'mean', 'std_dev' and 'percentile_<p>' keys.
+        All values except 'count' are None if there are no valid values
+    '''
+    value_array = np.asarray(value_array, dtype='float64').ravel()
+    value_array = value_array[~np.isnan(value_array)]
+    percentiles = list(percentiles or [])
+
+    statistics = {'count': len(value_array)}
+    if not len(value_array):
+        statistics.update({key: None for key in ['min', 'max', 'mean', 'std_dev']
+                           + ['percentile_{:g}'.format(percentile) for percentile in percentiles]})
+        return statistics
+
+    statistics['min'] = float(np.min(value_array))
+    statistics['max'] = float(np.max(value_array))
+    statistics['mean'] = float(np.mean(value_array))
+    statistics['std_dev'] = float(np.std(value_array))
+    if percentiles:
+        for percentile, percentile_value in zip(percentiles, np.percentile(value_array, percentiles)):
+            statistics['percentile_{:g}'.format(percentile)] = float(percentile_value)
+
+    return statistics
+
+
+def get_piece_statistics(piece_array, array_offset, fill_value):
+    '''
+    Function to return (min, max, sum, count) for all non-no-data values in an array piece, or None if there are none.
+    Module-level so that it can be run in a process pool by map_pieces()
+    '''
+    if isinstance(piece_array, np.ma.core.MaskedArray):
+        piece_array = piece_array.data
+
+    # Discard all no-data elements
+    piece_array = np.array(piece_array[piece_array != fill_value])
+
+    piece_size = len(piece_array)
+    if not piece_size:
+        return None
+
+    return np.nanmin(piece_array), np.nanmax(piece_array), np.nanmean(piece_array, dtype='float64') * piece_size, piece_size
+
+
+def combine_piece_statistics(statistics, piece_statistics):
+    '''
+    Function to combine (min, max, sum, count) tuples returned by get_piece_statistics() in piece order
+    '''
+    if piece_statistics is None:
+        return statistics
+    if statistics is None:
+        return piece_statistics
+    return (min(statistics[0], piece_statistics[0]),
+            max(statistics[1], piece_statistics[1]),
+            statistics[2] + piece_statistics[2],
+            statistics[3] + piece_statistics[3])
 
 
 class DataStats(object):
@@ -35,12 +98,14 @@ class DataStats(object):
                 'max', 'mean']  # , 'median', 'std_dev', 'percentile_1', 'percentile_99']
 
     def __init__(self, netcdf_path=None, netcdf_dataset=None,
-                 max_bytes=500000000):
+                 max_bytes=500000000, prefetch=1, workers=None):
         '''
         DataStats Constructor
         Parameter:
             netcdf_path - string representing path to NetCDF file or URL for an OPeNDAP endpoint
             max_bytes - maximum number of bytes to pull into memory
+            prefetch - number of pieces to read ahead in a background thread while statistics are computed
+            workers - number of worker threads computing statistics for pieces. None for serial computation
         '''
         assert netcdf_dataset or netcdf_path, 'Either netcdf_dataset or netcdf_path must be defined'
         assert not (
@@ -68,42 +133,21 @@ class DataStats(object):
         self._data_stats['x_size'] = shape[1]
         self._data_stats['y_size'] = shape[0]
 
-        length_read = 0
-        weighted_mean = 0.0
-
-        for piece_array, _piece_offsets in array_pieces(
-                self.data_variable, max_bytes=max_bytes):
-
-            if isinstance(piece_array, np.ma.core.MaskedArray):
-                piece_array = piece_array.data
-
-            # Discard all no-data elements
-            piece_array = np.array(
-                piece_array[piece_array != self.data_variable._FillValue])
-
-            piece_size = len(piece_array)
-
-            if piece_size:
-                try:
-                    self._data_stats['min'] = min(
-                        self._data_stats['min'], np.nanmin(piece_array))
-                except:
-                    self._data_stats['min'] = np.nanmin(piece_array)
-
-                try:
-                    self._data_stats['max'] = max(
-                        self._data_stats['max'], np.nanmax(piece_array))
-                except:
-                    self._data_stats['max'] = np.nanmax(piece_array)
-
-                weighted_mean += np.nanmean(piece_array) * piece_size
-                length_read += piece_size
-            #==================================================================
-            # else:
-            #     print 'Empty array'
-            #==================================================================
-
-        self._data_stats['mean'] = weighted_mean / length_read if length_read else None
+        # Attributes are read before iterating so that only the background thread accesses the netCDF dataset
+        fill_value = self.data_variable._FillValue
+
+        statistics = map_pieces(self.data_variable,
+                                partial(get_piece_statistics, fill_value=fill_value),
+                                ReduceSink(combine_piece_statistics),
+                                max_bytes=max_bytes,
+                                workers=workers,
+                                prefetch=prefetch)
+        
+        if statistics is not None:
+            self._data_stats['min'], self._data_stats['max'], value_sum, length_read = statistics
+            self._data_stats['mean'] = value_sum / length_read
+        else:
+            self._data_stats['mean'] = None
 
         #===================================================================
         # #TODO: Implement something clever for these
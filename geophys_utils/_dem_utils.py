@@ -23,6 +23,7 @@ Created on 05/10/2012
 import os
 import sys
 import logging
+import threading
 import numpy
 from osgeo import osr
 import numexpr
@@ -221,27 +222,28 @@ class DEMUtils(NetCDFGridUtils):
         
         return dzdx_array, dzdy_array
     
-    def create_slope_array(self, dzdx_array, dzdy_array):
+    def create_slope_array(self, dzdx_array, dzdy_array, fill_value=None):
         hypotenuse_array = numpy.hypot(dzdx_array, dzdy_array)
         slope_array = numexpr.evaluate("arctan(hypotenuse_array) / RADIANS_PER_DEGREE")
         #Blank out no-data cells
-        slope_array[numpy.isnan(slope_array)] = self.data_variable._FillValue
+        slope_array[numpy.isnan(slope_array)] = self.data_variable._FillValue if fill_value is None else fill_value
         
         return slope_array
     
         
-    def create_aspect_array(self, dzdx_array, dzdy_array):
+    def create_aspect_array(self, dzdx_array, dzdy_array, fill_value=None):
         # Convert angles from conventional radians to compass heading 0-360
         aspect_array = numexpr.evaluate("(450 - arctan2(dzdy_array, -dzdx_array) / RADIANS_PER_DEGREE) % 360")
         #Blank out no-data cells
-        aspect_array[numpy.isnan(aspect_array)] = self.data_variable._FillValue
+        aspect_array[numpy.isnan(aspect_array)] = self.data_variable._FillValue if fill_value is None else fill_value
         
         return aspect_array
 
         
-    def create_slope_and_aspect(self, slope_path=None, aspect_path=None, overlap=4):
+    def create_slope_and_aspect(self, slope_path=None, aspect_path=None, overlap=4, prefetch=0):
         '''
         Create slope & aspect datasets from elevation
+        @param prefetch: number of elevation pieces to read ahead in a background thread while slope & aspect are computed
         '''
         # Copy dataset structure but not data
         slope_path = slope_path or os.path.splitext(self.nc_path)[0] + '_slope.nc'
@@ -260,16 +262,22 @@ class DEMUtils(NetCDFGridUtils):
         aspect_variable.long_name = 'aspect expressed compass bearing of normal to plane (0=North, 90=East, etc.)'
         aspect_variable.units = 'degrees'
               
+        # The netCDF library is not thread-safe, so all netCDF access in this thread must hold the same lock as background reads
+        netcdf_lock = threading.Lock()
+        fill_value = self.data_variable._FillValue
+        
         # Process dataset in small pieces
         for piece_array, offsets in array_pieces(self.data_variable, 
                                                  max_bytes=self.max_bytes if self.opendap else self.max_bytes/2, # Need to allow for multiple arrays in memory 
-                                                 overlap=overlap):
+                                                 overlap=overlap,
+                                                 prefetch=prefetch,
+                                                 read_lock=netcdf_lock):
             print('Processing array of shape {} at {}'.format(piece_array.shape, offsets))
             
             if type(piece_array) == numpy.ma.masked_array:
                 piece_array = piece_array.data # Convert from masked array to plain array
 
-            piece_array[(piece_array == self.data_variable._FillValue)] = numpy.NaN
+            piece_array[(piece_array == fill_value)] = numpy.NaN
             
             # Calculate raw source & destination slices including overlaps
             source_slices = [slice(0, 
@@ -294,10 +302,11 @@ class DEMUtils(NetCDFGridUtils):
                            ]
             
             print('Computing dzdx and dzdy arrays')
-            dzdx_array, dzdy_array = self.create_dzdxy_arrays(piece_array, offsets)
+            with netcdf_lock:
+                dzdx_array, dzdy_array = self.create_dzdxy_arrays(piece_array, offsets)
             
             print('Computing slope array')
-            result_array = self.create_slope_array(dzdx_array, dzdy_array)
+            result_array = self.create_slope_array(dzdx_array, dzdy_array, fill_value)
 
             print('Writing slope array of shape %s at %s'.format(tuple([dest_slices[dim_index].stop - dest_slices[dim_index].start
                                                      for dim_index in range(2)
@@ -307,11 +316,12 @@ class DEMUtils(NetCDFGridUtils):
                                                      ])
                                               )
                   )
-            slope_variable[dest_slices] = result_array[source_slices]  
-            slope_nc_dataset.sync()
+            with netcdf_lock:
+                slope_variable[dest_slices] = result_array[tuple(source_slices)]  
+                slope_nc_dataset.sync()
                  
             print('Computing aspect array')
-            result_array = self.create_aspect_array(dzdx_array, dzdy_array)
+            result_array = self.create_aspect_array(dzdx_array, dzdy_array, fill_value)
                                   
             print('Writing aspect array of shape {} at {}'.format(tuple([dest_slices[dim_index].stop - dest_slices[dim_index].start
                                                      for dim_index in range(2)
@@ -321,8 +331,9 @@ class DEMUtils(NetCDFGridUtils):
                                                      ])
                                               )
                   )
-            aspect_variable[dest_slices] = result_array[source_slices]      
-            aspect_nc_dataset.sync()   
+            with netcdf_lock:
+                aspect_variable[dest_slices] = result_array[tuple(source_slices)]      
+                aspect_nc_dataset.sync()   
             
         slope_nc_dataset.close() 
         print('Finished writing slope dataset %s'.format(slope_path))
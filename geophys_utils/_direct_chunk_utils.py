@@ -0,0 +1,227 @@
+#!/usr/bin/env python
+
+#===============================================================================
+#    Copyright 2026 Geoscience Australia
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+#===============================================================================
+'''
+Functions to compress chunks of netCDF4 (i.e. HDF5) variables in worker processes and write them with HDF5 direct chunk
+writes, so that compressed copies scale with the number of cores rather than being limited by single-threaded deflate
+
+Chunks are passed through the same HDF5 filter pipeline (fletcher32, shuffle & deflate) as the HDF5 library would apply,
+so the output is indistinguishable from that written through the netCDF library. Requires h5py.
+
+Created on 18Oct.,2026
+
+@author: agent
+'''
+import itertools
+import time
+import zlib
+import netCDF4
+import numpy as np
+import logging
+
+from geophys_utils._copy_checkpoint import get_piece_crc
+from geophys_utils._parallel_utils import ordered_map
+from geophys_utils._io_stats import io_timer
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO) # Initial logging level for this module
+
+try:
+    import h5py
+except ImportError:
+    logger.debug('Unable to import h5py. Parallel compression will not be enabled')
+    h5py = None
+
+# HDF5 filter identifiers
+FILTER_DEFLATE = 1
+FILTER_SHUFFLE = 2
+FILTER_FLETCHER32 = 3
+SUPPORTED_FILTERS = [FILTER_DEFLATE, FILTER_SHUFFLE, FILTER_FLETCHER32]
+
+_compress_piece_datasets = {} # Open input datasets keyed by path for compress_copy_piece() in each worker process
+
+
+def fletcher32(data):
+    '''
+    Function to return the HDF5 Fletcher32 checksum of a bytes object, as computed by H5_checksum_fletcher32()
+    Big-endian 16-bit words are summed with end-around carry, so sums are only ever zero if all words are zero.
+    '''
+    words = np.frombuffer(data[:len(data) - (len(data) % 2)], dtype='>u2').astype('uint64')
+    if len(data) % 2: # Odd trailing byte is treated as the high byte of a final word
+        words = np.append(words, np.uint64(data[-1]) << np.uint64(8))
+
+    def fold(value):
+        return ((value - 1) % 0xffff) + 1 if value else 0
+
+    word_count = len(words)
+    sum1 = int(np.sum(words % 0xffff) % 0xffff)
+    sum2 = int(np.sum((words % 0xffff) * (np.arange(word_count, 0, -1, dtype='uint64') % 0xffff) % 0xffff) % 0xffff)
+    nonzero = bool(np.any(words))
+    sum1 = fold(sum1 or (0xffff if nonzero else 0))
+    sum2 = fold(sum2 or (0xffff if nonzero else 0))
+    return (sum2 << 16) | sum1
+
+
+def apply_filters(chunk_bytes, filters, itemsize):
+    '''
+    Function to apply an HDF5 filter pipeline to the raw bytes of a single chunk
+    @param chunk_bytes: bytes of uncompressed chunk in storage byte order
+    @param filters: list of (filter_id, filter_values) tuples in pipeline order
+    @param itemsize: number of bytes per array element
+
+    @return filtered_bytes: bytes to be written with direct chunk write
+    '''
+    for filter_id, filter_values in filters:
+        if filter_id == FILTER_FLETCHER32:
+            chunk_bytes = chunk_bytes + np.array([fletcher32(chunk_bytes)], dtype='<u4').tobytes()
+        elif filter_id == FILTER_SHUFFLE:
+            element_size = filter_values[0] if filter_values else itemsize
+            element_count = len(chunk_bytes) // element_size
+            if element_size > 1 and element_count > 1:
+                # Leftover bytes (e.g. from an earlier checksum) are left unshuffled at the end
+                shuffled_length = element_count * element_size
+                chunk_bytes = (np.frombuffer(chunk_bytes[:shuffled_length], dtype='uint8').reshape((element_count, element_size)).T.tobytes()
+                               + chunk_bytes[shuffled_length:])
+        elif filter_id == FILTER_DEFLATE:
+            chunk_bytes = zlib.compress(chunk_bytes, filter_values[0] if filter_values else 6)
+        else:
+            raise BaseException('Unsupported HDF5 filter {}'.format(filter_id))
+    return chunk_bytes
+
+
+def get_variable_filters(h5_dataset):
+    '''
+    Function to return the filter pipeline of an h5py dataset as a list of (filter_id, filter_values) tuples, or None if
+    the dataset is unchunked or any of its filters are not supported
+    '''
+    if h5_dataset.chunks is None:
+        return None
+    create_plist = h5_dataset.id.get_create_plist()
+    filters = []
+    for filter_index in range(create_plist.get_nfilters()):
+        filter_id, _flags, filter_values, _name = create_plist.get_filter(filter_index)
+        if filter_id not in SUPPORTED_FILTERS:
+            return None
+        filters.append((filter_id, tuple(filter_values)))
+    return filters
+
+
+def compress_copy_piece(arguments):
+    '''
+    Function to read a piece of a variable and compress each of its chunks. Module-level so that it can be run in a
+    process pool. Input datasets are kept open between calls in each worker process.
+    @param arguments: (nc_path, variable_name, read_slices, flip_axis, write_slices, chunk_shape, dtype, fill_value, filters)
+        tuple, where write_slices must be aligned with chunk_shape
+
+    @return chunk_list: list of (chunk_offset, filtered_bytes) tuples
+    @return piece_crc: checksum of piece as returned by get_piece_crc()
+    @return piece_nbytes: number of uncompressed bytes in piece
+    @return read_seconds: time taken to read (and decompress) piece in seconds
+    @return compress_seconds: time taken to compress piece in seconds
+    '''
+    nc_path, variable_name, read_slices, flip_axis, write_slices, chunk_shape, dtype, fill_value, filters = arguments
+    dtype = np.dtype(dtype)
+
+    netcdf_dataset = _compress_piece_datasets.get(nc_path)
+    if netcdf_dataset is None:
+        netcdf_dataset = netCDF4.Dataset(nc_path, 'r')
+        _compress_piece_datasets[nc_path] = netcdf_dataset
+
+    start_time = time.perf_counter()
+    piece_array = netcdf_dataset.variables[variable_name][read_slices]
+    read_seconds = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    if flip_axis is not None:
+        piece_array = np.flip(piece_array, flip_axis)
+    piece_crc = get_piece_crc(piece_array, dtype)
+    piece_array = np.ma.filled(np.ma.asarray(piece_array).astype(dtype), fill_value)
+
+    chunk_list = []
+    for chunk_starts in itertools.product(*[range(0, piece_size, chunk_size)
+                                            for piece_size, chunk_size in zip(piece_array.shape, chunk_shape)]):
+        chunk_array = piece_array[tuple(slice(chunk_start, chunk_start + chunk_size)
+                                        for chunk_start, chunk_size in zip(chunk_starts, chunk_shape))]
+        if chunk_array.shape != tuple(chunk_shape): # Edge chunks are padded to full size with fill value
+            padded_array = np.full(chunk_shape, fill_value, dtype=dtype)
+            padded_array[tuple(slice(0, size) for size in chunk_array.shape)] = chunk_array
+            chunk_array = padded_array
+
+        chunk_list.append((tuple(write_slice.start + chunk_start for write_slice, chunk_start in zip(write_slices, chunk_starts)),
+                           apply_filters(np.ascontiguousarray(chunk_array).tobytes(), filters, dtype.itemsize)))
+
+    return chunk_list, piece_crc, piece_array.nbytes, read_seconds, time.perf_counter() - start_time
+
+
+def write_compressed_variables(input_nc_path, output_nc_path, variable_pieces, workers=None, checkpoint=None, io_stats=None):
+    '''
+    Function to copy pieces of variables from a netCDF file into existing (empty) chunked variables of a closed netCDF4
+    file. Pieces are read and their chunks compressed in a pool of worker processes, and the compressed chunks are
+    written in order with HDF5 direct chunk writes in the calling process.
+    @param input_nc_path: path of input netCDF file
+    @param output_nc_path: path of output netCDF4 file, which must not be open in the netCDF library
+    @param variable_pieces: list of (variable_name, read_slices_list, write_slices_list, flip_axis) tuples, where
+        write_slices must be aligned with the output chunks and flip_axis is the index of any dimension to be reversed
+    @param workers: number of worker processes. None for serial processing in the calling process
+    @param checkpoint: CopyCheckpoint object to record pieces written, or None
+    @param io_stats: IOStats object to record timings, or None
+    '''
+    assert h5py is not None, 'h5py is required for direct chunk writes'
+
+    h5_file = h5py.File(output_nc_path, 'r+')
+
+    def flush_output():
+        with io_timer(io_stats, 'sync'):
+            h5_file.flush()
+
+    try:
+        for variable_name, read_slices_list, write_slices_list, flip_axis in variable_pieces:
+            h5_dataset = h5_file[variable_name]
+            filters = get_variable_filters(h5_dataset)
+            assert filters is not None, 'Unsupported filter pipeline for direct chunk writes to {}'.format(variable_name)
+            logger.info('\tCompressing {} pieces of {} in {} worker processes'.format(len(write_slices_list), variable_name, workers or 1))
+
+            piece_iterator = ordered_map(compress_copy_piece,
+                                         ((input_nc_path, variable_name, read_slices, flip_axis, write_slices,
+                                           h5_dataset.chunks, h5_dataset.dtype.str, h5_dataset.fillvalue, filters)
+                                          for read_slices, write_slices in zip(read_slices_list, write_slices_list)),
+                                         workers=workers,
+                                         use_processes=True)
+
+            for write_slices in write_slices_list:
+                with io_timer(io_stats if (workers and workers > 1) else None, 'wait', variable_name):
+                    chunk_list, piece_crc, piece_nbytes, read_seconds, compress_seconds = next(piece_iterator)
+                if io_stats is not None:
+                    io_stats.record('read', variable_name, piece_nbytes, read_seconds, write_slices)
+                    io_stats.record('compress', variable_name, piece_nbytes, compress_seconds, write_slices)
+
+                logger.debug('\t\tWriting {} compressed chunks for piece {}'.format(len(chunk_list), write_slices))
+                with io_timer(io_stats, 'write', variable_name, write_slices, sum([len(chunk_bytes) for _offset, chunk_bytes in chunk_list])):
+                    for chunk_offset, chunk_bytes in chunk_list:
+                        h5_dataset.id.write_direct_chunk(chunk_offset, chunk_bytes)
+
+                if checkpoint is not None:
+                    checkpoint.piece_written(variable_name, piece_crc, flush_output)
+
+            piece_iterator.close() # Shut down worker processes before the next variable
+    finally:
+        if checkpoint is not None:
+            try:
+                checkpoint.save(flush_output)
+            except Exception as e:
+                logger.warning('Unable to save checkpoint {}: {}'.format(checkpoint.checkpoint_path, e))
+        h5_file.close()
@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+
+#===============================================================================
+#    Copyright 2026 Geoscience Australia
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+#===============================================================================
+'''
+Functions to drape (i.e. sample) many gridded netCDF datasets at point locations
+
+Created on 18Oct.,2026
+
+@author: agent
+'''
+import os
+import re
+import numpy as np
+from collections import OrderedDict
+import logging
+
+from geophys_utils._netcdf_grid_utils import NetCDFGridUtils
+from geophys_utils._crs_utils import transform_coords, get_spatial_ref_from_wkt
+from geophys_utils._parallel_utils import ordered_map
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO) # Initial logging level for this module
+
+
+def get_drape_grid_names(nc_paths):
+    '''
+    Function to return a unique name for each grid in nc_paths, for use as the prefix of its drape column names.
+    Names are file basenames without extension, preceded by as many parent directory names as are needed to distinguish
+    grids with the same basename. Any remaining duplicates (i.e. the same path given more than once) are numbered.
+    '''
+    split_paths = [[path_part for path_part in re.split(r'[\\/]+', os.path.splitext(nc_path)[0]) if path_part]
+                   for nc_path in nc_paths]
+    depths = [1] * len(split_paths)
+    while True:
+        grid_names = ['_'.join(path_parts[-depth:]) for path_parts, depth in zip(split_paths, depths)]
+        # Only extend names shared by different paths
+        extendable_indices = [path_index for path_index, grid_name in enumerate(grid_names)
+                              if depths[path_index] < len(split_paths[path_index])
+                              and len(set([tuple(split_paths[other_index]) for other_index, other_grid_name in enumerate(grid_names)
+                                           if other_grid_name == grid_name])) > 1]
+        if not extendable_indices:
+            break
+        for path_index in extendable_indices:
+            depths[path_index] += 1
+
+    unique_grid_names = []
+    for grid_name in grid_names:
+        unique_grid_name = grid_name
+        duplicate_count = 1
+        while unique_grid_name in unique_grid_names:
+            duplicate_count += 1
+            unique_grid_name = '{}_{}'.format(grid_name, duplicate_count)
+        unique_grid_names.append(unique_grid_name)
+    return unique_grid_names
+
+
+def get_drape_column_name(nc_path, variable_name, nc_paths=None):
+    '''
+    Function to return column name for values sampled from variable_name in grid at nc_path
+    @param nc_paths: list of all grid paths draped together (including nc_path), used to distinguish grids with the
+        same basename. Defaults to nc_path alone
+    '''
+    nc_paths = nc_paths or [nc_path]
+    return '{}_{}'.format(get_drape_grid_names(nc_paths)[nc_paths.index(nc_path)], variable_name)
+
+
+def _sample_grid(arguments):
+    '''
+    Function to sample a single grid at native coordinates. Module-level so that it can be run in a process pool.
+    @param arguments: (nc_path, variable_names, native_coordinates, resampling_method) tuple, where native_coordinates is
+        an (n, 2) array of XY coordinates in the grid CRS
+
+    @return value_array: float64 array of shape (n, n_variables) with NaN for no-data
+    '''
+    nc_path, variable_names, native_coordinates, resampling_method = arguments
+
+    netcdf_grid_utils = NetCDFGridUtils(nc_path, lazy=True)
+    try:
+        if resampling_method == 'nearest':
+            return netcdf_grid_utils.get_values_at_coords(native_coordinates, variable_names=variable_names)
+
+        fractional_index_array, _mask_array = netcdf_grid_utils.get_fractional_index_array_from_coords(native_coordinates)
+        index_array, weights = netcdf_grid_utils.get_resampling_indices(fractional_index_array, resampling_method)
+        return np.column_stack([netcdf_grid_utils.get_resampled_values(netcdf_grid_utils.netcdf_dataset.variables[variable_name],
+                                                                       index_array,
+                                                                       weights)
+                                for variable_name in variable_names])
+    finally:
+        netcdf_grid_utils.close()
+
+
+def drape_grids(coordinates, nc_paths, wkt=None, variable_names=None, resampling_method='nearest', workers=None):
+    '''
+    Function to sample many grids at the same point locations
+    Grid CRSs and extents are read first, and points are reprojected only once for each distinct grid CRS. Grids are
+    then pruned to the points falling within their extents (and skipped altogether if there are none) before being
+    sampled concurrently in a pool of worker processes. Each touched grid block is read only once per grid.
+    @param coordinates: (n, 2) array of point coordinates
+    @param nc_paths: list of paths or OPeNDAP URLs of gridded netCDF datasets
+    @param wkt: WKT or CRS name for point coordinates. Defaults to "EPSG:4326"
+    @param variable_names: list of variable names to sample from every grid. Defaults to the data variable of each grid
+    @param resampling_method: 'nearest' or 'bilinear'
+    @param workers: number of worker processes. None for serial processing in the calling process
+
+    @return drape_columns: OrderedDict of float64 arrays of length n (with NaN for no-data and points outside grid) keyed
+        by column name as returned by get_drape_column_name(). Grids with the same basename are distinguished by their
+        parent directory names (see get_drape_grid_names())
+    '''
+    assert resampling_method in NetCDFGridUtils.WARP_RESAMPLING_METHODS, 'Invalid resampling_method {}. Must be one of {}'.format(
+        resampling_method, NetCDFGridUtils.WARP_RESAMPLING_METHODS)
+    coordinates = np.asarray(coordinates, dtype='float64').reshape((-1, 2))
+    wkt = wkt or 'EPSG:4326'
+    if type(variable_names) == str:
+        variable_names = [variable_names]
+
+    # Read CRS and extent of each grid, then reproject points once for each distinct CRS
+    grid_subsets = [] # List of (nc_path, grid_variable_names, point_indices, native_coordinates) tuples
+    native_coordinates_by_crs = {}
+    for nc_path in nc_paths:
+        netcdf_grid_utils = NetCDFGridUtils(nc_path, enable_block_cache=False, lazy=True)
+        try:
+            grid_variable_names = variable_names or [netcdf_grid_utils.data_variable.name]
+            crs_key = get_spatial_ref_from_wkt(netcdf_grid_utils.wkt).ExportToWkt()
+            native_coordinates = native_coordinates_by_crs.get(crs_key)
+            if native_coordinates is None:
+                native_coordinates = np.array(transform_coords(coordinates, wkt, netcdf_grid_utils.wkt), dtype='float64').reshape((-1, 2))
+                native_coordinates_by_crs[crs_key] = native_coordinates
+
+            # Extents are in array dimension order
+            array_order_coordinates = native_coordinates[:,::-1] if netcdf_grid_utils.YX_order else native_coordinates
+            point_indices = np.flatnonzero(np.all((array_order_coordinates >= np.array(netcdf_grid_utils.min_extent)) &
+                                                  (array_order_coordinates <= np.array(netcdf_grid_utils.max_extent)), axis=1))
+        finally:
+            netcdf_grid_utils.close()
+
+        logger.debug('{} of {} points fall within {}'.format(len(point_indices), len(coordinates), nc_path))
+        grid_subsets.append((nc_path, grid_variable_names, point_indices, native_coordinates[point_indices]))
+
+    logger.info('Draping {} grids in {} distinct CRSs at {} points'.format(len(nc_paths), len(native_coordinates_by_crs), len(coordinates)))
+
+    # Start with all-NaN columns so that grids with no points in their extents are still represented
+    # Grid names are unique, so columns for grids with the same basename do not overwrite each other
+    grid_names = get_drape_grid_names(nc_paths)
+    drape_columns = OrderedDict(('{}_{}'.format(grid_name, variable_name),
+                                 np.full(shape=(len(coordinates),), fill_value=np.nan, dtype='float64'))
+                                for grid_name, (_nc_path, grid_variable_names, _point_indices, _native_coordinates) in zip(grid_names, grid_subsets)
+                                for variable_name in grid_variable_names)
+
+    sampled_subsets = [(grid_name, grid_subset) for grid_name, grid_subset in zip(grid_names, grid_subsets) if len(grid_subset[2])]
+    for (grid_name, (nc_path, grid_variable_names, point_indices, _native_coordinates)), value_array in zip(
+            sampled_subsets,
+            ordered_map(_sample_grid,
+                        ((nc_path, grid_variable_names, native_coordinates, resampling_method)
+                         for _grid_name, (nc_path, grid_variable_names, _point_indices, native_coordinates) in sampled_subsets),
+                        workers=workers,
+                        use_processes=True)
+            ):
+        for variable_index, variable_name in enumerate(grid_variable_names):
+            drape_columns['{}_{}'.format(grid_name, variable_name)][point_indices] = value_array[:,variable_index]
+
+    return drape_columns
@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+
+#===============================================================================
+#    Copyright 2026 Geoscience Australia
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+#===============================================================================
+'''
+Frequency-domain filters for potential-field (magnetic & gravity) grids, applied to windows of a grid
+
+Wavenumbers are in radians per metre, with kx positive eastward and ky positive northward.
+
+Created on 18Oct.,2026
+
+@author: agent
+'''
+import math
+import numpy as np
+from scipy import fft as scipy_fft
+
+
+def upward_continuation_filter(kx, ky, height):
+    '''
+    Upward continuation filter. Negative heights give (unstable) downward continuation
+    @param height: continuation height in metres
+    '''
+    return np.exp(-np.hypot(kx, ky) * height)
+
+
+def vertical_derivative_filter(kx, ky, order=1):
+    '''
+    Vertical derivative filter
+    @param order: derivative order (may be fractional)
+    '''
+    return np.hypot(kx, ky) ** order
+
+
+def x_derivative_filter(kx, ky, order=1):
+    '''
+    Eastward horizontal derivative filter
+    @param order: integer derivative order
+    '''
+    return (1j * kx) ** order
+
+
+def y_derivative_filter(kx, ky, order=1):
+    '''
+    Northward horizontal derivative filter
+    @param order: integer derivative order
+    '''
+    return (1j * ky) ** order
+
+
+def reduction_to_pole_filter(kx, ky, inclination, declination, remanent_inclination=None, remanent_declination=None):
+    '''
+    Reduction to the pole filter for total magnetic intensity. Unstable for low (< ~15 degree) inclinations.
+    @param inclination: geomagnetic field inclination in degrees
+    @param declination: geomagnetic field declination in degrees
+    @param remanent_inclination: magnetisation inclination in degrees. Defaults to field inclination (induced only)
+    @param remanent_declination: magnetisation declination in degrees. Defaults to field declination (induced only)
+    '''
+    k = np.hypot(kx, ky)
+    zero_wavenumber = (k == 0)
+    k[zero_wavenumber] = 1.0 # Avoid division by zero. Zero wavenumber (i.e. mean) is left unchanged below
+
+    def direction_factor(direction_inclination, direction_declination):
+        inclination_radians, declination_radians = math.radians(direction_inclination), math.radians(direction_declination)
+        return (math.sin(inclination_radians) +
+                1j * math.cos(inclination_radians) * (kx * math.sin(declination_radians) + ky * math.cos(declination_radians)) / k)
+
+    field_factor = direction_factor(inclination, declination)
+    if remanent_inclination is None and remanent_declination is None:
+        magnetisation_factor = field_factor
+    else:
+        magnetisation_factor = direction_factor(inclination if remanent_inclination is None else remanent_inclination,
+                                                declination if remanent_declination is None else remanent_declination)
+
+    filter_array = 1.0 / (field_factor * magnetisation_factor)
+    filter_array[zero_wavenumber] = 1.0
+    return filter_array
+
+
+FFT_FILTERS = {'upward_continuation': upward_continuation_filter,
+               'vertical_derivative': vertical_derivative_filter,
+               'x_derivative': x_derivative_filter,
+               'y_derivative': y_derivative_filter,
+               'reduction_to_pole': reduction_to_pole_filter,
+               }
+
+
+def get_cosine_taper(size, taper_start, taper_stop):
+    '''
+    Function to return 1D taper which is 1.0 over [taper_start, taper_stop) and falls to 0.0 by cosine roll-off to each end
+    '''
+    taper = np.ones(shape=(size,), dtype='float64')
+    if taper_start:
+        taper[:taper_start] = 0.5 * (1.0 - np.cos(np.pi * (np.arange(taper_start) + 0.5) / taper_start))
+    if size - taper_stop:
+        taper[taper_stop:] = 0.5 * (1.0 + np.cos(np.pi * (np.arange(size - taper_stop) + 0.5) / (size - taper_stop)))
+    return taper
+
+
+def get_blend_weights(size, ramp_before, ramp_after):
+    '''
+    Function to return 1D linear blending weights for a tile extending ramp_before and ramp_after cells beyond the
+    boundaries of its core. Weights of adjacent tiles with equal ramp widths sum to 1.0 across their shared ramps.
+    @param size: total size of tile output region including ramps
+    @param ramp_before: number of cells of ramp on each side of the leading core boundary (0 at grid edge)
+    @param ramp_after: number of cells of ramp on each side of the trailing core boundary (0 at grid edge)
+    '''
+    weights = np.ones(shape=(size,), dtype='float64')
+    if ramp_before:
+        weights[:2 * ramp_before] = (np.arange(2 * ramp_before) + 0.5) / (2 * ramp_before)
+    if ramp_after:
+        weights[size - 2 * ramp_after:] = 1.0 - (np.arange(2 * ramp_after) + 0.5) / (2 * ramp_after)
+    return weights
+
+
+def filter_window(arguments):
+    '''
+    Function to apply a frequency-domain filter to a 2D window. Module-level so that it can be run in a process pool.
+    No-data cells are filled with the window mean, the window is mirror-padded and the padding tapered to the mean
+    before the FFT, and no-data cells are restored as NaN afterwards.
+    @param arguments: (window_array, filter_name, filter_parameters, cell_sizes, axis_signs, padding, yx_order) tuple, where
+        window_array is a float64 array with NaN for no-data, cell_sizes are cell sizes in metres in array dimension order,
+        axis_signs are +1 or -1 for each array dimension depending on whether indices increase northward/eastward or not,
+        padding is the number of cells of tapered padding on each side, and yx_order is True if rows are northings
+
+    @return filtered_array: float64 array of same shape as window_array with NaN for no-data
+    '''
+    window_array, filter_name, filter_parameters, cell_sizes, axis_signs, padding, yx_order = arguments
+
+    nodata_mask = np.isnan(window_array)
+    if nodata_mask.all():
+        return window_array
+    window_mean = np.mean(window_array[~nodata_mask])
+
+    # Pad to fast FFT sizes, then taper padding to zero (i.e. window mean) at outer edges
+    padded_shape = [scipy_fft.next_fast_len(window_array.shape[dim_index] + 2 * padding) for dim_index in range(2)]
+    pad_widths = [(padding, padded_shape[dim_index] - window_array.shape[dim_index] - padding) for dim_index in range(2)]
+    padded_array = np.pad(np.where(nodata_mask, 0.0, window_array - window_mean), pad_widths, mode='symmetric')
+    padded_array *= np.outer(*[get_cosine_taper(padded_shape[dim_index],
+                                                pad_widths[dim_index][0],
+                                                padded_shape[dim_index] - pad_widths[dim_index][1])
+                               for dim_index in range(2)])
+
+    # Wavenumbers in radians per metre for array axes, converted to eastward & northward components
+    axis_wavenumbers = np.meshgrid(*[2.0 * np.pi * axis_signs[dim_index] * scipy_fft.fftfreq(padded_shape[dim_index], cell_sizes[dim_index])
+                                     for dim_index in range(2)], indexing='ij')
+    ky, kx = axis_wavenumbers if yx_order else axis_wavenumbers[::-1]
+
+    filter_array = FFT_FILTERS[filter_name](kx, ky, **(filter_parameters or {}))
+    filtered_array = np.real(scipy_fft.ifft2(scipy_fft.fft2(padded_array) * filter_array))
+
+    # Mean is scaled by filter response at zero wavenumber
+    filtered_array = filtered_array[padding:padding + window_array.shape[0],
+                                    padding:padding + window_array.shape[1]] + window_mean * np.real(filter_array[0, 0])
+    filtered_array[nodata_mask] = np.nan
+    return filtered_array
@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+
+#===============================================================================
+#    Copyright 2026 Geoscience Australia
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+#===============================================================================
+'''
+IOStats class to record bytes and elapsed time per phase, per variable and per piece for netCDF operations
+
+N.B: The netCDF library decompresses chunks as they are read and compresses them as they are written, so
+decompression time is included in the "read" phase and compression time in the "write" and "sync" phases, or in the
+"compress" phase when chunks are compressed in worker processes for direct chunk writes.
+
+Created on 18Oct.,2026
+
+@author: agent
+'''
+import time
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+import logging
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO) # Initial logging level for this module
+
+
+class IOTiming(object):
+    '''
+    IOTiming class holding the number of bytes for a timed operation. Set nbytes inside an io_timer() block.
+    '''
+    def __init__(self, nbytes=0):
+        self.nbytes = nbytes
+
+
+@contextmanager
+def io_timer(io_stats, phase, variable_name=None, piece=None, nbytes=0):
+    '''
+    Context manager to time a block of code and record it in io_stats. Does nothing if io_stats is None.
+    @param io_stats: IOStats object or None
+    @param phase: name of phase, e.g. 'read', 'write', 'sync'
+    @param variable_name: name of variable, or None for dataset-level operations
+    @param piece: piece identifier (e.g. tuple of slices), or None
+    @param nbytes: number of bytes, if known in advance. May be set on the yielded IOTiming object instead
+
+    @yield timing: IOTiming object
+    '''
+    timing = IOTiming(nbytes)
+    if io_stats is None:
+        yield timing
+        return
+
+    start_time = time.perf_counter()
+    try:
+        yield timing
+    finally:
+        io_stats.record(phase, variable_name, timing.nbytes, time.perf_counter() - start_time, piece)
+
+
+def get_piece_string(piece):
+    '''
+    Function to return a compact string representation of a piece identifier, e.g. "0:128,0:79" for a tuple of slices
+    '''
+    if piece is None:
+        return None
+    if isinstance(piece, (tuple, list)):
+        return ','.join([get_piece_string(item) for item in piece])
+    if isinstance(piece, slice):
+        return '{}:{}'.format('' if piece.start is None else piece.start, '' if piece.stop is None else piece.stop)
+    return str(piece)
+
+
+class IOStats(object):
+    '''
+    IOStats class accumulating timed I/O records. Records may be added from multiple threads.
+    '''
+    def __init__(self, record_pieces=True):
+        '''
+        Constructor for IOStats
+        @param record_pieces: Boolean flag indicating whether individual piece records should be kept for the report
+        '''
+        self.record_pieces = record_pieces
+        self.start_time = time.time()
+        self.phase_totals = OrderedDict() # {phase: [count, bytes, seconds]}
+        self.variable_totals = OrderedDict() # {variable_name: {phase: [count, bytes, seconds]}}
+        self.piece_records = []
+        self._lock = threading.Lock()
+
+    def record(self, phase, variable_name, nbytes, seconds, piece=None):
+        '''
+        Function to record a single timed operation
+        @param phase: name of phase, e.g. 'read', 'write', 'sync'
+        @param variable_name: name of variable, or None for dataset-level operations
+        @param nbytes: number of bytes read or written
+        @param seconds: elapsed time in seconds
+        @param piece: piece identifier (e.g. tuple of slices), or None
+        '''
+        nbytes = int(nbytes or 0)
+        with self._lock:
+            totals_list = [self.phase_totals.setdefault(phase, [0, 0, 0.0])]
+            if variable_name is not None:
+                totals_list.append(self.variable_totals.setdefault(variable_name, OrderedDict()).setdefault(phase, [0, 0, 0.0]))
+            for totals in totals_list:
+                totals[0] += 1
+                totals[1] += nbytes
+                totals[2] += seconds
+
+            if self.record_pieces and piece is not None:
+                self.piece_records.append({'phase': phase,
+                                           'variable': variable_name,
+                                           'piece': get_piece_string(piece),
+                                           'bytes': nbytes,
+                                           'seconds': seconds,
+                                           })
+
+    @staticmethod
+    def get_totals_dict(totals):
+        '''
+        Helper function to convert [count, bytes, seconds] list to dict including throughput
+        '''
+        count, nbytes, seconds = totals
+        return OrderedDict([('count', count),
+                            ('bytes', nbytes),
+                            ('seconds', seconds),
+                            ('mb_per_second', (nbytes / 1000000.0 / seconds) if seconds else None),
+                            ])
+
+    def report(self):
+        '''
+        Function to return structured report of recorded operations
+        @return report: dict with 'elapsed_seconds', 'phases' (totals keyed by phase), 'variables' (totals keyed by
+            variable name then phase) and 'pieces' (list of individual piece records) keys
+        '''
+        with self._lock:
+            return OrderedDict([('elapsed_seconds', time.time() - self.start_time),
+                                ('phases', OrderedDict((phase, IOStats.get_totals_dict(totals))
+                                                       for phase, totals in self.phase_totals.items())),
+                                ('variables', OrderedDict((variable_name, OrderedDict((phase, IOStats.get_totals_dict(totals))
+                                                                                      for phase, totals in phase_totals.items()))
+                                                          for variable_name, phase_totals in self.variable_totals.items())),
+                                ('pieces', list(self.piece_records)),
+                                ])
+
+    def get_summary_lines(self):
+        '''
+        Function to return a list of human-readable summary lines of totals per phase and per variable
+        '''
+        report = self.report()
+
+        def totals_string(label, totals):
+            return '  {:<24s} {:>8d} ops {:>14d} bytes {:>10.3f} s {:>10s} MB/s'.format(
+                label, totals['count'], totals['bytes'], totals['seconds'],
+                '{:.1f}'.format(totals['mb_per_second']) if totals['mb_per_second'] is not None else '-')
+
+        lines = ['I/O summary after {:.3f} s elapsed:'.format(report['elapsed_seconds'])]
+        lines += [totals_string(phase, totals) for phase, totals in report['phases'].items()]
+        for variable_name, phase_totals in report['variables'].items():
+            lines.append(' {}:'.format(variable_name))
+            lines += [totals_string(phase, totals) for phase, totals in phase_totals.items()]
+        return lines
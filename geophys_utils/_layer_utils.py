@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+
+#===============================================================================
+#    Copyright 2026 Geoscience Australia
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+#===============================================================================
+'''
+Functions to work with layered (point, layer) data such as AEM conductivity models
+
+Created on 18Oct.,2026
+
+@author: agent
+'''
+import numpy as np
+
+
+def get_layer_top_depths(thickness_array):
+    '''
+    Function to return depths below surface of layer tops and of the base of the deepest layer
+    A NaN thickness for the deepest layer is treated as an infinite half-space
+    @param thickness_array: array of shape (n, layers) or (layers,) containing layer thicknesses
+
+    @return layer_top_depth_array: array of same shape as thickness_array containing depth of top of each layer
+    @return bottom_depth_array: array of shape (n,) (or scalar) containing depth of base of deepest layer
+    '''
+    thickness_array = np.asarray(thickness_array, dtype='float64')
+
+    layer_top_depth_array = np.zeros(shape=thickness_array.shape, dtype='float64')
+    layer_top_depth_array[...,1:] = np.cumsum(thickness_array[...,:-1], axis=-1)
+
+    bottom_depth_array = layer_top_depth_array[...,-1] + thickness_array[...,-1]
+    bottom_depth_array = np.where(np.isnan(bottom_depth_array), np.inf, bottom_depth_array)
+
+    return layer_top_depth_array, bottom_depth_array
+
+
+def sample_layers_at_depths(value_array, layer_top_depth_array, depth_array, bottom_depth_array=None):
+    '''
+    Vectorised function to return the value of the layer containing each specified depth for every column
+    @param value_array: array of shape (n, layers) containing layered values
+    @param layer_top_depth_array: array of shape (n, layers) containing ascending depths of layer tops
+    @param depth_array: array of shape (depths,) or (depths, n) containing depths below surface to sample
+    @param bottom_depth_array: array of shape (n,) containing depth of base of deepest layer. None means half-space
+
+    @return result_array: array of shape (depths, n) containing sampled values, or NaN above surface or below base
+    '''
+    value_array = np.asarray(value_array, dtype='float64')
+    layer_top_depth_array = np.asarray(layer_top_depth_array, dtype='float64')
+    column_count, layer_count = value_array.shape
+
+    depth_array = np.asarray(depth_array, dtype='float64')
+    if depth_array.ndim == 1:
+        depth_array = np.broadcast_to(depth_array[:,np.newaxis], (depth_array.shape[0], column_count))
+
+    if bottom_depth_array is None:
+        bottom_depth_array = np.full(shape=(column_count,), fill_value=np.inf)
+
+    valid_mask = np.logical_and(depth_array >= 0, depth_array < bottom_depth_array[np.newaxis,:])
+
+    # Search all columns at once by offsetting each column's layer tops into its own disjoint range
+    column_span = max(np.nanmax(layer_top_depth_array), np.max(depth_array[valid_mask], initial=0.0)) + 1.0
+    column_offsets = np.arange(column_count) * column_span
+    layer_indices = (np.searchsorted((layer_top_depth_array + column_offsets[:,np.newaxis]).ravel(),
+                                     np.where(valid_mask, depth_array, 0.0) + column_offsets[np.newaxis,:],
+                                     side='right') - 1
+                     - np.arange(column_count)[np.newaxis,:] * layer_count)
+
+    column_indices = np.broadcast_to(np.arange(column_count)[np.newaxis,:], depth_array.shape)
+
+    result_array = np.full(shape=depth_array.shape, fill_value=np.nan)
+    result_array[valid_mask] = value_array[column_indices[valid_mask], layer_indices[valid_mask]]
+
+    return result_array
+
+
+def get_layered_section(distance_array,
+                        surface_elevation_array,
+                        thickness_array,
+                        value_array_dict,
+                        horizontal_resolution=None,
+                        vertical_resolution=None,
+                        max_depth=None,
+                        max_gap=None):
+    '''
+    Function to regrid layered values along a line onto a regular distance-elevation grid
+    Each grid column takes the layered model of the nearest point along the line
+    @param distance_array: array of shape (n,) containing ascending distances of points along line
+    @param surface_elevation_array: array of shape (n,) containing surface elevation at each point
+    @param thickness_array: array of shape (n, layers) or (layers,) containing layer thicknesses
+    @param value_array_dict: dict of arrays of shape (n, layers) keyed by variable name
+    @param horizontal_resolution: distance between grid columns. Defaults to median point spacing
+    @param vertical_resolution: elevation difference between grid rows. Defaults to median thickness of top layer
+    @param max_depth: maximum depth below surface to grid. Defaults to depth of base of deepest finite layer
+    @param max_gap: maximum distance from a grid column to its nearest point before column is set to NaN. None for no limit
+
+    @return section_dict: dict containing 'distance' array of shape (columns,), 'elevation' array of shape (rows,),
+        'point_index' array of shape (columns,) for nearest point, and value grids of shape (rows, columns) keyed by variable name
+    '''
+    distance_array = np.asarray(distance_array, dtype='float64')
+    surface_elevation_array = np.asarray(surface_elevation_array, dtype='float64')
+    point_count = distance_array.shape[0]
+
+    thickness_array = np.asarray(thickness_array, dtype='float64')
+    if thickness_array.ndim == 1: # Same layering for all points
+        thickness_array = np.broadcast_to(thickness_array, (point_count, thickness_array.shape[0]))
+
+    layer_top_depth_array, bottom_depth_array = get_layer_top_depths(thickness_array)
+
+    horizontal_resolution = horizontal_resolution or (float(np.median(np.diff(distance_array))) if point_count > 1 else 1.0)
+    vertical_resolution = vertical_resolution or float(np.nanmedian(thickness_array[:,0]))
+
+    if max_depth is None:
+        finite_bottoms = bottom_depth_array[np.isfinite(bottom_depth_array)]
+        max_depth = (np.max(finite_bottoms) if len(finite_bottoms)
+                     else np.max(layer_top_depth_array[:,-1]) + vertical_resolution)
+
+    column_distances = np.arange(0, distance_array[-1] - distance_array[0] + horizontal_resolution / 2.0,
+                                 horizontal_resolution) + distance_array[0]
+
+    # Find nearest point for each column
+    point_indices = np.clip(np.searchsorted(distance_array, column_distances), 1, max(point_count - 1, 1))
+    point_indices -= (np.abs(column_distances - distance_array[point_indices - 1]) <=
+                      np.abs(distance_array[np.minimum(point_indices, point_count - 1)] - column_distances))
+    point_indices = np.clip(point_indices, 0, point_count - 1)
+
+    row_elevations = np.arange(np.nanmax(surface_elevation_array),
+                               np.nanmin(surface_elevation_array) - max_depth - vertical_resolution / 2.0,
+                               -vertical_resolution)
+
+    column_surface_elevations = surface_elevation_array[point_indices]
+    depth_array = column_surface_elevations[np.newaxis,:] - row_elevations[:,np.newaxis]
+    depth_array[depth_array > max_depth] = -1.0 # Treat as outside model
+
+    section_dict = {'distance': column_distances,
+                    'elevation': row_elevations,
+                    'point_index': point_indices
+                    }
+
+    gap_mask = None
+    if max_gap is not None:
+        gap_mask = np.abs(distance_array[point_indices] - column_distances) > max_gap
+
+    for variable_name, value_array in value_array_dict.items():
+        grid_array = sample_layers_at_depths(np.asarray(value_array, dtype='float64')[point_indices],
+                                             layer_top_depth_array[point_indices],
+                                             depth_array,
+                                             bottom_depth_array[point_indices]
+                                             )
+        if gap_mask is not None:
+            grid_array[:,gap_mask] = np.nan
+
+        section_dict[variable_name] = grid_array
+
+    return section_dict
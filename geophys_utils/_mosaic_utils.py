@@ -0,0 +1,369 @@
+#!/usr/bin/env python
+
+#===============================================================================
+#    Copyright 2026 Geoscience Australia
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+#===============================================================================
+'''
+Functions to build a mosaic of many gridded netCDF datasets (e.g. survey grids) in a single output grid
+
+Created on 18Oct.,2026
+
+@author: agent
+'''
+import math
+import argparse
+import numpy as np
+import logging
+from collections import OrderedDict
+
+from geophys_utils._netcdf_grid_utils import NetCDFGridUtils
+from geophys_utils._netcdf_grid_writer import create_netcdf_grid
+from geophys_utils._block_cache import BlockCache
+from geophys_utils._parallel_utils import ordered_map
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO) # Initial logging level for this module
+
+BLEND_METHODS = ['priority', 'mean', 'feather']
+DEFAULT_TILE_SIZE = 256 # Size of output tiles (and chunks) in each dimension
+DEFAULT_FEATHER_CELLS = 16 # Width of feathered edges in source cells
+DEFAULT_MAX_OPEN_SOURCES = 8 # Maximum number of source grids kept open in each process
+
+
+def get_source_footprint(netcdf_grid_utils, wkt, pixel_size):
+    '''
+    Function to return the bounding box of a source grid in the mosaic CRS
+    @param netcdf_grid_utils: NetCDFGridUtils object for source grid
+    @param wkt: WKT or CRS name for mosaic
+    @param pixel_size: mosaic pixel size in mosaic CRS units
+
+    @return footprint: [xmin, ymin, xmax, ymax] list of cell edge ordinates in mosaic CRS
+    '''
+    geotransform, shape = netcdf_grid_utils.get_warp_grid(wkt, pixel_size)
+    return [geotransform[0],
+            geotransform[3] + shape[0] * geotransform[5],
+            geotransform[0] + shape[1] * geotransform[1],
+            geotransform[3]]
+
+
+def get_tile_source_index(footprints, geotransform, shape, tile_size):
+    '''
+    Function to build a spatial index of the sources overlapping each output tile
+    @param footprints: list of [xmin, ymin, xmax, ymax] source footprints in mosaic CRS, in priority order
+    @param geotransform: GDAL GeoTransform for north-up mosaic grid
+    @param shape: (rows, columns) tuple for mosaic grid
+    @param tile_size: size of output tiles in each dimension
+
+    @return tile_source_index: dict keyed by (tile_row, tile_column) containing list of (source_index, source_window) tuples
+        in priority order, where source_window is a (row_slice, column_slice) tuple of the footprint within the tile
+    '''
+    tile_source_index = {}
+    for source_index, footprint in enumerate(footprints):
+        # Footprint extent in mosaic cells, clipped to mosaic grid
+        footprint_slices = (slice(max(int(math.floor((geotransform[3] - footprint[3]) / -geotransform[5])), 0),
+                                  min(int(math.ceil((geotransform[3] - footprint[1]) / -geotransform[5])), shape[0])),
+                            slice(max(int(math.floor((footprint[0] - geotransform[0]) / geotransform[1])), 0),
+                                  min(int(math.ceil((footprint[2] - geotransform[0]) / geotransform[1])), shape[1]))
+                            )
+        if footprint_slices[0].start >= footprint_slices[0].stop or footprint_slices[1].start >= footprint_slices[1].stop:
+            logger.debug('Source {} does not overlap mosaic'.format(source_index))
+            continue
+
+        for tile_row in range(footprint_slices[0].start // tile_size, (footprint_slices[0].stop - 1) // tile_size + 1):
+            for tile_column in range(footprint_slices[1].start // tile_size, (footprint_slices[1].stop - 1) // tile_size + 1):
+                source_window = tuple(slice(max(footprint_slice.start, tile_index * tile_size),
+                                            min(footprint_slice.stop, (tile_index + 1) * tile_size))
+                                      for footprint_slice, tile_index in zip(footprint_slices, (tile_row, tile_column)))
+                tile_source_index.setdefault((tile_row, tile_column), []).append((source_index, source_window))
+
+    return tile_source_index
+
+
+# Most recently used source grids kept open (with their block caches) between tiles in each process,
+# keyed by (nc_path, block_cache_bytes) in least- to most-recently used order
+_mosaic_source_grid_utils = OrderedDict()
+
+
+def _get_mosaic_source(nc_path, block_cache_bytes, max_open_sources=None):
+    '''
+    Function to return a NetCDFGridUtils object for a source grid, opening it on first use in each process
+    The least recently used source grid is closed when more than max_open_sources would be open
+    @param nc_path: path or OPeNDAP URL of source grid
+    @param block_cache_bytes: block cache budget for source grid
+    @param max_open_sources: maximum number of source grids to keep open. Defaults to DEFAULT_MAX_OPEN_SOURCES
+    '''
+    source_key = (nc_path, block_cache_bytes)
+    source_grid_utils = _mosaic_source_grid_utils.get(source_key)
+    if source_grid_utils is not None:
+        _mosaic_source_grid_utils.move_to_end(source_key)
+        return source_grid_utils
+
+    while len(_mosaic_source_grid_utils) >= max(max_open_sources or DEFAULT_MAX_OPEN_SOURCES, 1):
+        _evicted_key, evicted_grid_utils = _mosaic_source_grid_utils.popitem(last=False)
+        evicted_grid_utils.close()
+
+    source_grid_utils = NetCDFGridUtils(nc_path, block_cache_bytes=block_cache_bytes, lazy=True)
+    _mosaic_source_grid_utils[source_key] = source_grid_utils
+    return source_grid_utils
+
+
+def _close_mosaic_sources():
+    '''
+    Function to close all source grids opened in this process by _get_mosaic_source()
+    '''
+    for source_grid_utils in _mosaic_source_grid_utils.values():
+        source_grid_utils.close()
+    _mosaic_source_grid_utils.clear()
+
+
+def _mosaic_tile(arguments):
+    '''
+    Function to resample and blend all sources overlapping a single output tile. Module-level so that it can be run in
+    a process pool.
+    @param arguments: (tile_slices, tile_sources, mosaic_parameters) tuple, where tile_slices is a (row_slice, column_slice)
+        tuple for the tile in the mosaic grid, tile_sources is a list of (nc_path, source_window) tuples in priority order
+        as indexed by get_tile_source_index(), and mosaic_parameters is a dict of build_mosaic() parameters
+
+    @return tile_array: float64 array for tile with NaN for no-data, or None if no source has values within tile
+    '''
+    tile_slices, tile_sources, mosaic_parameters = arguments
+    geotransform = mosaic_parameters['geotransform']
+    blend_method = mosaic_parameters['blend_method']
+    feather_cells = mosaic_parameters['feather_cells']
+
+    tile_shape = tuple(tile_slice.stop - tile_slice.start for tile_slice in tile_slices)
+    if blend_method == 'priority':
+        tile_array = np.full(shape=tile_shape, fill_value=np.nan, dtype='float64')
+    else:
+        value_sum_array = np.zeros(shape=tile_shape, dtype='float64')
+        weight_sum_array = np.zeros(shape=tile_shape, dtype='float64')
+
+    sampled_source_count = 0
+    for nc_path, source_window in tile_sources:
+        source_grid_utils = _get_mosaic_source(nc_path, mosaic_parameters['source_cache_bytes'], mosaic_parameters['max_open_sources'])
+        source_variable = (source_grid_utils.netcdf_dataset.variables[mosaic_parameters['variable_name']]
+                           if mosaic_parameters['variable_name'] else source_grid_utils.data_variable)
+
+        row_coordinates = geotransform[3] + (np.arange(source_window[0].start, source_window[0].stop) + 0.5) * geotransform[5]
+        column_coordinates = geotransform[0] + (np.arange(source_window[1].start, source_window[1].stop) + 0.5) * geotransform[1]
+        window_coordinates = np.column_stack([ordinate_array.ravel() for ordinate_array
+                                              in np.meshgrid(column_coordinates, row_coordinates)])
+
+        fractional_index_array, mask_array = source_grid_utils.get_fractional_index_array_from_coords(window_coordinates,
+                                                                                                      mosaic_parameters['wkt'])
+        fractional_index_array = fractional_index_array[mask_array]
+        if not len(fractional_index_array):
+            continue
+        sampled_source_count += 1
+
+        index_array, weights = source_grid_utils.get_resampling_indices(fractional_index_array, mosaic_parameters['resampling_method'])
+
+        window_array = np.full(shape=mask_array.shape, fill_value=np.nan, dtype='float64')
+        window_array[mask_array] = source_grid_utils.get_resampled_values(source_variable,
+                                                                          index_array,
+                                                                          weights,
+                                                                          max_bytes=mosaic_parameters['max_bytes'])
+        window_array = window_array.reshape(tuple(window_slice.stop - window_slice.start for window_slice in source_window))
+        tile_window = tuple(slice(window_slice.start - tile_slice.start, window_slice.stop - tile_slice.start)
+                            for window_slice, tile_slice in zip(source_window, tile_slices))
+
+        if blend_method == 'priority':
+            # Only fill cells without values from higher priority sources
+            tile_array[tile_window] = np.where(np.isnan(tile_array[tile_window]), window_array, tile_array[tile_window])
+        else:
+            if blend_method == 'feather':
+                # Distance in source cells from nearest source grid edge
+                edge_distances = np.min(np.concatenate((fractional_index_array,
+                                                        np.array(source_variable.shape) - 1 - fractional_index_array),
+                                                       axis=1), axis=1)
+                window_weights = np.zeros(shape=mask_array.shape, dtype='float64')
+                window_weights[mask_array] = np.clip((edge_distances + 0.5) / feather_cells, 1.0 / feather_cells, 1.0)
+                window_weights = window_weights.reshape(window_array.shape)
+            else:
+                window_weights = 1.0
+            valid_array = ~np.isnan(window_array)
+            value_sum_array[tile_window] += np.where(valid_array, window_array * window_weights, 0.0)
+            weight_sum_array[tile_window] += np.where(valid_array, window_weights, 0.0)
+
+    if not sampled_source_count:
+        return None
+
+    if blend_method != 'priority':
+        with np.errstate(invalid='ignore', divide='ignore'):
+            tile_array = value_sum_array / weight_sum_array # NaN where no valid values
+
+    logger.debug('Mosaicked tile {} from {} sources'.format(tile_slices, sampled_source_count))
+    return tile_array
+
+
+def build_mosaic(nc_paths,
+                 output_path,
+                 wkt,
+                 pixel_size,
+                 bounds=None,
+                 blend_method='priority',
+                 resampling_method='bilinear',
+                 feather_cells=None,
+                 variable_name=None,
+                 tile_size=None,
+                 cache_bytes=None,
+                 max_bytes=None,
+                 workers=None,
+                 max_open_sources=None):
+    '''
+    Function to mosaic many gridded netCDF datasets with different extents, CRSs and cell sizes into a single CF-compliant grid
+    Output tiles are processed in row-major order. Each source is only resampled over the part of its footprint that
+    falls within each tile, and sources which do not overlap a tile are skipped using a spatial index of footprints.
+    If workers is specified, whole tiles (coordinate transformation, source reads, resampling and blending) are processed
+    in a pool of worker processes, since the netCDF library is not thread-safe. Each worker keeps its most recently used
+    sources and their block caches open between tiles, and tiles are written in order by the calling process.
+    @param nc_paths: list of paths or OPeNDAP URLs of source grids in priority order (highest first)
+    @param output_path: path of netCDF file to create (will be overwritten)
+    @param wkt: WKT or CRS name (e.g. "EPSG:3577") for mosaic
+    @param pixel_size: mosaic pixel size in mosaic CRS units
+    @param bounds: optional [xmin, ymin, xmax, ymax] list of mosaic bounds in mosaic CRS. Defaults to union of all footprints
+    @param blend_method: method for combining overlapping sources. One of 'priority' (first valid source value), 'mean'
+        (mean of valid source values) or 'feather' (mean weighted by distance from source grid edges)
+    @param resampling_method: 'nearest' or 'bilinear'
+    @param feather_cells: width of feathered source edges in source cells. Defaults to DEFAULT_FEATHER_CELLS
+    @param variable_name: name of variable to read from all sources. Defaults to the data variable of each source
+    @param tile_size: size of output tiles (and chunks) in each dimension. Defaults to DEFAULT_TILE_SIZE
+    @param cache_bytes: block cache budget shared between all open sources in each process. Defaults to BlockCache.DEFAULT_MAX_BYTES
+    @param max_bytes: Maximum number of bytes to read for an unchunked source block
+    @param workers: number of worker processes for processing tiles. None for serial processing in the calling process
+    @param max_open_sources: maximum number of sources kept open in each process. Defaults to DEFAULT_MAX_OPEN_SOURCES
+    '''
+    assert blend_method in BLEND_METHODS, 'Invalid blend_method {}. Must be one of {}'.format(blend_method, BLEND_METHODS)
+    tile_size = tile_size or DEFAULT_TILE_SIZE
+    feather_cells = feather_cells or DEFAULT_FEATHER_CELLS
+    max_open_sources = max(max_open_sources or DEFAULT_MAX_OPEN_SOURCES, 1)
+
+    # Share block cache budget between open sources so that memory use does not grow with the number of sources
+    source_cache_bytes = max((cache_bytes or BlockCache.DEFAULT_MAX_BYTES) // max(min(len(nc_paths), max_open_sources), 1), 1)
+    source_grid_utils_list = [NetCDFGridUtils(nc_path, enable_block_cache=False, lazy=True)
+                              for nc_path in nc_paths]
+    try:
+        source_variables = [(source_grid_utils.netcdf_dataset.variables[variable_name] if variable_name
+                             else source_grid_utils.data_variable)
+                            for source_grid_utils in source_grid_utils_list]
+        for source_variable in source_variables:
+            assert len(source_variable.shape) == 2, 'Only 2D variables can be mosaicked'
+
+        footprints = [get_source_footprint(source_grid_utils, wkt, pixel_size)
+                      for source_grid_utils in source_grid_utils_list]
+        source_variable_attributes = {key: value for key, value in source_variables[0].__dict__.items()
+                                      if key in ['long_name', 'units', 'standard_name']}
+        output_variable_name = variable_name or source_variables[0].name
+    finally:
+        for source_grid_utils in source_grid_utils_list:
+            source_grid_utils.close()
+
+    if bounds is None:
+        footprint_array = np.array(footprints)
+        bounds = list(np.min(footprint_array[:,0:2], axis=0)) + list(np.max(footprint_array[:,2:4], axis=0))
+
+    # Align mosaic with multiples of pixel size
+    geotransform = [math.floor(bounds[0] / pixel_size) * pixel_size, pixel_size, 0.0,
+                    math.ceil(bounds[3] / pixel_size) * pixel_size, 0.0, -pixel_size]
+    shape = (int(math.ceil((geotransform[3] - bounds[1]) / pixel_size - NetCDFGridUtils.FLOAT_TOLERANCE)),
+             int(math.ceil((bounds[2] - geotransform[0]) / pixel_size - NetCDFGridUtils.FLOAT_TOLERANCE)))
+
+    tile_source_index = get_tile_source_index(footprints, geotransform, shape, tile_size)
+    logger.info('Mosaicking {} sources into grid of shape {} with {} non-empty tiles'.format(len(nc_paths), shape, len(tile_source_index)))
+
+    output_dataset = create_netcdf_grid(output_path,
+                                        wkt,
+                                        geotransform,
+                                        shape,
+                                        output_variable_name,
+                                        dtype='float32',
+                                        fill_value=np.nan,
+                                        variable_attributes={output_variable_name: source_variable_attributes},
+                                        chunksizes=[tile_size, tile_size],
+                                        global_attributes={'source': ', '.join(nc_paths),
+                                                           'blend_method': blend_method,
+                                                           'resampling_method': resampling_method})
+
+    mosaic_parameters = {'wkt': wkt,
+                         'geotransform': geotransform,
+                         'blend_method': blend_method,
+                         'resampling_method': resampling_method,
+                         'feather_cells': feather_cells,
+                         'variable_name': variable_name,
+                         'source_cache_bytes': source_cache_bytes,
+                         'max_bytes': max_bytes,
+                         'max_open_sources': max_open_sources,
+                         }
+    tile_keys = sorted(tile_source_index.keys())
+    tile_slices_list = [(slice(tile_row * tile_size, min((tile_row + 1) * tile_size, shape[0])),
+                         slice(tile_column * tile_size, min((tile_column + 1) * tile_size, shape[1])))
+                        for tile_row, tile_column in tile_keys]
+    try:
+        tile_arrays = ordered_map(_mosaic_tile,
+                                  ((tile_slices,
+                                    [(nc_paths[source_index], source_window) for source_index, source_window in tile_source_index[tile_key]],
+                                    mosaic_parameters)
+                                   for tile_key, tile_slices in zip(tile_keys, tile_slices_list)),
+                                  workers=workers,
+                                  use_processes=True)
+        try:
+            for tile_slices, tile_array in zip(tile_slices_list, tile_arrays):
+                if tile_array is not None:
+                    output_dataset.variables[output_variable_name][tile_slices] = tile_array
+        finally:
+            tile_arrays.close() # Shut down worker pool
+    finally:
+        output_dataset.close()
+        _close_mosaic_sources() # Sources opened in the calling process for serial processing
+
+    logger.info('Finished mosaic {}'.format(output_path))
+
+
+def main():
+    '''
+    Main function to build a mosaic from the command line
+    '''
+    parser = argparse.ArgumentParser(description='Mosaic gridded netCDF datasets')
+    parser.add_argument('--crs', help='CRS for mosaic as WKT or EPSG code, e.g. "EPSG:3577"', type=str, required=True)
+    parser.add_argument('--pixel_size', help='Mosaic pixel size in mosaic CRS units', type=float, required=True)
+    parser.add_argument('--blend', help='Blend method (one of {}). Default is priority'.format(BLEND_METHODS),
+                        type=str, default='priority')
+    parser.add_argument('--resampling', help="Resampling method ('nearest' or 'bilinear'). Default is bilinear",
+                        type=str, default='bilinear')
+    parser.add_argument('--workers', help='Number of worker processes', type=int)
+    parser.add_argument('--max_open_sources', help='Maximum number of sources kept open in each process. Default is {}'.format(DEFAULT_MAX_OPEN_SOURCES),
+                        type=int)
+    parser.add_argument('-d', '--debug', action='store_const', const=True, default=False,
+                        help='output debug information. Default is no debug info')
+    parser.add_argument('output_path')
+    parser.add_argument('input_paths', nargs='+', help='Source grids in priority order (highest first)')
+
+    args = parser.parse_args()
+
+    if args.debug:
+        logger.setLevel(logging.DEBUG)
+
+    build_mosaic(args.input_paths,
+                 args.output_path,
+                 args.crs,
+                 args.pixel_size,
+                 blend_method=args.blend,
+                 resampling_method=args.resampling,
+                 workers=args.workers,
+                 max_open_sources=args.max_open_sources)
+
+
+if __name__ == '__main__':
+    main()
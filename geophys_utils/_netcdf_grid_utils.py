@@ -20,13 +20,27 @@ Created on 14Sep.,2016
 
 @author: Alex
 '''
+import netCDF4
 import numpy as np
 import math
+import itertools
+import os
+import re
+import tempfile
+from functools import partial
 from scipy.ndimage import map_coordinates
 from geophys_utils._crs_utils import get_utm_wkt, transform_coords
-from geophys_utils._transect_utils import sample_transect
-from geophys_utils._polygon_utils import netcdf2convex_hull
+from geophys_utils._transect_utils import sample_transect, sample_transects
+from geophys_utils._polygon_utils import netcdf2convex_hull, get_polygon_rings, get_polygon_cell_indices
+from geophys_utils._data_stats import get_array_statistics
+from geophys_utils._parallel_utils import ordered_map
 from geophys_utils._netcdf_utils import NetCDFUtils
+from geophys_utils._chunk_utils import ACCESS_PATTERNS
+from geophys_utils._block_cache import BlockCache, get_default_disk_cache_dir, get_source_signature
+from geophys_utils._resampling_utils import downsample_array
+from geophys_utils._netcdf_grid_writer import create_netcdf_grid
+from geophys_utils._fft_utils import FFT_FILTERS, filter_window, get_blend_weights
+from geophys_utils._io_stats import io_timer, IOStats
 import logging
 import argparse
 from distutils.util import strtobool
@@ -44,69 +58,74 @@ class NetCDFGridUtils(NetCDFUtils):
     HORIZONTAL_VARIABLE_NAMES = ['lon', 'Easting', 'x', 'longitude']
     DEFAULT_MAX_BYTES = 500000000  # Default to 500,000,000 bytes for NCI's OPeNDAP
     FLOAT_TOLERANCE = 0.000001
+    DEFAULT_READ_BLOCK_SIZE = 512 # Size of read blocks in each dimension for unchunked variables
+    INTERPOLATION_SPLINE_HALO = 16 # Halo in cells around interpolation windows for spline orders > 1
+    OVERVIEW_MIN_SIZE = 256 # Default overview levels are added until the largest dimension is no larger than this
+    ZONAL_PERCENTILES = [25, 50, 75] # Default percentiles for zonal statistics
+    WARP_TILE_SIZE = 256 # Size of output tiles (and chunks) in each dimension for warp
+    WARP_EDGE_POINTS = 101 # Number of points sampled along each grid edge to determine warped extent
+    WARP_RESAMPLING_METHODS = ['nearest', 'bilinear']
+    FFT_TILE_SIZE = 1024 # Default size of FFT filter tile cores in each dimension
+    FFT_OVERLAP = 128 # Default number of cells of overlap around FFT filter tile cores
 
-    def __init__(self, netcdf_dataset, debug=False):
+    def __init__(self, netcdf_dataset,
+                 enable_block_cache=True,
+                 block_cache_bytes=None,
+                 enable_disk_cache=None,
+                 disk_cache_bytes=None,
+                 cache_path=None,
+                 lazy=False,
+                 debug=False):
         '''
         NetCDFGridUtils Constructor - wraps a NetCDF dataset
+        @parameter netcdf_dataset: netCDF4.Dataset object or path/URL of netCDF file
+        @parameter enable_block_cache: Boolean parameter indicating whether blocks read for queries should be cached in memory
+        @parameter block_cache_bytes: Maximum number of bytes held in the block cache. Defaults to BlockCache.DEFAULT_MAX_BYTES
+        @parameter enable_disk_cache: Boolean parameter indicating whether blocks should also be cached on disk, or None for default
+            (True for OPeNDAP datasets, False otherwise)
+        @parameter disk_cache_bytes: Maximum number of bytes held in the on-disk block cache. Defaults to BlockCache.DEFAULT_MAX_DISK_BYTES
+        @parameter cache_path: Directory for on-disk block cache. Defaults to a directory in the system temporary directory.
+            Created when the first block is written
+        @parameter lazy: Boolean parameter indicating whether dimension arrays, pixel sizes, extents and bounds should only be
+            determined on first use. Regularly spaced dimension arrays are then derived from their first two and last values
+            rather than being read in full.
+        @parameter debug: Boolean parameter indicating whether debug output should be turned on or not
         '''
-        def set_nominal_pixel_sizes():
-            '''
-            Function to set tuples with the nominal vertical and horizontal sizes of the centre pixel in metres and degrees
-            '''
-            centre_pixel_indices = [
-                len(self.dimension_arrays[dim_index]) // 2 for dim_index in range(2)]
-
-            # Get coordinates of centre pixel and next diagonal pixel
-            centre_pixel_coords = [[self.dimension_arrays[dim_index][centre_pixel_indices[dim_index]] 
-                                    for dim_index in range(2)],
-                                   [self.dimension_arrays[dim_index][centre_pixel_indices[dim_index] + 1] 
-                                    for dim_index in range(2)]
-                                   ]
-
-            if self.YX_order:
-                for coord_index in range(2):
-                    centre_pixel_coords[coord_index].reverse()
-
-            #TODO: Make sure this is general for all CRSs
-            self.y_variable = (self.netcdf_dataset.variables.get('lat') 
-                               or self.netcdf_dataset.variables.get('y')
-                               )
-            
-            self.y_inverted = (self.y_variable[-1] < self.y_variable[0])
-        
-            nominal_utm_wkt = get_utm_wkt(centre_pixel_coords[0], self.wkt)
-            centre_pixel_utm_coords = transform_coords(
-                centre_pixel_coords, from_wkt=self.wkt, to_wkt=nominal_utm_wkt)          
-            
-            self.nominal_pixel_metres = [round(abs(centre_pixel_utm_coords[1][
-                        dim_index] - centre_pixel_utm_coords[0][dim_index]), 8) for dim_index in range(2)]
-            
-            
-            centre_pixel_wgs84_coords = transform_coords(
-                centre_pixel_coords, from_wkt=self.wkt, to_wkt='EPSG:4326')
-            
-            self.nominal_pixel_degrees = [round(abs(centre_pixel_wgs84_coords[1][
-                        dim_index] - centre_pixel_wgs84_coords[0][dim_index]), 8) for dim_index in range(2)]
-
-        def get_default_sample_metres():
-            '''
-            Function to return average nominal pixel size in metres rounded up to nearest 10^x or 5*10^x
-            This is to provide a sensible default resolution for the sampling points along a transect by keeping it around the nominal pixel size
-            '''
-            log_10_avg_pixel_metres = math.log((self.nominal_pixel_metres[
-                                               0] + self.nominal_pixel_metres[1]) / 2.0) / math.log(10.0)
-            log_10_5 = math.log(5.0) / math.log(10.0)
-
-            return round(math.pow(10.0, math.floor(log_10_avg_pixel_metres) +
-                                  (log_10_5 if((log_10_avg_pixel_metres % 1.0) < log_10_5) else 1.0)))
-
-    
         # Start of init function - Call inherited constructor first
         super().__init__(netcdf_dataset, debug=debug)
         
         logger.debug('Running NetCDFGridUtils constructor')
         
+        self.lazy = lazy
+
+        # Initialise private property variables to None until set by property getter methods
         self._GeoTransform = None
+        self._dimension_arrays = None
+        self._regular_dimensions = None
+        self._pixel_size = None
+        self._pixel_count = None
+        self._min_extent = None
+        self._max_extent = None
+        self._nominal_pixel_metres = None
+        self._nominal_pixel_degrees = None
+        self._default_sample_metres = None
+        self._native_bbox = None
+        self._bounds = None
+        self._overview_dataset = None
+
+        if enable_disk_cache is None:
+            enable_disk_cache = self.opendap
+
+        if enable_block_cache:
+            self.block_cache = BlockCache(max_bytes=block_cache_bytes,
+                                          disk_cache_dir=((cache_path or get_default_disk_cache_dir(self.nc_path, 'NetCDFGridUtils'))
+                                                          if enable_disk_cache else None),
+                                          max_disk_bytes=disk_cache_bytes,
+                                          source_signature=(get_source_signature(self.nc_path, self.netcdf_dataset)
+                                                            if enable_disk_cache else None)
+                                          )
+        else:
+            self.block_cache = None
 
 
 # assert len(self.netcdf_dataset.dimensions) == 2, 'NetCDF dataset must be
@@ -114,243 +133,727 @@ class NetCDFGridUtils(NetCDFUtils):
 
         try:
             data_variable_dimensions = [variable for variable in self.netcdf_dataset.variables.values() 
-                                       if hasattr(variable, 'grid_mapping')][0].dimensions
-            print(data_variable_dimensions)
+                                       if hasattr(variable, 'grid_mapping') 
+                                       and not hasattr(variable, 'overview_factor') # Ignore overview variables
+                                       ][0].dimensions
+            logger.debug('data_variable_dimensions: {}'.format(data_variable_dimensions))
             self._data_variable_list = [variable for variable in self.netcdf_dataset.variables.values() 
                                        if variable.dimensions == data_variable_dimensions]
-            print(self.data_variable_list)
+            logger.debug('data_variable_list: {}'.format([variable.name for variable in self.data_variable_list]))
         except:
             logger.debug('Unable to determine data variable(s) (must have same dimensions as variable with "grid_mapping" attribute)')
             raise
             
-        #TODO: Make this work for multi-variate grids
-        assert len(self.data_variable_list) == 1, 'Unable to determine single data variable (must have "grid_mapping" attribute)'
+        # Multi-variate grids (e.g. TMI, RTP & 1VD bands) share dimensions. Use the first variable by default.
+        # Use get_values_at_coords to sample all variables at once.
+        assert len(self.data_variable_list) >= 1, 'Unable to determine data variable (must have "grid_mapping" attribute)'
         self.data_variable = self.data_variable_list[0]
         
-        # Boolean flag indicating YX array ordering
+        # Boolean flag indicating YX array ordering of last two (spatial) dimensions.
+        # Any leading dimensions (e.g. time) precede the spatial dimensions
         # TODO: Find a nicer way of dealing with this
         self.YX_order = self.data_variable.dimensions[
-            1] in NetCDFGridUtils.HORIZONTAL_VARIABLE_NAMES
+            -1] in NetCDFGridUtils.HORIZONTAL_VARIABLE_NAMES
+
+        # Default path for sidecar file containing overviews
+        if self.opendap:
+            self.overview_path = os.path.join(tempfile.gettempdir(), 'NetCDFGridUtils',
+                                              re.sub('\W', '_', os.path.splitext(self.nc_path)[0]) + '_overviews.nc')
+        else:
+            self.overview_path = os.path.splitext(self.nc_path)[0] + '_overviews.nc'
+
+        if not self.lazy:
+            # Set all properties up front
+            self.default_sample_metres
+            self.bounds
+
+    def read_dimension_array(self, dimension_name):
+        '''
+        Returns a tuple containing the array of values for the named dimension and a Boolean flag indicating whether it
+        is regularly spaced. In lazy mode, a dimension whose first two and last values are consistent with constant
+        spacing is assumed to be regular and is computed rather than read in full.
+        @parameter dimension_name: name of dimension variable
+        '''
+        dimension_variable = self.netcdf_dataset.variables[dimension_name]
+        dimension_size = dimension_variable.shape[0]
+
+        if self.lazy and dimension_size > 2:
+            first_values = np.asarray(dimension_variable[0:2], dtype='float64')
+            last_value = float(dimension_variable[-1])
+            dimension_step = first_values[1] - first_values[0]
+            if (dimension_step and
+                abs((last_value - first_values[0]) / (dimension_size - 1) - dimension_step) <= abs(dimension_step) * NetCDFGridUtils.FLOAT_TOLERANCE):
+                logger.debug('Computing regular dimension array for {}'.format(dimension_name))
+                return first_values[0] + np.arange(dimension_size) * dimension_step, True
+
+        logger.debug('Reading dimension array for {}'.format(dimension_name))
+        dimension_array = dimension_variable[:]
+        return dimension_array, self.dimension_is_regular(dimension_array)
 
-        # Two-element list of dimension varibles.
-        self.dimension_arrays = [self.netcdf_dataset.variables[dimension_name][
-            :] for dimension_name in self.data_variable.dimensions]
+    @property
+    def dimension_arrays(self):
+        '''
+        Property getter function to return two-element list of dimension arrays as required
+        '''
+        if self._dimension_arrays is None:
+            logger.debug('Setting dimension_arrays property')
+            dimension_arrays, regular_dimensions = zip(*[self.read_dimension_array(dimension_name)
+                                                         for dimension_name in self.data_variable.dimensions[-2:]])
+            self._dimension_arrays = list(dimension_arrays)
+            # Boolean flags indicating whether each dimension has (near-)constant spacing
+            self._regular_dimensions = list(regular_dimensions)
+        return self._dimension_arrays
+
+    @property
+    def regular_dimensions(self):
+        '''
+        Property getter function to return two-element list of Boolean flags indicating regularly spaced dimensions
+        '''
+        if self._regular_dimensions is None:
+            self.dimension_arrays
+        return self._regular_dimensions
+
+    @regular_dimensions.setter
+    def regular_dimensions(self, regular_dimensions):
+        '''
+        Property setter function to override regular dimension flags
+        '''
+        self.dimension_arrays
+        self._regular_dimensions = list(regular_dimensions)
 
-        self.pixel_size = [abs(self.GeoTransform[1]),
-                           abs(self.GeoTransform[5])]
+    @property
+    def pixel_size(self):
+        '''
+        Property getter function to return pixel sizes in array dimension order as required
+        '''
+        if self._pixel_size is None:
+            logger.debug('Setting pixel_size property')
+            self._pixel_size = [abs(self.GeoTransform[1]),
+                                abs(self.GeoTransform[5])]
+            if self.YX_order:
+                self._pixel_size.reverse()
+        return self._pixel_size
+
+    @property
+    def pixel_count(self):
+        '''
+        Property getter function to return pixel counts in X, Y order as required
+        '''
+        if self._pixel_count is None:
+            self._pixel_count = list(self.data_variable.shape[-2:])
+            if self.YX_order:
+                self._pixel_count.reverse()
+        return self._pixel_count
+
+    @property
+    def min_extent(self):
+        '''
+        Property getter function to return minimum extent (outer pixel edges) in array dimension order as required
+        '''
+        if self._min_extent is None:
+            self._min_extent = tuple([min(self.dimension_arrays[
+                                    dim_index]) - self.pixel_size[dim_index] / 2.0 for dim_index in range(2)])
+        return self._min_extent
+
+    @property
+    def max_extent(self):
+        '''
+        Property getter function to return maximum extent (outer pixel edges) in array dimension order as required
+        '''
+        if self._max_extent is None:
+            self._max_extent = tuple([max(self.dimension_arrays[
+                                    dim_index]) + self.pixel_size[dim_index] / 2.0 for dim_index in range(2)])
+        return self._max_extent
+
+    def set_nominal_pixel_sizes(self):
+        '''
+        Function to set lists with the nominal vertical and horizontal sizes of the centre pixel in metres and degrees
+        '''
+        logger.debug('Setting nominal pixel sizes')
+        centre_pixel_indices = [
+            len(self.dimension_arrays[dim_index]) // 2 for dim_index in range(2)]
+
+        # Get coordinates of centre pixel and next diagonal pixel
+        centre_pixel_coords = [[self.dimension_arrays[dim_index][centre_pixel_indices[dim_index]] 
+                                for dim_index in range(2)],
+                               [self.dimension_arrays[dim_index][centre_pixel_indices[dim_index] + 1] 
+                                for dim_index in range(2)]
+                               ]
+
+        if self.YX_order:
+            for coord_index in range(2):
+                centre_pixel_coords[coord_index].reverse()
+
+        nominal_utm_wkt = get_utm_wkt(centre_pixel_coords[0], self.wkt)
+        centre_pixel_utm_coords = transform_coords(
+            centre_pixel_coords, from_wkt=self.wkt, to_wkt=nominal_utm_wkt)          
         
-        self.pixel_count = list(self.data_variable.shape)
+        self._nominal_pixel_metres = [round(abs(centre_pixel_utm_coords[1][
+                    dim_index] - centre_pixel_utm_coords[0][dim_index]), 8) for dim_index in range(2)]
         
-        if self.YX_order:
-            self.pixel_size.reverse()
-            self.pixel_count.reverse()
-
-        self.min_extent = tuple([min(self.dimension_arrays[
-                                dim_index]) - self.pixel_size[dim_index] / 2.0 for dim_index in range(2)])
-        self.max_extent = tuple([max(self.dimension_arrays[
-                                dim_index]) + self.pixel_size[dim_index] / 2.0 for dim_index in range(2)])
-
-        set_nominal_pixel_sizes()
-
-        self.default_sample_metres = get_default_sample_metres()
-
-        # Create nested list of bounding box corner coordinates
-        self.native_bbox = [[self.GeoTransform[0] + (x_pixel_offset * self.GeoTransform[1]) + (y_pixel_offset * self.GeoTransform[2]),
-                             self.GeoTransform[3] + (x_pixel_offset * self.GeoTransform[4]) + (y_pixel_offset * self.GeoTransform[5])]
-                            for x_pixel_offset, y_pixel_offset in [[0, self.pixel_count[1]], 
-                                                                   [self.pixel_count[0], self.pixel_count[1]],
-                                                                   [self.pixel_count[0], 0],
-                                                                   [0, 0]
-                                                                   ]
-                            ]
+        centre_pixel_wgs84_coords = transform_coords(
+            centre_pixel_coords, from_wkt=self.wkt, to_wkt='EPSG:4326')
         
-        # Create bounds
-        self.bounds = self.native_bbox[0] + self.native_bbox[2]
+        self._nominal_pixel_degrees = [round(abs(centre_pixel_wgs84_coords[1][
+                    dim_index] - centre_pixel_wgs84_coords[0][dim_index]), 8) for dim_index in range(2)]
 
-    def get_indices_from_coords(self, coordinates, wkt=None):
+    @property
+    def nominal_pixel_metres(self):
         '''
-        Returns list of netCDF array indices corresponding to coordinates to support nearest neighbour queries
+        Property getter function to return nominal sizes of centre pixel in metres as required
+        '''
+        if self._nominal_pixel_metres is None:
+            self.set_nominal_pixel_sizes()
+        return self._nominal_pixel_metres
+
+    @property
+    def nominal_pixel_degrees(self):
+        '''
+        Property getter function to return nominal sizes of centre pixel in degrees as required
+        '''
+        if self._nominal_pixel_degrees is None:
+            self.set_nominal_pixel_sizes()
+        return self._nominal_pixel_degrees
+
+    @property
+    def default_sample_metres(self):
+        '''
+        Property getter function to return average nominal pixel size in metres rounded up to nearest 10^x or 5*10^x
+        This is to provide a sensible default resolution for the sampling points along a transect by keeping it around the nominal pixel size
+        '''
+        if self._default_sample_metres is None:
+            log_10_avg_pixel_metres = math.log((self.nominal_pixel_metres[
+                                               0] + self.nominal_pixel_metres[1]) / 2.0) / math.log(10.0)
+            log_10_5 = math.log(5.0) / math.log(10.0)
+
+            self._default_sample_metres = round(math.pow(10.0, math.floor(log_10_avg_pixel_metres) +
+                                                         (log_10_5 if((log_10_avg_pixel_metres % 1.0) < log_10_5) else 1.0)))
+        return self._default_sample_metres
+
+    @property
+    def native_bbox(self):
+        '''
+        Property getter function to return nested list of bounding box corner coordinates as required
+        '''
+        if self._native_bbox is None:
+            self._native_bbox = [[self.GeoTransform[0] + (x_pixel_offset * self.GeoTransform[1]) + (y_pixel_offset * self.GeoTransform[2]),
+                                  self.GeoTransform[3] + (x_pixel_offset * self.GeoTransform[4]) + (y_pixel_offset * self.GeoTransform[5])]
+                                 for x_pixel_offset, y_pixel_offset in [[0, self.pixel_count[1]], 
+                                                                        [self.pixel_count[0], self.pixel_count[1]],
+                                                                        [self.pixel_count[0], 0],
+                                                                        [0, 0]
+                                                                        ]
+                                 ]
+        return self._native_bbox
+
+    @property
+    def bounds(self):
+        '''
+        Property getter function to return [xmin, ymin, xmax, ymax] bounds as required
+        '''
+        if self._bounds is None:
+            self._bounds = self.native_bbox[0] + self.native_bbox[2]
+        return self._bounds
+
+    def get_native_coordinate_array(self, coordinates, wkt=None):
+        '''
+        Returns (n, 2) array of native coordinates in the same dimension order as the data array
         @parameter coordinates: iterable collection of coordinate pairs or single coordinate pair
         @parameter wkt: Coordinate Reference System for coordinates. None == native NetCDF CRS
         '''
         wkt = wkt or self.wkt
-        native_coordinates = transform_coords(coordinates, self.wkt, wkt)
+        native_coordinates = np.array(transform_coords(coordinates, wkt, self.wkt), dtype='float64')
         # Reshape 1D array into 2D single coordinate array if only one coordinate provided
-        if native_coordinates.shape == (2,):
-            native_coordinates = native_coordinates.reshape((1,2))
-        
+        native_coordinates = native_coordinates.reshape((-1, 2))
+
         # Convert coordinates to same dimension ordering as array
         if self.YX_order:
-            native_coordinates = native_coordinates[:,1::-1]
-                
-        try:  # Multiple coordinates
-            indices = [[np.where(abs(self.dimension_arrays[dim_index] - coordinate[dim_index]) <= (self.pixel_size[dim_index] / 2.0))[0][0] for dim_index in range(2)]
-                       if not ([True for dim_index in range(2) if coordinate[dim_index] < self.min_extent[dim_index] or coordinate[dim_index] > self.max_extent[dim_index]])
-                       else None
-                       for coordinate in native_coordinates]
-        except TypeError:  # Single coordinate pair
-            indices = ([np.where(abs(self.dimension_arrays[dim_index] - native_coordinates[dim_index]) <= (self.pixel_size[dim_index] / 2.0))[0][0] for dim_index in range(2)]
-                       if not [True for dim_index in range(2) if native_coordinates[dim_index] < self.min_extent[dim_index] or native_coordinates[dim_index] > self.max_extent[dim_index]]
-                       else None)
-
-        return indices
+            native_coordinates = native_coordinates[:,::-1]
+
+        return native_coordinates
+
+    def get_index_array_from_coords(self, coordinates, wkt=None):
+        '''
+        Vectorised function to return an (n, 2) integer array of nearest netCDF array indices for coordinates
+        and an (n,) Boolean mask indicating which coordinates fall within the grid extent.
+        Regular dimensions use an affine inverse, irregular dimensions use a binary search.
+        N.B: Indices for coordinates outside the grid extent are clipped to the array bounds and should be
+        ignored using the mask.
+        @parameter coordinates: iterable collection of coordinate pairs or single coordinate pair
+        @parameter wkt: Coordinate Reference System for coordinates. None == native NetCDF CRS
+
+        @return index_array: (n, 2) integer array of array indices in array dimension order
+        @return mask_array: (n,) Boolean array which is True for coordinates within the grid extent
+        '''
+        native_coordinates = self.get_native_coordinate_array(coordinates, wkt)
+
+        index_array = np.zeros(shape=native_coordinates.shape, dtype='int64')
+        mask_array = np.ones(shape=(native_coordinates.shape[0],), dtype='bool')
+
+        for dim_index in range(2):
+            dimension_array = np.asarray(self.dimension_arrays[dim_index], dtype='float64')
+            dimension_size = len(dimension_array)
+            ordinates = native_coordinates[:,dim_index]
+
+            mask_array &= np.logical_and(ordinates >= self.min_extent[dim_index],
+                                         ordinates <= self.max_extent[dim_index])
+
+            if self.regular_dimensions[dim_index]:
+                # Affine inverse from dimension array. Half-pixel ties are resolved to the lower index
+                dimension_step = (dimension_array[-1] - dimension_array[0]) / (dimension_size - 1)
+                dimension_indices = np.ceil((ordinates - dimension_array[0]) / dimension_step - 0.5)
+            else:
+                # Binary search on ascending dimension values, then choose nearest neighbour
+                descending = dimension_array[-1] < dimension_array[0]
+                ascending_array = dimension_array[::-1] if descending else dimension_array
+                upper_indices = np.clip(np.searchsorted(ascending_array, ordinates), 1, dimension_size - 1)
+                dimension_indices = upper_indices - (np.abs(ordinates - ascending_array[upper_indices - 1]) <=
+                                                     np.abs(ascending_array[upper_indices] - ordinates))
+                if descending:
+                    dimension_indices = dimension_size - 1 - dimension_indices
+
+            # N.B: NaN ordinates are masked out above
+            index_array[:,dim_index] = np.clip(np.nan_to_num(dimension_indices), 0, dimension_size - 1)
+
+        return index_array, mask_array
+
+    def get_indices_from_coords(self, coordinates, wkt=None):
+        '''
+        Returns list of netCDF array indices corresponding to coordinates to support nearest neighbour queries
+        @parameter coordinates: iterable collection of coordinate pairs or single coordinate pair
+        @parameter wkt: Coordinate Reference System for coordinates. None == native NetCDF CRS
+
+        @return indices: list containing an index pair list (or None if outside grid extent) for each coordinate
+        '''
+        index_array, mask_array = self.get_index_array_from_coords(coordinates, wkt)
+
+        return [(list(index_pair) if valid else None)
+                for index_pair, valid in zip(index_array.tolist(), mask_array)]
+
+    @staticmethod
+    def dimension_is_regular(dimension_array):
+        '''
+        Returns True if dimension_array is monotonic with constant spacing to within NetCDFGridUtils.FLOAT_TOLERANCE
+        of the mean spacing
+        @parameter dimension_array: 1D array of dimension values
+        '''
+        dimension_array = np.asarray(dimension_array, dtype='float64')
+        if len(dimension_array) < 3:
+            return len(dimension_array) == 2 # Two points are always regular, but a single point has no spacing
+
+        dimension_steps = np.diff(dimension_array)
+        mean_step = (dimension_array[-1] - dimension_array[0]) / (len(dimension_array) - 1)
+        return bool(mean_step and
+                    np.all(np.abs(dimension_steps - mean_step) <= abs(mean_step) * NetCDFGridUtils.FLOAT_TOLERANCE))
+
+    def get_fractional_index_array_from_coords(self, coordinates, wkt=None):
+        '''
+        Vectorised function to return an (n, 2) array of fractional array indices for coordinates, where integer
+        values correspond to pixel centres, and an (n,) Boolean mask indicating which coordinates fall within the grid extent.
+        @parameter coordinates: iterable collection of coordinate pairs or single coordinate pair
+        @parameter wkt: Coordinate Reference System for coordinates. None == native NetCDF CRS
+
+        @return fractional_index_array: (n, 2) float array of fractional array indices in array dimension order
+        @return mask_array: (n,) Boolean array which is True for coordinates within the grid extent
+        '''
+        native_coordinates = self.get_native_coordinate_array(coordinates, wkt)
+
+        fractional_index_array = np.zeros(shape=native_coordinates.shape, dtype='float64')
+        mask_array = np.ones(shape=(native_coordinates.shape[0],), dtype='bool')
+
+        for dim_index in range(2):
+            dimension_array = np.asarray(self.dimension_arrays[dim_index], dtype='float64')
+            ordinates = native_coordinates[:,dim_index]
+
+            mask_array &= np.logical_and(ordinates >= self.min_extent[dim_index],
+                                         ordinates <= self.max_extent[dim_index])
+
+            if self.regular_dimensions[dim_index]:
+                dimension_step = (dimension_array[-1] - dimension_array[0]) / (len(dimension_array) - 1)
+                fractional_index_array[:,dim_index] = (ordinates - dimension_array[0]) / dimension_step
+            elif dimension_array[-1] < dimension_array[0]: # Descending irregular dimension
+                fractional_index_array[:,dim_index] = np.interp(ordinates, dimension_array[::-1],
+                                                                np.arange(len(dimension_array) - 1, -1, -1, dtype='float64'))
+            else: # Ascending irregular dimension
+                fractional_index_array[:,dim_index] = np.interp(ordinates, dimension_array,
+                                                                np.arange(len(dimension_array), dtype='float64'))
+
+        return fractional_index_array, mask_array
 
     def get_fractional_indices_from_coords(self, coordinates, wkt=None):
         '''
         Returns list of fractional array indices corresponding to coordinates to support interpolation
         @parameter coordinates: iterable collection of coordinate pairs or single coordinate pair
         @parameter wkt: Coordinate Reference System for coordinates. None == native NetCDF CRS
+
+        @return fractional_indices: fractional index pair list (or None if outside grid extent) for single coordinate,
+            or list of same for multiple coordinates
         '''
-        wkt = wkt or self.wkt
-        native_coordinates = transform_coords(coordinates, self.wkt, wkt)
+        fractional_index_array, mask_array = self.get_fractional_index_array_from_coords(coordinates, wkt)
 
-        self.pixel_size
+        fractional_indices = [(list(index_pair) if valid else None)
+                              for index_pair, valid in zip(fractional_index_array.tolist(), mask_array)]
 
-        # Convert coordinates to same order as array
-        if self.YX_order:
-            try:
-                for coord_index in range(len(native_coordinates)):
-                    if native_coordinates[coord_index] is not None:
-                        native_coordinates[coord_index] = list(
-                            native_coordinates[coord_index])
-                        native_coordinates[coord_index].reverse()
-            except:
-                native_coordinates = list(native_coordinates)
-                native_coordinates.reverse()
-        # TODO: Make sure this still works with Southwards-positive datasets
-        try:  # Multiple coordinates
-            fractional_indices = [[(coordinate[dim_index] - min(self.dimension_arrays[dim_index])) / self.pixel_size[dim_index] for dim_index in range(2)]
-                                  if not ([True for dim_index in range(2) if coordinate[dim_index] < self.min_extent[dim_index] or coordinate[dim_index] > self.max_extent[dim_index]])
-                                  else None
-                                  for coordinate in native_coordinates]
-        except:  # Single coordinate pair
-            fractional_indices = ([(native_coordinates[dim_index] - min(self.dimension_arrays[dim_index])) / self.pixel_size[dim_index] for dim_index in range(2)]
-                                  if not [True for dim_index in range(2) if native_coordinates[dim_index] < self.min_extent[dim_index] or native_coordinates[dim_index] > self.max_extent[dim_index]]
-                                  else None)
-
-        return fractional_indices
+        if np.asarray(coordinates).shape == (2,): # Single coordinate pair
+            return fractional_indices[0]
+        else:
+            return fractional_indices
+
+    def get_read_block_shape(self, data_variable, max_bytes=None):
+        '''
+        Returns list of block sizes for grouping reads from the last two (spatial) dimensions of data_variable
+        Blocks are aligned with the storage chunks of chunked variables so that each chunk is decompressed only once.
+        Unchunked variables use blocks of up to NetCDFGridUtils.DEFAULT_READ_BLOCK_SIZE cells in each dimension.
+        @parameter data_variable: netCDF variable to be read
+        @parameter max_bytes: Maximum number of bytes to read for an unchunked block. Defaults to self.max_bytes
+        '''
+        max_bytes = max_bytes or self.max_bytes
+        spatial_shape = data_variable.shape[-2:]
+
+        try:
+            chunking = data_variable.chunking()
+        except: # netCDF3 variables and numpy arrays don't have chunking
+            chunking = None
+
+        if chunking and chunking != 'contiguous':
+            return [min(chunk_size, dimension_size)
+                    for chunk_size, dimension_size in zip(chunking[-2:], spatial_shape)]
+
+        # Allow for whole extent of any leading dimensions being read with each block
+        leading_cells = int(np.prod(data_variable.shape[:-2]))
+        block_size = max(min(NetCDFGridUtils.DEFAULT_READ_BLOCK_SIZE,
+                             int(math.sqrt(max_bytes / (data_variable.dtype.itemsize * leading_cells)))
+                             ), 1)
+        return [min(block_size, dimension_size) for dimension_size in spatial_shape]
+
+    def read_block(self, data_variable, block_index, block_shape, leading_slices=()):
+        '''
+        Returns a numpy array containing a single spatial block read from data_variable with masked values filled
+        Blocks are served from self.block_cache if enabled, in which case the returned array is read-only.
+        @parameter data_variable: netCDF variable from which to read. The last two dimensions must be spatial
+        @parameter block_index: (row, column) index of block in units of block_shape
+        @parameter block_shape: list of block sizes as returned by get_read_block_shape()
+        @parameter leading_slices: tuple of slices with explicit start & stop values for any leading dimensions
+        '''
+        spatial_shape = data_variable.shape[-2:]
+        block_slices = tuple(leading_slices) + tuple(slice(block_index[dim_index] * block_shape[dim_index],
+                                                           min((block_index[dim_index] + 1) * block_shape[dim_index], spatial_shape[dim_index]))
+                                                     for dim_index in range(2))
+        def read_function():
+            logger.debug('Reading block {} from {}'.format(block_slices, data_variable.name))
+            with io_timer(self.io_stats, 'read', data_variable.name, block_slices) as timing:
+                block_array = np.ma.filled(data_variable[block_slices], getattr(data_variable, '_FillValue', None))
+                timing.nbytes = block_array.nbytes
+            return block_array
+
+        if self.block_cache is None:
+            return read_function()
+
+        # Block shape is part of the key because unchunked variables may be read with different block shapes
+        return self.block_cache.get((data_variable.name,) + tuple(int(size) for size in block_shape)
+                                    + tuple(int(index) for index in block_index)
+                                    + tuple(int(bound) for leading_slice in leading_slices
+                                            for bound in (leading_slice.start, leading_slice.stop)),
+                                    read_function)
+
+    def read_window(self, data_variable, window_slices, max_bytes=None):
+        '''
+        Returns a 2D numpy array containing an arbitrary window of data_variable assembled from (cached) read blocks
+        @parameter data_variable: 2D netCDF variable from which to read
+        @parameter window_slices: tuple of two slices with non-negative start and stop values defining the window
+        @parameter max_bytes: Maximum number of bytes to read for an unchunked block. Defaults to self.max_bytes
+        '''
+        assert len(data_variable.shape) == 2, '{} has leading dimensions {}. Use get_values_at_coords() with leading_slices for variables with more than two dimensions'.format(
+            data_variable.name, data_variable.dimensions[:-2])
+        block_shape = self.get_read_block_shape(data_variable, max_bytes)
+        window_array = np.zeros(shape=tuple(window_slice.stop - window_slice.start for window_slice in window_slices),
+                                dtype=data_variable.dtype)
+
+        block_ranges = [range(window_slices[dim_index].start // block_shape[dim_index],
+                              (window_slices[dim_index].stop - 1) // block_shape[dim_index] + 1)
+                        for dim_index in range(2)]
+
+        for block_row in block_ranges[0]:
+            for block_column in block_ranges[1]:
+                block_index = (block_row, block_column)
+                block_array = self.read_block(data_variable, block_index, block_shape)
+
+                # Intersect block with window in both dimensions
+                block_start = [block_index[dim_index] * block_shape[dim_index] for dim_index in range(2)]
+                overlap_start = [max(block_start[dim_index], window_slices[dim_index].start) for dim_index in range(2)]
+                overlap_stop = [min(block_start[dim_index] + block_array.shape[dim_index], window_slices[dim_index].stop)
+                                for dim_index in range(2)]
+
+                window_array[tuple(slice(overlap_start[dim_index] - window_slices[dim_index].start,
+                                         overlap_stop[dim_index] - window_slices[dim_index].start)
+                                   for dim_index in range(2))
+                             ] = block_array[tuple(slice(overlap_start[dim_index] - block_start[dim_index],
+                                                         overlap_stop[dim_index] - block_start[dim_index])
+                                                   for dim_index in range(2))]
+
+        return window_array
+
+    def get_values_at_indices(self, data_variable, index_array, max_bytes=None):
+        '''
+        Returns array of values read from 2D data_variable at an (n, 2) array of indices
+        Indices are grouped by read block (i.e. storage chunk) so that each touched block is read exactly once,
+        and values are returned in the same order as index_array.
+        @parameter data_variable: 2D netCDF variable from which to read
+        @parameter index_array: (n, 2) integer array of array indices
+        @parameter max_bytes: Maximum number of bytes to read for an unchunked block. Defaults to self.max_bytes
+        '''
+        assert len(data_variable.shape) == 2, '{} has leading dimensions {}. Use get_values_at_coords() with leading_slices for variables with more than two dimensions'.format(
+            data_variable.name, data_variable.dimensions[:-2])
+        index_array = np.asarray(index_array, dtype='int64').reshape((-1, 2))
+        value_array = np.zeros(shape=(len(index_array),), dtype=data_variable.dtype)
+        if not len(index_array):
+            return value_array
+
+        block_shape = self.get_read_block_shape(data_variable, max_bytes)
+
+        block_count = 0
+        for block_index, point_indices in self.group_indices_by_block(index_array, block_shape, data_variable.shape):
+            block_array = self.read_block(data_variable, block_index, block_shape)
+
+            local_indices = index_array[point_indices] - block_index * np.array(block_shape)
+            value_array[point_indices] = block_array[local_indices[:,0], local_indices[:,1]]
+            block_count += 1
+
+        logger.debug('Read {} values from {} blocks of {}'.format(len(index_array), block_count, data_variable.name))
+        return value_array
+
+    def get_leading_block_slices(self, data_variable, leading_slices):
+        '''
+        Returns list of tuples of slices dividing the selected range of any leading (e.g. time) dimensions into
+        pieces aligned with storage chunks. Unchunked variables are read over the whole selected range.
+        @parameter data_variable: netCDF variable from which to read. The last two dimensions must be spatial
+        @parameter leading_slices: tuple of slices with explicit start & stop values for all leading dimensions
+        '''
+        try:
+            chunking = data_variable.chunking()
+        except: # netCDF3 variables and numpy arrays don't have chunking
+            chunking = None
+
+        if not chunking or chunking == 'contiguous':
+            return [tuple(leading_slices)]
+
+        return list(itertools.product(*[[slice(max(chunk_start, leading_slice.start),
+                                               min(chunk_start + chunk_size, leading_slice.stop))
+                                         for chunk_start in range(leading_slice.start // chunk_size * chunk_size,
+                                                                  leading_slice.stop, chunk_size)
+                                         ]
+                                        for leading_slice, chunk_size in zip(leading_slices, chunking[:-2])
+                                        ]))
+
+    def get_values_at_coords(self, coordinates, wkt=None, variable_names=None, leading_slices=None, max_bytes=None):
+        '''
+        Returns array of values from multiple variables with the same dimensions at specified coordinates
+        Indices are resolved once and each touched block is read once for each variable.
+        Variables may have leading dimensions (e.g. time) before the two spatial dimensions.
+        @parameter coordinates: iterable collection of coordinate pairs or single coordinate pair
+        @parameter wkt: WKT for coordinate Coordinate Reference System. None == native NetCDF CRS
+        @parameter variable_names: list of variable names or single variable name. Defaults to all data variables
+        @parameter leading_slices: optional tuple of slices (with step 1) selecting ranges of leading dimensions.
+            Defaults to the whole range of all leading dimensions
+        @parameter max_bytes: Maximum number of bytes to read for an unchunked block. Defaults to self.max_bytes
+
+        @return value_array: float64 array of shape (n_points, n_variables) for 2D variables, or
+            (n_points, n_variables, <selected leading dimension sizes>...) for variables with leading dimensions,
+            containing NaN for no-data values and coordinates outside the grid
+        '''
+        if variable_names is None:
+            variables = self.data_variable_list
+        else:
+            if type(variable_names) == str:
+                variable_names = [variable_names]
+            variables = [self.netcdf_dataset.variables[variable_name] for variable_name in variable_names]
+
+        assert len(set(variable.dimensions for variable in variables)) == 1, 'All variables must have the same dimensions'
+
+        # Resolve leading slices to explicit start & stop values
+        full_leading_shape = variables[0].shape[:-2]
+        leading_slices = list(leading_slices or [])
+        leading_slices += [slice(None)] * (len(full_leading_shape) - len(leading_slices))
+        leading_slices = tuple(slice(*leading_slice.indices(dimension_size)[:2])
+                               for leading_slice, dimension_size in zip(leading_slices, full_leading_shape))
+        leading_shape = tuple(leading_slice.stop - leading_slice.start for leading_slice in leading_slices)
+
+        index_array, mask_array = self.get_index_array_from_coords(coordinates, wkt)
+        valid_indices = np.flatnonzero(mask_array)
+        index_array = index_array[valid_indices]
+
+        value_array = np.full(shape=(len(mask_array), len(variables)) + leading_shape, fill_value=np.nan, dtype='float64')
+
+        block_shape = self.get_read_block_shape(variables[0], max_bytes)
+        leading_block_slices_list = self.get_leading_block_slices(variables[0], leading_slices)
+
+        for block_index, point_indices in self.group_indices_by_block(index_array, block_shape, variables[0].shape):
+            local_indices = index_array[point_indices] - block_index * np.array(block_shape)
+            result_indices = valid_indices[point_indices]
+
+            for variable_index, variable in enumerate(variables):
+                no_data_value = getattr(variable, '_FillValue', None)
+
+                for leading_block_slices in leading_block_slices_list:
+                    block_array = self.read_block(variable, block_index, block_shape, leading_block_slices)
+
+                    # Move points axis to front to give shape (n_points, <leading block shape>...)
+                    block_values = np.moveaxis(block_array[..., local_indices[:,0], local_indices[:,1]], -1, 0).astype('float64')
+                    if no_data_value is not None:
+                        block_values[block_values == no_data_value] = np.nan
+
+                    value_array[(result_indices, variable_index) +
+                                tuple(slice(leading_block_slice.start - leading_slice.start,
+                                            leading_block_slice.stop - leading_slice.start)
+                                      for leading_block_slice, leading_slice in zip(leading_block_slices, leading_slices))
+                                ] = block_values
+
+        return value_array
+
+    @staticmethod
+    def group_indices_by_block(index_array, block_shape, array_shape):
+        '''
+        Generator to group an (n, 2) array of spatial indices by read block
+        Points are sorted by a single integer block key so that each touched block is yielded exactly once.
+        @parameter index_array: (n, 2) integer array of spatial array indices
+        @parameter block_shape: list of spatial block sizes as returned by get_read_block_shape()
+        @parameter array_shape: shape of array. The last two dimensions must be spatial
+
+        @yield block_index: (row, column) array index of block in units of block_shape
+        @yield point_indices: array of indices into index_array for points falling within block
+        '''
+        if not len(index_array):
+            return
+
+        block_indices = index_array // np.array(block_shape)
+
+        block_columns = int(math.ceil(array_shape[-1] / float(block_shape[1])))
+        block_keys = block_indices[:,0] * block_columns + block_indices[:,1]
+        sort_order = np.argsort(block_keys, kind='stable')
+        sorted_keys = block_keys[sort_order]
+        group_starts = np.flatnonzero(np.concatenate(([True], sorted_keys[1:] != sorted_keys[:-1])))
+        group_ends = np.append(group_starts[1:], len(sorted_keys))
+
+        for group_start, group_end in zip(group_starts, group_ends):
+            point_indices = sort_order[group_start:group_end]
+            yield block_indices[point_indices[0]], point_indices
 
     def get_value_at_coords(self, coordinates, wkt=None,
                             max_bytes=None, variable_name=None):
         '''
         Returns list of array values at specified coordinates
+        Each storage chunk touched by the coordinates is read only once.
         @parameter coordinates: iterable collection of coordinate pairs or single coordinate pair
         @parameter wkt: WKT for coordinate Coordinate Reference System. None == native NetCDF CRS
-        @parameter max_bytes: Maximum number of bytes to read in a single query. Defaults to NetCDFGridUtils.DEFAULT_MAX_BYTES
-        @parameter variable_name: NetCDF variable_name if not default data variable
+        @parameter max_bytes: Maximum number of bytes to read for an unchunked block. Defaults to self.max_bytes
+        @parameter variable_name: NetCDF variable_name if not default data variable. Variable must be 2D
         '''
-        # Use arbitrary maximum request size of NetCDFGridUtils.DEFAULT_MAX_BYTES
-        # (500,000,000 bytes => 11180 points per query)
-        #TODO: Find a better way of overcoming the netCDF problem where whole rows & columns are retrieved
-        max_bytes = max_bytes or 100  # NetCDFGridUtils.DEFAULT_MAX_BYTES
-
         if variable_name:
             data_variable = self.netcdf_dataset.variables[variable_name]
         else:
             data_variable = self.data_variable
 
+        assert len(data_variable.shape) == 2, '{} has leading dimensions {}. Use get_values_at_coords() with leading_slices for variables with more than two dimensions'.format(
+            data_variable.name, data_variable.dimensions[:-2])
+
         no_data_value = data_variable._FillValue
 
-        indices = np.array(self.get_indices_from_coords(coordinates, wkt))
-        
-#        return data_variable[indices[:,0], indices[:,1]].diagonal() # This could get too big
+        index_array, mask_array = self.get_index_array_from_coords(coordinates, wkt)
 
-        # Allow for the fact that the NetCDF advanced indexing will pull back
-        # n^2 cells rather than n
-        max_points = max(
-            int(math.sqrt(max_bytes / data_variable.dtype.itemsize)), 1)
-        try:
-            # Make this a vectorised operation for speed (one query for as many
-            # points as possible)
-            # Array of valid index pairs only
-            index_array = np.array(
-                [index_pair for index_pair in indices if index_pair is not None])
-            assert len(index_array.shape) == 2 and index_array.shape[
-                1] == 2, 'Not an iterable containing index pairs'
-            # Boolean mask indicating which index pairs are valid
-            mask_array = np.array([(index_pair is not None)
-                                   for index_pair in indices])
-            # Array of values read from variable
-            value_array = np.ones(shape=(len(index_array)),
-                                  dtype=data_variable.dtype) * no_data_value
-            # Final result array including no-data for invalid index pairs
-            result_array = np.ones(
-                shape=(len(mask_array)), dtype=data_variable.dtype) * no_data_value
-            start_index = 0
-            end_index = min(max_points, len(index_array))
-            while True:
-                # N.B: ".diagonal()" is required because NetCDF doesn't do advanced indexing exactly like numpy
-                # Hack is required to take values from leading diagonal. Requires n^2 elements retrieved instead of n. Not good, but better than whole array
-                # TODO: Think of a better way of doing this
-                value_array[start_index:end_index] = data_variable[
-                    (index_array[start_index:end_index, 0], index_array[start_index:end_index, 1])].diagonal()
-                if end_index == len(index_array):  # Finished
-                    break
-                start_index = end_index
-                end_index = min(start_index + max_points, len(index_array))
-
-            result_array[mask_array] = value_array
-            return list(result_array)
-        except:
-            return data_variable[indices[0], indices[1]]
+        # Final result array including no-data for invalid index pairs
+        result_array = np.ones(
+            shape=(len(mask_array)), dtype=data_variable.dtype) * no_data_value
+
+        result_array[mask_array] = self.get_values_at_indices(data_variable, index_array[mask_array], max_bytes)
+
+        return list(result_array)
 
     def get_interpolated_value_at_coords(
-            self, coordinates, wkt=None, max_bytes=None, variable_name=None):
+            self, coordinates, wkt=None, max_bytes=None, variable_name=None, order=3, window_size=None):
         '''
         Returns list of interpolated array values at specified coordinates
+        Coordinates are interpolated in batches falling within the same window of the grid, and only the window around
+        each batch (plus the halo required by the spline order) is read, so memory use scales with the number of
+        touched windows rather than the grid size.
+        N.B: Values for multiple coordinates are set to no-data where the nearest cell is no-data.
         @parameter coordinates: iterable collection of coordinate pairs or single coordinate pair
         @parameter wkt: Coordinate Reference System for coordinates. None == native NetCDF CRS
-        @parameter max_bytes: Maximum number of bytes to read in a single query. Defaults to NetCDFGridUtils.DEFAULT_MAX_BYTES
-        @parameter variable_name: NetCDF variable_name if not default data variable
+        @parameter max_bytes: Maximum number of bytes to read for an unchunked block. Defaults to self.max_bytes
+        @parameter variable_name: NetCDF variable_name if not default data variable. Variable must be 2D
+        @parameter order: Spline order for scipy.ndimage.map_coordinates (0-5). Defaults to 3 (cubic)
+        @parameter window_size: Nominal window size in cells. Defaults to NetCDFGridUtils.DEFAULT_READ_BLOCK_SIZE
         '''
         # TODO: Check behaviour of scipy.ndimage.map_coordinates adjacent to no-data areas. Should not interpolate no-data value
-        # TODO: Make this work for arrays > memory
-        max_bytes = max_bytes or 100
-        NetCDFGridUtils.DEFAULT_MAX_BYTES
-
         if variable_name:
             data_variable = self.netcdf_dataset.variables[variable_name]
         else:
             data_variable = self.data_variable
 
+        assert len(data_variable.shape) == 2, '{} has leading dimensions {}. Use get_values_at_coords() with leading_slices for variables with more than two dimensions'.format(
+            data_variable.name, data_variable.dimensions[:-2])
+
         no_data_value = data_variable._FillValue
 
-        fractional_indices = self.get_fractional_indices_from_coords(
-            coordinates, wkt)
+        fractional_index_array, mask_array = self.get_fractional_index_array_from_coords(coordinates, wkt)
 
-        # Make this a vectorised operation for speed (one query for as many
-        # points as possible)
-        try:
-            # Array of valid index pairs only
-            index_array = np.array(
-                [index_pair for index_pair in fractional_indices if index_pair is not None])
-            assert len(index_array.shape) == 2 and index_array.shape[
-                1] == 2, 'Not an iterable containing index pairs'
-            # Boolean mask indicating which index pairs are valid
-            mask_array = np.array([(index_pair is not None)
-                                   for index_pair in fractional_indices])
-            # Array of values read from variable
-            value_array = np.ones(shape=(len(index_array)),
-                                  dtype=data_variable.dtype) * no_data_value
-            # Final result array including no-data for invalid index pairs
-            result_array = np.ones(
-                shape=(len(mask_array)), dtype=data_variable.dtype) * no_data_value
-
-            value_array = map_coordinates(
-                data_variable, index_array.transpose(), cval=no_data_value)
-
-            result_array[mask_array] = value_array
-
-            # Mask out any coordinates falling in no-data areas. Need to do this to stop no-data value from being interpolated
-            # This is a bit ugly.
-            result_array[np.array(self.get_value_at_coords(
-                coordinates, wkt, max_bytes, variable_name)) == no_data_value] = no_data_value
-
-            return list(result_array)
-        except AssertionError:
-            return map_coordinates(data_variable, np.array(
-                [[fractional_indices[0]], [fractional_indices[1]]]), cval=no_data_value)
+        # Spline pre-filtering for orders > 1 is global, so use a halo wide enough for its influence to be negligible
+        halo = NetCDFGridUtils.INTERPOLATION_SPLINE_HALO if order > 1 else 1
+
+        # Windows are whole numbers of read blocks so that blocks are re-used from the block cache
+        block_shape = self.get_read_block_shape(data_variable, max_bytes)
+        window_size = window_size or NetCDFGridUtils.DEFAULT_READ_BLOCK_SIZE
+        window_shape = np.array([max(window_size // block_shape[dim_index], 1) * block_shape[dim_index]
+                                 for dim_index in range(2)])
+
+        valid_indices = np.flatnonzero(mask_array)
+        valid_fractional_indices = fractional_index_array[valid_indices]
+        window_indices = np.clip(np.floor(valid_fractional_indices + 0.5), 0, np.array(data_variable.shape[:2]) - 1
+                                 ).astype('int64') // window_shape
+
+        # Sort points by single integer window key, then process each batch of points in the same window
+        window_keys = window_indices[:,0] * (data_variable.shape[1] // window_shape[1] + 1) + window_indices[:,1]
+        sort_order = np.argsort(window_keys, kind='stable')
+        sorted_keys = window_keys[sort_order]
+        batch_starts = np.flatnonzero(np.concatenate(([True], sorted_keys[1:] != sorted_keys[:-1])))
+        batch_ends = np.append(batch_starts[1:], len(sorted_keys))
+
+        # Final result array including no-data for invalid index pairs
+        result_array = np.ones(
+            shape=(len(mask_array)), dtype=data_variable.dtype) * no_data_value
+        nearest_value_array = np.ones(
+            shape=(len(mask_array)), dtype=data_variable.dtype) * no_data_value
+
+        for batch_start, batch_end in zip(batch_starts, batch_ends):
+            batch_indices = sort_order[batch_start:batch_end]
+            window_index = window_indices[batch_indices[0]]
+
+            window_slices = tuple(slice(max(window_index[dim_index] * window_shape[dim_index] - halo, 0),
+                                        min((window_index[dim_index] + 1) * window_shape[dim_index] + halo,
+                                            data_variable.shape[dim_index]))
+                                  for dim_index in range(2))
+            window_origin = np.array([window_slice.start for window_slice in window_slices])
+            window_array = self.read_window(data_variable, window_slices, max_bytes)
 
+            local_fractional_indices = valid_fractional_indices[batch_indices] - window_origin
+            result_array[valid_indices[batch_indices]] = map_coordinates(window_array,
+                                                                         local_fractional_indices.transpose(),
+                                                                         order=order,
+                                                                         cval=no_data_value)
+
+            # Nearest cell values with half-pixel ties resolved to the lower index as for get_value_at_coords
+            local_nearest_indices = np.clip(np.ceil(local_fractional_indices - 0.5).astype('int64'),
+                                            0, np.array(window_array.shape) - 1)
+            nearest_value_array[valid_indices[batch_indices]] = window_array[local_nearest_indices[:,0],
+                                                                             local_nearest_indices[:,1]]
+            logger.debug('Interpolated {} values in window {}'.format(len(batch_indices), window_slices))
+
+        if np.asarray(coordinates).shape == (2,): # Single coordinate pair - no no-data masking for backward compatibility
+            return result_array
+
+        # Mask out any coordinates falling in no-data areas. Need to do this to stop no-data value from being interpolated
+        result_array[nearest_value_array == no_data_value] = no_data_value
+
+        return list(result_array)
 
     def sample_transect(self, transect_vertices, wkt=None, sample_metres=None):
         '''
@@ -364,6 +867,642 @@ class NetCDFGridUtils(NetCDFUtils):
         return sample_transect(transect_vertices, wkt, sample_metres)
         
 
+    def sample_transects(self, transect_vertices_list, wkt=None, sample_metres=None, variable_names=None, max_bytes=None):
+        '''
+        Function to sample values along multiple transects in one batch
+        Sample points for all transects are generated with vectorised code and sampled in a single query, so each
+        touched block is read only once (and retained in the block cache for subsequent queries).
+        @param transect_vertices_list: list of transects, each a list or array of transect vertex coordinates
+        @param wkt: coordinate reference system for transect vertices. None == native NetCDF CRS
+        @param sample_metres: distance between sample points in metres. Defaults to self.default_sample_metres
+        @param variable_names: list of variable names or single variable name. Defaults to the data variable
+        @param max_bytes: Maximum number of bytes to read for an unchunked block. Defaults to self.max_bytes
+
+        @return transect_results: list containing a (sample_point_array, distance_array, value_array) tuple for each
+            transect, where value_array has shape (n_points, n_variables) as returned by get_values_at_coords
+        '''
+        wkt = wkt or self.wkt
+        sample_metres = sample_metres or self.default_sample_metres
+        variable_names = variable_names or [self.data_variable.name]
+
+        transect_samples = sample_transects(transect_vertices_list, wkt, sample_metres)
+        if not transect_samples:
+            return []
+
+        sample_counts = [len(distance_array) for _sample_point_array, distance_array in transect_samples]
+        value_array = self.get_values_at_coords(np.concatenate([sample_point_array
+                                                                for sample_point_array, _distance_array in transect_samples]),
+                                                wkt=wkt,
+                                                variable_names=variable_names,
+                                                max_bytes=max_bytes)
+
+        return [(sample_point_array, distance_array, transect_value_array)
+                for (sample_point_array, distance_array), transect_value_array
+                in zip(transect_samples, np.split(value_array, np.cumsum(sample_counts)[:-1]))
+                ]
+
+    def get_zonal_statistics(self, polygons, wkt=None, variable_name=None, percentiles=None, max_bytes=None, workers=None):
+        '''
+        Function to compute statistics of grid values within each of a list of polygons (zones)
+        Polygons are rasterised onto the grid (cells are included if their centres fall inside), then the cells for all
+        zones are read in a single pass so that each touched block is read only once, regardless of the number of
+        polygons. Rasterisation and statistics are computed in parallel for each zone if workers is specified.
+        N.B: Polygon vertices are transformed to the native CRS without densification, so edges should be short
+        relative to any CRS curvature.
+        @param polygons: list of shapely Polygons or MultiPolygons, or of exterior ring vertex coordinate lists
+        @param wkt: coordinate reference system for polygon vertices. None == native NetCDF CRS
+        @param variable_name: name of 2D variable from which to compute statistics. Defaults to the data variable
+        @param percentiles: list of percentiles to compute. Defaults to NetCDFGridUtils.ZONAL_PERCENTILES
+        @param max_bytes: Maximum number of bytes to read for an unchunked block. Defaults to self.max_bytes
+        @param workers: number of worker threads for rasterisation and statistics. None for serial processing
+
+        @return zonal_statistics: list containing a dict of statistics for each polygon as returned by get_array_statistics
+        '''
+        data_variable = self.netcdf_dataset.variables[variable_name] if variable_name else self.data_variable
+        assert len(data_variable.shape) == 2, 'Zonal statistics are only supported for 2D variables'
+        percentiles = NetCDFGridUtils.ZONAL_PERCENTILES if percentiles is None else percentiles
+
+        if not len(polygons):
+            return []
+
+        # Transform vertices for all rings of all polygons in a single call
+        polygon_rings_list = [get_polygon_rings(polygon) for polygon in polygons]
+        ring_list = [ring for polygon_rings in polygon_rings_list for ring in polygon_rings]
+        native_ring_list = np.split(self.get_native_coordinate_array(np.concatenate(ring_list), wkt),
+                                    np.cumsum([len(ring) for ring in ring_list])[:-1])
+        ring_counts = [len(polygon_rings) for polygon_rings in polygon_rings_list]
+        native_polygon_rings_list = [native_ring_list[ring_start:ring_start + ring_count]
+                                     for ring_start, ring_count in zip(np.cumsum([0] + ring_counts[:-1]), ring_counts)]
+
+        zone_index_arrays = list(ordered_map(partial(get_polygon_cell_indices, dimension_arrays=self.dimension_arrays),
+                                             native_polygon_rings_list,
+                                             workers=workers))
+        zone_cell_counts = [len(zone_index_array) for zone_index_array in zone_index_arrays]
+        logger.debug('Rasterised {} polygons to {} cells'.format(len(polygons), sum(zone_cell_counts)))
+
+        # Read values for all zones at once, so that each block is read only once
+        value_array = self.get_values_at_indices(data_variable,
+                                                 np.concatenate(zone_index_arrays),
+                                                 max_bytes=max_bytes).astype('float64')
+        no_data_value = getattr(data_variable, '_FillValue', None)
+        if no_data_value is not None:
+            value_array[value_array == no_data_value] = np.nan
+
+        return list(ordered_map(partial(get_array_statistics, percentiles=percentiles),
+                                np.split(value_array, np.cumsum(zone_cell_counts)[:-1]),
+                                workers=workers))
+
+    def get_resampling_indices(self, fractional_index_array, resampling_method='nearest'):
+        '''
+        Returns array indices and weights required to resample at fractional array indices
+        @param fractional_index_array: (n, 2) array of fractional array indices as returned by get_fractional_index_array_from_coords
+        @param resampling_method: 'nearest' or 'bilinear'
+
+        @return index_array: (n, 2) integer array of array indices for nearest, or (4n, 2) array of cell corner indices for bilinear
+        @return weights: None for nearest, or (4, n) array of bilinear weights for cell corners
+        '''
+        assert resampling_method in NetCDFGridUtils.WARP_RESAMPLING_METHODS, 'Invalid resampling_method {}. Must be one of {}'.format(
+            resampling_method, NetCDFGridUtils.WARP_RESAMPLING_METHODS)
+        max_indices = np.array([len(dimension_array) - 1 for dimension_array in self.dimension_arrays])
+
+        if resampling_method == 'nearest':
+            # Half-pixel ties are resolved to the lower index, as for get_index_array_from_coords
+            return np.clip(np.ceil(fractional_index_array - 0.5).astype('int64'), 0, max_indices), None
+
+        lower_index_array = np.clip(np.floor(fractional_index_array).astype('int64'), 0, np.maximum(max_indices - 1, 0))
+        fractions = np.clip(fractional_index_array - lower_index_array, 0.0, 1.0)
+        index_array = np.concatenate([np.minimum(lower_index_array + np.array(offset), max_indices)
+                                      for offset in [(0, 0), (0, 1), (1, 0), (1, 1)]])
+        weights = np.stack([(1.0 - fractions[:,0]) * (1.0 - fractions[:,1]),
+                            (1.0 - fractions[:,0]) * fractions[:,1],
+                            fractions[:,0] * (1.0 - fractions[:,1]),
+                            fractions[:,0] * fractions[:,1]])
+        return index_array, weights
+
+    def get_resampled_values(self, data_variable, index_array, weights=None, max_bytes=None):
+        '''
+        Returns float64 array of values resampled from 2D data_variable with NaN for no-data
+        Any no-data cell corner makes a bilinear result no-data.
+        @param data_variable: 2D netCDF variable from which to read
+        @param index_array: index array as returned by get_resampling_indices
+        @param weights: bilinear weights as returned by get_resampling_indices, or None for nearest
+        @param max_bytes: Maximum number of bytes to read for an unchunked block. Defaults to self.max_bytes
+        '''
+        value_array = self.get_values_at_indices(data_variable, index_array, max_bytes=max_bytes).astype('float64')
+        no_data_value = getattr(data_variable, '_FillValue', None)
+        if no_data_value is not None:
+            value_array[value_array == no_data_value] = np.nan
+
+        if weights is not None:
+            value_array = np.sum(value_array.reshape((4, -1)) * weights, axis=0)
+
+        return value_array
+
+    def get_warp_grid(self, wkt, pixel_size=None):
+        '''
+        Returns GeoTransform and shape of a north-up grid in another CRS covering the extent of this grid
+        The extent is determined by transforming points along all four grid edges.
+        @param wkt: WKT or CRS name for output grid
+        @param pixel_size: output pixel size in output CRS units. Defaults to the size giving the same cell area as the
+            source grid at its centre
+
+        @return geotransform: GDAL GeoTransform list for output grid
+        @return shape: (rows, columns) tuple for output grid
+        '''
+        edge_ordinates_list = []
+        for dim_index in range(2):
+            dimension_array = np.asarray(self.dimension_arrays[dim_index], dtype='float64')
+            other_dimension_array = np.asarray(self.dimension_arrays[1 - dim_index], dtype='float64')
+            edge_sample_indices = np.unique(np.linspace(0, len(other_dimension_array) - 1,
+                                                        NetCDFGridUtils.WARP_EDGE_POINTS).astype('int64'))
+            for edge_ordinate in [dimension_array[0], dimension_array[-1]]:
+                edge_ordinates = np.zeros(shape=(len(edge_sample_indices), 2), dtype='float64')
+                edge_ordinates[:,dim_index] = edge_ordinate
+                edge_ordinates[:,1 - dim_index] = other_dimension_array[edge_sample_indices]
+                edge_ordinates_list.append(edge_ordinates)
+
+        # Convert from array dimension order to XY order for transformation
+        edge_coordinates = np.concatenate(edge_ordinates_list)
+        if self.YX_order:
+            edge_coordinates = edge_coordinates[:,::-1]
+        edge_coordinates = transform_coords(edge_coordinates, self.wkt, wkt)
+
+        min_coordinates = np.nanmin(edge_coordinates, axis=0)
+        max_coordinates = np.nanmax(edge_coordinates, axis=0)
+
+        if not pixel_size:
+            # Preserve cell area at grid centre, using the cell edge vectors in both dimensions
+            centre_indices = [len(dimension_array) // 2 for dimension_array in self.dimension_arrays]
+            cell_vertices = np.array([[self.dimension_arrays[dim_index][min(centre_indices[dim_index] + offset[dim_index],
+                                                                            len(self.dimension_arrays[dim_index]) - 1)]
+                                       for dim_index in range(2)]
+                                      for offset in [(0, 0), (1, 0), (0, 1)]], dtype='float64')
+            if self.YX_order:
+                cell_vertices = cell_vertices[:,::-1]
+            cell_vertices = transform_coords(cell_vertices, self.wkt, wkt)
+            edge_vectors = cell_vertices[1:] - cell_vertices[0]
+            pixel_size = math.sqrt(abs(edge_vectors[0,0] * edge_vectors[1,1] - edge_vectors[0,1] * edge_vectors[1,0]))
+
+        shape = tuple(int(math.ceil((max_coordinates[dim_index] - min_coordinates[dim_index]) / pixel_size
+                                    - NetCDFGridUtils.FLOAT_TOLERANCE)) + 1
+                      for dim_index in [1, 0]) # (rows, columns)
+
+        geotransform = [min_coordinates[0] - pixel_size / 2.0, pixel_size, 0.0,
+                        max_coordinates[1] + pixel_size / 2.0, 0.0, -pixel_size]
+
+        return geotransform, shape
+
+    def _set_lazy_spatial_properties(self):
+        '''
+        Function to set the lazily-evaluated spatial properties used to map coordinates to grid indices, so that they are
+        not first set concurrently by worker threads
+        '''
+        for property_name in ['wkt', 'dimension_arrays', 'regular_dimensions', 'min_extent', 'max_extent']:
+            getattr(self, property_name)
+
+    def warp(self, output_path, wkt, pixel_size=None, variable_names=None, resampling_method='nearest',
+             tile_size=None, max_bytes=None, workers=None):
+        '''
+        Function to reproject 2D data variables into a new CF-compliant netCDF grid in another CRS, one output tile at a time
+        For each tile, output pixel centres are transformed to source fractional indices (with a cached coordinate
+        transformation) and values are read from the touched source blocks via the block cache, so memory use is
+        bounded by the tile size and the block cache budget. Coordinate transformation and index computation for tiles
+        is done in parallel if workers is specified, while all netCDF reads and writes stay in the calling thread.
+        @param output_path: path of netCDF file to create (will be overwritten)
+        @param wkt: WKT or CRS name (e.g. "EPSG:3577") for output grid
+        @param pixel_size: output pixel size in output CRS units. Defaults to size preserving the source cell area
+        @param variable_names: list of variable names or single variable name. Defaults to all data variables
+        @param resampling_method: 'nearest' or 'bilinear'
+        @param tile_size: size of output tiles (and chunks) in each dimension. Defaults to NetCDFGridUtils.WARP_TILE_SIZE
+        @param max_bytes: Maximum number of bytes to read for an unchunked block. Defaults to self.max_bytes
+        @param workers: number of worker threads for computing tile sample indices. None for serial processing
+        '''
+        assert resampling_method in NetCDFGridUtils.WARP_RESAMPLING_METHODS, 'Invalid resampling_method {}. Must be one of {}'.format(
+            resampling_method, NetCDFGridUtils.WARP_RESAMPLING_METHODS)
+        tile_size = tile_size or NetCDFGridUtils.WARP_TILE_SIZE
+
+        if variable_names is None:
+            variable_names = [variable.name for variable in self.data_variable_list]
+        elif type(variable_names) == str:
+            variable_names = [variable_names]
+        source_variables = [self.netcdf_dataset.variables[variable_name] for variable_name in variable_names]
+        assert len(set(variable.dimensions for variable in source_variables)) == 1, 'All variables must have the same dimensions'
+        assert len(source_variables[0].dimensions) == 2, 'Only 2D variables can be warped'
+
+        geotransform, shape = self.get_warp_grid(wkt, pixel_size)
+
+        dtype = source_variables[0].dtype
+        if resampling_method == 'bilinear' and not np.issubdtype(dtype, np.floating):
+            dtype = np.dtype('float32')
+        fill_value = getattr(source_variables[0], '_FillValue', None)
+        if fill_value is None and np.issubdtype(dtype, np.floating):
+            fill_value = np.nan
+
+        output_dataset = create_netcdf_grid(output_path,
+                                            wkt,
+                                            geotransform,
+                                            shape,
+                                            variable_names,
+                                            dtype=dtype,
+                                            fill_value=fill_value,
+                                            variable_attributes={variable.name: {key: value for key, value in variable.__dict__.items()
+                                                                                 if key not in ['_FillValue', 'grid_mapping']}
+                                                                 for variable in source_variables},
+                                            chunksizes=[tile_size, tile_size],
+                                            global_attributes={'source': self.nc_path,
+                                                               'resampling_method': resampling_method})
+
+        self._set_lazy_spatial_properties() # Before any worker threads use them
+
+        def get_tile_sample_indices(tile_slices):
+            '''
+            Returns tile_slices, Boolean mask of valid tile points, index array and bilinear weights (or None)
+            '''
+            row_coordinates = geotransform[3] + (np.arange(tile_slices[0].start, tile_slices[0].stop) + 0.5) * geotransform[5]
+            column_coordinates = geotransform[0] + (np.arange(tile_slices[1].start, tile_slices[1].stop) + 0.5) * geotransform[1]
+            tile_coordinates = np.column_stack([ordinate_array.ravel() for ordinate_array
+                                                in np.meshgrid(column_coordinates, row_coordinates)])
+
+            fractional_index_array, mask_array = self.get_fractional_index_array_from_coords(tile_coordinates, wkt)
+            index_array, weights = self.get_resampling_indices(fractional_index_array[mask_array], resampling_method)
+            return tile_slices, mask_array, index_array, weights
+
+        tile_slices_list = [(slice(tile_row, min(tile_row + tile_size, shape[0])),
+                             slice(tile_column, min(tile_column + tile_size, shape[1])))
+                            for tile_row in range(0, shape[0], tile_size)
+                            for tile_column in range(0, shape[1], tile_size)]
+
+        try:
+            for tile_slices, mask_array, index_array, weights in ordered_map(get_tile_sample_indices, tile_slices_list, workers=workers):
+                if not mask_array.any(): # Tile lies outside source grid
+                    continue
+
+                for source_variable in source_variables:
+                    tile_array = np.full(shape=(mask_array.shape[0],), fill_value=np.nan, dtype='float64')
+                    tile_array[mask_array] = self.get_resampled_values(source_variable, index_array, weights, max_bytes=max_bytes)
+                    output_dataset.variables[source_variable.name][tile_slices] = np.ma.masked_invalid(
+                        tile_array.reshape((tile_slices[0].stop - tile_slices[0].start,
+                                            tile_slices[1].stop - tile_slices[1].start)))
+
+                logger.debug('Warped tile {}'.format(tile_slices))
+        finally:
+            output_dataset.close()
+
+        logger.info('Warped {} from {} to {} grid of shape {} in {}'.format(variable_names, self.nc_path, wkt, shape, output_path))
+
+    def apply_fft_filter(self, output_path, filter_name, filter_parameters=None, variable_names=None,
+                         tile_size=None, overlap=None, padding=None, max_bytes=None, workers=None, use_processes=True):
+        '''
+        Function to apply a frequency-domain filter (e.g. upward continuation or reduction to pole) to 2D data variables
+        tile by tile, writing the results to a copy of the dataset
+        Each tile core is read with an overlap on all sides, mirror-padded with a tapered margin and filtered by FFT.
+        Adjacent tile results are blended with linear weights across the inner half of their overlaps. Blended results are
+        accumulated in a float64 band of whole rows for each variable, and each row is written once when no later tile can
+        contribute to it, so memory use is bounded by the band size rather than the grid size. Tiles are filtered in a pool
+        of workers if workers is specified, while all netCDF reads and writes stay in the calling process.
+        @param output_path: path of netCDF file to create (will be overwritten)
+        @param filter_name: one of the keys of _fft_utils.FFT_FILTERS
+        @param filter_parameters: dict of keyword arguments for filter function, e.g. {'height': 500.0}
+        @param variable_names: list of variable names or single variable name. Defaults to all data variables
+        @param tile_size: size of tile cores in each dimension. Defaults to NetCDFGridUtils.FFT_TILE_SIZE
+        @param overlap: number of cells read around each tile core. Defaults to NetCDFGridUtils.FFT_OVERLAP
+        @param padding: number of cells of tapered mirror padding around each window. Defaults to overlap
+        @param max_bytes: Maximum number of bytes to read for an unchunked block. Defaults to self.max_bytes
+        @param workers: number of workers for FFT filtering. None for serial processing
+        @param use_processes: Boolean flag indicating whether workers should be processes rather than threads
+        '''
+        assert filter_name in FFT_FILTERS, 'Invalid filter_name {}. Must be one of {}'.format(filter_name, sorted(FFT_FILTERS.keys()))
+        tile_size = tile_size or NetCDFGridUtils.FFT_TILE_SIZE
+        overlap = NetCDFGridUtils.FFT_OVERLAP if overlap is None else overlap
+        padding = overlap if padding is None else padding
+        assert overlap < tile_size, 'overlap must be smaller than tile_size'
+        blend_size = overlap // 2 # Ramp width on each side of tile core boundaries
+
+        if variable_names is None:
+            variable_names = [variable.name for variable in self.data_variable_list]
+        elif type(variable_names) == str:
+            variable_names = [variable_names]
+        source_variables = [self.netcdf_dataset.variables[variable_name] for variable_name in variable_names]
+        for source_variable in source_variables:
+            assert len(source_variable.shape) == 2, 'FFT filters can only be applied to 2D variables'
+        shape = source_variables[0].shape
+
+        # Cell sizes in metres and axis directions in array dimension order
+        cell_sizes = list(self.nominal_pixel_metres)
+        if self.YX_order:
+            cell_sizes.reverse()
+        axis_signs = [1 if self.dimension_arrays[dim_index][-1] >= self.dimension_arrays[dim_index][0] else -1
+                      for dim_index in range(2)]
+
+        # Create output dataset with same structure but empty filtered variables, converting integer data to float
+        self.copy(output_path,
+                  datatype_map_dict={str(source_variable.dtype): 'float32' for source_variable in source_variables
+                                     if not np.issubdtype(source_variable.dtype, np.floating)},
+                  empty_var_list=variable_names)
+        output_dataset = netCDF4.Dataset(output_path, mode='r+')
+        try:
+            output_dataset.fft_filter = filter_name
+            output_dataset.fft_filter_parameters = str(filter_parameters or {})
+
+            tile_ranges = [[(tile_start, min(tile_start + tile_size, shape[dim_index]))
+                            for tile_start in range(0, shape[dim_index], tile_size)]
+                           for dim_index in range(2)]
+
+            # Ramp widths for each core boundary shared by two tiles, limited so that the ramps of a tile never overlap
+            boundary_ramps = [{dimension_tile_ranges[tile_index][1]: min(blend_size,
+                                                                         (dimension_tile_ranges[tile_index][1] - dimension_tile_ranges[tile_index][0]) // 2,
+                                                                         (dimension_tile_ranges[tile_index + 1][1] - dimension_tile_ranges[tile_index + 1][0]) // 2)
+                               for tile_index in range(len(dimension_tile_ranges) - 1)}
+                              for dimension_tile_ranges in tile_ranges]
+
+            def tile_window_generator():
+                '''
+                Generator to read windows around each tile core in the calling process
+                '''
+                for row_range, column_range in itertools.product(*tile_ranges):
+                    window_slices = tuple(slice(max(tile_range[0] - overlap, 0), min(tile_range[1] + overlap, shape[dim_index]))
+                                          for dim_index, tile_range in enumerate([row_range, column_range]))
+                    for source_variable in source_variables:
+                        window_array = self.read_window(source_variable, window_slices, max_bytes=max_bytes).astype('float64')
+                        if hasattr(source_variable, '_FillValue'):
+                            window_array[window_array == source_variable._FillValue] = np.nan
+                        yield (window_array, filter_name, filter_parameters, cell_sizes, axis_signs, padding, self.YX_order)
+
+            tile_keys = [(row_range, column_range, source_variable)
+                         for row_range, column_range in itertools.product(*tile_ranges)
+                         for source_variable in source_variables]
+
+            # Accumulation band for each variable as [band_start_row, float64 weighted sum array, NaN mask array]
+            band_dict = {source_variable.name: [0, np.zeros(shape=(0, shape[1]), dtype='float64'), np.ones(shape=(0, shape[1]), dtype='bool')]
+                         for source_variable in source_variables}
+
+            def write_band_rows(variable_name, row_stop):
+                '''
+                Helper function to write band rows before row_stop to the output variable and drop them from the band
+                '''
+                band_start, band_array, nan_mask = band_dict[variable_name]
+                if row_stop <= band_start:
+                    return
+                output_dataset.variables[variable_name][band_start:row_stop] = np.ma.masked_where(nan_mask[:row_stop - band_start],
+                                                                                                   band_array[:row_stop - band_start])
+                band_dict[variable_name] = [row_stop, band_array[row_stop - band_start:], nan_mask[row_stop - band_start:]]
+
+            for (row_range, column_range, source_variable), filtered_array in zip(tile_keys,
+                                                                                   ordered_map(filter_window,
+                                                                                               tile_window_generator(),
+                                                                                               workers=workers,
+                                                                                               use_processes=use_processes)):
+                tile_ranges_2d = [row_range, column_range]
+                # Ramps are only required at core boundaries shared with another tile
+                ramps = [(boundary_ramps[dim_index].get(tile_range[0], 0), boundary_ramps[dim_index].get(tile_range[1], 0))
+                         for dim_index, tile_range in enumerate(tile_ranges_2d)]
+                output_slices = tuple(slice(tile_range[0] - ramps[dim_index][0], tile_range[1] + ramps[dim_index][1])
+                                      for dim_index, tile_range in enumerate(tile_ranges_2d))
+                window_starts = [max(tile_range[0] - overlap, 0) for tile_range in tile_ranges_2d]
+                tile_result = filtered_array[tuple(slice(output_slice.start - window_start, output_slice.stop - window_start)
+                                                   for output_slice, window_start in zip(output_slices, window_starts))]
+
+                weights = np.outer(*[get_blend_weights(output_slices[dim_index].stop - output_slices[dim_index].start, *ramps[dim_index])
+                                     for dim_index in range(2)])
+
+                # Rows above this tile's output can receive no further contributions, so write them and extend the band
+                # to cover this tile's output rows
+                write_band_rows(source_variable.name, output_slices[0].start)
+                band_start, band_array, nan_mask = band_dict[source_variable.name]
+                if output_slices[0].stop - band_start > band_array.shape[0]:
+                    extra_rows = output_slices[0].stop - band_start - band_array.shape[0]
+                    band_array = np.concatenate([band_array, np.zeros(shape=(extra_rows, shape[1]), dtype='float64')])
+                    nan_mask = np.concatenate([nan_mask, np.ones(shape=(extra_rows, shape[1]), dtype='bool')])
+                    band_dict[source_variable.name] = [band_start, band_array, nan_mask]
+
+                # Accumulate weighted result with contributions from preceding tiles
+                band_slices = (slice(output_slices[0].start - band_start, output_slices[0].stop - band_start), output_slices[1])
+                band_array[band_slices] += np.where(np.isnan(tile_result), 0.0, tile_result * weights)
+                nan_mask[band_slices] = np.isnan(tile_result)
+
+                logger.debug('Filtered tile {} of {}'.format(output_slices, source_variable.name))
+
+            for source_variable in source_variables:
+                write_band_rows(source_variable.name, shape[0])
+        finally:
+            output_dataset.close()
+
+        logger.info('Applied {} filter to {} in {}'.format(filter_name, variable_names, output_path))
+
+    def get_default_overview_factors(self):
+        '''
+        Returns list of power-of-two overview factors continuing until the largest spatial dimension of the coarsest
+        overview is no larger than NetCDFGridUtils.OVERVIEW_MIN_SIZE
+        '''
+        overview_factors = []
+        overview_factor = 2
+        while max(self.data_variable.shape[-2:]) > NetCDFGridUtils.OVERVIEW_MIN_SIZE * overview_factor // 2:
+            overview_factors.append(overview_factor)
+            overview_factor *= 2
+        return overview_factors
+
+    def build_overviews(self, overview_factors=None, resampling_method='mean', variable_names=None,
+                        in_place=False, overview_path=None, max_bytes=None):
+        '''
+        Function to build decimated overview levels for 2D data variables in a single streaming pass
+        The source is read once in bands of whole rows, and every overview level is computed from each band, so memory use
+        is bounded by the band size. Overview variables are named <variable>_ovr<factor> with dimensions
+        <dimension>_ovr<factor>, and carry "overview_factor", "source_variable" and "resampling_method" attributes.
+        @parameter overview_factors: list of integer reduction factors, each of which must divide the largest.
+            Defaults to powers of two as returned by get_default_overview_factors()
+        @parameter resampling_method: one of 'mean', 'nearest', 'min' or 'max'
+        @parameter variable_names: list of variable names or single variable name. Defaults to all data variables
+        @parameter in_place: Boolean flag indicating whether overviews should be written into the source file rather than a sidecar file.
+            A netCDF4.Dataset object provided to the constructor is written directly and left open, so it must be open
+            for writing (e.g. mode 'r+'). Otherwise the source file is re-opened for writing, then re-opened read-only
+        @parameter overview_path: path of sidecar file. Defaults to self.overview_path
+        @parameter max_bytes: Maximum number of bytes to read in each band. Defaults to self.max_bytes
+        '''
+        max_bytes = max_bytes or self.max_bytes
+        overview_factors = sorted(set(overview_factors or self.get_default_overview_factors()))
+        if not overview_factors:
+            logger.info('Grid is too small to require overviews')
+            return
+
+        max_factor = overview_factors[-1]
+        assert not [overview_factor for overview_factor in overview_factors if max_factor % overview_factor], 'All overview factors must divide the largest factor'
+
+        if variable_names is None:
+            variable_names = [variable.name for variable in self.data_variable_list]
+        elif type(variable_names) == str:
+            variable_names = [variable_names]
+
+        # Capture everything required from the source dataset before it is re-opened for in-place writing
+        crs_variable_name = self.crs_variable.name
+        crs_attributes = {key: value for key, value in self.crs_variable.__dict__.items() if key != '_FillValue'}
+        geotransform = list(self.GeoTransform)
+        dimension_arrays = self.dimension_arrays
+        regular_dimensions = self.regular_dimensions
+
+        # Only datasets opened here are closed afterwards
+        close_output = True
+        if in_place:
+            assert not self.opendap, 'Unable to write overviews into OPeNDAP dataset'
+            self.close_overviews()
+            if self._netcdf_dataset is not None and self._netcdf_dataset is self._caller_dataset:
+                output_dataset = self._netcdf_dataset
+                close_output = False
+            else:
+                self.close()
+                output_dataset = netCDF4.Dataset(self.nc_path, mode='r+')
+            source_dataset = output_dataset
+        else:
+            overview_path = overview_path or self.overview_path
+            self.close_overviews()
+            if not os.path.isdir(os.path.dirname(os.path.abspath(overview_path))):
+                os.makedirs(os.path.dirname(os.path.abspath(overview_path)))
+            output_dataset = netCDF4.Dataset(overview_path, mode='w', clobber=True, format='NETCDF4')
+            source_dataset = self.netcdf_dataset
+
+        try:
+            source_variables = [source_dataset.variables[variable_name] for variable_name in variable_names]
+            assert len(set(variable.dimensions for variable in source_variables)) == 1, 'All variables must have the same dimensions'
+            assert len(source_variables[0].dimensions) == 2, 'Overviews can only be built for 2D variables'
+            dimension_names = source_variables[0].dimensions
+            source_shape = source_variables[0].shape
+
+            if not in_place:
+                output_dataset.source = self.nc_path
+                output_dataset.Conventions = 'CF-1.6'
+                crs_variable = output_dataset.createVariable(crs_variable_name, 'i1')
+                crs_variable.setncatts(crs_attributes)
+
+            # Create dimensions, coordinate variables and data variables for each level
+            output_variables = {}
+            for overview_factor in overview_factors:
+                overview_dimension_names = ['{}_ovr{}'.format(dimension_name, overview_factor) for dimension_name in dimension_names]
+                for dim_index, overview_dimension_name in enumerate(overview_dimension_names):
+                    source_dimension_variable = source_dataset.variables[dimension_names[dim_index]]
+                    overview_dimension_array = downsample_array(np.asarray(dimension_arrays[dim_index], dtype='float64').reshape((-1, 1)),
+                                                                overview_factor, 'mean')[:,0]
+                    if regular_dimensions[dim_index] and len(dimension_arrays[dim_index]) > 1: # Use nominal centres for partial blocks
+                        dimension_step = ((dimension_arrays[dim_index][-1] - dimension_arrays[dim_index][0]) 
+                                          / (len(dimension_arrays[dim_index]) - 1))
+                        overview_dimension_array = (dimension_arrays[dim_index][0] 
+                                                    + dimension_step * (np.arange(len(overview_dimension_array)) * overview_factor 
+                                                                        + (overview_factor - 1) / 2.0))
+
+                    output_dataset.createDimension(overview_dimension_name, len(overview_dimension_array))
+                    overview_dimension_variable = output_dataset.createVariable(overview_dimension_name, 'f8', (overview_dimension_name,))
+                    overview_dimension_variable.setncatts({key: value for key, value in source_dimension_variable.__dict__.items()
+                                                           if key != '_FillValue'})
+                    overview_dimension_variable[:] = overview_dimension_array
+
+                for source_variable in source_variables:
+                    dtype = source_variable.dtype
+                    if resampling_method == 'mean' and not np.issubdtype(dtype, np.floating):
+                        dtype = np.dtype('float32')
+                    overview_shape = [len(output_dataset.dimensions[overview_dimension_name]) for overview_dimension_name in overview_dimension_names]
+
+                    output_variable = output_dataset.createVariable('{}_ovr{}'.format(source_variable.name, overview_factor),
+                                                                   dtype,
+                                                                   overview_dimension_names,
+                                                                   zlib=True,
+                                                                   chunksizes=[min(dimension_size, 256) for dimension_size in overview_shape],
+                                                                   fill_value=getattr(source_variable, '_FillValue', None)
+                                                                   )
+                    output_variable.setncatts({key: value for key, value in source_variable.__dict__.items() if key != '_FillValue'})
+                    output_variable.grid_mapping = crs_variable_name
+                    output_variable.overview_factor = overview_factor
+                    output_variable.source_variable = source_variable.name
+                    output_variable.resampling_method = resampling_method
+                    output_variable.GeoTransform = ' '.join([str(value * (overview_factor if value_index in [1, 2, 4, 5] else 1))
+                                                             for value_index, value in enumerate(geotransform)])
+                    output_variables[(source_variable.name, overview_factor)] = output_variable
+
+            # Stream source in bands of whole rows aligned with the largest factor
+            band_rows = max_factor * max(1, int(max_bytes // (8 * source_shape[1] * max_factor)))
+            for band_start in range(0, source_shape[0], band_rows):
+                band_end = min(band_start + band_rows, source_shape[0])
+                for source_variable in source_variables:
+                    band_array = np.ma.filled(source_variable[band_start:band_end].astype('float64'), np.nan)
+                    if hasattr(source_variable, '_FillValue'):
+                        band_array[band_array == source_variable._FillValue] = np.nan
+
+                    for overview_factor in overview_factors:
+                        overview_array = downsample_array(band_array, overview_factor, resampling_method)
+                        output_variables[(source_variable.name, overview_factor)][
+                            band_start // overview_factor:band_start // overview_factor + overview_array.shape[0]
+                            ] = np.ma.masked_invalid(overview_array)
+
+                logger.debug('Built overviews for rows {}-{}'.format(band_start, band_end))
+        finally:
+            if close_output:
+                output_dataset.close()
+            else:
+                output_dataset.sync()
+
+        logger.info('Built {} overviews with factors {} for variables {} in {}'.format(resampling_method,
+                                                                                     overview_factors,
+                                                                                     variable_names,
+                                                                                     self.nc_path if in_place else overview_path))
+        if in_place:
+            # Refresh data variables from re-opened dataset
+            self._data_variable_list = [self.netcdf_dataset.variables[variable.name] for variable in self._data_variable_list]
+            self.data_variable = self.netcdf_dataset.variables[self.data_variable.name]
+            self._crs_variable = None
+        elif overview_path != self.overview_path:
+            self.overview_path = overview_path
+
+    @property
+    def overview_dataset(self):
+        '''
+        Property getter function to open sidecar overview dataset only when required. Returns None if there is no sidecar file.
+        '''
+        if self._overview_dataset is None and os.path.isfile(self.overview_path):
+            logger.debug('Opening overview dataset {}'.format(self.overview_path))
+            self._overview_dataset = netCDF4.Dataset(self.overview_path, mode='r')
+        return self._overview_dataset
+
+    def close_overviews(self):
+        '''
+        Function to close sidecar overview dataset if opened
+        '''
+        if self._overview_dataset is not None:
+            self._overview_dataset.close()
+            self._overview_dataset = None
+
+    def get_overview_variables(self, variable_name=None):
+        '''
+        Returns dict of overview netCDF variables keyed by overview factor, from this dataset and any sidecar file
+        @parameter variable_name: name of source variable. Defaults to the data variable
+        '''
+        variable_name = variable_name or self.data_variable.name
+        overview_variables = {}
+        for dataset in [self.overview_dataset, self.netcdf_dataset]: # In-place overviews take precedence
+            if dataset is None:
+                continue
+            for variable in dataset.variables.values():
+                if getattr(variable, 'source_variable', None) == variable_name and hasattr(variable, 'overview_factor'):
+                    overview_variables[int(variable.overview_factor)] = variable
+        return overview_variables
+
+    def get_best_overview(self, target_resolution, variable_name=None):
+        '''
+        Returns the coarsest available level whose cell size does not exceed target_resolution, or the full resolution
+        variable if no overview is fine enough.
+        @parameter target_resolution: required cell size in native CRS units
+        @parameter variable_name: name of source variable. Defaults to the data variable
+
+        @return overview_factor: reduction factor of level (1 for full resolution)
+        @return variable: netCDF variable for level
+        '''
+        variable_name = variable_name or self.data_variable.name
+        cell_size = max(self.pixel_size)
+        overview_variables = self.get_overview_variables(variable_name)
+        suitable_factors = [overview_factor for overview_factor in overview_variables.keys()
+                            if overview_factor * cell_size <= target_resolution * (1.0 + NetCDFGridUtils.FLOAT_TOLERANCE)]
+        if not suitable_factors:
+            return 1, self.netcdf_dataset.variables[variable_name]
+
+        overview_factor = max(suitable_factors)
+        return overview_factor, overview_variables[overview_factor]
+
     def get_convex_hull(self, to_wkt=None):
         try:
             convex_hull = netcdf2convex_hull(self.netcdf_dataset, NetCDFGridUtils.DEFAULT_MAX_BYTES)
@@ -383,14 +1522,25 @@ class NetCDFGridUtils(NetCDFUtils):
                 # Assume string or array representation of GeoTransform exists
                 self._GeoTransform = self.crs_variable.GeoTransform
             except:
-                #TODO: create GeoTransform from x & y variables
-                raise BaseException('Unable to determine GeoTransform')
+                self._GeoTransform = None
 
             if type(self._GeoTransform) == str:
                 # Convert string representation of GeoTransform to array
                 self._GeoTransform = [float(number.strip())
                                       for number in self.crs_variable.GeoTransform.strip().split(' ')
                                       ]
+            elif self._GeoTransform is None:
+                # Create GeoTransform from first two values of x & y dimension variables
+                try:
+                    x_values, y_values = [np.asarray(self.netcdf_dataset.variables[dimension_name][0:2], dtype='float64')
+                                          for dimension_name in (self.data_variable.dimensions[:-3:-1]
+                                                                 if self.YX_order else self.data_variable.dimensions[-2:])
+                                          ]
+                    x_size, y_size = x_values[1] - x_values[0], y_values[1] - y_values[0]
+                    self._GeoTransform = [x_values[0] - x_size / 2.0, x_size, 0.0,
+                                          y_values[0] - y_size / 2.0, 0.0, y_size]
+                except:
+                    raise BaseException('Unable to determine GeoTransform')
                    
         return self._GeoTransform
 
@@ -415,12 +1565,27 @@ def main():
     parser.add_argument("--complevel", help="Compression level for chunked variables as an integer 0-9. Default is 4",
                         type=int, default=4)
     parser.add_argument('-i', '--invert_y', help='Store copy with y-axis indexing Southward positive', type=str)
+    parser.add_argument("--workers", help="Number of worker processes used to read pieces. Default is serial copy",
+                        type=int)
+    parser.add_argument('-p', '--parallel_compression', action='store_const', const=True, default=False,
+                        help='Compress chunks in the worker processes and write them directly with h5py. Requires --workers and h5py '
+                             '(pip install geophys_utils[parallel_compression])')
+    parser.add_argument("--access", help="Expected access pattern used to plan chunk sizes for variables not in --chunkspec (one of %s)" % ', '.join(ACCESS_PATTERNS),
+                        type=str, choices=ACCESS_PATTERNS)
+    parser.add_argument('-r', '--resume', action='store_const', const=True, default=False,
+                        help='Resume an interrupted copy from its checkpoint file. Default is to start afresh')
+    parser.add_argument('-s', '--stats', action='store_const', const=True, default=False,
+                        help='Report bytes, elapsed time and throughput per phase and per variable after copying')
+    parser.add_argument('-e', '--explain', action='store_const', const=True, default=False,
+                        help='Report expected chunks touched by typical queries for current (and planned) chunking instead of copying')
     parser.add_argument('-d', '--debug', action='store_const', const=True, default=False,
                         help='output debug information. Default is no debug info')
     parser.add_argument("input_path")
-    parser.add_argument("output_path")
+    parser.add_argument("output_path", nargs='?', help='Output netCDF path. Not required with --explain')
     
     args = parser.parse_args()
+    if not (args.explain or args.output_path):
+        parser.error('output_path is required unless --explain is given')
     
     if args.invert_y is not None:
         invert_y = bool(strtobool(args.invert_y))
@@ -438,6 +1603,14 @@ def main():
                       debug=args.debug
                       )   
     
+    if args.stats:
+        ncgu.io_stats = IOStats(record_pieces=False)
+        
+    if args.explain:
+        for explanation_line in ncgu.explain_chunking(access_pattern=args.access):
+            print(explanation_line)
+        return
+    
     ncgu.copy(args.output_path, 
              #datatype_map_dict={},
              # Compress all chunked variables
@@ -453,8 +1626,16 @@ def main():
              #dim_range_dict={},
              nc_format=args.format,
              #limit_dim_size=False
-             invert_y=invert_y
+             access_pattern=args.access,
+             resume=args.resume,
+             invert_y=invert_y,
+             workers=args.workers,
+             parallel_compression=args.parallel_compression
              )
+    
+    if args.stats:
+        for summary_line in ncgu.io_stats.get_summary_lines():
+            print(summary_line)
         
 
 if __name__ == '__main__':
@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+
+#===============================================================================
+#    Copyright 2026 Geoscience Australia
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+#===============================================================================
+'''
+Function to create an empty CF-compliant gridded netCDF dataset ready to be written in pieces
+
+Created on 18Oct.,2026
+
+@author: agent
+'''
+import netCDF4
+import numpy as np
+import logging
+
+from geophys_utils._crs_utils import get_spatial_ref_from_wkt
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO) # Initial logging level for this module
+
+# Default creation options for gridded data variables
+DEFAULT_GRID_VARIABLE_OPTIONS = {'complevel': 4,
+                                 'zlib': True,
+                                 'fletcher32': True,
+                                 'shuffle': True,
+                                 'endian': 'little',
+                                 }
+
+
+def create_netcdf_grid(nc_path,
+                       wkt,
+                       geotransform,
+                       shape,
+                       variable_names,
+                       dtype='float32',
+                       fill_value=None,
+                       leading_dimension=None,
+                       variable_attributes=None,
+                       chunksizes=None,
+                       nc_format='NETCDF4',
+                       global_attributes=None):
+    '''
+    Function to create a CF-compliant gridded netCDF dataset with dimension and crs variables but no data
+    The caller is responsible for writing data into the variables and closing the returned dataset.
+    @param nc_path: path of netCDF file to create (will be overwritten)
+    @param wkt: WKT or CRS name (e.g. "EPSG:4326") for grid coordinate reference system
+    @param geotransform: GDAL GeoTransform for grid. Must be north-up (i.e. no rotation terms)
+    @param shape: (rows, columns) tuple for 2D grid shape
+    @param variable_names: list of data variable name strings or single data variable name string
+    @param dtype: datatype of data variables
+    @param fill_value: _FillValue for data variables. None for netCDF default
+    @param leading_dimension: optional (name, value_array, attribute_dict) tuple defining an extra leading dimension (e.g. depth)
+    @param variable_attributes: optional dict of attribute dicts keyed by data variable name
+    @param chunksizes: optional list of chunk sizes for data variables. Defaults to whole rows or single slices
+    @param nc_format: netCDF file format
+    @param global_attributes: optional dict of global attributes
+
+    @return nc_dataset: netCDF4.Dataset open for writing
+    '''
+    if type(variable_names) == str:
+        variable_names = [variable_names]
+
+    # Resolve CRS names (e.g. "EPSG:4326") to full WKT for the crs variable
+    spatial_ref = get_spatial_ref_from_wkt(wkt)
+    wkt = spatial_ref.ExportToWkt()
+    geographic = bool(spatial_ref.IsGeographic())
+    if geographic:
+        dimension_names = ['lat', 'lon']
+        dimension_attributes = [{'standard_name': 'latitude', 'long_name': 'latitude', 'units': 'degrees_north'},
+                                {'standard_name': 'longitude', 'long_name': 'longitude', 'units': 'degrees_east'}
+                                ]
+    else:
+        dimension_names = ['y', 'x']
+        dimension_attributes = [{'standard_name': 'projection_y_coordinate', 'long_name': 'y coordinate of projection', 'units': 'm'},
+                                {'standard_name': 'projection_x_coordinate', 'long_name': 'x coordinate of projection', 'units': 'm'}
+                                ]
+
+    # Pixel centre coordinates
+    dimension_arrays = [geotransform[3] + (np.arange(shape[0]) + 0.5) * geotransform[5],
+                        geotransform[0] + (np.arange(shape[1]) + 0.5) * geotransform[1]
+                        ]
+
+    if leading_dimension is not None:
+        leading_dimension_name, leading_dimension_array, leading_dimension_attributes = leading_dimension
+        dimension_names = [leading_dimension_name] + dimension_names
+        dimension_arrays = [np.array(leading_dimension_array)] + dimension_arrays
+        dimension_attributes = [leading_dimension_attributes or {}] + dimension_attributes
+
+    logger.debug('Creating {} grid {} of shape {}'.format(nc_format, nc_path, tuple(len(array) for array in dimension_arrays)))
+    nc_dataset = netCDF4.Dataset(nc_path, mode='w', clobber=True, format=nc_format)
+    try:
+        nc_dataset.Conventions = 'CF-1.6'
+        for attribute_name, attribute_value in (global_attributes or {}).items():
+            nc_dataset.setncattr(attribute_name, attribute_value)
+
+        for dimension_name, dimension_array, attributes in zip(dimension_names, dimension_arrays, dimension_attributes):
+            nc_dataset.createDimension(dimension_name, len(dimension_array))
+            dimension_variable = nc_dataset.createVariable(dimension_name, dimension_array.dtype, (dimension_name,))
+            dimension_variable.setncatts(attributes)
+            dimension_variable[:] = dimension_array
+
+        crs_variable = nc_dataset.createVariable('crs', 'i1')
+        if geographic:
+            crs_variable.grid_mapping_name = 'latitude_longitude'
+        crs_variable.spatial_ref = wkt
+        crs_variable.crs_wkt = wkt # CF-1.7 attribute
+        crs_variable.GeoTransform = ' '.join([str(value) for value in geotransform])
+
+        if chunksizes is None:
+            chunksizes = [1] * (len(dimension_names) - 2) + [min(shape[0], 256), min(shape[1], 256)]
+
+        for variable_name in variable_names:
+            variable_options = dict(DEFAULT_GRID_VARIABLE_OPTIONS)
+            variable_options['chunksizes'] = [min(chunksizes[dim_index], len(dimension_arrays[dim_index]))
+                                              for dim_index in range(len(dimension_names))]
+            if fill_value is not None:
+                variable_options['fill_value'] = fill_value
+
+            data_variable = nc_dataset.createVariable(variable_name, dtype, dimension_names, **variable_options)
+            data_variable.grid_mapping = 'crs'
+            data_variable.setncatts((variable_attributes or {}).get(variable_name) or {})
+    except:
+        nc_dataset.close()
+        raise
+
+    return nc_dataset
@@ -23,6 +23,9 @@ Created on 16/11/2016
 import os
 import numpy as np
 from geophys_utils._netcdf_point_utils import NetCDFPointUtils
+from geophys_utils._layer_utils import get_layered_section
+from geophys_utils._parallel_utils import ordered_map
+from geophys_utils._block_cache import get_source_signature
 from scipy.spatial.distance import pdist
 import logging
 import netCDF4
@@ -35,8 +38,13 @@ class NetCDFLineUtils(NetCDFPointUtils):
     '''
     NetCDFLineUtils class to do various fiddly things with NetCDF geophysics line data files.
     '''
+    # Number of points in each bin of the finest line pyramid level
+    LINE_PYRAMID_BASE_BIN_SIZE = 4
 
-    def __init__(self, 
+    # Ratio between bin sizes of successive line pyramid levels
+    LINE_PYRAMID_LEVEL_FACTOR = 4
+
+    def __init__(self,
                  netcdf_dataset,
                  memcached_connection=None,
                  enable_disk_cache=None,
@@ -63,7 +71,10 @@ class NetCDFLineUtils(NetCDFPointUtils):
         # Initialise private property variables to None until set by property getter methods
         self._line = None
         self._line_index = None
-            
+
+        # Sidecar file for decimated line pyramid is kept next to the cache file
+        self.pyramid_path = os.path.splitext(self.cache_path)[0] + '_pyramid.nc'
+
         
     def get_line_masks(self, line_numbers=None, subset_mask=None, get_contiguous_lines=False):
         '''
@@ -178,8 +189,279 @@ class NetCDFLineUtils(NetCDFPointUtils):
                     line_dict[variable_name] = self.netcdf_dataset.variables[variable_name][point_indices]
         
                 yield line_number, line_dict
- 
-    
+
+
+    def get_line_sections(self, line_numbers=None,
+                          variables='conductivity',
+                          elevation_variable='elevation',
+                          thickness_variable='thickness',
+                          horizontal_resolution=None,
+                          vertical_resolution=None,
+                          max_depth=None,
+                          max_gap=None,
+                          workers=None):
+        '''
+        Generator to return 2D distance-elevation sections of layered (point, layer) variables (e.g. AEM conductivity) for specified lines
+        Line data is read in the calling thread, and regridding of separate lines can be performed in parallel worker threads
+        @param line_numbers: list of integer line number or single integer line number, or None for all lines
+        @param variables: list of (point, layer) variable name strings or single variable name string
+        @param elevation_variable: name of (point) variable containing surface elevation for each point
+        @param thickness_variable: name of (point, layer) or (layer) variable containing layer thicknesses
+        @param horizontal_resolution: distance in metres between section columns. Defaults to median point spacing
+        @param vertical_resolution: elevation difference in metres between section rows. Defaults to median top layer thickness
+        @param max_depth: maximum depth below surface in metres. Defaults to base of deepest finite layer
+        @param max_gap: maximum distance in metres from a column to its nearest point before column is set to NaN. None for no limit
+        @param workers: number of worker threads used to regrid lines. None or 1 for serial processing
+
+        @return line_number: line number for single line
+        @return section_dict: dict containing 'distance' and 'elevation' arrays for columns and rows, 'coordinates' of each column
+            and 2D (elevation, distance) grid arrays keyed by variable name
+        '''
+        if type(variables) == str:
+            variables = [variables]
+
+        thickness_netcdf_variable = self.netcdf_dataset.variables[thickness_variable]
+        if 'point' in thickness_netcdf_variable.dimensions:
+            line_variables = list(variables) + [elevation_variable, thickness_variable]
+            fixed_thickness_array = None
+        else: # Same layering for all points
+            line_variables = list(variables) + [elevation_variable]
+            fixed_thickness_array = np.ma.filled(thickness_netcdf_variable[:].astype('float64'), np.nan)
+
+        def get_section_arguments():
+            '''
+            Generator to read line values and yield arguments for section regridding
+            '''
+            for line_number, line_dict in self.get_lines(line_numbers=line_numbers, variables=line_variables):
+                line_arrays = {variable_name: np.ma.filled(line_dict[variable_name].astype('float64'), np.nan)
+                               for variable_name in line_variables}
+
+                yield (line_number,
+                       line_dict['coordinates'],
+                       dict(distance_array=self.coords2metres(line_dict['coordinates']),
+                            surface_elevation_array=line_arrays[elevation_variable],
+                            thickness_array=(line_arrays[thickness_variable]
+                                             if fixed_thickness_array is None
+                                             else fixed_thickness_array),
+                            value_array_dict={variable_name: line_arrays[variable_name] for variable_name in variables},
+                            horizontal_resolution=horizontal_resolution,
+                            vertical_resolution=vertical_resolution,
+                            max_depth=max_depth,
+                            max_gap=max_gap
+                            )
+                       )
+
+        def get_section(section_arguments):
+            '''
+            Function to regrid a single line section
+            '''
+            line_number, coordinates, section_kwargs = section_arguments
+            section_dict = get_layered_section(**section_kwargs)
+            section_dict['coordinates'] = coordinates[section_dict['point_index']]
+            return line_number, section_dict
+
+        for line_number, section_dict in ordered_map(get_section, get_section_arguments(), workers=workers):
+            yield line_number, section_dict
+
+
+    def build_line_pyramid(self, variables=None, base_bin_size=None, level_factor=None):
+        '''
+        Function to build a pyramid of decimated min/max envelopes for line variables and save it to self.pyramid_path
+        Each level divides every line into consecutive bins of base_bin_size * level_factor^level points
+        @param variables: list of 1D point variable name strings or single variable name string. None builds all 1D point variables
+        @param base_bin_size: number of points in each bin of the finest level. Defaults to LINE_PYRAMID_BASE_BIN_SIZE
+        @param level_factor: ratio between bin sizes of successive levels. Defaults to LINE_PYRAMID_LEVEL_FACTOR
+
+        @return bin_sizes: list of bin sizes (in points) for each pyramid level
+        '''
+        base_bin_size = base_bin_size or NetCDFLineUtils.LINE_PYRAMID_BASE_BIN_SIZE
+        level_factor = level_factor or NetCDFLineUtils.LINE_PYRAMID_LEVEL_FACTOR
+
+        if variables is None:
+            variables = [variable_name for variable_name in self.point_variables
+                         if len(self.netcdf_dataset.variables[variable_name].dimensions) == 1
+                         and self.netcdf_dataset.variables[variable_name].dtype.kind in 'iuf'
+                         ]
+        elif type(variables) == str:
+            variables = [variables]
+
+        # Validate all variables before anything is written
+        for variable_name in variables:
+            source_variable = self.netcdf_dataset.variables.get(variable_name)
+            assert source_variable is not None, 'Variable {} not found'.format(variable_name)
+            assert len(source_variable.dimensions) == 1 and source_variable.dimensions[0] == 'point', \
+                'Variable {} is not a 1D point variable'.format(variable_name)
+
+        line_count = len(self.line)
+        line_index = np.array(self.line_index, dtype='int64')
+
+        # Stable sort keeps points in their original order within each line
+        point_order = np.argsort(line_index, kind='stable')
+        sorted_line_index = line_index[point_order]
+        line_point_counts = np.bincount(line_index, minlength=line_count)
+        line_start_points = np.concatenate(([0], np.cumsum(line_point_counts)[:-1]))
+
+        # Position of each (sorted) point within its line
+        point_rank = np.arange(len(sorted_line_index)) - line_start_points[sorted_line_index]
+
+        sorted_xycoords = self.xycoords[point_order]
+
+        bin_sizes = [base_bin_size]
+        while bin_sizes[-1] < np.max(line_point_counts):
+            bin_sizes.append(bin_sizes[-1] * level_factor)
+
+        logger.debug('Building line pyramid with bin sizes {} in {}'.format(bin_sizes, self.pyramid_path))
+
+        # Pyramid is built in a temporary file which only replaces any existing pyramid once it is complete
+        os.makedirs(os.path.dirname(self.pyramid_path), exist_ok=True)
+        temp_pyramid_path = self.pyramid_path + '.tmp'
+        pyramid_dataset = netCDF4.Dataset(temp_pyramid_path, 'w')
+        pyramid_complete = False
+        try:
+            pyramid_dataset.source = self.nc_path
+            # Empty signature if the source version cannot be determined
+            pyramid_dataset.source_signature = get_source_signature(self.nc_path, self.netcdf_dataset) or ''
+            pyramid_dataset.bin_sizes = bin_sizes
+
+            pyramid_dataset.createDimension(dimname='line', size=line_count)
+            pyramid_dataset.createDimension(dimname='xy', size=2)
+            pyramid_dataset.createVariable('line', self.line.dtype, dimensions=['line'])[:] = self.line
+
+            level_bin_start_indices = []
+            for level, bin_size in enumerate(bin_sizes):
+                line_bin_counts = (line_point_counts + bin_size - 1) // bin_size
+                line_start_bins = np.concatenate(([0], np.cumsum(line_bin_counts)[:-1]))
+
+                # Bins are contiguous and ascending in sorted point order, so reduceat can be used
+                bin_ids = line_start_bins[sorted_line_index] + point_rank // bin_size
+                bin_start_indices = np.concatenate(([0], np.flatnonzero(np.diff(bin_ids)) + 1))
+                bin_point_counts = np.diff(np.append(bin_start_indices, len(bin_ids)))
+                level_bin_start_indices.append(bin_start_indices)
+
+                bin_dimension = 'bin_{}'.format(level)
+                pyramid_dataset.createDimension(dimname=bin_dimension, size=len(bin_start_indices))
+
+                for variable_name, dimensions, array in [('line_start_bin_{}'.format(level), ['line'], line_start_bins),
+                                                         ('line_bin_count_{}'.format(level), ['line'], line_bin_counts),
+                                                         ('start_point_{}'.format(level), [bin_dimension], point_order[bin_start_indices]),
+                                                         ('point_count_{}'.format(level), [bin_dimension], bin_point_counts),
+                                                         ('xycoords_{}'.format(level), [bin_dimension, 'xy'],
+                                                          np.add.reduceat(sorted_xycoords, bin_start_indices, axis=0) / bin_point_counts[:,np.newaxis]),
+                                                         ]:
+                    pyramid_dataset.createVariable(variable_name,
+                                                   array.dtype,
+                                                   dimensions=dimensions,
+                                                   **self.CACHE_VARIABLE_PARAMETERS
+                                                   )[:] = array
+                pyramid_dataset.variables['point_count_{}'.format(level)].bin_size = bin_size
+
+            # Sorted source values are only held in memory for one variable at a time
+            for variable_name in variables:
+                source_variable = self.netcdf_dataset.variables[variable_name]
+                values = self.fetch_array(source_variable).astype('float64')
+                if hasattr(source_variable, '_FillValue'):
+                    values[values == source_variable._FillValue] = np.nan
+                values = values[point_order]
+
+                for level, bin_start_indices in enumerate(level_bin_start_indices):
+                    # fmin/fmax ignore NaN values unless the entire bin is NaN
+                    for statistic, ufunc in [('min', np.fmin), ('max', np.fmax)]:
+                        pyramid_dataset.createVariable('{}_{}_{}'.format(variable_name, statistic, level),
+                                                       'float64',
+                                                       dimensions=['bin_{}'.format(level)],
+                                                       **self.CACHE_VARIABLE_PARAMETERS
+                                                       )[:] = ufunc.reduceat(values, bin_start_indices)
+
+                logger.debug('Saved {}-level pyramid for variable {}'.format(len(bin_sizes), variable_name))
+
+            # Only record variables as built once all of them have been written
+            pyramid_dataset.variables_built = ' '.join(variables)
+            pyramid_complete = True
+        finally:
+            pyramid_dataset.close()
+            if not pyramid_complete:
+                os.remove(temp_pyramid_path)
+
+        os.replace(temp_pyramid_path, self.pyramid_path)
+
+        return bin_sizes
+
+
+    def get_line_envelopes(self, line_numbers=None, variables=None, max_bins=None):
+        '''
+        Generator to return min/max envelopes of specified variables for specified lines from the line pyramid
+        Only the pyramid level required for each line is read, and the pyramid is built if it does not exist
+        @param line_numbers: list of integer line number or single integer line number, or None for all lines
+        @param variables: list of 1D point variable name strings or single variable name string. None returns all variables in pyramid
+        @param max_bins: Maximum number of bins (e.g. display pixels) required for each line. None returns the finest level
+
+        @return line_number: line number for single line
+        @return: dict containing bin coordinates, start_point, point_count and <variable>_min & <variable>_max arrays
+        '''
+        if type(variables) == str:
+            variables = [variables]
+
+        pyramid_dataset = None
+        if os.path.isfile(self.pyramid_path):
+            pyramid_dataset = netCDF4.Dataset(self.pyramid_path, 'r')
+
+            # Rebuild pyramid if it is for a different source or version of the source, incomplete or does not contain all variables
+            variables_built = getattr(pyramid_dataset, 'variables_built', None)
+            if (getattr(pyramid_dataset, 'source', None) != self.nc_path or
+                getattr(pyramid_dataset, 'source_signature', None) != (get_source_signature(self.nc_path, self.netcdf_dataset) or '') or
+                variables_built is None or
+                (variables and set(variables) - set(variables_built.split()))):
+                variables = sorted(set(variables or []) | set((variables_built or '').split())) or None
+                pyramid_dataset.close()
+                pyramid_dataset = None
+
+        if pyramid_dataset is None:
+            self.build_line_pyramid(variables)
+            pyramid_dataset = netCDF4.Dataset(self.pyramid_path, 'r')
+
+        try:
+            variables = variables or pyramid_dataset.variables_built.split()
+            level_count = len(np.atleast_1d(pyramid_dataset.bin_sizes))
+
+            # Small per-line lookup arrays for all levels
+            line_bin_counts = np.stack([pyramid_dataset.variables['line_bin_count_{}'.format(level)][:]
+                                        for level in range(level_count)])
+            line_start_bins = np.stack([pyramid_dataset.variables['line_start_bin_{}'.format(level)][:]
+                                        for level in range(level_count)])
+
+            if line_numbers is None:
+                line_indices = np.arange(len(self.line))
+            else:
+                line_indices = np.flatnonzero(np.isin(self.line, line_numbers))
+
+            for line_index in line_indices:
+                # Choose finest level with no more than max_bins bins, otherwise use coarsest level
+                if max_bins:
+                    levels = np.flatnonzero(line_bin_counts[:,line_index] <= max_bins)
+                    level = levels[0] if len(levels) else level_count - 1
+                else:
+                    level = 0
+
+                bin_slice = slice(line_start_bins[level, line_index],
+                                  line_start_bins[level, line_index] + line_bin_counts[level, line_index])
+                if bin_slice.start == bin_slice.stop: # No points in line
+                    continue
+
+                envelope_dict = {'coordinates': pyramid_dataset.variables['xycoords_{}'.format(level)][bin_slice],
+                                 'start_point': pyramid_dataset.variables['start_point_{}'.format(level)][bin_slice],
+                                 'point_count': pyramid_dataset.variables['point_count_{}'.format(level)][bin_slice],
+                                 }
+                for variable_name in variables:
+                    for statistic in ['min', 'max']:
+                        envelope_dict[variable_name + '_' + statistic] = pyramid_dataset.variables['{}_{}_{}'.format(variable_name,
+                                                                                                                     statistic,
+                                                                                                                     level)][bin_slice]
+
+                yield self.line[line_index], envelope_dict
+        finally:
+            pyramid_dataset.close()
+
+
     def get_line_values(self):
         '''
         Function to retrieve array of line number values from self.netcdf_dataset
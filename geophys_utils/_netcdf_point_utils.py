@@ -30,11 +30,16 @@ import re
 import tempfile
 from collections import OrderedDict
 from pprint import pformat
-from scipy.interpolate import griddata
+from scipy.interpolate import griddata, CloughTocher2DInterpolator
+from scipy.spatial import Delaunay
 from geophys_utils._crs_utils import transform_coords, get_utm_wkt
 from geophys_utils._transect_utils import utm_coords, coords2distance
 from geophys_utils._netcdf_utils import NetCDFUtils
 from geophys_utils._polygon_utils import points2convex_hull
+from geophys_utils._layer_utils import get_layer_top_depths, sample_layers_at_depths
+from geophys_utils._netcdf_grid_writer import create_netcdf_grid
+from geophys_utils._drape_utils import drape_grids
+from geophys_utils._io_stats import io_timer
 from scipy.spatial.ckdtree import cKDTree
 import logging
 
@@ -54,6 +59,46 @@ DEFAULT_READ_CHUNK_SIZE = 8192
 
 # Set this to a number other than zero for testing
 POINT_LIMIT = 0
+
+# Default number of cells in each dimension of tiles for layered gridding
+DEFAULT_GRID_TILE_SIZE = 256
+
+
+def get_interpolation_function(point_coordinates, query_coordinates, resampling_method='linear'):
+    '''
+    Function to build a horizontal interpolation structure once and return a function which applies it to any values
+    @parameter point_coordinates: array of shape (n, 2) containing point coordinates
+    @parameter query_coordinates: array of shape (m, 2) containing coordinates at which to interpolate
+    @parameter resampling_method: 'linear' (default), 'nearest' or 'cubic'
+
+    @return interpolate: function taking array of shape (n, ...) of point values and returning array of shape (m, ...)
+    '''
+    if resampling_method == 'nearest':
+        _distances, nearest_indices = cKDTree(point_coordinates).query(query_coordinates)
+        return lambda values: values[nearest_indices]
+
+    triangulation = Delaunay(point_coordinates)
+
+    if resampling_method == 'cubic':
+        return lambda values: CloughTocher2DInterpolator(triangulation, values)(query_coordinates)
+
+    assert resampling_method == 'linear', 'Invalid resampling_method {}'.format(resampling_method)
+
+    # Pre-compute barycentric weights so every set of values costs only a weighted sum
+    simplex_indices = triangulation.find_simplex(query_coordinates)
+    outside_mask = (simplex_indices < 0)
+    transforms = triangulation.transform[simplex_indices]
+    partial_weights = np.einsum('ijk,ik->ij', transforms[:,:2], query_coordinates - transforms[:,2])
+    weights = np.column_stack((partial_weights, 1.0 - partial_weights.sum(axis=1)))
+    vertex_indices = triangulation.simplices[simplex_indices]
+
+    def interpolate(values):
+        result = np.einsum('ij,ij...->i...', weights, values[vertex_indices])
+        result[outside_mask] = np.nan
+        return result
+
+    return interpolate
+
     
 class NetCDFPointUtils(NetCDFUtils):
     '''
@@ -150,14 +195,24 @@ class NetCDFPointUtils(NetCDFUtils):
     #             pass
     #===========================================================================
         
-    def fetch_array(self, source_variable, dest_array=None):
+    def fetch_array(self, source_variable, dest_array=None, point_mask=None):
         '''
-        Helper function to retrieve entire 1D array in pieces < self.max_bytes in size
+        Helper function to retrieve entire array in pieces < self.max_bytes in size
+        Arrays of more than one dimension (e.g. (point, layer)) are divided along the first dimension
         @param source_variable: netCDF variable from which to retrieve data
+        @param point_mask: optional Boolean mask for the first dimension. Only pieces within the range spanned by the
+            masked elements are read, and only the masked elements are returned
         '''
-        source_len = source_variable.shape[0]
-        pieces_required = int(math.ceil((source_variable[0].itemsize * source_len) / self.max_bytes))
-        max_elements = source_len // pieces_required
+        if point_mask is None:
+            start_index, end_index = 0, source_variable.shape[0]
+        else:
+            mask_indices = np.flatnonzero(point_mask)
+            start_index, end_index = (int(mask_indices[0]), int(mask_indices[-1]) + 1) if len(mask_indices) else (0, 0)
+
+        source_len = end_index - start_index
+        element_bytes = source_variable.dtype.itemsize * int(np.prod(source_variable.shape[1:]))
+        pieces_required = max(int(math.ceil((element_bytes * source_len) / self.max_bytes)), 1)
+        max_elements = max(source_len // pieces_required, 1)
         
         # Reduce max_elements to fit within chunk boundaries if possible
         if pieces_required > 1 and hasattr(source_variable, '_ChunkSizes'):
@@ -174,16 +229,27 @@ class NetCDFPointUtils(NetCDFUtils):
         logger.debug('Fetching {} pieces containing up to {} {} array elements.'.format(pieces_required, max_elements, source_variable.name))
         
         if dest_array is None:
-            dest_array = np.zeros((source_len,), dtype=source_variable.dtype)
-
-        # Copy array in pieces
-        start_index = 0
-        while start_index < source_len:
-            end_index = min(start_index + max_elements, source_len)
-            logger.debug('Retrieving {} array elements {}:{}'.format(source_variable.name, start_index, end_index))
-            array_slice = slice(start_index, end_index)
-            dest_array[array_slice] = source_variable[array_slice]
-            start_index += max_elements
+            dest_shape = source_variable.shape if point_mask is None else (len(mask_indices),) + source_variable.shape[1:]
+            dest_array = np.zeros(dest_shape, dtype=source_variable.dtype)
+
+        # Copy array in pieces aligned with multiples of max_elements
+        piece_start = start_index
+        dest_index = 0
+        while piece_start < end_index:
+            piece_end = min((piece_start // max_elements + 1) * max_elements, end_index)
+            logger.debug('Retrieving {} array elements {}:{}'.format(source_variable.name, piece_start, piece_end))
+            array_slice = slice(piece_start, piece_end)
+            with io_timer(self.io_stats, 'read', source_variable.name, array_slice, element_bytes * (piece_end - piece_start)):
+                piece_array = source_variable[array_slice]
+
+            if point_mask is None:
+                dest_array[array_slice] = piece_array
+            else:
+                piece_mask = point_mask[array_slice]
+                piece_count = np.count_nonzero(piece_mask)
+                dest_array[dest_index:dest_index + piece_count] = piece_array[piece_mask]
+                dest_index += piece_count
+            piece_start = piece_end
             
         return dest_array
         
@@ -213,6 +279,21 @@ class NetCDFPointUtils(NetCDFUtils):
             
         
     
+    def drape_grids(self, nc_paths, variable_names=None, resampling_method='nearest', point_mask=None, workers=None):
+        '''
+        Function to sample many grids at the locations of all (or selected) points
+        @param nc_paths: list of paths or OPeNDAP URLs of gridded netCDF datasets
+        @param variable_names: list of variable names to sample from every grid. Defaults to the data variable of each grid
+        @param resampling_method: 'nearest' or 'bilinear'
+        @param point_mask: optional Boolean mask of dimension 'point' selecting points to sample
+        @param workers: number of worker processes. None for serial processing
+
+        @return drape_columns: OrderedDict of float64 arrays aligned with (selected) points, keyed by column name
+        '''
+        coordinates = self.xycoords if point_mask is None else self.xycoords[point_mask]
+        return drape_grids(coordinates, nc_paths, wkt=self.wkt, variable_names=variable_names,
+                           resampling_method=resampling_method, workers=workers)
+
     def get_reprojected_bounds(self, bounds, from_wkt, to_wkt):
         '''
         Function to take a bounding box specified in one CRS and return its smallest containing bounding box in a new CRS
@@ -232,38 +313,23 @@ class NetCDFPointUtils(NetCDFUtils):
         return [min(reprojected_bounding_box[:,0]), min(reprojected_bounding_box[:,1]), max(reprojected_bounding_box[:,0]), max(reprojected_bounding_box[:,1])]
             
             
-    def grid_points(self, grid_resolution, 
-                    variables=None, 
-                    native_grid_bounds=None, 
-                    reprojected_grid_bounds=None, 
-                    resampling_method='linear', 
-                    grid_wkt=None, 
-                    point_step=1):
+    def get_grid_point_subset(self, grid_resolution,
+                              native_grid_bounds=None,
+                              reprojected_grid_bounds=None,
+                              grid_wkt=None,
+                              point_step=1):
         '''
-        Function to grid points in a specified bounding rectangle to a regular grid of the specified resolution and crs
+        Function to determine pixel centre bounds for a regular grid and the subset of points required to interpolate it
         @parameter grid_resolution: cell size of regular grid in grid CRS units
-        @parameter variables: Single variable name string or list of multiple variable name strings. Defaults to all point variables
-        @parameter native_grid_bounds: Spatial bounding box of area to grid in native coordinates 
+        @parameter native_grid_bounds: Spatial bounding box of area to grid in native coordinates
         @parameter reprojected_grid_bounds: Spatial bounding box of area to grid in grid coordinates
-        @parameter resampling_method: Resampling method for gridding. 'linear' (default), 'nearest' or 'cubic'. 
-        See https://docs.scipy.org/doc/scipy/reference/generated/scipy.interpolate.griddata.html 
         @parameter grid_wkt: WKT for grid coordinate reference system. Defaults to native CRS
         @parameter point_step: Sampling spacing for points. 1 (default) means every point, 2 means every second point, etc.
-        
-        @return grids: dict of grid arrays keyed by variable name if parameter 'variables' value was a list, or
-        a single grid array if 'variable' parameter value was a string
-        @return wkt: WKT for grid coordinate reference system.
-        @return geotransform: GDAL GeoTransform for grid
-        '''
-        assert not (native_grid_bounds and reprojected_grid_bounds), 'Either native_grid_bounds or reprojected_grid_bounds can be provided, but not both'
-        # Grid all data variables if not specified
-        variables = variables or self.point_variables
 
-        # Allow single variable to be given as a string
-        single_var = (type(variables) == str)
-        if single_var:
-            variables = [variables]
-        
+        @return pixel_centre_bounds: (xmin, ymin, xmax, ymax) tuple of outermost pixel centres in grid CRS
+        @return point_subset_mask: Boolean mask of dimension 'point' for points required for interpolation
+        @return coordinates: array of shape (n, 2) containing grid CRS coordinates of points in point_subset_mask
+        '''
         if native_grid_bounds:
             reprojected_grid_bounds = self.get_reprojected_bounds(native_grid_bounds, self.wkt, grid_wkt)
         elif reprojected_grid_bounds:
@@ -290,11 +356,6 @@ class NetCDFPointUtils(NetCDFUtils):
 
         spatial_subset_mask = self.get_spatial_mask(self.get_reprojected_bounds(expanded_grid_bounds, grid_wkt, self.wkt))
         
-        # Create grids of Y and X values. Note YX ordering and inverted Y
-        # Note GRID_RESOLUTION/2.0 fudge to avoid truncation due to rounding error
-        grid_y, grid_x = np.mgrid[pixel_centre_bounds[3]:pixel_centre_bounds[1]-grid_resolution/2.0:-grid_resolution, 
-                                 pixel_centre_bounds[0]:pixel_centre_bounds[2]+grid_resolution/2.0:grid_resolution]
-
         # Skip points to reduce memory requirements
         #TODO: Implement function which grids spatial subsets.
         point_subset_mask = np.zeros(shape=(self.netcdf_dataset.dimensions['point'].size,), dtype=bool)
@@ -307,6 +368,53 @@ class NetCDFPointUtils(NetCDFUtils):
             # N.B: Be careful about XY vs YX coordinate order         
             coordinates = np.array(transform_coords(coordinates[:], self.wkt, grid_wkt))
 
+
+        return pixel_centre_bounds, point_subset_mask, coordinates
+
+
+    def grid_points(self, grid_resolution, 
+                    variables=None, 
+                    native_grid_bounds=None, 
+                    reprojected_grid_bounds=None, 
+                    resampling_method='linear', 
+                    grid_wkt=None, 
+                    point_step=1):
+        '''
+        Function to grid points in a specified bounding rectangle to a regular grid of the specified resolution and crs
+        @parameter grid_resolution: cell size of regular grid in grid CRS units
+        @parameter variables: Single variable name string or list of multiple variable name strings. Defaults to all point variables
+        @parameter native_grid_bounds: Spatial bounding box of area to grid in native coordinates 
+        @parameter reprojected_grid_bounds: Spatial bounding box of area to grid in grid coordinates
+        @parameter resampling_method: Resampling method for gridding. 'linear' (default), 'nearest' or 'cubic'. 
+        See https://docs.scipy.org/doc/scipy/reference/generated/scipy.interpolate.griddata.html 
+        @parameter grid_wkt: WKT for grid coordinate reference system. Defaults to native CRS
+        @parameter point_step: Sampling spacing for points. 1 (default) means every point, 2 means every second point, etc.
+        
+        @return grids: dict of grid arrays keyed by variable name if parameter 'variables' value was a list, or
+        a single grid array if 'variable' parameter value was a string
+        @return wkt: WKT for grid coordinate reference system.
+        @return geotransform: GDAL GeoTransform for grid
+        '''
+        assert not (native_grid_bounds and reprojected_grid_bounds), 'Either native_grid_bounds or reprojected_grid_bounds can be provided, but not both'
+        # Grid all data variables if not specified
+        variables = variables or self.point_variables
+
+        # Allow single variable to be given as a string
+        single_var = (type(variables) == str)
+        if single_var:
+            variables = [variables]
+        
+        pixel_centre_bounds, point_subset_mask, coordinates = self.get_grid_point_subset(grid_resolution,
+                                                                                         native_grid_bounds=native_grid_bounds,
+                                                                                         reprojected_grid_bounds=reprojected_grid_bounds,
+                                                                                         grid_wkt=grid_wkt,
+                                                                                         point_step=point_step)
+
+        # Create grids of Y and X values. Note YX ordering and inverted Y
+        # Note GRID_RESOLUTION/2.0 fudge to avoid truncation due to rounding error
+        grid_y, grid_x = np.mgrid[pixel_centre_bounds[3]:pixel_centre_bounds[1]-grid_resolution/2.0:-grid_resolution, 
+                                 pixel_centre_bounds[0]:pixel_centre_bounds[2]+grid_resolution/2.0:grid_resolution]
+
         # Interpolate required values to the grid - Note YX ordering for image
         grids = {}
         for variable in [self.netcdf_dataset.variables[var_name] for var_name in variables]:
@@ -330,6 +438,161 @@ class NetCDFPointUtils(NetCDFUtils):
         return grids, (grid_wkt or self.wkt), geotransform
     
     
+    def grid_layered_points(self, grid_resolution,
+                            output_path,
+                            vertical_range,
+                            vertical_resolution,
+                            variables='conductivity',
+                            use_elevation=False,
+                            elevation_variable='elevation',
+                            thickness_variable='thickness',
+                            native_grid_bounds=None,
+                            reprojected_grid_bounds=None,
+                            resampling_method='linear',
+                            grid_wkt=None,
+                            point_step=1,
+                            tile_size=None):
+        '''
+        Function to grid layered (point, layer) variables such as AEM conductivity into a 3D netCDF file of depth or elevation slices
+        The grid is processed in tiles to bound memory use, and the horizontal interpolation structure for each tile
+        is built once and re-used for every slice and variable.
+        @parameter grid_resolution: cell size of regular grid in grid CRS units
+        @parameter output_path: path of 3D netCDF file to create
+        @parameter vertical_range: (top, bottom) tuple of depths below surface (or elevations if use_elevation is True) in metres
+        @parameter vertical_resolution: distance in metres between slices
+        @parameter variables: Single variable name string or list of multiple (point, layer) variable name strings
+        @parameter use_elevation: Boolean flag indicating whether slices are at constant elevation rather than constant depth
+        @parameter elevation_variable: name of (point) variable containing surface elevation. Only used if use_elevation is True
+        @parameter thickness_variable: name of (point, layer) or (layer) variable containing layer thicknesses
+        @parameter native_grid_bounds: Spatial bounding box of area to grid in native coordinates
+        @parameter reprojected_grid_bounds: Spatial bounding box of area to grid in grid coordinates
+        @parameter resampling_method: Resampling method for gridding. 'linear' (default), 'nearest' or 'cubic'.
+        @parameter grid_wkt: WKT for grid coordinate reference system. Defaults to native CRS
+        @parameter point_step: Sampling spacing for points. 1 (default) means every point, 2 means every second point, etc.
+        @parameter tile_size: number of cells in each horizontal dimension of a tile. Defaults to DEFAULT_GRID_TILE_SIZE
+
+        @return wkt: WKT for grid coordinate reference system.
+        @return geotransform: GDAL GeoTransform for grid
+        '''
+        tile_size = tile_size or DEFAULT_GRID_TILE_SIZE
+
+        if type(variables) == str:
+            variables = [variables]
+
+        if use_elevation: # Slices from highest to lowest elevation
+            slice_values = np.arange(max(vertical_range), min(vertical_range) - vertical_resolution / 2.0, -vertical_resolution)
+            slice_dimension = ('elevation', slice_values, {'long_name': 'elevation', 'units': 'm', 'positive': 'up'})
+        else: # Slices from shallowest to deepest
+            slice_values = np.arange(min(vertical_range), max(vertical_range) + vertical_resolution / 2.0, vertical_resolution)
+            slice_dimension = ('depth', slice_values, {'long_name': 'depth below surface', 'units': 'm', 'positive': 'down'})
+
+        pixel_centre_bounds, point_subset_mask, coordinates = self.get_grid_point_subset(grid_resolution,
+                                                                                         native_grid_bounds=native_grid_bounds,
+                                                                                         reprojected_grid_bounds=reprojected_grid_bounds,
+                                                                                         grid_wkt=grid_wkt,
+                                                                                         point_step=point_step)
+
+        # Read layered values for point subset in pieces spanning only the subset, replacing fill values with NaN
+        def get_subset_values(variable_name):
+            variable = self.netcdf_dataset.variables[variable_name]
+            if variable.dimensions[0] == 'point':
+                values = self.fetch_array(variable, point_mask=point_subset_mask)
+            else:
+                values = self.fetch_array(variable)
+            values = values.astype('float64')
+            if hasattr(variable, '_FillValue'):
+                values[values == variable._FillValue] = np.nan
+            return values
+
+        layer_top_depths, bottom_depths = get_layer_top_depths(get_subset_values(thickness_variable))
+        if layer_top_depths.ndim == 1: # Same layering for all points
+            layer_top_depths = np.broadcast_to(layer_top_depths, (len(coordinates), layer_top_depths.shape[0]))
+            bottom_depths = np.broadcast_to(bottom_depths, (len(coordinates),))
+
+        if use_elevation:
+            surface_elevations = get_subset_values(elevation_variable)
+
+        value_arrays = {variable_name: get_subset_values(variable_name) for variable_name in variables}
+
+        # Pixel centre ordinates. Note inverted Y and GRID_RESOLUTION/2.0 fudge to avoid truncation due to rounding error
+        grid_y_values = np.arange(pixel_centre_bounds[3], pixel_centre_bounds[1]-grid_resolution/2.0, -grid_resolution)
+        grid_x_values = np.arange(pixel_centre_bounds[0], pixel_centre_bounds[2]+grid_resolution/2.0, grid_resolution)
+
+        geotransform = [pixel_centre_bounds[0]-grid_resolution/2.0,
+                        grid_resolution,
+                        0,
+                        pixel_centre_bounds[3]+grid_resolution/2.0,
+                        0,
+                        -grid_resolution
+                        ]
+
+        nc_dataset = create_netcdf_grid(output_path,
+                                        wkt=(grid_wkt or self.wkt),
+                                        geotransform=geotransform,
+                                        shape=(len(grid_y_values), len(grid_x_values)),
+                                        variable_names=variables,
+                                        leading_dimension=slice_dimension,
+                                        variable_attributes={variable_name: {key: value
+                                                                             for key, value in self.netcdf_dataset.variables[variable_name].__dict__.items()
+                                                                             if key in ['long_name', 'units']
+                                                                             }
+                                                             for variable_name in variables
+                                                             },
+                                        chunksizes=[1, tile_size, tile_size]
+                                        )
+
+        # Include points an arbitrary quarter-tile beyond each tile for nice interpolation at tile edges
+        tile_margin = tile_size * grid_resolution / 4.0
+        try:
+            for tile_row in range(0, len(grid_y_values), tile_size):
+                for tile_column in range(0, len(grid_x_values), tile_size):
+                    tile_y_values = grid_y_values[tile_row:tile_row+tile_size]
+                    tile_x_values = grid_x_values[tile_column:tile_column+tile_size]
+
+                    tile_point_mask = np.logical_and(np.logical_and(coordinates[:,0] >= tile_x_values[0] - tile_margin,
+                                                                    coordinates[:,0] <= tile_x_values[-1] + tile_margin),
+                                                     np.logical_and(coordinates[:,1] >= tile_y_values[-1] - tile_margin,
+                                                                    coordinates[:,1] <= tile_y_values[0] + tile_margin))
+                    if np.count_nonzero(tile_point_mask) < 3:
+                        logger.debug('Insufficient points to grid tile at ({}, {})'.format(tile_row, tile_column))
+                        continue
+
+                    tile_grid_x, tile_grid_y = np.meshgrid(tile_x_values, tile_y_values)
+                    try:
+                        interpolate = get_interpolation_function(coordinates[tile_point_mask],
+                                                                 np.column_stack((tile_grid_x.ravel(), tile_grid_y.ravel())),
+                                                                 resampling_method=resampling_method)
+                    except Exception as e: # Degenerate point geometry (e.g. single line) in tile
+                        logger.debug('Unable to triangulate points for tile at ({}, {}): {}'.format(tile_row, tile_column, e))
+                        continue
+
+                    if use_elevation: # Depth of each slice below each point's surface
+                        slice_depths = surface_elevations[tile_point_mask][np.newaxis,:] - slice_values[:,np.newaxis]
+                    else:
+                        slice_depths = slice_values
+
+                    for variable_name in variables:
+                        point_slice_values = sample_layers_at_depths(value_arrays[variable_name][tile_point_mask],
+                                                                     layer_top_depths[tile_point_mask],
+                                                                     slice_depths,
+                                                                     bottom_depths[tile_point_mask])
+
+                        # Interpolate all slices at once, then re-order to (slice, y, x)
+                        tile_array = interpolate(point_slice_values.transpose()).transpose().reshape((len(slice_values),
+                                                                                                      len(tile_y_values),
+                                                                                                      len(tile_x_values)))
+
+                        nc_dataset.variables[variable_name][:,
+                                                            tile_row:tile_row+len(tile_y_values),
+                                                            tile_column:tile_column+len(tile_x_values)
+                                                            ] = np.ma.masked_invalid(tile_array)
+                    logger.debug('Gridded tile at ({}, {}) from {} points'.format(tile_row, tile_column, np.count_nonzero(tile_point_mask)))
+        finally:
+            nc_dataset.close()
+
+        return (grid_wkt or self.wkt), geotransform
+
+
     def utm_grid_points(self, utm_grid_resolution, variables=None, native_grid_bounds=None, resampling_method='linear', point_step=1):
         '''
         Function to grid points in a specified native bounding rectangle to a regular grid of the specified resolution in its local UTM CRS
@@ -24,22 +24,90 @@ Created on 2Mar.,2017
 '''
 
 import netCDF4
+import os
 import math
 import itertools
 import argparse
 import re
 from distutils.util import strtobool
 import logging
+import time
+import numpy as np
 
 from geophys_utils._crs_utils import transform_coords
+from geophys_utils._parallel_utils import ordered_map
+from geophys_utils._chunk_utils import get_chunk_shape, get_explanation_lines, ACCESS_PATTERNS
+from geophys_utils._copy_checkpoint import CopyCheckpoint, get_piece_crc
+from geophys_utils._io_stats import io_timer, IOStats
+from geophys_utils._direct_chunk_utils import write_compressed_variables, h5py
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO) # Initial logging level for this module
 
+_copy_piece_datasets = {} # Open input datasets keyed by path for read_copy_piece() in each worker process
+
+
+def get_copy_piece_sizes(shape, output_chunking, input_chunking, itemsize, piece_bytes):
+    '''
+    Function to return piece sizes for a chunked copy of an array of any dimensionality
+    Pieces are whole multiples of the output chunk sizes (so that no output chunk is written more than once), and are
+    rounded up to cover whole input chunks where possible. Pieces are then grown in the slowest-varying dimensions 
+    first until piece_bytes would be exceeded.
+    @param shape: shape of array to copy
+    @param output_chunking: list of output chunk sizes, or None for contiguous output
+    @param input_chunking: list of input chunk sizes, or None for contiguous input
+    @param itemsize: number of bytes per array element
+    @param piece_bytes: maximum number of bytes per piece (a single base piece may exceed this)
+    
+    @return piece_sizes: list of piece sizes for each dimension
+    '''
+    piece_sizes = []
+    for dimension_index in range(len(shape)):
+        output_chunk_size = output_chunking[dimension_index] if output_chunking else 1
+        input_chunk_size = input_chunking[dimension_index] if input_chunking else 1
+        piece_sizes.append(min(output_chunk_size * int(math.ceil(float(input_chunk_size) / output_chunk_size)),
+                               shape[dimension_index]))
+    
+    # Grow pieces from the fastest-varying dimension backwards, keeping multiples of base piece size
+    for dimension_index in range(len(shape) - 1, -1, -1):
+        other_bytes = itemsize * int(np.prod([piece_sizes[other_index] 
+                                              for other_index in range(len(shape)) 
+                                              if other_index != dimension_index]))
+        multiplier = min(int(math.ceil(float(shape[dimension_index]) / piece_sizes[dimension_index])),
+                         max(int(piece_bytes // (other_bytes * piece_sizes[dimension_index])), 1))
+        piece_sizes[dimension_index] = min(piece_sizes[dimension_index] * multiplier, shape[dimension_index])
+        if piece_sizes[dimension_index] < shape[dimension_index]:
+            break # No point growing slower-varying dimensions if this one isn't complete
+        
+    return piece_sizes
+            
+
+def read_copy_piece(arguments):
+    '''
+    Function to read a piece of a variable for a chunked copy. Module-level so that it can be run in a process pool.
+    Input datasets are kept open between calls in each worker process.
+    @param arguments: (nc_path, variable_name, read_slices) tuple
+    
+    @return piece_array: array read from variable
+    @return read_seconds: time taken to read (and decompress) piece in seconds
+    '''
+    nc_path, variable_name, read_slices = arguments
+    netcdf_dataset = _copy_piece_datasets.get(nc_path)
+    if netcdf_dataset is None:
+        netcdf_dataset = netCDF4.Dataset(nc_path, 'r')
+        _copy_piece_datasets[nc_path] = netcdf_dataset
+    
+    start_time = time.perf_counter()
+    piece_array = netcdf_dataset.variables[variable_name][read_slices]
+    return piece_array, time.perf_counter() - start_time
+
+
 class NetCDFUtils(object):
     '''
     NetCDFUtils class implementing useful functionality against netCDF files
     '''
+    DEFAULT_COPY_PIECE_BYTES = 64000000 # 64MB default piece size for chunked copy
+    
     DEFAULT_COPY_OPTIONS = {'complevel': 4, 
                             'zlib': True, 
                             'fletcher32': True,
@@ -57,11 +125,13 @@ class NetCDFUtils(object):
         
         logger.debug('Running NetCDFUtils constructor')
         
+        self._caller_dataset = None # Dataset provided by caller, which should not be re-opened behind the caller's back
         if type(netcdf_dataset) == str: # String provided as path to netCDF file
             self.nc_path = netcdf_dataset
             self._netcdf_dataset = None
         elif type(netcdf_dataset) == netCDF4.Dataset: # NetCDF4.Dataset object provided
             self._netcdf_dataset = netcdf_dataset 
+            self._caller_dataset = netcdf_dataset
             self.nc_path = netcdf_dataset.filepath()
         else:
             raise BaseException('Invalid netcdf_dataset type')
@@ -75,9 +145,15 @@ class NetCDFUtils(object):
         # Initialise private property variables to None until set by property getter methods
         self._data_variable_list = None       
         self._crs_variable = None
+        self._x_variable = None
+        self._y_variable = None
+        self._y_inverted = None
         self._wkt = None
         self._wgs84_bbox = None
         
+        # IOStats object to record bytes and elapsed time of reads & writes, or None for no instrumentation
+        self.io_stats = None
+        
 #===============================================================================
 #         #TODO: Make sure this is general for all CRSs
 #         self.x_variable = (self.netcdf_dataset.variables.get('lon') 
@@ -115,6 +191,77 @@ class NetCDFUtils(object):
 #                 self.wkt = get_spatial_ref_from_wkt('EPSG:4326').ExportToWkt()
 #===============================================================================
 
+    def get_copy_GeoTransform(self, dim_range_dict={}, flip_y=False):
+        '''
+        Function to return the GeoTransform of a copy with the specified dimension ranges and optionally flipped Y 
+            dimension. The GeoTransform is derived from the first two values of the X & Y dimension variables in the 
+            copy, so it will always be consistent with the copied coordinates.
+            
+            @param dim_range_dict: dict of (start, end+1) tuples keyed by dimension name
+            @param flip_y: Boolean flag indicating whether Y dimension is to be flipped
+            
+            @return GeoTransform: GDAL GeoTransform list for copy, or None if it cannot be determined
+        '''
+        if (self.x_variable is None or self.y_variable is None or 
+            len(self.x_variable.dimensions) != 1 or len(self.y_variable.dimensions) != 1):
+            return None
+        
+        origins, sizes = [], []
+        for dimension_variable in [self.x_variable, self.y_variable]:
+            dim_range = dim_range_dict.get(dimension_variable.dimensions[0]) or (0, dimension_variable.shape[0])
+            if dim_range[1] - dim_range[0] < 2:
+                return None
+            
+            if flip_y and dimension_variable is self.y_variable:
+                dimension_values = np.asarray(dimension_variable[dim_range[1] - 2:dim_range[1]], dtype='float64')[::-1]
+            else:
+                dimension_values = np.asarray(dimension_variable[dim_range[0]:dim_range[0] + 2], dtype='float64')
+            
+            sizes.append(dimension_values[1] - dimension_values[0])
+            origins.append(dimension_values[0] - sizes[-1] / 2.0) # Coordinates are for pixel centres
+        
+        return [origins[0], sizes[0], 0.0, origins[1], 0.0, sizes[1]]
+        
+    def explain_chunking(self, access_pattern=None, variable_names=None):
+        '''
+        Function to report the expected number of chunks touched (and bytes read) by typical queries for each access 
+            pattern against the current chunking of each array variable and, if access_pattern is specified, against the 
+            chunking which would be planned for that access pattern by copy()
+            
+            @param access_pattern: Access pattern for planned chunking ('spatial', 'time_series' or 'point_scan'). 
+                None to report current chunking only
+            @param variable_names: List of variable names to report. Defaults to data variables
+            
+            @return explanation_lines: List of report lines
+        '''
+        variable_names = variable_names or self.get_data_variable_names()
+        
+        explanation_lines = []
+        for variable_name in variable_names:
+            variable = self.netcdf_dataset.variables[variable_name]
+            if not variable.shape:
+                continue
+            chunking = variable.chunking()
+            explanation_lines += get_explanation_lines(variable_name, 
+                                                       variable.shape, 
+                                                       variable.dtype, 
+                                                       chunking if chunking != 'contiguous' else None,
+                                                       get_chunk_shape(variable.shape, variable.dtype, access_pattern) if access_pattern else None
+                                                       )
+            
+        return explanation_lines
+        
+    def get_data_variable_names(self):
+        '''
+        Function to return the names of data variables, i.e. those in self.data_variable_list if it is defined, otherwise
+            all array variables which are not coordinate (dimension) variables
+        '''
+        if self.data_variable_list is not None:
+            return [data_variable.name for data_variable in self.data_variable_list]
+        
+        return [variable_name for variable_name, variable in self.netcdf_dataset.variables.items()
+                if variable.shape and variable_name not in self.netcdf_dataset.dimensions]
+        
     def copy(self, nc_out_path, 
                  datatype_map_dict={},
                  variable_options_dict={},
@@ -122,7 +269,13 @@ class NetCDFUtils(object):
                  nc_format=None,
                  limit_dim_size=False,
                  empty_var_list=[],
-                 invert_y=None):
+                 invert_y=None,
+                 piece_bytes=None,
+                 workers=None,
+                 access_pattern=None,
+                 resume=False,
+                 checkpoint_path=None,
+                 parallel_compression=False):
         '''
         Function to copy a netCDF dataset to another one with potential changes to size, format, 
             variable creation options and datatypes.
@@ -140,20 +293,77 @@ class NetCDFUtils(object):
             @param limit_dim_size: Boolean flag indicating whether unlimited dimensions should be fixed
             @param empty_var_list: List of strings denoting variable names for variables which should be created but not copied
             @param invert_y: Boolean parameter indicating whether copied Y axis should be Southwards positive (None means same as source)
+            @param piece_bytes: Maximum number of bytes per piece for chunked copy. Defaults to NetCDFUtils.DEFAULT_COPY_PIECE_BYTES
+            @param workers: Number of worker processes used to read pieces. None for serial copy in the calling process
+            @param access_pattern: Expected access pattern ('spatial', 'time_series' or 'point_scan') used to plan chunk sizes
+                for any data variables (see get_data_variable_names()) without chunksizes in variable_options_dict. Other
+                variables such as coordinate variables keep the same chunking as source. None means same chunking as source
+            @param resume: Boolean flag indicating whether an interrupted copy to nc_out_path should be resumed from its
+                checkpoint. The copy starts afresh if there is no checkpoint or the copy settings have changed
+            @param checkpoint_path: Path of JSON checkpoint file recording copy progress. Defaults to nc_out_path with 
+                CopyCheckpoint.FILE_SUFFIX appended. The checkpoint file is removed once the copy is complete
+            @param parallel_compression: Boolean flag indicating whether chunks of zlib-compressed variables should be 
+                compressed in the worker processes and written with HDF5 direct chunk writes. Requires h5py, workers > 1 
+                and a NETCDF4 or NETCDF4_CLASSIC output format
         '''  
+        piece_bytes = min(piece_bytes or NetCDFUtils.DEFAULT_COPY_PIECE_BYTES, self.max_bytes)
         logger.debug('variable_options_dict: {}'.format(variable_options_dict))   
           
         # Override default variable options with supplied ones for all data variables
-        for data_variable in self.data_variable_list:
+        for data_variable_name in self.get_data_variable_names():
             variable_dict = dict(NetCDFUtils.DEFAULT_COPY_OPTIONS)
-            variable_dict.update(variable_options_dict.get(data_variable.name) or {})
-            variable_options_dict[data_variable.name] = variable_dict
+            variable_dict.update(variable_options_dict.get(data_variable_name) or {})
+            variable_options_dict[data_variable_name] = variable_dict
                                 
         nc_format = nc_format or self.netcdf_dataset.file_format 
         logger.info('Output format is %s' % nc_format)
         
-        nc_output_dataset = netCDF4.Dataset(nc_out_path, mode="w", clobber=True, format=nc_format)
+        # Only data variables have their chunk sizes planned for access_pattern
+        planned_variable_names = self.get_data_variable_names() if access_pattern else []
+        
+        # Determine whether Y dimension needs to be flipped, and the GeoTransform for the output
+        flip_y = bool(invert_y is not None and self.y_variable is not None and bool(invert_y) != self.y_inverted)
+        y_dimension_name = self.y_variable.dimensions[0] if flip_y else None
+        if flip_y:
+            logger.info('Flipping Y dimension %s so that Y axis is %s positive' % (y_dimension_name,
+                                                                                   'Southwards' if invert_y else 'Northwards'))
+        output_GeoTransform = (self.get_copy_GeoTransform(dim_range_dict, flip_y) 
+                               if (flip_y or dim_range_dict) else None)
+        
+        # Compressed chunks can only be written directly to HDF5-based formats
+        use_direct_chunks = bool(parallel_compression and workers and workers > 1 and nc_format.startswith('NETCDF4'))
+        if use_direct_chunks and h5py is None:
+            logger.warning('h5py is not available. Compression will not be parallelised')
+            use_direct_chunks = False
+        direct_chunk_variable_pieces = [] # List of (variable_name, read_slices_list, write_slices_list, flip_axis) tuples
+        
+        # Pieces written are recorded in a checkpoint file so that an interrupted copy can be resumed
+        checkpoint = CopyCheckpoint(checkpoint_path or (nc_out_path + CopyCheckpoint.FILE_SUFFIX),
+                                    {'input_path': self.nc_path,
+                                     'datatype_map_dict': datatype_map_dict,
+                                     'variable_options_dict': variable_options_dict,
+                                     'dim_range_dict': dim_range_dict,
+                                     'nc_format': nc_format,
+                                     'limit_dim_size': limit_dim_size,
+                                     'empty_var_list': empty_var_list,
+                                     'invert_y': invert_y,
+                                     'piece_bytes': piece_bytes,
+                                     'access_pattern': access_pattern,
+                                     })
+        resuming = bool(resume and os.path.isfile(nc_out_path) and checkpoint.load())
         
+        if resuming:
+            logger.info('Resuming copy to %s' % nc_out_path)
+            nc_output_dataset = netCDF4.Dataset(nc_out_path, mode="r+")
+        else:
+            nc_output_dataset = netCDF4.Dataset(nc_out_path, mode="w", clobber=True, format=nc_format)
+            checkpoint.save()
+        
+        def sync_output():
+            with io_timer(self.io_stats, 'sync'):
+                nc_output_dataset.sync()
+        
+        copy_complete = False
         try:
             dims_used = set()
             dim_size = {}
@@ -175,7 +385,9 @@ class NetCDFUtils(object):
             
             #Copy dimensions
             for dimension_name, dimension in self.netcdf_dataset.dimensions.items():
-                if dimension_name in dims_used: # Discard unused dimensions
+                if resuming: # Dimensions already exist
+                    assert len(nc_output_dataset.dimensions[dimension_name]) == dim_size[dimension_name], 'Dimension %s size mismatch' % dimension_name
+                elif dimension_name in dims_used: # Discard unused dimensions
                     logger.info('Copying dimension %s of length %d' % (dimension_name, dim_size[dimension_name]))
                     nc_output_dataset.createDimension(dimension_name, 
                                           dim_size[dimension_name] 
@@ -184,16 +396,24 @@ class NetCDFUtils(object):
                 else:
                     logger.info('Skipping unused dimension %s' % dimension_name)
     
+            # Datasets without a grid mapping (e.g. plain NetCDFUtils) have no crs variable to special-case
+            try:
+                crs_variable = self.crs_variable
+            except AssertionError:
+                crs_variable = None
+                
             # Copy variables
             for variable_name, input_variable in self.netcdf_dataset.variables.items():
                 dtype = datatype_map_dict.get(str(input_variable.datatype)) or input_variable.datatype
                 
                 # Special case for "crs" or "transverse_mercator" - want byte datatype
-                if input_variable == self.crs_variable: 
+                if crs_variable is not None and input_variable == crs_variable: 
                     dtype = 'i1'
                     
                 # Start off by copying options from input variable (if specified)
-                var_options = input_variable.filters() or {}
+                # N.B: Newer netCDF4 versions also report filters (e.g. szip, zstd) which are not createVariable keywords
+                var_options = {key: value for key, value in (input_variable.filters() or {}).items()
+                               if key in ['zlib', 'complevel', 'shuffle', 'fletcher32']}
                 
                 # Chunking is defined outside the filters() result
                 chunking = input_variable.chunking()
@@ -218,6 +438,13 @@ class NetCDFUtils(object):
                 if hasattr(input_variable, '_FillValue'):
                     var_options['fill_value'] = input_variable._FillValue
                     
+                # Plan chunk sizes of data variables for access pattern unless explicitly specified
+                if (access_pattern and variable_name in planned_variable_names and nc_format.startswith('NETCDF4') and
+                    not (variable_options_dict.get(variable_name) or {}).get('chunksizes')):
+                    var_options['chunksizes'] = get_chunk_shape([dim_size[dimension_name] for dimension_name in input_variable.dimensions],
+                                                                dtype,
+                                                                access_pattern)
+                    
                 # Apply any supplied options over top of defaults
                 var_options.update(variable_options_dict.get(variable_name) or {})
                 
@@ -234,24 +461,23 @@ class NetCDFUtils(object):
                                                                                        options_string
                                                                                        )
                             )
-                # Create output variable using var_options to specify output options
-                output_variable = nc_output_dataset.createVariable(variable_name, 
-                                              dtype, 
-                                              input_variable.dimensions,
-                                              **var_options
-                                              )
-                
-                # Copy variable attributes
-                logger.info('\tCopying %s attributes: %s' % (variable_name, ', '.join(input_variable.ncattrs())))
-                output_variable.setncatts({k: input_variable.getncattr(k) for k in input_variable.ncattrs() if not k.startswith('_')})
-                
-                #===============================================================
-                # if (flip_y and (input_variable == self.crs_variable)):                    
-                #     output_GeoTransform = list(self.GeoTransform)
-                #     output_GeoTransform[5] = - output_GeoTransform[5]
-                #     output_variable.GeoTransform = ' '.join([str(value) for value in output_GeoTransform])
-                #     logger.info('%s.GeoTransform rewritten as "%s"' % (variable_name, output_variable.GeoTransform))
-                #===============================================================
+                if resuming: # Output variable and its attributes already exist
+                    output_variable = nc_output_dataset.variables[variable_name]
+                else:
+                    # Create output variable using var_options to specify output options
+                    output_variable = nc_output_dataset.createVariable(variable_name, 
+                                                  dtype, 
+                                                  input_variable.dimensions,
+                                                  **var_options
+                                                  )
+                    
+                    # Copy variable attributes
+                    logger.info('\tCopying %s attributes: %s' % (variable_name, ', '.join(input_variable.ncattrs())))
+                    output_variable.setncatts({k: input_variable.getncattr(k) for k in input_variable.ncattrs() if not k.startswith('_')})
+                    
+                    if (output_GeoTransform and crs_variable is not None and (input_variable == crs_variable) and hasattr(input_variable, 'GeoTransform')):                    
+                        output_variable.GeoTransform = ' '.join([str(value) for value in output_GeoTransform])
+                        logger.info('%s.GeoTransform rewritten as "%s"' % (variable_name, output_variable.GeoTransform))
     
                 if variable_name not in empty_var_list:
                     # Copy data
@@ -269,90 +495,100 @@ class NetCDFUtils(object):
                                                                              )
                                     )
                         
-                        if (not input_variable_chunking or 
-                            len(input_variable.dimensions) != 2): 
-                            # No chunking - Try to copy in one hit
-                            
-                            #===================================================
-                            # if ((input_variable == self.y_variable) and flip_y): 
-                            #     # Y-axis flip required
-                            #     assert len(overall_slices) == 1, 'y-axis variable should be one-dimensional'
-                            #     overall_slices = [slice(overall_slices[0].stop-1, overall_slices[0].start-1 if overall_slices[0].start else None, -1)]
-                            #     logger.info('\tInverting y-axis variable %s' % variable_name)
-                            #     
-                            #===================================================
-                            output_variable[...] = input_variable[overall_slices]
+                        output_shape = [overall_slice.stop - overall_slice.start for overall_slice in overall_slices]
                         
-                        else: # Chunked - perform copy in pieces
-                            #TODO: Improve this for small chunks
-                            assert len(input_variable.dimensions) == 2, 'Can only chunk copy 2D data at the moment'
-                            
-                            # Use largest chunk sizes between input and output
-                            piece_sizes = [max(var_options['chunksizes'][dimension_index],
-                                              input_variable_chunking[dimension_index])
-                                          for dimension_index in range(len(input_variable.dimensions))
-                                         ]
-        
-                            piece_index_ranges = [(overall_slices[dimension_index].start // piece_sizes[dimension_index],
-                                                  int(math.ceil(float(overall_slices[dimension_index].stop) / piece_sizes[dimension_index]))
-                                                 )
-                                                 for dimension_index in range(len(input_variable.dimensions))
-                                                ]
-                                                 
-                            piece_counts = [int(math.ceil(float(dim_size[input_variable.dimensions[dimension_index]]) / 
-                                                          piece_sizes[dimension_index]))
-                                            for dimension_index in range(len(input_variable.dimensions)) 
-                                            ]
+                        # Index of Y dimension if variable is to be flipped
+                        flip_axis = (input_variable.dimensions.index(y_dimension_name) 
+                                     if y_dimension_name in input_variable.dimensions else None)
+                        
+                        output_chunking = output_variable.chunking()
+                        if output_chunking == 'contiguous':
+                            output_chunking = None
+                        
+                        if (not (input_variable_chunking or output_chunking) and
+                            input_variable.dtype.itemsize * np.prod(output_shape) <= piece_bytes): 
+                            # Small unchunked variable - copy in one piece
+                            piece_sizes = list(output_shape)
+                        else: # Copy in pieces aligned with output chunks
+                            piece_sizes = get_copy_piece_sizes(output_shape, 
+                                                               output_chunking,
+                                                               input_variable_chunking, 
+                                                               input_variable.dtype.itemsize, 
+                                                               piece_bytes)
+                        
+                        piece_write_slices_list = [tuple(slice(piece_start, min(piece_start + piece_size, dimension_size))
+                                                         for piece_start, piece_size, dimension_size in zip(piece_starts, piece_sizes, output_shape))
+                                                   for piece_starts in itertools.product(*[range(0, dimension_size, max(piece_size, 1))
+                                                                                           for dimension_size, piece_size in zip(output_shape, piece_sizes)])
+                                                   ]
                         
-                            logger.info('\tCopying %s pieces of size %s cells' % (' x '.join([str(piece_count) for piece_count in piece_counts]),
-                                                                          ' x '.join([str(piece_size) for piece_size in piece_sizes])
-                                                                          )
-                                        )
+                        # Skip pieces already written by an interrupted copy
+                        completed_piece_count = checkpoint.resume_variable(variable_name, 
+                                                                           len(piece_write_slices_list),
+                                                                           (lambda piece_index: output_variable[piece_write_slices_list[piece_index]]) 
+                                                                           if resuming else None,
+                                                                           output_variable.dtype)
+                        
+                        logger.info('\tCopying %d pieces of size %s cells' % (len(piece_write_slices_list) - completed_piece_count,
+                                                                             ' x '.join([str(piece_size) for piece_size in piece_sizes])
+                                                                             )
+                                    )
+                        
+                        def piece_read_arguments_generator():
+                            for piece_write_slices in piece_write_slices_list[completed_piece_count:]:
+                                # Pieces of flipped variables are read from the mirrored position along the Y dimension
+                                yield (self.nc_path,
+                                       variable_name,
+                                       tuple(slice(piece_write_slice.start + overall_slice.start, piece_write_slice.stop + overall_slice.start)
+                                             if dimension_index != flip_axis
+                                             else slice(overall_slice.stop - piece_write_slice.stop, overall_slice.stop - piece_write_slice.start)
+                                             for dimension_index, (piece_write_slice, overall_slice) in enumerate(zip(piece_write_slices, overall_slices)))
+                                       )
+                        
+                        output_filters = output_variable.filters() or {}
+                        if (use_direct_chunks and output_chunking and output_filters.get('zlib') and
+                            not any([output_filters.get(key) for key in ['szip', 'zstd', 'bzip2', 'blosc']]) and
+                            output_variable.dtype.kind in 'biuf' and
+                            not ({'scale_factor', 'add_offset'} & set(output_variable.ncattrs()))):
+                            # Defer copy until the netCDF library has closed the output and chunks can be written directly
+                            direct_chunk_variable_pieces.append((variable_name,
+                                                                 [read_arguments[2] for read_arguments in piece_read_arguments_generator()],
+                                                                 piece_write_slices_list[completed_piece_count:],
+                                                                 flip_axis))
+                            continue
+                        
+                        def read_local_piece(arguments):
+                            start_time = time.perf_counter()
+                            piece_array = input_variable[arguments[2]]
+                            return piece_array, time.perf_counter() - start_time
+                        
+                        # Read & decompress pieces in worker processes if required (netCDF is not thread-safe), 
+                        # and write them in order in this process
+                        parallel_read = bool(workers and workers > 1)
+                        piece_iterator = ordered_map(read_copy_piece if parallel_read else read_local_piece, 
+                                                     piece_read_arguments_generator(), 
+                                                     workers=workers, use_processes=True)
+                        
+                        for piece_write_slices in piece_write_slices_list[completed_piece_count:]:
+                            # Time spent waiting for worker processes to deliver the next piece
+                            with io_timer(self.io_stats if parallel_read else None, 'wait', variable_name):
+                                piece_array, read_seconds = next(piece_iterator)
+                            if self.io_stats is not None:
+                                self.io_stats.record('read', variable_name, piece_array.nbytes, read_seconds, piece_write_slices)
                             
-                            try:
-                                ydim_index = input_variable.dimensions.index(self.y_variable.name)
-                            except:
-                                ydim_index = None
+                            logger.debug('\t\tWriting piece %s' % (piece_write_slices,))
+                            if flip_axis is not None:
+                                piece_array = np.flip(piece_array, flip_axis)
+                            with io_timer(self.io_stats, 'write', variable_name, piece_write_slices, piece_array.nbytes):
+                                output_variable[piece_write_slices] = piece_array
                             
-                            # Iterate over every piece
-                            for piece_indices in itertools.product(*[range(piece_index_ranges[dimension_index][0], 
-                                                                          piece_index_ranges[dimension_index][1])
-                                                               for dimension_index in range(len(input_variable.dimensions))
-                                                              ]
-                                                            ):
-                                
-                                                   
-                                logger.info('\t\tCopying piece %s' % (piece_indices,))
-                                
-                                piece_read_slices = [slice(max(overall_slices[dimension_index].start,
-                                                         piece_indices[dimension_index] * piece_sizes[dimension_index]
-                                                        ),                                                 
-                                                     min(overall_slices[dimension_index].stop,
-                                                         (piece_indices[dimension_index] + 1) * piece_sizes[dimension_index]
-                                                        )
-                                                    )
-                                               for dimension_index in range(len(input_variable.dimensions))
-                                               ]
-                                
-                                piece_write_slices = [slice(piece_read_slices[dimension_index].start - overall_slices[dimension_index].start,
-                                                      piece_read_slices[dimension_index].stop - overall_slices[dimension_index].start,
-                                                     )
-                                                for dimension_index in range(len(input_variable.dimensions))
-                                               ]
-                                
-                                #===============================================
-                                # if flip_y and ydim_index is not None:
-                                #     # Flip required
-                                #     piece_write_slices[ydim_index] = slice(output_variable.shape[ydim_index] - piece_write_slices[ydim_index].start -1, 
-                                #                                           output_variable.shape[ydim_index] - piece_write_slices[ydim_index].stop - 1 
-                                #                                             if (output_variable.shape[ydim_index] - piece_write_slices[ydim_index].stop) 
-                                #                                             else None, -1)
-                                #===============================================
-                                
-                                #logger.debug(piece_read_slices, piece_write_slices)
-                                
-                                output_variable[piece_write_slices] = input_variable[piece_read_slices]
+                            with io_timer(self.io_stats, 'checksum', variable_name, nbytes=piece_array.nbytes):
+                                piece_crc = get_piece_crc(piece_array, output_variable.dtype)
+                            checkpoint.piece_written(variable_name, piece_crc, sync_output)
                         
+                        # Shut down worker processes now rather than when the generator is garbage collected, since
+                        # they hold inherited handles to the output file
+                        piece_iterator.close()
                     else: # scalar variable - simple copy
                         logger.info('\tCopying %s scalar data' % variable_name)
                         output_variable = input_variable
@@ -367,10 +603,33 @@ class NetCDFUtils(object):
                 else:
                     nc_output_dataset.__setattr__(item, value)
                     
+            if direct_chunk_variable_pieces:
+                # HDF5 file must be closed by the netCDF library before compressed chunks are written directly
+                with io_timer(self.io_stats, 'sync'):
+                    nc_output_dataset.close()
+                nc_output_dataset = None
+                write_compressed_variables(self.nc_path, nc_out_path, direct_chunk_variable_pieces, 
+                                           workers=workers, checkpoint=checkpoint, io_stats=self.io_stats)
+                    
+            # Final check that every piece of every variable was written
+            incomplete_variable_names = checkpoint.get_incomplete_variable_names()
+            if incomplete_variable_names:
+                raise BaseException('Copy incomplete for variable(s) %s' % ', '.join(incomplete_variable_names))
+            copy_complete = True
+                    
             logger.info('Finished copying netCDF dataset %s to %s.' % (self.nc_path, nc_out_path))
         
         finally:
-            nc_output_dataset.close()
+            if nc_output_dataset is not None:
+                if not copy_complete: # Record progress so far for a resumed copy
+                    try:
+                        checkpoint.save(sync_output)
+                    except Exception as e:
+                        logger.warning('Unable to save checkpoint %s: %s' % (checkpoint.checkpoint_path, e))
+                with io_timer(self.io_stats, 'sync'):
+                    nc_output_dataset.close()
+        
+        checkpoint.remove()
             
     
     def close(self):
@@ -425,6 +684,41 @@ class NetCDFUtils(object):
                 
         return self._crs_variable
 
+    @property
+    def x_variable(self):
+        '''
+        Property getter function to return X dimension variable (or None if not found) as required
+        '''
+        if self._x_variable is None:
+            #TODO: Make sure this is general for all CRSs
+            for x_variable_name in ['lon', 'x']:
+                self._x_variable = self.netcdf_dataset.variables.get(x_variable_name)
+                if self._x_variable is not None:
+                    break
+        return self._x_variable
+
+    @property
+    def y_variable(self):
+        '''
+        Property getter function to return Y dimension variable (or None if not found) as required
+        '''
+        if self._y_variable is None:
+            #TODO: Make sure this is general for all CRSs
+            for y_variable_name in ['lat', 'y']:
+                self._y_variable = self.netcdf_dataset.variables.get(y_variable_name)
+                if self._y_variable is not None:
+                    break
+        return self._y_variable
+
+    @property
+    def y_inverted(self):
+        '''
+        Property getter function to return Boolean flag indicating whether Y dimension values are descending
+        '''
+        if self._y_inverted is None:
+            self._y_inverted = bool(self.y_variable[-1] < self.y_variable[0])
+        return self._y_inverted
+
 
     @property
     def wkt(self):
@@ -497,12 +791,27 @@ def main():
                         type=str)
     parser.add_argument("--complevel", help="Compression level for chunked variables as an integer 0-9. Default is 4",
                         type=int, default=4)
+    parser.add_argument("--workers", help="Number of worker processes used to read pieces. Default is serial copy",
+                        type=int)
+    parser.add_argument('-p', '--parallel_compression', action='store_const', const=True, default=False,
+                        help='Compress chunks in the worker processes and write them directly with h5py. Requires --workers and h5py '
+                             '(pip install geophys_utils[parallel_compression])')
+    parser.add_argument("--access", help="Expected access pattern used to plan chunk sizes for variables not in --chunkspec (one of %s)" % ', '.join(ACCESS_PATTERNS),
+                        type=str, choices=ACCESS_PATTERNS)
+    parser.add_argument('-r', '--resume', action='store_const', const=True, default=False,
+                        help='Resume an interrupted copy from its checkpoint file. Default is to start afresh')
+    parser.add_argument('-s', '--stats', action='store_const', const=True, default=False,
+                        help='Report bytes, elapsed time and throughput per phase and per variable after copying')
+    parser.add_argument('-e', '--explain', action='store_const', const=True, default=False,
+                        help='Report expected chunks touched by typical queries for current (and planned) chunking instead of copying')
     parser.add_argument('-d', '--debug', action='store_const', const=True, default=False,
                         help='output debug information. Default is no debug info')
     parser.add_argument("input_path")
-    parser.add_argument("output_path")
+    parser.add_argument("output_path", nargs='?', help='Output netCDF path. Not required with --explain')
     
     args = parser.parse_args()
+    if not (args.explain or args.output_path):
+        parser.error('output_path is required unless --explain is given')
     
     if args.do_copy:
         if args.chunkspec:
@@ -515,6 +824,14 @@ def main():
                       debug=args.debug
                       )   
     
+    if args.stats:
+        ncu.io_stats = IOStats(record_pieces=False)
+        
+    if args.explain:
+        for explanation_line in ncu.explain_chunking(access_pattern=args.access):
+            print(explanation_line)
+        return
+    
     ncu.copy(args.output_path, 
              #datatype_map_dict={},
              # Compress all chunked variables
@@ -530,7 +847,15 @@ def main():
              #dim_range_dict={},
              nc_format=args.format,
              #limit_dim_size=False
+             access_pattern=args.access,
+             resume=args.resume,
+             workers=args.workers,
+             parallel_compression=args.parallel_compression
              )
+    
+    if args.stats:
+        for summary_line in ncu.io_stats.get_summary_lines():
+            print(summary_line)
         
 
 if __name__ == '__main__':
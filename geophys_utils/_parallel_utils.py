@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+
+#===============================================================================
+#    Copyright 2026 Geoscience Australia
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+#===============================================================================
+'''
+Functions to apply work to a sequence of items in parallel while keeping results in order
+
+N.B: The netCDF library is not thread-safe, so items should be read from netCDF files
+in the calling thread (i.e. by the iterable) and only computation done by the workers.
+
+Created on 18Oct.,2026
+
+@author: agent
+'''
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import logging
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO) # Initial logging level for this module
+
+
+def ordered_map(function, argument_iterable, workers=None, use_processes=False, max_pending=None):
+    '''
+    Generator to apply function to each item of argument_iterable in a pool of workers and yield results in input order
+    argument_iterable is always consumed in the calling thread, and no more than max_pending items are in flight at once
+    so that memory use stays bounded. Exceptions raised by function are re-raised in the calling thread.
+    @param function: function taking a single argument. Must be picklable (i.e. module-level) if use_processes is True
+    @param argument_iterable: iterable or generator yielding arguments for function
+    @param workers: number of worker threads or processes. None or 1 applies function serially in the calling thread
+    @param use_processes: Boolean flag indicating whether a process pool should be used instead of a thread pool
+    @param max_pending: maximum number of items submitted but not yet yielded. Defaults to twice the number of workers
+
+    @yield result: return value of function for each item in argument_iterable order
+    '''
+    if not workers or workers == 1:
+        for argument in argument_iterable:
+            yield function(argument)
+        return
+
+    max_pending = max_pending or 2 * workers
+    executor = (ProcessPoolExecutor if use_processes else ThreadPoolExecutor)(max_workers=workers)
+    pending = deque()
+    try:
+        for argument in argument_iterable:
+            pending.append(executor.submit(function, argument))
+            if len(pending) >= max_pending:
+                yield pending.popleft().result()
+
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        # Cancel outstanding work if the consumer stops early or an exception occurs
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
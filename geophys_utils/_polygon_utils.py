@@ -30,6 +30,8 @@ from shapely.ops import cascaded_union, polygonize
 from scipy.spatial import Delaunay
 from ._array_pieces import array_pieces
 
+SCANLINE_BATCH_CELLS = 1000000 # Maximum number of row-edge intersections computed at once when rasterising polygons
+
 
 def get_grid_edge_points(grid_array, dimension_ordinates, nodata_value, max_bytes=None):
     '''
@@ -98,6 +100,92 @@ def get_netcdf_edge_points(netcdf_dataset, max_bytes=None):
     return get_grid_edge_points(data_variable, dimension_ordinates, nodata_value, max_bytes)
 
 
+def get_polygon_rings(polygon):
+    '''
+    Function to return a list of closed vertex arrays for all rings of a polygon
+    @param polygon: shapely Polygon or MultiPolygon, or iterable of vertex coordinates for a single exterior ring
+
+    @return ring_list: list of closed (n, 2) float64 arrays of ring vertex coordinates (exterior and interior rings)
+    '''
+    if hasattr(polygon, 'geoms'): # Multi-part geometry
+        return [ring for polygon_part in polygon.geoms for ring in get_polygon_rings(polygon_part)]
+
+    if hasattr(polygon, 'exterior'): # Shapely polygon with optional holes
+        ring_list = [np.array(polygon.exterior.coords)[:,0:2]] + [np.array(interior.coords)[:,0:2]
+                                                                   for interior in polygon.interiors]
+    else:
+        ring_list = [np.array(polygon, dtype='float64')[:,0:2]]
+
+    # Close any open rings
+    return [ring if (ring[0] == ring[-1]).all() else np.concatenate((ring, ring[0:1]))
+            for ring in ring_list]
+
+
+def get_polygon_cell_indices(polygon_rings, dimension_arrays):
+    '''
+    Function to return array indices of grid cells with centres inside a polygon using even-odd ray casting
+    All polygon edges are intersected with each row of cell centres at once, and cells are inside the polygon if an odd
+    number of intersections lie beyond them in the row. Holes and multiple parts are therefore handled by the even-odd
+    rule, and only rows and columns within the polygon bounding box are tested.
+    @param polygon_rings: list of closed (n, 2) arrays of ring vertices in the same dimension order as the grid array
+    @param dimension_arrays: list of two 1D arrays of cell centre ordinates in array dimension order
+
+    @return index_array: (n, 2) int64 array of array indices of cells inside polygon, sorted by row
+    '''
+    polygon_rings = [np.asarray(ring, dtype='float64') for ring in polygon_rings]
+    edge_starts = np.concatenate([ring[:-1] for ring in polygon_rings])
+    edge_ends = np.concatenate([ring[1:] for ring in polygon_rings])
+
+    # Edges parallel to rows can never be crossed
+    crossable_edges = (edge_starts[:,0] != edge_ends[:,0])
+    edge_starts = edge_starts[crossable_edges]
+    edge_ends = edge_ends[crossable_edges]
+    if not len(edge_starts):
+        return np.zeros(shape=(0, 2), dtype='int64')
+
+    min_vertex = np.minimum(np.min(edge_starts, axis=0), np.min(edge_ends, axis=0))
+    max_vertex = np.maximum(np.max(edge_starts, axis=0), np.max(edge_ends, axis=0))
+
+    row_ordinates, column_ordinates = [np.asarray(dimension_array, dtype='float64') for dimension_array in dimension_arrays]
+    row_indices = np.flatnonzero((row_ordinates >= min_vertex[0]) & (row_ordinates <= max_vertex[0]))
+    column_indices = np.flatnonzero((column_ordinates >= min_vertex[1]) & (column_ordinates <= max_vertex[1]))
+    if not (len(row_indices) and len(column_indices)):
+        return np.zeros(shape=(0, 2), dtype='int64')
+
+    window_column_ordinates = column_ordinates[column_indices]
+    edge_slopes = (edge_ends[:,1] - edge_starts[:,1]) / (edge_ends[:,0] - edge_starts[:,0])
+
+    index_array_list = []
+    batch_rows = max(SCANLINE_BATCH_CELLS // len(edge_starts), 1)
+    for batch_start in range(0, len(row_indices), batch_rows):
+        batch_row_indices = row_indices[batch_start:batch_start + batch_rows]
+        batch_row_ordinates = row_ordinates[batch_row_indices].reshape((-1, 1))
+
+        # (rows, edges) arrays of edge crossings and sorted intersection ordinates, with non-crossings sorted to the end
+        crossings = ((edge_starts[:,0] > batch_row_ordinates) != (edge_ends[:,0] > batch_row_ordinates))
+        intersections = np.where(crossings,
+                                 edge_starts[:,1] + (batch_row_ordinates - edge_starts[:,0]) * edge_slopes,
+                                 np.inf)
+        intersections.sort(axis=1)
+        crossing_counts = np.sum(crossings, axis=1)
+
+        for row_index, row_intersections, crossing_count in zip(batch_row_indices, intersections, crossing_counts):
+            if not crossing_count:
+                continue
+
+            inside_columns = column_indices[(crossing_count - np.searchsorted(row_intersections[:crossing_count],
+                                                                              window_column_ordinates,
+                                                                              side='right')) % 2 == 1]
+            if len(inside_columns):
+                index_array_list.append(np.column_stack((np.full(shape=(len(inside_columns),), fill_value=row_index, dtype='int64'),
+                                                         inside_columns)))
+
+    if not index_array_list:
+        return np.zeros(shape=(0, 2), dtype='int64')
+
+    return np.concatenate(index_array_list).astype('int64')
+
+
 def points2convex_hull(point_list, dilation=0, tolerance=0):
     '''
     Function to return a list of vertex coordinates in the convex hull around data-containing areas of a point list
@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+
+#===============================================================================
+#    Copyright 2026 Geoscience Australia
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+#===============================================================================
+'''
+Functions to resample 2D arrays by integer factors
+
+Created on 18Oct.,2026
+
+@author: agent
+'''
+import warnings
+import numpy as np
+
+RESAMPLING_METHODS = ['mean', 'nearest', 'min', 'max']
+
+
+def downsample_array(array, factor, resampling_method='mean'):
+    '''
+    Function to reduce a 2D array by an integer factor in both dimensions
+    Partial blocks at the trailing edges are reduced from the cells available. NaN values are ignored except by 'nearest'.
+    @param array: 2D float array with NaN for no-data
+    @param factor: integer reduction factor
+    @param resampling_method: one of 'mean', 'nearest' (centre cell of each block), 'min' or 'max'
+
+    @return downsampled_array: float array of shape (ceil(rows / factor), ceil(columns / factor))
+    '''
+    assert resampling_method in RESAMPLING_METHODS, 'Invalid resampling_method {}. Must be one of {}'.format(resampling_method,
+                                                                                                          RESAMPLING_METHODS)
+    array = np.asarray(array)
+    output_shape = tuple(-(-dimension_size // factor) for dimension_size in array.shape)
+
+    if resampling_method == 'nearest':
+        # Centre cell of each block, or last available cell of partial blocks
+        return array[np.ix_(*[np.minimum(np.arange(output_shape[dim_index]) * factor + factor // 2,
+                                         array.shape[dim_index] - 1)
+                              for dim_index in range(2)])]
+
+    # Pad to whole number of blocks with NaN, then reduce over block axes
+    padded_array = np.full(shape=(output_shape[0] * factor, output_shape[1] * factor), fill_value=np.nan, dtype='float64')
+    padded_array[:array.shape[0], :array.shape[1]] = array
+    block_array = padded_array.reshape((output_shape[0], factor, output_shape[1], factor))
+
+    reduce_function = {'mean': np.nanmean, 'min': np.nanmin, 'max': np.nanmax}[resampling_method]
+    with warnings.catch_warnings(): # Suppress warnings for all-NaN blocks
+        warnings.simplefilter('ignore', category=RuntimeWarning)
+        return reduce_function(block_array, axis=(1, 3))
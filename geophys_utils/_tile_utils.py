@@ -0,0 +1,293 @@
+#!/usr/bin/env python
+
+#===============================================================================
+#    Copyright 2026 Geoscience Australia
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+#===============================================================================
+'''
+Functions and GridTileRenderer class to render XYZ (Web Mercator) map tiles from gridded netCDF datasets
+
+Tiles are rendered from the most appropriate overview level (see NetCDFGridUtils.build_overviews) with a windowed
+read, coloured with a built-in colour map and encoded as PNG without any imaging library dependency.
+
+Created on 18Oct.,2026
+
+@author: agent
+'''
+import re
+import struct
+import zlib
+import warnings
+import numpy as np
+import logging
+
+from geophys_utils._block_cache import BlockCache, get_source_signature
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO) # Initial logging level for this module
+
+TILE_SIZE = 256
+WEB_MERCATOR_WKT = 'EPSG:3857'
+WEB_MERCATOR_EXTENT = 20037508.342789244 # Half circumference of earth in Web Mercator metres
+
+# Colour maps defined as lists of equally spaced RGB control points
+COLOUR_MAPS = {'greyscale': [(0, 0, 0), (255, 255, 255)],
+               'viridis': [(68, 1, 84), (59, 82, 139), (33, 145, 140), (94, 201, 98), (253, 231, 37)],
+               'rainbow': [(0, 0, 255), (0, 255, 255), (0, 255, 0), (255, 255, 0), (255, 0, 0), (255, 0, 255)],
+               'terrain': [(51, 51, 153), (0, 153, 255), (0, 204, 102), (255, 255, 153), (128, 92, 84), (255, 255, 255)],
+               }
+
+TILE_FORMATS = {'png': 'image/png',
+                'raw': 'application/octet-stream', # Little-endian float32 values in row-major order
+                }
+
+
+def get_tile_bounds(z, x, y):
+    '''
+    Function to return Web Mercator bounds of an XYZ tile (origin at top left)
+    @param z: zoom level
+    @param x: tile column
+    @param y: tile row
+
+    @return bounds: [xmin, ymin, xmax, ymax] in Web Mercator metres
+    '''
+    tile_metres = 2.0 * WEB_MERCATOR_EXTENT / (2 ** z)
+    return [x * tile_metres - WEB_MERCATOR_EXTENT,
+            WEB_MERCATOR_EXTENT - (y + 1) * tile_metres,
+            (x + 1) * tile_metres - WEB_MERCATOR_EXTENT,
+            WEB_MERCATOR_EXTENT - y * tile_metres
+            ]
+
+
+def get_tile_pixel_coords(z, x, y, tile_size=TILE_SIZE):
+    '''
+    Function to return Web Mercator coordinates of the centres of all pixels in an XYZ tile
+    @param z: zoom level
+    @param x: tile column
+    @param y: tile row
+    @param tile_size: number of pixels in each dimension of tile
+
+    @return pixel_coords: array of shape (tile_size * tile_size, 2) in row-major order from top left
+    '''
+    xmin, ymin, xmax, ymax = get_tile_bounds(z, x, y)
+    pixel_metres = (xmax - xmin) / tile_size
+    pixel_x, pixel_y = np.meshgrid(xmin + (np.arange(tile_size) + 0.5) * pixel_metres,
+                                   ymax - (np.arange(tile_size) + 0.5) * pixel_metres)
+    return np.column_stack((pixel_x.ravel(), pixel_y.ravel()))
+
+
+def apply_colour_map(array, colour_map='viridis', value_range=None):
+    '''
+    Function to convert a 2D float array to an RGBA array using a colour map. NaN values are fully transparent.
+    @param array: 2D float array with NaN for no-data
+    @param colour_map: name of colour map in COLOUR_MAPS or list of RGB control points
+    @param value_range: (minimum, maximum) values mapped to ends of colour map. Defaults to data range
+
+    @return rgba_array: uint8 array of shape array.shape + (4,)
+    '''
+    control_points = np.array(COLOUR_MAPS[colour_map] if type(colour_map) == str else colour_map, dtype='float64')
+    array = np.asarray(array, dtype='float64')
+    valid_mask = np.isfinite(array)
+
+    if value_range is None:
+        value_range = ((np.min(array[valid_mask]), np.max(array[valid_mask])) if np.any(valid_mask) else (0.0, 1.0))
+    value_span = (value_range[1] - value_range[0]) or 1.0
+
+    scaled_array = np.clip((np.where(valid_mask, array, value_range[0]) - value_range[0]) / value_span, 0.0, 1.0)
+    control_positions = np.linspace(0.0, 1.0, len(control_points))
+
+    rgba_array = np.zeros(shape=array.shape + (4,), dtype='uint8')
+    for band_index in range(3):
+        rgba_array[..., band_index] = np.round(np.interp(scaled_array, control_positions, control_points[:,band_index]))
+    rgba_array[..., 3] = np.where(valid_mask, 255, 0)
+
+    return rgba_array
+
+
+def encode_png(rgba_array, compression_level=6):
+    '''
+    Function to encode an RGBA array as a PNG image using only the standard library
+    @param rgba_array: uint8 array of shape (height, width, 4)
+    @param compression_level: zlib compression level 0-9
+
+    @return png_bytes: bytes containing PNG file content
+    '''
+    rgba_array = np.ascontiguousarray(rgba_array, dtype='uint8')
+    height, width = rgba_array.shape[:2]
+
+    # Prefix each scanline with filter type 0 (none)
+    scanline_array = np.zeros(shape=(height, width * 4 + 1), dtype='uint8')
+    scanline_array[:,1:] = rgba_array.reshape((height, width * 4))
+
+    def png_chunk(chunk_type, chunk_data):
+        return (struct.pack('>I', len(chunk_data)) + chunk_type + chunk_data
+                + struct.pack('>I', zlib.crc32(chunk_type + chunk_data) & 0xffffffff))
+
+    return (b'\x89PNG\r\n\x1a\n'
+            + png_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0)) # 8-bit RGBA
+            + png_chunk(b'IDAT', zlib.compress(scanline_array.tobytes(), compression_level))
+            + png_chunk(b'IEND', b''))
+
+
+class GridTileRenderer(object):
+    '''
+    GridTileRenderer class to render XYZ tiles from a NetCDFGridUtils object with an LRU (plus optional on-disk) tile cache
+    '''
+    def __init__(self, netcdf_grid_utils,
+                 variable_name=None,
+                 colour_map='viridis',
+                 value_range=None,
+                 tile_size=TILE_SIZE,
+                 tile_cache_bytes=None,
+                 disk_cache_dir=None):
+        '''
+        GridTileRenderer Constructor
+        @parameter netcdf_grid_utils: NetCDFGridUtils object for grid
+        @parameter variable_name: name of variable to render. Defaults to the data variable
+        @parameter colour_map: name of colour map in COLOUR_MAPS or list of RGB control points
+        @parameter value_range: (minimum, maximum) values mapped to ends of colour map. Defaults to 2nd & 98th percentiles
+        @parameter tile_size: number of pixels in each dimension of tile
+        @parameter tile_cache_bytes: Maximum number of bytes of rendered tiles held in memory. Defaults to BlockCache.DEFAULT_MAX_BYTES
+        @parameter disk_cache_dir: Directory for on-disk tile cache, or None for memory only
+        '''
+        self.netcdf_grid_utils = netcdf_grid_utils
+        self.variable_name = variable_name or netcdf_grid_utils.data_variable.name
+        self.colour_map = colour_map
+        self._value_range = value_range
+        self.tile_size = tile_size
+        self.tile_cache = BlockCache(max_bytes=tile_cache_bytes,
+                                     disk_cache_dir=disk_cache_dir,
+                                     source_signature=(get_source_signature(netcdf_grid_utils.nc_path, netcdf_grid_utils.netcdf_dataset)
+                                                       if disk_cache_dir else None))
+
+    @property
+    def value_range(self):
+        '''
+        Property getter function to return (minimum, maximum) values for colour map as required
+        Defaults to the 2nd and 98th percentiles of the coarsest overview (or a decimated read of the variable).
+        '''
+        if self._value_range is None:
+            overview_factor, variable = self.netcdf_grid_utils.get_best_overview(float('inf'), self.variable_name)
+            step = max(1, max(variable.shape) // 1024)
+            sample_array = np.ma.filled(variable[::step, ::step].astype('float64'), np.nan)
+            if hasattr(variable, '_FillValue'):
+                sample_array[sample_array == variable._FillValue] = np.nan
+            with warnings.catch_warnings(): # Suppress warning for all-NaN array
+                warnings.simplefilter('ignore', category=RuntimeWarning)
+                self._value_range = tuple(np.nanpercentile(sample_array, [2.0, 98.0]))
+            logger.debug('Set value_range to {} from overview factor {}'.format(self._value_range, overview_factor))
+        return self._value_range
+
+    def get_tile_array(self, z, x, y):
+        '''
+        Returns float array of shape (tile_size, tile_size) containing nearest-neighbour values for an XYZ tile, with NaN
+        for no-data. Values are read from the coarsest overview level no coarser than the tile pixel size, and only the
+        window of that level covering the tile is read.
+        @parameter z: zoom level
+        @parameter x: tile column
+        @parameter y: tile row
+        '''
+        grid_utils = self.netcdf_grid_utils
+        pixel_coords = get_tile_pixel_coords(z, x, y, self.tile_size)
+        native_coords = grid_utils.get_native_coordinate_array(pixel_coords, WEB_MERCATOR_WKT)
+        tile_array = np.full(shape=(self.tile_size * self.tile_size,), fill_value=np.nan, dtype='float64')
+
+        # Nominal tile pixel size in native units from extent of tile in native CRS
+        finite_coords = native_coords[np.all(np.isfinite(native_coords), axis=1)]
+        if not len(finite_coords):
+            return tile_array.reshape((self.tile_size, self.tile_size))
+        target_resolution = min(np.max(finite_coords[:,dim_index]) - np.min(finite_coords[:,dim_index])
+                                for dim_index in range(2)) / self.tile_size
+
+        overview_factor, variable = grid_utils.get_best_overview(target_resolution, self.variable_name)
+
+        if overview_factor == 1:
+            dimension_arrays = grid_utils.dimension_arrays
+        else:
+            dimension_arrays = [variable.group().variables[dimension_name][:] for dimension_name in variable.dimensions]
+
+        # Nearest index in each dimension from regular spacing of level
+        index_array = np.zeros(shape=native_coords.shape, dtype='int64')
+        valid_mask = np.all(np.isfinite(native_coords), axis=1)
+        for dim_index in range(2):
+            dimension_array = np.asarray(dimension_arrays[dim_index], dtype='float64')
+            dimension_step = ((dimension_array[-1] - dimension_array[0]) / (len(dimension_array) - 1)
+                              if len(dimension_array) > 1 else grid_utils.pixel_size[dim_index] * overview_factor)
+            fractional_indices = (np.where(valid_mask, native_coords[:,dim_index], dimension_array[0]) - dimension_array[0]) / dimension_step
+            index_array[:,dim_index] = np.round(fractional_indices)
+            valid_mask &= np.logical_and(fractional_indices >= -0.5, fractional_indices < len(dimension_array) - 0.5)
+
+        if not np.any(valid_mask):
+            return tile_array.reshape((self.tile_size, self.tile_size))
+
+        # Windowed read covering all valid indices
+        valid_indices = index_array[valid_mask]
+        window_start = np.clip(np.min(valid_indices, axis=0), 0, None)
+        window_stop = np.minimum(np.max(valid_indices, axis=0) + 1, variable.shape)
+        window_array = np.ma.filled(variable[window_start[0]:window_stop[0], window_start[1]:window_stop[1]].astype('float64'), np.nan)
+        if hasattr(variable, '_FillValue'):
+            window_array[window_array == variable._FillValue] = np.nan
+
+        local_indices = np.minimum(valid_indices - window_start, np.array(window_array.shape) - 1)
+        tile_array[valid_mask] = window_array[local_indices[:,0], local_indices[:,1]]
+        logger.debug('Read window {}-{} of {} for tile {}/{}/{}'.format(window_start, window_stop, variable.name, z, x, y))
+
+        return tile_array.reshape((self.tile_size, self.tile_size))
+
+    def render_tile(self, z, x, y, tile_format='png'):
+        '''
+        Returns bytes containing a rendered XYZ tile, using the tile cache if possible
+        @parameter z: zoom level
+        @parameter x: tile column
+        @parameter y: tile row
+        @parameter tile_format: 'png' for colour-mapped PNG image or 'raw' for little-endian float32 values
+        '''
+        assert tile_format in TILE_FORMATS, 'Invalid tile format {}'.format(tile_format)
+        colour_map_key = self.colour_map if type(self.colour_map) == str else str(hash(str(self.colour_map)))
+        cache_key = (self.variable_name, tile_format, int(z), int(x), int(y))
+        if tile_format == 'png':
+            cache_key += (colour_map_key,) + tuple(float(value) for value in self.value_range)
+
+        def read_function():
+            tile_array = self.get_tile_array(z, x, y)
+            if tile_format == 'png':
+                tile_bytes = encode_png(apply_colour_map(tile_array, self.colour_map, self.value_range))
+            else:
+                tile_bytes = tile_array.astype('<f4').tobytes()
+            return np.frombuffer(tile_bytes, dtype='uint8')
+
+        return self.tile_cache.get(cache_key, read_function).tobytes()
+
+    def handle_tile_request(self, request_path):
+        '''
+        Function to handle a tile request path of the form "<z>/<x>/<y>.<format>" without any web framework
+        @parameter request_path: path of tile request, optionally with leading "/"
+
+        @return status: HTTP status code
+        @return content_type: MIME type of response
+        @return content: response body bytes
+        '''
+        match = re.match('^/?(\d+)/(\d+)/(\d+)\.(\w+)$', request_path)
+        if not match or match.group(4) not in TILE_FORMATS:
+            return 404, 'text/plain', 'Invalid tile request {}'.format(request_path).encode('utf-8')
+
+        z, x, y = [int(group) for group in match.groups()[:3]]
+        if x >= 2 ** z or y >= 2 ** z:
+            return 404, 'text/plain', 'Tile {}/{}/{} out of range'.format(z, x, y).encode('utf-8')
+
+        try:
+            return 200, TILE_FORMATS[match.group(4)], self.render_tile(z, x, y, match.group(4))
+        except Exception as e:
+            logger.warning('Unable to render tile {}: {}'.format(request_path, e))
+            return 500, 'text/plain', str(e).encode('utf-8')
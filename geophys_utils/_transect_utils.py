@@ -98,61 +98,70 @@ def sample_transect(transect_vertices, wkt, sample_metres):
     @param wkt: coordinate reference system for transect_vertices
     @param sample_metres: distance between sample points in metres
     '''
-    transect_vertex_array = np.array(transect_vertices)
-    # print 'transect_vertex_array = %s' % transect_vertex_array
-    nominal_utm_wkt, utm_transect_vertices = utm_coords(transect_vertex_array, wkt)
-    # print 'nominal_utm_wkt = %s' % nominal_utm_wkt
-    # print 'utm_transect_vertices = %s' % utm_transect_vertices
-
-    sample_points = []
-    residual = 0
-    for vertex_index in range(len(utm_transect_vertices) - 1):
-        utm_line = (utm_transect_vertices[
-                    vertex_index], utm_transect_vertices[vertex_index + 1])
-        # print 'utm_line = %s' % (utm_line,)
-        utm_line_length = line_length(utm_line)
-        # print 'utm_line_length = %s' % utm_line_length
-
-        # Skip lines of infinite length
-        if utm_line_length == float('inf'):
-            continue
-
-        sample_count = (utm_line_length + residual) // sample_metres
-        # print 'sample_count = %s' % sample_count
-        if not sample_count:
-            residual += utm_line_length
-            continue
-
-        if residual:  # Use un-sampled distance from last line
-            start_point = point_along_line(
-                utm_line, sample_metres - residual)
-        else:
-            start_point = utm_line[0]  # Start at beginning
-        # print 'start_point = %s' % (start_point,)
-
-        # Calculate new residual
-        residual = (utm_line_length + residual) % sample_metres
-        # print 'residual = %s' % residual
-
-        end_point = point_along_line(utm_line, utm_line_length - residual)
-        # print 'end_point = %s' % (end_point,)
-
-        try:
-            sample_point_array = np.stack([np.linspace(start_point[dim_index], end_point[
-                                          dim_index], sample_count + 1) for dim_index in range(2)]).transpose()
-            # print 'sample_point_array.shape = %s' %
-            # (sample_point_array.shape,)
-        except Exception as e:
-            print('Line sampling failed: {}'.format(e.message))
-            residual = 0
-            continue
-
-        sample_points += list(sample_point_array)
-
-        # Don't double up end point with next start point
-        if (not residual) and (vertex_index <
-                               len(utm_transect_vertices) - 1):
-            sample_points.pop()
-
-    return transform_coords(
-        sample_points, nominal_utm_wkt, wkt), sample_metres
+    sample_point_array, _distance_array = sample_transects([transect_vertices], wkt, sample_metres)[0]
+
+    return sample_point_array, sample_metres
+
+
+def sample_transects(transect_vertices_list, wkt, sample_metres):
+    '''
+    Vectorised function to return sample points sample_metres apart along multiple transects
+    Transects are grouped by UTM zone so that each group of vertices and sample points is transformed in a single call,
+    and all sample points in a group are generated with one interpolation over a combined distance array.
+    @param transect_vertices_list: list of transects, each a list or array of transect vertex coordinates
+    @param wkt: coordinate reference system for transect vertices
+    @param sample_metres: distance between sample points in metres
+
+    @return transect_samples: list containing a (sample_point_array, distance_array) tuple for each transect, where
+        sample_point_array is an array of shape (n, 2) of sample coordinates in the transect CRS and distance_array is an
+        array of shape (n,) containing the distance in metres of each sample point along the transect
+    '''
+    transect_vertex_arrays = [np.array(transect_vertices, dtype='float64').reshape((-1, 2))
+                              for transect_vertices in transect_vertices_list]
+    transect_samples = [None] * len(transect_vertex_arrays)
+    if not transect_vertex_arrays:
+        return transect_samples
+
+    # Determine UTM zone & hemisphere for centre of each transect in one transformation
+    centre_coords = np.array([np.nanmean(transect_vertex_array, axis=0) for transect_vertex_array in transect_vertex_arrays])
+    latlon_centre_coords = np.array(transform_coords(centre_coords, wkt, 'EPSG:4326')).reshape((-1, 2))
+    utm_zone_keys = (np.floor((latlon_centre_coords[:,0] + 180.0) / 6.0).astype('int64') * 2
+                     + (latlon_centre_coords[:,1] >= 0.0))
+
+    for utm_zone_key in np.unique(utm_zone_keys):
+        transect_indices = np.flatnonzero(utm_zone_keys == utm_zone_key)
+        utm_wkt = get_utm_wkt(centre_coords[transect_indices[0]], wkt)
+
+        vertex_counts = [len(transect_vertex_arrays[transect_index]) for transect_index in transect_indices]
+        utm_vertex_array = np.array(transform_coords(np.concatenate([transect_vertex_arrays[transect_index]
+                                                                     for transect_index in transect_indices]),
+                                                     wkt, utm_wkt)).reshape((-1, 2))
+
+        # Cumulative distance along each transect, ignoring segments of infinite length
+        segment_lengths = np.hypot(*np.diff(utm_vertex_array, axis=0).transpose())
+        segment_lengths[~np.isfinite(segment_lengths)] = 0.0
+        transect_starts = np.cumsum([0] + vertex_counts[:-1])
+        segment_lengths[transect_starts[1:] - 1] = 0.0 # No segments between transects
+        transect_distances = np.concatenate(([0.0], np.cumsum(segment_lengths)))
+        transect_distances -= np.repeat(transect_distances[transect_starts], vertex_counts)
+
+        # Offset each transect into its own disjoint distance range so that one interpolation samples all transects
+        transect_lengths = transect_distances[transect_starts + np.array(vertex_counts) - 1]
+        transect_offsets = np.cumsum(np.concatenate(([0.0], transect_lengths[:-1] + sample_metres)))
+        combined_distances = transect_distances + np.repeat(transect_offsets, vertex_counts)
+
+        sample_counts = (transect_lengths // sample_metres).astype('int64') + 1
+        sample_distances = (np.arange(np.sum(sample_counts)) - np.repeat(np.cumsum(sample_counts) - sample_counts, sample_counts)
+                            ) * float(sample_metres)
+        combined_sample_distances = sample_distances + np.repeat(transect_offsets, sample_counts)
+
+        utm_sample_points = np.column_stack([np.interp(combined_sample_distances, combined_distances, utm_vertex_array[:,dim_index])
+                                             for dim_index in range(2)])
+        sample_points = np.array(transform_coords(utm_sample_points, utm_wkt, wkt)).reshape((-1, 2))
+
+        sample_ends = np.cumsum(sample_counts)
+        for transect_index, sample_start, sample_end in zip(transect_indices, sample_ends - sample_counts, sample_ends):
+            transect_samples[transect_index] = (sample_points[sample_start:sample_end],
+                                                sample_distances[sample_start:sample_end])
+
+    return transect_samples
@@ -23,10 +23,18 @@ Created on 15/11/2016
 
 @author: Alex Ip
 """
-from geophys_utils.test import test_array_pieces, test_crs_utils, test_data_stats, test_netcdf_grid_utils
+from geophys_utils.test import test_array_pieces, test_block_cache, test_chunk_utils, test_crs_utils, test_data_stats, test_direct_chunk_utils, test_drape_utils, test_io_stats, test_mosaic_utils, test_netcdf_grid_utils, test_netcdf_utils, test_tile_utils
 
 # Run all tests
 test_array_pieces.main()
+test_block_cache.main()
+test_chunk_utils.main()
 test_crs_utils.main()
 test_data_stats.main()
-test_netcdf_grid_utils.main()
\ No newline at end of file
+test_direct_chunk_utils.main()
+test_drape_utils.main()
+test_io_stats.main()
+test_mosaic_utils.main()
+test_netcdf_grid_utils.main()
+test_netcdf_utils.main()
+test_tile_utils.main()
\ No newline at end of file
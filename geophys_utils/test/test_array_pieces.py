@@ -23,9 +23,43 @@ Created on 15/11/2016
 @author: Alex Ip
 """
 import unittest
+import threading
 import numpy as np
 from functools import reduce
-from geophys_utils._array_pieces import array_pieces
+from scipy.ndimage import uniform_filter
+from geophys_utils._array_pieces import array_pieces, map_pieces, ArraySink, ReduceSink
+
+TEST_MAP_SHAPE = (178, 79)
+TEST_MAP_MAX_BYTES = 20000
+TEST_MAP_OVERLAP = 2
+
+def smooth_piece(piece_array, array_offset):
+    '''
+    Module-level piece function for testing map_pieces with a process pool
+    '''
+    return uniform_filter(piece_array, size=2 * TEST_MAP_OVERLAP + 1, mode='nearest')
+
+def sum_piece(piece_array, array_offset):
+    return float(np.sum(piece_array))
+
+class RecordingArray(object):
+    '''
+    Array-like object which records the pieces read and optionally raises an exception after a number of reads
+    '''
+    def __init__(self, ndarray, fail_after=None):
+        self.ndarray = ndarray
+        self.shape = ndarray.shape
+        self.dtype = ndarray.dtype
+        self.fail_after = fail_after
+        self.slices_read = []
+        self.lock = threading.Lock()
+
+    def __getitem__(self, array_slices):
+        with self.lock:
+            if self.fail_after is not None and len(self.slices_read) >= self.fail_after:
+                raise IOError('Simulated read failure')
+            self.slices_read.append(array_slices)
+        return self.ndarray[array_slices]
 
 class TestArrayPieces(unittest.TestCase):
     """Unit tests for geophys_utils._array_pieces module."""
@@ -59,7 +93,7 @@ class TestArrayPieces(unittest.TestCase):
             slices = [slice(array_offset[dim_index], 
                             array_offset[dim_index]+piece_array.shape[dim_index]
                             ) for dim_index in range(2)]
-            assert not np.any(piece_array - test_array[slices]), 'Array contents changed for array piece at %s' % array_offset
+            assert not np.any(piece_array - test_array[tuple(slices)]), 'Array contents changed for array piece at %s' % array_offset
         
         print('\tTesting sixteenth arrays with overlap')
         array_pieces_results = {array_offset: piece_array for piece_array, array_offset in array_pieces(test_array,
@@ -82,8 +116,63 @@ class TestArrayPieces(unittest.TestCase):
             slices = [slice(array_offset[dim_index], 
                             array_offset[dim_index]+piece_array.shape[dim_index]
                             ) for dim_index in range(2)]
-            assert not np.any(piece_array - test_array[slices]), 'Array contents changed for array piece at %s' % array_offset
+            assert not np.any(piece_array - test_array[tuple(slices)]), 'Array contents changed for array piece at %s' % array_offset
         
+    def test_array_pieces_prefetch(self):
+        print('Testing array_pieces function with prefetch')
+        test_array = np.reshape(np.arange(0, 10000, dtype='int16'), (100,100))
+        sixteenth_bytes = test_array.dtype.itemsize * reduce(lambda x, y: x * y / 16, test_array.shape)
+        
+        serial_results = list(array_pieces(test_array, max_bytes=sixteenth_bytes, overlap=10))
+        for prefetch, prefetch_threads in [(1, 1), (4, 3)]:
+            print('\tTesting prefetch={}, prefetch_threads={}'.format(prefetch, prefetch_threads))
+            prefetch_results = list(array_pieces(test_array, max_bytes=sixteenth_bytes, overlap=10, 
+                                                 prefetch=prefetch, prefetch_threads=prefetch_threads))
+            assert [array_offset for _piece_array, array_offset in prefetch_results] == \
+                [array_offset for _piece_array, array_offset in serial_results], 'Pieces returned out of order'
+            for (prefetch_array, _prefetch_offset), (serial_array, _serial_offset) in zip(prefetch_results, serial_results):
+                assert np.array_equal(prefetch_array, serial_array), 'Array contents changed'
+        
+        print('\tTesting error propagation')
+        piece_generator = array_pieces(RecordingArray(test_array, fail_after=1), max_bytes=sixteenth_bytes, prefetch=2)
+        piece_array, array_offset = next(piece_generator)
+        assert array_offset == (0, 0), 'First piece not returned before failure'
+        self.assertRaises(IOError, next, piece_generator)
+        
+        print('\tTesting early cancellation')
+        recording_array = RecordingArray(test_array)
+        piece_generator = array_pieces(recording_array, max_bytes=sixteenth_bytes, prefetch=2)
+        next(piece_generator)
+        piece_generator.close()
+        read_count = len(recording_array.slices_read)
+        assert read_count <= 3, 'More than prefetch pieces read ahead: {}'.format(read_count)
+        assert len(recording_array.slices_read) == read_count, 'Pieces read after generator closed'
+
+    def test_map_pieces(self):
+        print('Testing map_pieces function')
+        test_array = np.random.RandomState(0).random_sample(TEST_MAP_SHAPE)
+        expected_array = smooth_piece(test_array, (0, 0))
+        
+        for workers, use_processes in [(None, False), (3, False), (2, True)]:
+            print('\tTesting ArraySink with workers={}, use_processes={}'.format(workers, use_processes))
+            output_array = np.zeros(TEST_MAP_SHAPE)
+            map_pieces(test_array, smooth_piece, ArraySink(output_array), overlap=TEST_MAP_OVERLAP,
+                       max_bytes=TEST_MAP_MAX_BYTES, workers=workers, use_processes=use_processes)
+            assert np.allclose(output_array, expected_array), 'Overlap not trimmed correctly'
+            
+            print('\tTesting ReduceSink with workers={}, use_processes={}'.format(workers, use_processes))
+            piece_sum = map_pieces(test_array, sum_piece, ReduceSink(lambda total, piece_total: total + piece_total),
+                                   max_bytes=TEST_MAP_MAX_BYTES, workers=workers, use_processes=use_processes)
+            if workers is None:
+                serial_sum = piece_sum
+            assert piece_sum == serial_sum, 'Reduced result depends on number of workers'
+            assert np.isclose(piece_sum, np.sum(test_array)), 'Not every element reduced'
+        
+        print('\tTesting default ListSink')
+        piece_results = map_pieces(test_array, sum_piece, max_bytes=TEST_MAP_MAX_BYTES, workers=2)
+        assert [output_slices for output_slices, _result in piece_results] == \
+            sorted([output_slices for output_slices, _result in piece_results], key=lambda output_slices: [output_slice.start for output_slice in output_slices]), \
+            'Results not in piece order'
 
 
 # Define test suites
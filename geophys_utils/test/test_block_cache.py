@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+
+#===============================================================================
+#    Copyright 2026 Geoscience Australia
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+#===============================================================================
+"""
+Unit tests for geophys_utils._block_cache module
+
+Created on 18Oct.,2026
+
+@author: agent
+"""
+import unittest
+import os
+import time
+import tempfile
+import numpy as np
+from geophys_utils._block_cache import BlockCache, get_source_signature
+
+BLOCK_SHAPE = (10, 10) # 800 bytes per float64 block
+MAX_DISK_BYTES = 2000 # Room for two .npy files only
+
+class TestBlockCache(unittest.TestCase):
+    """Unit tests for geophys_utils._block_cache module."""
+
+    def test_memory_cache(self):
+        print('Testing BlockCache memory tier')
+        read_keys = []
+        def get_read_function(key):
+            def read_function():
+                read_keys.append(key)
+                return np.full(BLOCK_SHAPE, key[1], dtype='float64')
+            return read_function
+
+        block_cache = BlockCache(max_bytes=2000) # Room for two blocks only
+
+        for key in [('test', 0), ('test', 1), ('test', 0), ('test', 2), ('test', 1), ('test', 0)]:
+            block_array = block_cache.get(key, get_read_function(key))
+            assert (block_array == key[1]).all(), 'Incorrect block returned for key {}'.format(key)
+            assert not block_array.flags.writeable, 'Cached block is writeable'
+
+        # ('test', 1) should have been evicted by ('test', 2), and ('test', 0) by ('test', 1)
+        assert read_keys == [('test', 0), ('test', 1), ('test', 2), ('test', 1), ('test', 0)], 'Unexpected reads: {}'.format(read_keys)
+
+        statistics = block_cache.statistics
+        assert statistics['hits'] == 1 and statistics['misses'] == 5, 'Incorrect statistics: {}'.format(statistics)
+        assert statistics['evictions'] == 3 and statistics['blocks'] == 2, 'Incorrect statistics: {}'.format(statistics)
+        assert statistics['cached_bytes'] <= block_cache.max_bytes, 'Memory budget exceeded'
+
+    def test_disk_cache(self):
+        print('Testing BlockCache disk tier')
+        with tempfile.TemporaryDirectory() as disk_cache_dir:
+            BlockCache(disk_cache_dir=disk_cache_dir).get(('test', 3), lambda: np.full(BLOCK_SHAPE, 3.0))
+
+            # New cache instance should find block on disk without reading
+            block_cache = BlockCache(disk_cache_dir=disk_cache_dir)
+            block_array = block_cache.get(('test', 3))
+            assert block_array is not None and (block_array == 3.0).all(), 'Block not retrieved from disk'
+            assert block_cache.statistics['disk_hits'] == 1, 'Incorrect statistics: {}'.format(block_cache.statistics)
+
+            block_cache.clear(clear_disk=True)
+            assert block_cache.get(('test', 3)) is None, 'Disk cache not cleared'
+
+    def test_disk_cache_budget(self):
+        print('Testing BlockCache disk tier budget')
+        with tempfile.TemporaryDirectory() as temp_dir:
+            disk_cache_dir = os.path.join(temp_dir, 'blocks')
+            block_cache = BlockCache(disk_cache_dir=disk_cache_dir, max_disk_bytes=MAX_DISK_BYTES)
+            assert not os.path.exists(disk_cache_dir), 'Disk cache directory created before first write'
+
+            # Give files distinct ages so that least recently used order is unambiguous
+            for block_index in range(2):
+                block_cache.put(('test', block_index), np.full(BLOCK_SHAPE, float(block_index)))
+                file_time = time.time() - 100 + block_index
+                os.utime(block_cache.get_disk_path(('test', block_index)), (file_time, file_time))
+            assert os.path.isdir(disk_cache_dir), 'Disk cache directory not created on first write'
+
+            # Reading block 0 from disk makes block 1 least recently used
+            assert BlockCache(disk_cache_dir=disk_cache_dir).get(('test', 0)) is not None, 'Block not retrieved from disk'
+            block_cache.put(('test', 2), np.full(BLOCK_SHAPE, 2.0))
+
+            remaining_keys = [('test', block_index) for block_index in range(3)
+                              if os.path.isfile(block_cache.get_disk_path(('test', block_index)))]
+            assert remaining_keys == [('test', 0), ('test', 2)], 'Incorrect blocks retained on disk: {}'.format(remaining_keys)
+            assert block_cache.statistics['disk_evictions'] == 1, 'Incorrect statistics: {}'.format(block_cache.statistics)
+            assert block_cache.statistics['disk_bytes'] <= MAX_DISK_BYTES, 'Disk budget exceeded'
+
+    def test_source_signature(self):
+        print('Testing BlockCache source signature')
+        with tempfile.TemporaryDirectory() as temp_dir:
+            source_path = os.path.join(temp_dir, 'source.nc')
+            with open(source_path, 'wb') as source_file:
+                source_file.write(b'version 1')
+            source_signature = get_source_signature(source_path)
+            BlockCache(disk_cache_dir=temp_dir, source_signature=source_signature).get(('test', 4), lambda: np.full(BLOCK_SHAPE, 4.0))
+            assert BlockCache(disk_cache_dir=temp_dir, source_signature=source_signature).get(('test', 4)) is not None, \
+                'Block not retrieved from disk for unchanged source'
+
+            # Modified source must not return blocks cached from previous version
+            with open(source_path, 'wb') as source_file:
+                source_file.write(b'version 2 is longer')
+            modified_signature = get_source_signature(source_path)
+            assert modified_signature != source_signature, 'Signature unchanged for modified source'
+            assert BlockCache(disk_cache_dir=temp_dir, source_signature=modified_signature).get(('test', 4)) is None, \
+                'Stale block returned for modified source'
+
+
+# Define test suites
+def test_suite():
+    """Returns a test suite of all the tests in this module."""
+
+    test_classes = [TestBlockCache]
+
+    suite_list = map(unittest.defaultTestLoader.loadTestsFromTestCase,
+                     test_classes)
+
+    suite = unittest.TestSuite(suite_list)
+
+    return suite
+
+
+# Define main function
+def main():
+    unittest.TextTestRunner(verbosity=2).run(test_suite())
+
+if __name__ == '__main__':
+    main()
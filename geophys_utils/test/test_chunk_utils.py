@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+
+#===============================================================================
+#    Copyright 2026 Geoscience Australia
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+#===============================================================================
+"""
+Unit tests for geophys_utils._chunk_utils module
+
+Created on 18Oct.,2026
+
+@author: agent
+"""
+import unittest
+import numpy as np
+from geophys_utils._chunk_utils import get_chunk_shape, explain_chunk_shape, get_expected_chunks_touched, \
+    DEFAULT_MIN_CHUNK_BYTES, DEFAULT_MAX_CHUNK_BYTES
+
+GRID_SHAPE = (20000, 30000)
+CUBE_SHAPE = (365, 2000, 3000)
+POINT_SHAPE = (5000000, 3)
+SMALL_CUBE_SHAPE = (500, 100, 100)
+
+class TestChunkUtils(unittest.TestCase):
+    """Unit tests for geophys_utils._chunk_utils module."""
+
+    def test_get_chunk_shape(self):
+        print('Testing get_chunk_shape function')
+        for shape, access_pattern in [(GRID_SHAPE, 'spatial'),
+                                      (CUBE_SHAPE, 'spatial'),
+                                      (CUBE_SHAPE, 'time_series'),
+                                      (POINT_SHAPE, 'point_scan'),
+                                      (SMALL_CUBE_SHAPE, 'spatial')]:
+            chunk_shape = get_chunk_shape(shape, 'float32', access_pattern)
+            chunk_bytes = 4 * int(np.prod(chunk_shape))
+            assert DEFAULT_MIN_CHUNK_BYTES <= chunk_bytes <= DEFAULT_MAX_CHUNK_BYTES, \
+                'Chunk size {} for {} access to {} out of range'.format(chunk_bytes, access_pattern, shape)
+            assert all([0 < chunk_size <= dimension_size for chunk_size, dimension_size in zip(chunk_shape, shape)]), \
+                'Invalid chunk shape {} for {}'.format(chunk_shape, shape)
+
+        assert get_chunk_shape(GRID_SHAPE, 'float32', 'spatial') == [1000, 1000], 'Spatial chunks should be square'
+        assert get_chunk_shape(CUBE_SHAPE, 'float32', 'spatial')[0] == 1, 'Spatial chunks should span a single time'
+        assert get_chunk_shape(CUBE_SHAPE, 'float32', 'time_series')[0] == CUBE_SHAPE[0], 'Time series chunks should span all times'
+        assert get_chunk_shape(POINT_SHAPE, 'float32', 'point_scan')[1] == POINT_SHAPE[1], 'Point chunks should span all columns'
+        assert get_chunk_shape(SMALL_CUBE_SHAPE, 'float32', 'spatial')[1:] == [100, 100], 'Small spatial extent should be whole'
+
+        # Variables smaller than the minimum chunk size should be a single chunk
+        assert get_chunk_shape((178, 79), 'float32', 'spatial') == [178, 79], 'Small variable should be a single chunk'
+
+    def test_explain_chunk_shape(self):
+        print('Testing explain_chunk_shape function')
+        assert get_expected_chunks_touched([1000], [100], [1]) == 1.0, 'Single cell should touch one chunk'
+        assert get_expected_chunks_touched([1000], [100], [101]) == 2.0, 'Incorrect expected chunks touched'
+        assert get_expected_chunks_touched([100], [100], [100]) == 1.0, 'Whole dimension should touch all chunks'
+
+        spatial_explanation = explain_chunk_shape(CUBE_SHAPE, 'float32', get_chunk_shape(CUBE_SHAPE, 'float32', 'spatial'))
+        time_series_explanation = explain_chunk_shape(CUBE_SHAPE, 'float32', get_chunk_shape(CUBE_SHAPE, 'float32', 'time_series'))
+        assert spatial_explanation['spatial']['chunks_touched'] < time_series_explanation['spatial']['chunks_touched'], \
+            'Spatial chunking should touch fewer chunks for spatial queries'
+        assert time_series_explanation['time_series']['chunks_touched'] < spatial_explanation['time_series']['chunks_touched'], \
+            'Time series chunking should touch fewer chunks for time series queries'
+        assert time_series_explanation['time_series']['chunks_touched'] == 1.0, 'Time series query should touch one chunk'
+
+
+# Define test suites
+def test_suite():
+    """Returns a test suite of all the tests in this module."""
+
+    test_classes = [TestChunkUtils]
+
+    suite_list = map(unittest.defaultTestLoader.loadTestsFromTestCase,
+                     test_classes)
+
+    suite = unittest.TestSuite(suite_list)
+
+    return suite
+
+
+# Define main function
+def main():
+    unittest.TextTestRunner(verbosity=2).run(test_suite())
+
+if __name__ == '__main__':
+    main()
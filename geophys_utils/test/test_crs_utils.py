@@ -26,7 +26,7 @@ import unittest
 import numpy as np
 import re
 from osgeo.osr import CoordinateTransformation
-from geophys_utils._crs_utils import get_coordinate_transformation, get_utm_wkt, transform_coords
+from geophys_utils._crs_utils import get_spatial_ref_from_wkt, get_coordinate_transformation, get_utm_wkt, transform_coords
 
 class TestCRSUtils(unittest.TestCase):
     """Unit tests for geophys_utils._crs_utils module."""
@@ -43,6 +43,15 @@ class TestCRSUtils(unittest.TestCase):
     UTM_COORDS = (696382.5632171195, 6090881.858493287) #(696382.5632178178, 6090881.858493158)
     UTM_COORD_ARRAY = [(696382.5632171195, 6090881.858493287), (773798.0963396085, 6122843.308355326)]
 
+    def test_get_spatial_ref_from_wkt(self):
+        print('Testing get_spatial_ref_from_wkt function with EPSG names')
+        assert get_spatial_ref_from_wkt(TestCRSUtils.EPSG4326_EPSG).IsGeographic(), 'EPSG:4326 not resolved as geographic CRS'
+        for crs_name, expected_projection in [(TestCRSUtils.EPSG3577_EPSG, 'Albers'), ('EPSG:3857', 'Mercator')]:
+            spatial_ref_wkt = get_spatial_ref_from_wkt(crs_name).ExportToWkt()
+            assert spatial_ref_wkt.startswith('PROJCS') and expected_projection in spatial_ref_wkt, \
+                'Projected CRS {} not resolved: {}'.format(crs_name, spatial_ref_wkt)
+        self.assertRaises(AssertionError, get_spatial_ref_from_wkt, 'EPSG:not_a_code')
+
     def test_get_coordinate_transformation(self):
         print('Testing get_coordinate_transformation function')
         coordinate_transformation = get_coordinate_transformation(TestCRSUtils.EPSG4326_WKT, 
@@ -38,7 +38,7 @@ class TestDataStats(unittest.TestCase):
                        'max': 3412.063, 
                        #'nc_path': u'C:\\Users\\u76345\\git\\geophys_utils\\geophys_utils\\test\\test_grid.nc', 
                        'x_size': 79, 
-                       'mean': -15.958283494050137, 
+                       'mean': -18.473817515700016, # Mean of every valid cell, now that edge pieces are not dropped
                        'nodata_value': -99999.0}
 
     
@@ -56,6 +56,14 @@ class TestDataStats(unittest.TestCase):
             except TypeError:
                 assert data_stats.value(key) == TestDataStats.EXPECTED_RESULT[key], 'Incorrect value for %s' % key
 
+    def test_parallel_data_stats(self):
+        print('Testing DataStats class with parallel workers')
+        nc_path = os.path.join(os.path.dirname(__file__), TestDataStats.NC_PATH)
+        serial_data_stats = DataStats(nc_path, max_bytes=TestDataStats.MAX_BYTES, prefetch=0)
+        parallel_data_stats = DataStats(nc_path, max_bytes=TestDataStats.MAX_BYTES, prefetch=2, workers=3)
+        for key in DataStats.key_list:
+            assert parallel_data_stats.value(key) == serial_data_stats.value(key), 'Parallel value differs for %s' % key
+
 
 # Define test suites
 def test_suite():
@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+
+#===============================================================================
+#    Copyright 2026 Geoscience Australia
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+#===============================================================================
+"""
+Unit tests for geophys_utils._direct_chunk_utils module
+
+Created on 18Oct.,2026
+
+@author: agent
+"""
+import unittest
+import os
+import shutil
+import tempfile
+import zlib
+import netCDF4
+import numpy as np
+from geophys_utils._direct_chunk_utils import fletcher32, apply_filters, h5py, FILTER_DEFLATE, FILTER_SHUFFLE, FILTER_FLETCHER32
+from geophys_utils._netcdf_grid_utils import NetCDFGridUtils
+
+NC_PATH = 'test_grid.nc'
+TEST_CHECKSUMS = [(b'\x01\x02\x03', 84149250),
+                  (b'\x00' * 10, 0),
+                  (b'\xff\xff' * 5, 0xffffffff),
+                  ]
+TEST_COPY_CHUNKSIZES = [32, 16]
+TEST_COPY_PIECE_BYTES = 20000
+
+class TestDirectChunkUtils(unittest.TestCase):
+    """Unit tests for geophys_utils._direct_chunk_utils module."""
+
+    def test_fletcher32(self):
+        print('Testing fletcher32 function')
+        for data, expected_checksum in TEST_CHECKSUMS:
+            checksum = fletcher32(data)
+            assert checksum == expected_checksum, 'Incorrect checksum for {}: {} instead of {}'.format(data, checksum, expected_checksum)
+
+    def test_apply_filters(self):
+        print('Testing apply_filters function')
+        chunk_array = np.arange(100, dtype='float32')
+        chunk_bytes = chunk_array.tobytes()
+        filtered_bytes = apply_filters(chunk_bytes,
+                                       [(FILTER_FLETCHER32, ()), (FILTER_SHUFFLE, (4,)), (FILTER_DEFLATE, (4,))],
+                                       chunk_array.dtype.itemsize)
+
+        # Reverse pipeline: inflate, unshuffle (4-byte checksum is shuffled as an extra element) and verify checksum
+        unfiltered_bytes = zlib.decompress(filtered_bytes)
+        assert len(unfiltered_bytes) == len(chunk_bytes) + 4, 'Checksum not appended'
+        unshuffled_bytes = np.frombuffer(unfiltered_bytes, dtype='uint8').reshape((4, -1)).T.tobytes()
+        assert unshuffled_bytes[:len(chunk_bytes)] == chunk_bytes, 'Chunk bytes not recovered'
+        assert np.frombuffer(unshuffled_bytes[len(chunk_bytes):], dtype='<u4')[0] == fletcher32(chunk_bytes), 'Incorrect checksum'
+
+    @unittest.skipIf(h5py is None, 'h5py is not available')
+    def test_parallel_compression_copy(self):
+        print('Testing copy with parallel compression')
+        temp_dir = tempfile.mkdtemp()
+        netcdf_grid_utils = NetCDFGridUtils(os.path.join(os.path.dirname(__file__), NC_PATH))
+        try:
+            variable_name = netcdf_grid_utils.data_variable.name
+            copy_paths = [os.path.join(temp_dir, 'serial.nc'), os.path.join(temp_dir, 'parallel.nc')]
+            for copy_path, parallel_compression in zip(copy_paths, [False, True]):
+                netcdf_grid_utils.copy(copy_path,
+                                       variable_options_dict={variable_name: {'chunksizes': list(TEST_COPY_CHUNKSIZES),
+                                                                              'fletcher32': True}},
+                                       invert_y=not netcdf_grid_utils.y_inverted,
+                                       piece_bytes=TEST_COPY_PIECE_BYTES,
+                                       workers=2,
+                                       parallel_compression=parallel_compression)
+
+            with netCDF4.Dataset(copy_paths[0]) as serial_dataset, netCDF4.Dataset(copy_paths[1]) as parallel_dataset:
+                for copy_variable_name, serial_variable in serial_dataset.variables.items():
+                    parallel_variable = parallel_dataset.variables[copy_variable_name]
+                    assert parallel_variable.filters() == serial_variable.filters(), 'Filters differ for {}'.format(copy_variable_name)
+                    assert parallel_variable.chunking() == serial_variable.chunking(), 'Chunking differs for {}'.format(copy_variable_name)
+                    assert np.array_equal(np.ma.getdata(parallel_variable[:]), np.ma.getdata(serial_variable[:])), \
+                        'Values differ for {}'.format(copy_variable_name)
+
+            # Compressed chunks should be identical to those written by the HDF5 library
+            with h5py.File(copy_paths[0], 'r') as serial_file, h5py.File(copy_paths[1], 'r') as parallel_file:
+                serial_dataset, parallel_dataset = serial_file[variable_name], parallel_file[variable_name]
+                for chunk_index in range(serial_dataset.id.get_num_chunks()):
+                    chunk_offset = serial_dataset.id.get_chunk_info(chunk_index).chunk_offset
+                    assert parallel_dataset.id.read_direct_chunk(chunk_offset) == serial_dataset.id.read_direct_chunk(chunk_offset), \
+                        'Compressed chunk differs at {}'.format(chunk_offset)
+        finally:
+            netcdf_grid_utils.close()
+            shutil.rmtree(temp_dir)
+
+
+# Define test suites
+def test_suite():
+    """Returns a test suite of all the tests in this module."""
+
+    test_classes = [TestDirectChunkUtils]
+
+    suite_list = map(unittest.defaultTestLoader.loadTestsFromTestCase,
+                     test_classes)
+
+    suite = unittest.TestSuite(suite_list)
+
+    return suite
+
+
+# Define main function
+def main():
+    unittest.TextTestRunner(verbosity=2).run(test_suite())
+
+if __name__ == '__main__':
+    main()
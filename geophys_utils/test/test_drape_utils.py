@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+
+#===============================================================================
+#    Copyright 2026 Geoscience Australia
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+#===============================================================================
+"""
+Unit tests for geophys_utils._drape_utils module
+
+Created on 18Oct.,2026
+
+@author: agent
+"""
+import unittest
+import os
+import shutil
+import tempfile
+import netCDF4
+import numpy as np
+from geophys_utils._netcdf_grid_utils import NetCDFGridUtils
+from geophys_utils._netcdf_grid_writer import create_netcdf_grid
+from geophys_utils._drape_utils import drape_grids, get_drape_column_name, get_drape_grid_names
+
+NC_PATH = 'test_grid.nc'
+TEST_POINT_COUNT = 1000
+TEST_POINT_BOUNDS = [148.2, -36.05, 148.55, -35.3]
+TEST_WARP_CRS = 'EPSG:3577'
+TEST_OUTSIDE_GRID_TOP_LEFT = (150.0, -30.0) # Grid which does not contain any test points
+
+class TestDrapeUtils(unittest.TestCase):
+    """Unit tests for geophys_utils._drape_utils module."""
+
+    def test_drape_grids(self):
+        print('Testing drape_grids function')
+        temp_dir = tempfile.mkdtemp()
+        try:
+            nc_path = os.path.join(os.path.dirname(__file__), NC_PATH)
+            netcdf_grid_utils = NetCDFGridUtils(nc_path)
+
+            warp_path = os.path.join(temp_dir, 'warped.nc')
+            netcdf_grid_utils.warp(warp_path, TEST_WARP_CRS)
+
+            outside_path = os.path.join(temp_dir, 'outside.nc')
+            outside_dataset = create_netcdf_grid(outside_path, 'EPSG:4326',
+                                                 [TEST_OUTSIDE_GRID_TOP_LEFT[0], 0.01, 0.0, TEST_OUTSIDE_GRID_TOP_LEFT[1], 0.0, -0.01],
+                                                 (10, 10), 'data', fill_value=-99999.0)
+            outside_dataset.variables['data'][:] = np.ones((10, 10), dtype='float32')
+            outside_dataset.close()
+
+            coordinates = np.random.RandomState(0).uniform(TEST_POINT_BOUNDS[0:2], TEST_POINT_BOUNDS[2:4], (TEST_POINT_COUNT, 2))
+            nc_paths = [nc_path, warp_path, outside_path]
+            drape_columns = drape_grids(coordinates, nc_paths, wkt=netcdf_grid_utils.wkt, workers=2)
+
+            variable_name = netcdf_grid_utils.data_variable.name
+            expected_column_names = [get_drape_column_name(nc_path, variable_name),
+                                     get_drape_column_name(warp_path, variable_name),
+                                     get_drape_column_name(outside_path, 'data')]
+            assert list(drape_columns.keys()) == expected_column_names, 'Incorrect columns: {}'.format(list(drape_columns.keys()))
+
+            for column_array in drape_columns.values():
+                assert column_array.shape == (TEST_POINT_COUNT,), 'Column not aligned with points'
+
+            assert np.array_equal(drape_columns[expected_column_names[0]],
+                                  netcdf_grid_utils.get_values_at_coords(coordinates)[:,0],
+                                  equal_nan=True), 'Incorrect values for native grid'
+
+            warp_grid_utils = NetCDFGridUtils(warp_path)
+            assert np.array_equal(drape_columns[expected_column_names[1]],
+                                  warp_grid_utils.get_values_at_coords(coordinates, wkt=netcdf_grid_utils.wkt)[:,0],
+                                  equal_nan=True), 'Incorrect values for warped grid'
+            warp_grid_utils.close()
+
+            assert np.isnan(drape_columns[expected_column_names[2]]).all(), 'Values found for grid outside points'
+            netcdf_grid_utils.close()
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_duplicate_grid_names(self):
+        print('Testing drape_grids function with grids of the same name')
+        test_paths = ['/data/a/grid.nc', '/data/b/grid.nc', '/data/other.nc', '/data/a/grid.nc']
+        grid_names = get_drape_grid_names(test_paths)
+        assert grid_names == ['a_grid', 'b_grid', 'other', 'a_grid_2'], 'Incorrect grid names: {}'.format(grid_names)
+
+        temp_dir = tempfile.mkdtemp()
+        try:
+            nc_path = os.path.join(os.path.dirname(__file__), NC_PATH)
+            netcdf_grid_utils = NetCDFGridUtils(nc_path)
+            variable_name = netcdf_grid_utils.data_variable.name
+            grid_values = netcdf_grid_utils.data_variable[:]
+
+            # Copies of the test grid with the same basename but different values in different directories
+            nc_paths = []
+            for directory_index, directory_name in enumerate(['a', 'b']):
+                os.mkdir(os.path.join(temp_dir, directory_name))
+                copy_path = os.path.join(temp_dir, directory_name, NC_PATH)
+                netcdf_grid_utils.copy(copy_path)
+                with netCDF4.Dataset(copy_path, 'r+') as copy_dataset:
+                    copy_dataset.variables[variable_name][:] = grid_values + directory_index
+                nc_paths.append(copy_path)
+
+            coordinates = np.random.RandomState(0).uniform(TEST_POINT_BOUNDS[0:2], TEST_POINT_BOUNDS[2:4], (TEST_POINT_COUNT, 2))
+            drape_columns = drape_grids(coordinates, nc_paths, wkt=netcdf_grid_utils.wkt)
+            assert list(drape_columns.keys()) == [get_drape_column_name(copy_path, variable_name, nc_paths) for copy_path in nc_paths], \
+                'Incorrect columns: {}'.format(list(drape_columns.keys()))
+            assert len(set(drape_columns.keys())) == len(nc_paths), 'Column overwritten by grid with the same name'
+
+            first_values, second_values = drape_columns.values()
+            valid_mask = np.isfinite(first_values)
+            assert np.any(valid_mask) and np.array_equal(np.isfinite(second_values), valid_mask), 'Inconsistent no-data between grids'
+            assert np.allclose(second_values[valid_mask] - first_values[valid_mask], 1.0), 'Columns not sampled from their own grids'
+            netcdf_grid_utils.close()
+        finally:
+            shutil.rmtree(temp_dir)
+
+
+# Define test suites
+def test_suite():
+    """Returns a test suite of all the tests in this module."""
+
+    test_classes = [TestDrapeUtils]
+
+    suite_list = map(unittest.defaultTestLoader.loadTestsFromTestCase,
+                     test_classes)
+
+    suite = unittest.TestSuite(suite_list)
+
+    return suite
+
+
+# Define main function
+def main():
+    unittest.TextTestRunner(verbosity=2).run(test_suite())
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+
+#===============================================================================
+#    Copyright 2026 Geoscience Australia
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+#===============================================================================
+"""
+Unit tests for geophys_utils._io_stats module
+
+Created on 18Oct.,2026
+
+@author: agent
+"""
+import unittest
+import os
+import shutil
+import tempfile
+from geophys_utils._io_stats import IOStats, io_timer
+from geophys_utils._netcdf_grid_utils import NetCDFGridUtils
+
+NC_PATH = 'test_grid.nc'
+
+class TestIOStats(unittest.TestCase):
+    """Unit tests for geophys_utils._io_stats module."""
+
+    def test_io_timer(self):
+        print('Testing io_timer function')
+        io_stats = IOStats()
+        with io_timer(io_stats, 'read', 'test', (slice(0, 10), slice(0, 5))) as timing:
+            timing.nbytes = 400
+        with io_timer(io_stats, 'read', 'test', nbytes=200):
+            pass
+        with io_timer(io_stats, 'sync'):
+            pass
+        with io_timer(None, 'read', 'test') as timing: # Should not be recorded
+            timing.nbytes = 1000
+
+        report = io_stats.report()
+        assert report['phases']['read']['count'] == 2 and report['phases']['read']['bytes'] == 600, \
+            'Incorrect phase totals: {}'.format(report['phases'])
+        assert list(report['variables'].keys()) == ['test'], 'Dataset-level operations should not be reported per variable'
+        assert report['pieces'] == [{'phase': 'read', 'variable': 'test', 'piece': '0:10,0:5',
+                                     'bytes': 400, 'seconds': report['pieces'][0]['seconds']}], \
+            'Incorrect piece records: {}'.format(report['pieces'])
+        assert len(io_stats.get_summary_lines()) == 5, 'Incorrect number of summary lines'
+
+    def test_copy_stats(self):
+        print('Testing IOStats instrumentation of copy')
+        temp_dir = tempfile.mkdtemp()
+        netcdf_grid_utils = NetCDFGridUtils(os.path.join(os.path.dirname(__file__), NC_PATH))
+        try:
+            netcdf_grid_utils.io_stats = IOStats()
+            netcdf_grid_utils.copy(os.path.join(temp_dir, 'copy.nc'), workers=2)
+            report = netcdf_grid_utils.io_stats.report()
+            data_variable = netcdf_grid_utils.data_variable
+            variable_bytes = data_variable.size * data_variable.dtype.itemsize
+            for phase in ['read', 'write']:
+                assert report['variables'][data_variable.name][phase]['bytes'] == variable_bytes, \
+                    'Incorrect {} bytes for {}'.format(phase, data_variable.name)
+            assert report['phases']['wait']['count'] == report['phases']['read']['count'], 'Parallel waits not recorded'
+            assert report['phases']['sync']['count'] >= 1, 'Sync not recorded'
+        finally:
+            netcdf_grid_utils.close()
+            shutil.rmtree(temp_dir)
+
+
+# Define test suites
+def test_suite():
+    """Returns a test suite of all the tests in this module."""
+
+    test_classes = [TestIOStats]
+
+    suite_list = map(unittest.defaultTestLoader.loadTestsFromTestCase,
+                     test_classes)
+
+    suite = unittest.TestSuite(suite_list)
+
+    return suite
+
+
+# Define main function
+def main():
+    unittest.TextTestRunner(verbosity=2).run(test_suite())
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+
+#===============================================================================
+#    Copyright 2026 Geoscience Australia
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+#===============================================================================
+"""
+Unit tests for geophys_utils._mosaic_utils module
+
+Created on 18Oct.,2026
+
+@author: agent
+"""
+import unittest
+import os
+import shutil
+import tempfile
+import netCDF4
+import numpy as np
+from geophys_utils._netcdf_grid_writer import create_netcdf_grid
+from geophys_utils._mosaic_utils import build_mosaic, get_tile_source_index, _mosaic_source_grid_utils
+
+TEST_CRS = 'EPSG:4326'
+TEST_SOURCE_PIXEL_SIZE = 0.001
+TEST_SOURCE_SHAPE = (100, 120)
+TEST_SOURCES = [((148.0, -35.0), 1.0), # (top left corner, constant value) in priority order
+                ((148.06, -35.05), 3.0)]
+TEST_MOSAIC_PIXEL_SIZE = 0.002
+TEST_OVERLAP_COORDS = (148.09, -35.07) # Coordinates of point in overlap of both sources
+TEST_TILE_SIZE = 16
+TEST_BLEND_VALUES = {'priority': 1.0, 'mean': 2.0}
+
+class TestMosaicUtils(unittest.TestCase):
+    """Unit tests for geophys_utils._mosaic_utils module."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.source_paths = []
+        for source_index, (top_left, value) in enumerate(TEST_SOURCES):
+            source_path = os.path.join(self.temp_dir, 'source_{}.nc'.format(source_index))
+            source_dataset = create_netcdf_grid(source_path, TEST_CRS,
+                                                [top_left[0], TEST_SOURCE_PIXEL_SIZE, 0.0, top_left[1], 0.0, -TEST_SOURCE_PIXEL_SIZE],
+                                                TEST_SOURCE_SHAPE, 'data', fill_value=-99999.0)
+            source_dataset.variables['data'][:] = np.full(TEST_SOURCE_SHAPE, value, dtype='float32')
+            source_dataset.close()
+            self.source_paths.append(source_path)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_get_tile_source_index(self):
+        print('Testing get_tile_source_index function')
+        tile_source_index = get_tile_source_index([[0, -20, 10, 0], [15, -40, 40, -25], [100, 100, 110, 110]],
+                                                  [0, 1, 0, 0, 0, -1], (40, 40), 10)
+        assert set(tile_source_index.keys()) == {(0, 0), (1, 0), (2, 1), (2, 2), (2, 3), (3, 1), (3, 2), (3, 3)}, 'Incorrect tiles indexed: {}'.format(sorted(tile_source_index.keys()))
+        assert tile_source_index[(2, 1)] == [(1, (slice(25, 30), slice(15, 20)))], 'Incorrect source window: {}'.format(tile_source_index[(2, 1)])
+
+    def test_build_mosaic(self):
+        for blend_method in ['priority', 'mean', 'feather']:
+            print('Testing build_mosaic function with {} blending'.format(blend_method))
+            mosaic_path = os.path.join(self.temp_dir, 'mosaic_{}.nc'.format(blend_method))
+            build_mosaic(self.source_paths, mosaic_path, TEST_CRS, TEST_MOSAIC_PIXEL_SIZE,
+                         blend_method=blend_method, tile_size=TEST_TILE_SIZE, workers=2)
+
+            with netCDF4.Dataset(mosaic_path) as mosaic_dataset:
+                mosaic_array = mosaic_dataset.variables['data'][:]
+                lat_array = mosaic_dataset.variables['lat'][:]
+                lon_array = mosaic_dataset.variables['lon'][:]
+
+            # All cells covered by either source should have values
+            expected_count = int(round((2 * np.prod(TEST_SOURCE_SHAPE) * TEST_SOURCE_PIXEL_SIZE ** 2
+                                        - (0.12 - (TEST_SOURCES[1][0][0] - TEST_SOURCES[0][0][0])) 
+                                        * (0.1 - (TEST_SOURCES[0][0][1] - TEST_SOURCES[1][0][1]))
+                                        ) / TEST_MOSAIC_PIXEL_SIZE ** 2))
+            assert mosaic_array.count() == expected_count, 'Incorrect number of valid cells: {} instead of {}'.format(mosaic_array.count(), expected_count)
+            assert set(np.unique(mosaic_array.compressed())) >= {TEST_SOURCES[0][1], TEST_SOURCES[1][1]}, 'Source values not found in mosaic'
+
+            overlap_value = mosaic_array[np.argmin(np.abs(lat_array - TEST_OVERLAP_COORDS[1])),
+                                         np.argmin(np.abs(lon_array - TEST_OVERLAP_COORDS[0]))]
+            if blend_method in TEST_BLEND_VALUES:
+                assert overlap_value == TEST_BLEND_VALUES[blend_method], 'Incorrect {} blended value: {}'.format(blend_method, overlap_value)
+            else:
+                assert TEST_SOURCES[0][1] < overlap_value < TEST_SOURCES[1][1], 'Feathered value {} out of range'.format(overlap_value)
+
+            print('Testing serial build_mosaic function with {} blending and one open source'.format(blend_method))
+            serial_mosaic_path = os.path.join(self.temp_dir, 'serial_mosaic_{}.nc'.format(blend_method))
+            build_mosaic(self.source_paths, serial_mosaic_path, TEST_CRS, TEST_MOSAIC_PIXEL_SIZE,
+                         blend_method=blend_method, tile_size=TEST_TILE_SIZE, max_open_sources=1)
+            assert len(_mosaic_source_grid_utils) == 0, 'Open sources not closed'
+            with netCDF4.Dataset(serial_mosaic_path) as serial_mosaic_dataset:
+                assert np.array_equal(np.ma.filled(serial_mosaic_dataset.variables['data'][:], np.nan), np.ma.filled(mosaic_array, np.nan),
+                                      equal_nan=True), 'Serial and parallel {} mosaics differ'.format(blend_method)
+
+
+# Define test suites
+def test_suite():
+    """Returns a test suite of all the tests in this module."""
+
+    test_classes = [TestMosaicUtils]
+
+    suite_list = map(unittest.defaultTestLoader.loadTestsFromTestCase,
+                     test_classes)
+
+    suite = unittest.TestSuite(suite_list)
+
+    return suite
+
+
+# Define main function
+def main():
+    unittest.TextTestRunner(verbosity=2).run(test_suite())
+
+if __name__ == '__main__':
+    main()
@@ -24,9 +24,16 @@ Created on 15/11/2016
 """
 import unittest
 import os
+import shutil
+import tempfile
 import netCDF4
 import numpy as np
+from unittest import mock
+from shapely.geometry import Polygon
 from geophys_utils._netcdf_grid_utils import NetCDFGridUtils
+from geophys_utils import _netcdf_utils
+from geophys_utils._copy_checkpoint import CopyCheckpoint
+from geophys_utils._netcdf_grid_writer import create_netcdf_grid
 
 netcdf_grid_utils = None
 
@@ -37,10 +44,40 @@ TEST_COORDS = (148.213, -36.015)
 TEST_MULTI_COORDS = np.array([[148.213, -36.015], [148.516, -35.316]])
 TEST_INDICES = [1, 1]
 TEST_MULTI_INDICES = [[1, 1], [176, 77]]
+TEST_OUTSIDE_COORDS = np.array([[148.213, -36.015], [150.0, -35.316], [148.516, -35.316]])
+TEST_OUTSIDE_INDICES = [[1, 1], None, [176, 77]]
 TEST_FRACTIONAL_INDICES = [1.25, 1.25]
 TEST_VALUE = -99999.
 TEST_MULTI_VALUES = [-99999.0, -134.711334229]
 TEST_INTERPOLATED_VALUE = -99997.6171875
+TEST_TRANSECTS = [[[148.21, -36.0], [148.3, -35.8], [148.5, -35.32]],
+                  [[148.25, -35.5], [148.45, -35.5]],
+                  [[148.3, -35.9]]]
+TEST_SAMPLE_METRES = 500
+TEST_TRANSECT_SAMPLE_COUNTS = [160, 37, 1]
+TEST_OVERVIEW_FACTORS = [2, 4]
+TEST_ZONE_BOUNDS = [[148.2501, -35.9001, 148.4501, -35.5001], # Outer rectangle of first zone
+                    [148.3001, -35.8001, 148.4001, -35.6001], # Hole in first zone
+                    [150.0, -36.0, 151.0, -35.0]] # Zone outside grid
+TEST_WARP_CRS = 'EPSG:3577'
+TEST_WARP_TILE_SIZE = 64
+TEST_FFT_TILE_SIZE = 48
+TEST_FFT_OVERLAP = 24
+TEST_COPY_CHUNKSIZES = [32, 16]
+TEST_COPY_PIECE_BYTES = 20000
+TEST_INTERRUPT_PIECES = 3 # Y & X dimension variables and first data variable piece
+MIN_DERIVATIVE_CORRELATION = 0.95
+TEST_LAYERED_GEOTRANSFORM = [148.0, 0.01, 0.0, -35.0, 0.0, -0.01]
+TEST_LAYERED_SHAPE = (40, 30)
+TEST_LAYERED_DEPTHS = [0.0, 10.0, 20.0, 30.0, 40.0]
+TEST_LAYERED_CHUNKSIZES = [2, 16, 16]
+TEST_LAYERED_LEADING_SLICE = slice(1, 4) # Spans leading chunk boundary
+TEST_LAYERED_POINT_COUNT = 50
+TEST_3D_SHAPE = (37, 29)
+TEST_3D_LEADING_SIZE = 11
+TEST_3D_INPUT_CHUNKSIZES = [3, 10, 7]
+TEST_3D_COPY_CHUNKSIZES = [4, 8, 16] # Not aligned with input chunks in any dimension
+TEST_3D_COPY_PIECE_BYTES = 4000
     
 class TestNetCDFGridUtilsConstructor(unittest.TestCase):
     """Unit tests for TestNetCDFGridUtils Constructor.
@@ -66,6 +103,15 @@ class TestNetCDFGridUtilsFunctions1(unittest.TestCase):
         multi_indices = netcdf_grid_utils.get_indices_from_coords(TEST_MULTI_COORDS)
         assert (multi_indices == np.array(TEST_MULTI_INDICES)).all, 'Incorrect indices: {} instead of {}'.format(multi_indices, TEST_MULTI_INDICES)
 
+        print('Testing get_indices_from_coords function with coordinates outside grid {}'.format(TEST_OUTSIDE_COORDS))
+        outside_indices = netcdf_grid_utils.get_indices_from_coords(TEST_OUTSIDE_COORDS)
+        assert outside_indices == TEST_OUTSIDE_INDICES, 'Incorrect indices: {} instead of {}'.format(outside_indices, TEST_OUTSIDE_INDICES)
+
+        print('Testing get_index_array_from_coords function with coordinates outside grid {}'.format(TEST_OUTSIDE_COORDS))
+        index_array, mask_array = netcdf_grid_utils.get_index_array_from_coords(TEST_OUTSIDE_COORDS)
+        assert (mask_array == np.array([index_pair is not None for index_pair in TEST_OUTSIDE_INDICES])).all(), 'Incorrect mask: {}'.format(mask_array)
+        assert (index_array[mask_array] == np.array(TEST_MULTI_INDICES)).all(), 'Incorrect index array: {}'.format(index_array)
+
     def test_get_fractional_indices_from_coords(self):
         print('Testing get_fractional_indices_from_coords function')
         indices = netcdf_grid_utils.get_fractional_indices_from_coords(TEST_COORDS)
@@ -81,16 +127,414 @@ class TestNetCDFGridUtilsFunctions1(unittest.TestCase):
         multi_values = netcdf_grid_utils.get_value_at_coords(TEST_MULTI_COORDS)
         assert (np.abs(np.array(multi_values) - np.array(TEST_MULTI_VALUES)) < MAX_ERROR).all(), 'Incorrect retrieved value: {} instead of {}'.format(multi_values, TEST_MULTI_VALUES)
 
+        print('Testing get_value_at_coords function with {} byte blocks'.format(MAX_BYTES))
+        rng = np.random.RandomState(0)
+        random_coords = np.column_stack((rng.uniform(148.206, 148.522, 1000), rng.uniform(-36.022, -35.31, 1000)))
+        block_values = netcdf_grid_utils.get_value_at_coords(random_coords, max_bytes=MAX_BYTES)
+        index_array, _mask_array = netcdf_grid_utils.get_index_array_from_coords(random_coords)
+        expected_values = np.ma.filled(netcdf_grid_utils.data_variable[:], TEST_VALUE)[index_array[:,0], index_array[:,1]]
+        assert (np.array(block_values) == expected_values).all(), 'Incorrect values retrieved in blocks'
+
+        print('Testing get_value_at_coords function with cached blocks')
+        misses = netcdf_grid_utils.block_cache.misses
+        cached_values = netcdf_grid_utils.get_value_at_coords(random_coords, max_bytes=MAX_BYTES)
+        assert cached_values == block_values, 'Incorrect values retrieved from block cache'
+        assert netcdf_grid_utils.block_cache.misses == misses, 'Blocks re-read for repeated query'
+
+    def test_get_values_at_coords(self):
+        print('Testing get_values_at_coords function with multiple coordinates {}'.format(TEST_OUTSIDE_COORDS))
+        value_array = netcdf_grid_utils.get_values_at_coords(TEST_OUTSIDE_COORDS)
+        assert value_array.shape == (len(TEST_OUTSIDE_COORDS), len(netcdf_grid_utils.data_variable_list)), 'Incorrect shape: {}'.format(value_array.shape)
+        # First point is no-data and second is outside grid
+        assert np.isnan(value_array[0:2,0]).all(), 'No-data values not returned as NaN: {}'.format(value_array)
+        assert abs(value_array[2,0] - TEST_MULTI_VALUES[1]) < MAX_ERROR, 'Incorrect retrieved value: {} instead of {}'.format(value_array[2,0], TEST_MULTI_VALUES[1])
+
+    def test_get_values_at_coords_leading_dimension(self):
+        print('Testing get_values_at_coords function with multiple variables and leading dimension')
+        temp_dir = tempfile.mkdtemp()
+        try:
+            nc_path = os.path.join(temp_dir, 'layered.nc')
+            nc_dataset = create_netcdf_grid(nc_path, 'EPSG:4326', TEST_LAYERED_GEOTRANSFORM, TEST_LAYERED_SHAPE, ['a', 'b'],
+                                            fill_value=TEST_VALUE,
+                                            leading_dimension=('depth', np.array(TEST_LAYERED_DEPTHS), {'units': 'm'}),
+                                            chunksizes=TEST_LAYERED_CHUNKSIZES)
+            # Values encode depth, row & column indices, with opposite signs in each variable
+            expected_array = (np.array(TEST_LAYERED_DEPTHS)[:,None,None] * 10000
+                              + np.arange(np.prod(TEST_LAYERED_SHAPE)).reshape(TEST_LAYERED_SHAPE)[None,:,:]).astype('float32')
+            nc_dataset.variables['a'][:] = expected_array
+            nc_dataset.variables['b'][:] = -expected_array
+            nc_dataset.close()
+
+            layered_grid_utils = NetCDFGridUtils(nc_path)
+            try:
+                rng = np.random.RandomState(0)
+                index_array = np.column_stack((rng.randint(0, TEST_LAYERED_SHAPE[0], TEST_LAYERED_POINT_COUNT),
+                                               rng.randint(0, TEST_LAYERED_SHAPE[1], TEST_LAYERED_POINT_COUNT)))
+                # Pixel centre coordinates plus one point outside the grid
+                coordinates = np.column_stack((TEST_LAYERED_GEOTRANSFORM[0] + (index_array[:,1] + 0.5) * TEST_LAYERED_GEOTRANSFORM[1],
+                                               TEST_LAYERED_GEOTRANSFORM[3] + (index_array[:,0] + 0.5) * TEST_LAYERED_GEOTRANSFORM[5]))
+                coordinates = np.vstack((coordinates, [[150.0, -30.0]]))
+                expected_values = np.moveaxis(expected_array[:, index_array[:,0], index_array[:,1]], 0, -1)
+
+                value_array = layered_grid_utils.get_values_at_coords(coordinates)
+                assert value_array.shape == (len(coordinates), 2, len(TEST_LAYERED_DEPTHS)), 'Incorrect shape: {}'.format(value_array.shape)
+                assert np.array_equal(value_array[:-1,0], expected_values), 'Incorrect values for first variable'
+                assert np.array_equal(value_array[:-1,1], -expected_values), 'Incorrect values for second variable'
+                assert np.isnan(value_array[-1]).all(), 'Values returned for point outside grid'
+
+                print('Testing get_values_at_coords function with leading_slices')
+                value_array = layered_grid_utils.get_values_at_coords(coordinates, variable_names='b',
+                                                                      leading_slices=(TEST_LAYERED_LEADING_SLICE,))
+                assert value_array.shape == (len(coordinates), 1, TEST_LAYERED_LEADING_SLICE.stop - TEST_LAYERED_LEADING_SLICE.start), \
+                    'Incorrect shape: {}'.format(value_array.shape)
+                assert np.array_equal(value_array[:-1,0], -expected_values[:,TEST_LAYERED_LEADING_SLICE]), 'Incorrect values for leading slice'
+
+                print('Testing 2D-only functions with leading dimension')
+                self.assertRaises(AssertionError, layered_grid_utils.get_value_at_coords, coordinates, variable_name='a')
+                self.assertRaises(AssertionError, layered_grid_utils.get_interpolated_value_at_coords, coordinates, variable_name='a')
+                self.assertRaises(AssertionError, layered_grid_utils.read_window, layered_grid_utils.netcdf_dataset.variables['a'],
+                                  (slice(0, 10), slice(0, 10)))
+            finally:
+                layered_grid_utils.close()
+        finally:
+            shutil.rmtree(temp_dir)
+
     def test_get_interpolated_value_at_coords(self):
         print('Testing get_interpolated_value_at_coords function')
         interpolated_value = netcdf_grid_utils.get_interpolated_value_at_coords(TEST_COORDS)
         assert interpolated_value == TEST_INTERPOLATED_VALUE, 'Incorrect interpolated value retrieved'
 
+        print('Testing get_interpolated_value_at_coords function with small windows')
+        rng = np.random.RandomState(0)
+        random_coords = np.column_stack((rng.uniform(148.206, 148.522, 1000), rng.uniform(-36.022, -35.31, 1000)))
+        for order in [1, 3]:
+            whole_values = np.array(netcdf_grid_utils.get_interpolated_value_at_coords(random_coords, order=order))
+            window_values = np.array(netcdf_grid_utils.get_interpolated_value_at_coords(random_coords, order=order, window_size=16))
+            assert np.allclose(window_values, whole_values, rtol=MAX_ERROR), 'Windowed interpolation differs for order {}'.format(order)
+
+    def test_lazy_construction(self):
+        print('Testing lazy NetCDFGridUtils construction')
+        lazy_netcdf_grid_utils = NetCDFGridUtils(netcdf_grid_utils.nc_path, lazy=True)
+        assert lazy_netcdf_grid_utils._dimension_arrays is None, 'Dimension arrays read during lazy construction'
+
+        for attribute_name in ['min_extent', 'max_extent', 'pixel_size', 'nominal_pixel_metres', 'bounds']:
+            assert np.allclose(getattr(lazy_netcdf_grid_utils, attribute_name), getattr(netcdf_grid_utils, attribute_name),
+                               rtol=MAX_ERROR), 'Incorrect lazy {}'.format(attribute_name)
+
+        lazy_multi_values = lazy_netcdf_grid_utils.get_value_at_coords(TEST_MULTI_COORDS)
+        assert (np.abs(np.array(lazy_multi_values) - np.array(TEST_MULTI_VALUES)) < MAX_ERROR).all(), 'Incorrect retrieved value: {} instead of {}'.format(lazy_multi_values, TEST_MULTI_VALUES)
+
+        print('Testing lazy creation of disk cache directory')
+        temp_dir = tempfile.mkdtemp()
+        try:
+            disk_cache_dir = os.path.join(temp_dir, 'blocks')
+            disk_cached_grid_utils = NetCDFGridUtils(netcdf_grid_utils.nc_path, enable_disk_cache=True, cache_path=disk_cache_dir, lazy=True)
+            assert not os.path.exists(disk_cache_dir), 'Disk cache directory created during construction'
+            disk_cached_grid_utils.get_value_at_coords(TEST_MULTI_COORDS)
+            assert os.listdir(disk_cache_dir), 'No blocks written to disk cache'
+            disk_cached_grid_utils.close()
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_build_overviews(self):
+        print('Testing build_overviews function')
+        with tempfile.TemporaryDirectory() as temp_dir:
+            nc_path = os.path.join(temp_dir, NC_PATH)
+            shutil.copy(netcdf_grid_utils.nc_path, nc_path)
+            overview_netcdf_grid_utils = NetCDFGridUtils(nc_path)
+            try:
+                overview_netcdf_grid_utils.build_overviews(TEST_OVERVIEW_FACTORS, resampling_method='nearest')
+                assert os.path.isfile(overview_netcdf_grid_utils.overview_path), 'Overview file not created'
+
+                data_array = netcdf_grid_utils.data_variable[:]
+                for overview_factor in TEST_OVERVIEW_FACTORS:
+                    best_factor, overview_variable = overview_netcdf_grid_utils.get_best_overview(netcdf_grid_utils.pixel_size[0] * overview_factor)
+                    assert best_factor == overview_factor, 'Incorrect overview level {} instead of {}'.format(best_factor, overview_factor)
+                    assert overview_variable.shape == tuple(-(-dimension_size // overview_factor) for dimension_size in data_array.shape), 'Incorrect overview shape'
+                    # Ignore partial blocks at trailing edges
+                    expected_array = data_array[overview_factor // 2::overview_factor, overview_factor // 2::overview_factor]
+                    assert (overview_variable[:expected_array.shape[0], :expected_array.shape[1]] == expected_array).all(), 'Incorrect overview values'
+
+                best_factor, overview_variable = overview_netcdf_grid_utils.get_best_overview(netcdf_grid_utils.pixel_size[0] / 2.0)
+                assert best_factor == 1 and overview_variable.name == netcdf_grid_utils.data_variable.name, 'Full resolution variable not returned'
+            finally:
+                overview_netcdf_grid_utils.close_overviews()
+                overview_netcdf_grid_utils.close()
+
+    def test_build_overviews_in_place(self):
+        print('Testing build_overviews function in place')
+        with tempfile.TemporaryDirectory() as temp_dir:
+            nc_path = os.path.join(temp_dir, NC_PATH)
+            shutil.copy(netcdf_grid_utils.nc_path, nc_path)
+            variable_name = netcdf_grid_utils.data_variable.name
+            overview_variable_names = ['{}_ovr{}'.format(variable_name, overview_factor) for overview_factor in TEST_OVERVIEW_FACTORS]
+
+            # Dataset provided by caller should be written directly and left usable
+            with netCDF4.Dataset(nc_path, mode='r+') as nc_dataset:
+                overview_netcdf_grid_utils = NetCDFGridUtils(nc_dataset)
+                overview_netcdf_grid_utils.build_overviews(TEST_OVERVIEW_FACTORS, in_place=True)
+                assert nc_dataset.isopen(), 'Caller dataset closed'
+                assert overview_netcdf_grid_utils.netcdf_dataset is nc_dataset, 'Caller dataset replaced'
+                assert all([overview_variable_name in nc_dataset.variables for overview_variable_name in overview_variable_names]), \
+                    'Overviews not written to caller dataset'
+                assert np.array_equal(np.ma.getdata(nc_dataset.variables[variable_name][:]),
+                                      np.ma.getdata(netcdf_grid_utils.data_variable[:])), 'Source values changed'
+                assert not os.path.isfile(overview_netcdf_grid_utils.overview_path), 'Sidecar file created'
+
+            # Dataset opened from path should be re-opened for writing
+            path_netcdf_grid_utils = NetCDFGridUtils(nc_path)
+            try:
+                path_netcdf_grid_utils.build_overviews([TEST_OVERVIEW_FACTORS[-1] * 2], in_place=True)
+                best_factor, overview_variable = path_netcdf_grid_utils.get_best_overview(netcdf_grid_utils.pixel_size[0] * TEST_OVERVIEW_FACTORS[-1] * 2)
+                assert best_factor == TEST_OVERVIEW_FACTORS[-1] * 2, 'In-place overview not found: {}'.format(best_factor)
+            finally:
+                path_netcdf_grid_utils.close()
+
     def test_sample_transect(self):
         print('Testing sample_transect function')
         #TODO: Finish this!
         #transect_samples = netcdf_grid_utils.sample_transect(transect_vertices, crs=None, sample_metres=None)
 
+    def test_sample_transects(self):
+        print('Testing sample_transects function with {} transects'.format(len(TEST_TRANSECTS)))
+        transect_results = netcdf_grid_utils.sample_transects(TEST_TRANSECTS, sample_metres=TEST_SAMPLE_METRES)
+        assert len(transect_results) == len(TEST_TRANSECTS), 'Incorrect number of transects returned'
+
+        for transect_index, (sample_point_array, distance_array, value_array) in enumerate(transect_results):
+            assert len(sample_point_array) == len(distance_array) == len(value_array) == TEST_TRANSECT_SAMPLE_COUNTS[transect_index], 'Incorrect number of samples for transect {}'.format(transect_index)
+            assert (distance_array == np.arange(len(distance_array)) * TEST_SAMPLE_METRES).all(), 'Incorrect distances for transect {}'.format(transect_index)
+            assert (np.abs(sample_point_array[0] - np.array(TEST_TRANSECTS[transect_index][0])) < MAX_ERROR).all(), 'Transect {} does not start at first vertex'.format(transect_index)
+            assert np.array_equal(value_array, netcdf_grid_utils.get_values_at_coords(sample_point_array, variable_names=[netcdf_grid_utils.data_variable.name]),
+                                  equal_nan=True), 'Incorrect values for transect {}'.format(transect_index)
+
+    def test_get_zonal_statistics(self):
+        print('Testing get_zonal_statistics function')
+        def bounds2ring(bounds):
+            return [(bounds[0], bounds[1]), (bounds[2], bounds[1]), (bounds[2], bounds[3]), (bounds[0], bounds[3])]
+
+        zone_polygons = [Polygon(bounds2ring(TEST_ZONE_BOUNDS[0]), [bounds2ring(TEST_ZONE_BOUNDS[1])]),
+                         bounds2ring(TEST_ZONE_BOUNDS[2])]
+        zonal_statistics = netcdf_grid_utils.get_zonal_statistics(zone_polygons, percentiles=[50], workers=2)
+        assert len(zonal_statistics) == len(zone_polygons), 'Incorrect number of zones returned'
+
+        # Compute expected values from whole array
+        data_array = netcdf_grid_utils.data_variable[:].filled(np.nan).astype('float64')
+        data_array[data_array == netcdf_grid_utils.data_variable._FillValue] = np.nan
+        y_array, x_array = np.meshgrid(*netcdf_grid_utils.dimension_arrays, indexing='ij')
+        def bounds2mask(bounds):
+            return (x_array >= bounds[0]) & (x_array <= bounds[2]) & (y_array >= bounds[1]) & (y_array <= bounds[3])
+        zone_values = data_array[bounds2mask(TEST_ZONE_BOUNDS[0]) & ~bounds2mask(TEST_ZONE_BOUNDS[1])]
+        zone_values = zone_values[~np.isnan(zone_values)]
+
+        assert zonal_statistics[0]['count'] == len(zone_values), 'Incorrect count: {} instead of {}'.format(zonal_statistics[0]['count'], len(zone_values))
+        for key, expected_value in [('min', np.min(zone_values)), ('max', np.max(zone_values)), ('mean', np.mean(zone_values)),
+                                    ('std_dev', np.std(zone_values)), ('percentile_50', np.median(zone_values))]:
+            assert abs(zonal_statistics[0][key] - expected_value) < MAX_ERROR, 'Incorrect {}: {} instead of {}'.format(key, zonal_statistics[0][key], expected_value)
+
+        assert zonal_statistics[1]['count'] == 0 and zonal_statistics[1]['mean'] is None, 'Values found for zone outside grid'
+
+    def test_warp(self):
+        print('Testing warp function')
+        temp_dir = tempfile.mkdtemp()
+        try:
+            source_array = netcdf_grid_utils.data_variable[:]
+
+            # Warping to native CRS should reproduce source grid in north-up order
+            native_warp_path = os.path.join(temp_dir, 'native_warp.nc')
+            netcdf_grid_utils.warp(native_warp_path, netcdf_grid_utils.wkt, tile_size=TEST_WARP_TILE_SIZE)
+            with netCDF4.Dataset(native_warp_path) as warp_dataset:
+                warp_array = warp_dataset.variables[netcdf_grid_utils.data_variable.name][:]
+            if not netcdf_grid_utils.y_inverted:
+                warp_array = warp_array[::-1]
+            assert warp_array.shape == source_array.shape, 'Incorrect warped shape: {} instead of {}'.format(warp_array.shape, source_array.shape)
+            assert (np.ma.getmaskarray(warp_array) == np.ma.getmaskarray(source_array)).all() and np.ma.allequal(warp_array, source_array), 'Warped values differ from source'
+
+            # Nearest neighbour values in another CRS should match values sampled at output pixel centres
+            projected_warp_path = os.path.join(temp_dir, 'projected_warp.nc')
+            netcdf_grid_utils.warp(projected_warp_path, TEST_WARP_CRS, tile_size=TEST_WARP_TILE_SIZE, workers=2)
+            warp_grid_utils = NetCDFGridUtils(projected_warp_path)
+            try:
+                assert warp_grid_utils.wkt.startswith('PROJCS'), 'Invalid crs variable'
+                y_array, x_array = np.meshgrid(*warp_grid_utils.dimension_arrays, indexing='ij')
+                expected_array = netcdf_grid_utils.get_values_at_coords(np.column_stack((x_array.ravel(), y_array.ravel())),
+                                                                        wkt=warp_grid_utils.wkt,
+                                                                        variable_names=[netcdf_grid_utils.data_variable.name])
+                warp_array = np.ma.filled(warp_grid_utils.data_variable[:].astype('float64'), np.nan)
+                assert np.array_equal(warp_array.ravel(), expected_array[:,0], equal_nan=True), 'Incorrect warped values'
+            finally:
+                warp_grid_utils.close()
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_apply_fft_filter(self):
+        print('Testing apply_fft_filter function')
+        temp_dir = tempfile.mkdtemp()
+        try:
+            variable_name = netcdf_grid_utils.data_variable.name
+            source_array = np.ma.masked_equal(netcdf_grid_utils.data_variable[:].astype('float64'), netcdf_grid_utils.data_variable._FillValue)
+
+            # Zero height upward continuation should reproduce source exactly across blended tile boundaries
+            identity_path = os.path.join(temp_dir, 'identity.nc')
+            netcdf_grid_utils.apply_fft_filter(identity_path, 'upward_continuation', {'height': 0.0},
+                                               tile_size=TEST_FFT_TILE_SIZE, overlap=TEST_FFT_OVERLAP, workers=2)
+            with netCDF4.Dataset(identity_path) as filtered_dataset:
+                filtered_array = filtered_dataset.variables[variable_name][:]
+            assert (np.ma.getmaskarray(filtered_array) == np.ma.getmaskarray(source_array)).all(), 'Incorrect no-data mask'
+            assert np.ma.max(np.abs(filtered_array - source_array)) < 0.0001, 'Identity filter changed values'
+
+            # Eastward derivative should correlate with finite differences
+            derivative_path = os.path.join(temp_dir, 'x_derivative.nc')
+            netcdf_grid_utils.apply_fft_filter(derivative_path, 'x_derivative',
+                                               tile_size=TEST_FFT_TILE_SIZE, overlap=TEST_FFT_OVERLAP)
+            with netCDF4.Dataset(derivative_path) as filtered_dataset:
+                filtered_array = filtered_dataset.variables[variable_name][:]
+            difference_array = np.gradient(source_array.filled(np.nan), netcdf_grid_utils.nominal_pixel_metres[0], axis=1)
+            valid_mask = np.isfinite(difference_array) & ~np.ma.getmaskarray(filtered_array)
+            correlation = np.corrcoef(difference_array[valid_mask], filtered_array[valid_mask])[0, 1]
+            assert correlation > MIN_DERIVATIVE_CORRELATION, 'Poor correlation with finite differences: {}'.format(correlation)
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_chunked_copy(self):
+        print('Testing chunked copy with worker processes')
+        temp_dir = tempfile.mkdtemp()
+        try:
+            variable_name = netcdf_grid_utils.data_variable.name
+            copy_path = os.path.join(temp_dir, 'rechunked.nc')
+            netcdf_grid_utils.copy(copy_path,
+                                   variable_options_dict={variable_name: {'chunksizes': list(TEST_COPY_CHUNKSIZES)}},
+                                   piece_bytes=TEST_COPY_PIECE_BYTES,
+                                   workers=2)
+            with netCDF4.Dataset(copy_path) as copy_dataset:
+                assert copy_dataset.variables[variable_name].chunking() == TEST_COPY_CHUNKSIZES, 'Incorrect output chunking'
+                for copy_variable_name, input_variable in netcdf_grid_utils.netcdf_dataset.variables.items():
+                    if input_variable.shape:
+                        assert np.array_equal(np.ma.getdata(copy_dataset.variables[copy_variable_name][:]),
+                                              np.ma.getdata(input_variable[:])), 'Copied values differ for {}'.format(copy_variable_name)
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_chunked_copy_3d(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            nc_path = os.path.join(temp_dir, 'input_3d.nc')
+            nc_dataset = create_netcdf_grid(nc_path, 'EPSG:4326', TEST_LAYERED_GEOTRANSFORM, TEST_3D_SHAPE, 'data',
+                                            fill_value=TEST_VALUE,
+                                            leading_dimension=('time', np.arange(TEST_3D_LEADING_SIZE, dtype='float64'), {'units': 'days since 2000-01-01'}),
+                                            chunksizes=TEST_3D_INPUT_CHUNKSIZES)
+            input_array = np.arange(TEST_3D_LEADING_SIZE * np.prod(TEST_3D_SHAPE), dtype='float32').reshape((TEST_3D_LEADING_SIZE,) + TEST_3D_SHAPE)
+            nc_dataset.variables['data'][:] = input_array
+            nc_dataset.close()
+
+            input_grid_utils = NetCDFGridUtils(nc_path)
+            try:
+                for workers in [None, 2]:
+                    print('Testing 3D chunked copy with workers={}'.format(workers))
+                    copy_path = os.path.join(temp_dir, 'rechunked_3d_{}.nc'.format(workers))
+                    input_grid_utils.copy(copy_path,
+                                          variable_options_dict={'data': {'chunksizes': list(TEST_3D_COPY_CHUNKSIZES)}},
+                                          piece_bytes=TEST_3D_COPY_PIECE_BYTES,
+                                          workers=workers)
+                    with netCDF4.Dataset(copy_path) as copy_dataset:
+                        assert copy_dataset.variables['data'].chunking() == TEST_3D_COPY_CHUNKSIZES, 'Incorrect output chunking'
+                        assert np.array_equal(np.ma.getdata(copy_dataset.variables['data'][:]), input_array), \
+                            'Copied 3D values differ with workers={}'.format(workers)
+                        for dimension_name in ['time', 'lat', 'lon']:
+                            assert np.array_equal(copy_dataset.variables[dimension_name][:],
+                                                  input_grid_utils.netcdf_dataset.variables[dimension_name][:]), \
+                                'Copied {} values differ'.format(dimension_name)
+            finally:
+                input_grid_utils.close()
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_access_pattern_copy(self):
+        print('Testing explain_chunking function')
+        with mock.patch.object(_netcdf_utils.logger, 'info') as mock_info:
+            explanation_lines = netcdf_grid_utils.explain_chunking(access_pattern='time_series')
+        assert explanation_lines, 'No explanation returned'
+        assert not mock_info.called, 'Explanation lines logged as well as returned'
+
+        print('Testing copy with access pattern')
+        temp_dir = tempfile.mkdtemp()
+        try:
+            variable_name = netcdf_grid_utils.data_variable.name
+            copy_path = os.path.join(temp_dir, 'planned.nc')
+            with mock.patch.object(_netcdf_utils, 'get_chunk_shape', wraps=_netcdf_utils.get_chunk_shape) as mock_get_chunk_shape:
+                netcdf_grid_utils.copy(copy_path, access_pattern='time_series')
+            # Only the data variable should have its chunks planned, not the coordinate variables
+            assert [list(call_args[0][0]) for call_args in mock_get_chunk_shape.call_args_list] == [list(netcdf_grid_utils.data_variable.shape)], \
+                'Chunks planned for non-data variables: {}'.format(mock_get_chunk_shape.call_args_list)
+            with netCDF4.Dataset(copy_path) as copy_dataset:
+                assert copy_dataset.variables[variable_name].chunking() == _netcdf_utils.get_chunk_shape(netcdf_grid_utils.data_variable.shape,
+                                                                                                         netcdf_grid_utils.data_variable.dtype,
+                                                                                                         'time_series'), 'Incorrect planned chunking'
+                for dimension_name in netcdf_grid_utils.data_variable.dimensions:
+                    assert copy_dataset.variables[dimension_name].chunking() == netcdf_grid_utils.netcdf_dataset.variables[dimension_name].chunking(), \
+                        'Chunking of {} changed'.format(dimension_name)
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_invert_y_copy(self):
+        print('Testing copy with inverted Y axis')
+        temp_dir = tempfile.mkdtemp()
+        try:
+            variable_name = netcdf_grid_utils.data_variable.name
+            copy_path = os.path.join(temp_dir, 'inverted.nc')
+            netcdf_grid_utils.copy(copy_path,
+                                   variable_options_dict={variable_name: {'chunksizes': list(TEST_COPY_CHUNKSIZES)}},
+                                   invert_y=not netcdf_grid_utils.y_inverted,
+                                   piece_bytes=TEST_COPY_PIECE_BYTES,
+                                   workers=2)
+            inverted_grid_utils = NetCDFGridUtils(copy_path)
+            try:
+                assert inverted_grid_utils.y_inverted != netcdf_grid_utils.y_inverted, 'Y axis not inverted'
+                assert np.array_equal(np.ma.getdata(inverted_grid_utils.data_variable[:]),
+                                      np.ma.getdata(netcdf_grid_utils.data_variable[:])[::-1]), 'Data not flipped'
+                assert (np.sign(inverted_grid_utils.GeoTransform[5]) == 
+                        np.sign(inverted_grid_utils.y_variable[1] - inverted_grid_utils.y_variable[0])), 'GeoTransform not corrected'
+                assert np.allclose(inverted_grid_utils.get_values_at_coords(TEST_MULTI_COORDS), 
+                                   netcdf_grid_utils.get_values_at_coords(TEST_MULTI_COORDS),
+                                   equal_nan=True), 'Values differ at coordinates'
+            finally:
+                inverted_grid_utils.close()
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_resume_copy(self):
+        print('Testing resumed copy from checkpoint')
+        temp_dir = tempfile.mkdtemp()
+        try:
+            variable_name = netcdf_grid_utils.data_variable.name
+            copy_path = os.path.join(temp_dir, 'resumed.nc')
+            copy_arguments = {'variable_options_dict': {variable_name: {'chunksizes': list(TEST_COPY_CHUNKSIZES)}},
+                              'piece_bytes': TEST_COPY_PIECE_BYTES}
+            
+            # Interrupt copy after first data variable piece has been written
+            get_piece_crc = _netcdf_utils.get_piece_crc
+            written_pieces = []
+            def interrupting_get_piece_crc(piece_array, dtype):
+                if len(written_pieces) == TEST_INTERRUPT_PIECES:
+                    raise KeyboardInterrupt('Simulated interruption')
+                written_pieces.append(piece_array.shape)
+                return get_piece_crc(piece_array, dtype)
+            
+            with mock.patch.object(_netcdf_utils, 'get_piece_crc', side_effect=interrupting_get_piece_crc):
+                self.assertRaises(KeyboardInterrupt, netcdf_grid_utils.copy, copy_path, **copy_arguments)
+            assert os.path.isfile(copy_path + CopyCheckpoint.FILE_SUFFIX), 'Checkpoint not saved'
+            
+            with mock.patch.object(_netcdf_utils, 'get_piece_crc', side_effect=get_piece_crc) as resumed_get_piece_crc:
+                netcdf_grid_utils.copy(copy_path, resume=True, **copy_arguments)
+                resumed_piece_count = resumed_get_piece_crc.call_count
+            assert resumed_piece_count and resumed_piece_count < TEST_INTERRUPT_PIECES, 'Resumed copy did not skip written pieces'
+            assert not os.path.isfile(copy_path + CopyCheckpoint.FILE_SUFFIX), 'Checkpoint not removed'
+            
+            with netCDF4.Dataset(copy_path) as copy_dataset:
+                assert np.array_equal(np.ma.getdata(copy_dataset.variables[variable_name][:]),
+                                      np.ma.getdata(netcdf_grid_utils.data_variable[:])), 'Resumed copy values differ'
+        finally:
+            shutil.rmtree(temp_dir)
+
 # Define test suites
 def test_suite():
     """Returns a test suite of all the tests in this module."""
@@ -25,8 +25,10 @@ Created on 15/11/2016
 import unittest
 import os
 import re
+import tempfile
 import netCDF4
 import numpy as np
+from unittest import mock
 from geophys_utils._netcdf_line_utils import NetCDFLineUtils
 
 netcdf_line_utils = None
@@ -50,6 +52,42 @@ TEST_GET_LINE_RESULTS = ((190520, 4, 10064),
                          (190500, 4, 9988)
                          )
 
+AEM_LAYER_THICKNESSES = [5.0, 10.0, 20.0, 40.0, 80.0]
+AEM_LINE_POINT_COUNTS = (120, 80)
+AEM_PYRAMID_BIN_SIZES = [4, 16, 64, 256]
+AEM_PYRAMID_MAX_BINS = 4
+
+
+def create_aem_test_dataset(nc_path):
+    '''
+    Function to create a small synthetic AEM line dataset with (point, layer) conductivity
+    Conductivity value for each layer is layer index + point index / 10000
+    '''
+    point_count = sum(AEM_LINE_POINT_COUNTS)
+    layer_count = len(AEM_LAYER_THICKNESSES)
+
+    nc_dataset = netCDF4.Dataset(nc_path, 'w')
+    nc_dataset.createDimension('point', point_count)
+    nc_dataset.createDimension('line', len(AEM_LINE_POINT_COUNTS))
+    nc_dataset.createDimension('layer', layer_count)
+
+    crs_variable = nc_dataset.createVariable('crs', 'i1')
+    crs_variable.spatial_ref = 'GEOGCS["WGS 84",DATUM["WGS_1984",SPHEROID["WGS 84",6378137,298.257223563]],PRIMEM["Greenwich",0],UNIT["degree",0.0174532925199433],AUTHORITY["EPSG","4326"]]'
+
+    nc_dataset.createVariable('line', 'i4', ('line',))[:] = [1000, 1010]
+    nc_dataset.createVariable('line_index', 'i1', ('point',))[:] = np.concatenate([np.full((line_point_count,), line_index)
+                                                                                   for line_index, line_point_count in enumerate(AEM_LINE_POINT_COUNTS)])
+    # Diagonal lines so that only single points lie on the edges of the dataset bounds
+    nc_dataset.createVariable('longitude', 'f8', ('point',))[:] = np.concatenate([np.linspace(140.0, 140.05, line_point_count)
+                                                                                   for line_point_count in AEM_LINE_POINT_COUNTS])
+    nc_dataset.createVariable('latitude', 'f8', ('point',))[:] = np.concatenate([np.linspace(-30.0, -30.01, line_point_count) - 0.005 * line_index
+                                                                                  for line_index, line_point_count in enumerate(AEM_LINE_POINT_COUNTS)])
+    nc_dataset.createVariable('elevation', 'f4', ('point',))[:] = 100.0 + np.arange(point_count) % 10
+    nc_dataset.createVariable('thickness', 'f4', ('point', 'layer'))[:] = np.tile(AEM_LAYER_THICKNESSES, (point_count, 1))
+    nc_dataset.createVariable('conductivity', 'f4', ('point', 'layer'), fill_value=-9999.0)[:] = (np.tile(np.arange(layer_count), (point_count, 1))
+                                                                                                  + np.arange(point_count)[:,np.newaxis] / 10000.0)
+    nc_dataset.close()
+
    
 class TestNetCDFLineUtilsConstructor(unittest.TestCase):
     """Unit tests for TestNetCDFLineUtils Constructor.
@@ -106,13 +144,96 @@ class TestNetCDFLineUtilsFunctions2(unittest.TestCase):
                 break
 
 
+class TestNetCDFLineUtilsSections(unittest.TestCase):
+    """Unit tests for geophys_utils._netcdf_line_utils section functions against a synthetic AEM dataset"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.temp_dir = tempfile.TemporaryDirectory()
+        nc_path = os.path.join(cls.temp_dir.name, 'test_aem_line.nc')
+        create_aem_test_dataset(nc_path)
+        cls.netcdf_line_utils = NetCDFLineUtils(nc_path, enable_disk_cache=False)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.netcdf_line_utils.close()
+        cls.temp_dir.cleanup()
+
+    def test_get_line_sections(self):
+        print('Testing get_line_sections function')
+        for workers in [None, 2]:
+            section_count = 0
+            for line_number, section_dict in self.netcdf_line_utils.get_line_sections(vertical_resolution=1.0,
+                                                                                       workers=workers):
+                section_count += 1
+                grid_array = section_dict['conductivity']
+                assert grid_array.shape == (len(section_dict['elevation']), len(section_dict['distance'])), 'Invalid section shape'
+                assert len(section_dict['coordinates']) == len(section_dict['distance']), 'Invalid section coordinates'
+
+                # Every column should contain the complete layered model from top to bottom
+                for column_array in grid_array.transpose():
+                    column_values = column_array[~np.isnan(column_array)]
+                    assert len(column_values) == sum(AEM_LAYER_THICKNESSES), 'Invalid number of cells in column'
+                    assert np.all(np.floor(column_values) == np.repeat(np.arange(len(AEM_LAYER_THICKNESSES)),
+                                                                       np.array(AEM_LAYER_THICKNESSES, dtype='int'))), 'Invalid layer values in column'
+
+            assert section_count == len(AEM_LINE_POINT_COUNTS), 'Invalid number of sections: {}'.format(section_count)
+
+    def test_line_pyramid(self):
+        print('Testing build_line_pyramid function')
+        pyramid_path = os.path.join(self.temp_dir.name, 'test_aem_line_pyramid.nc')
+        self.netcdf_line_utils.pyramid_path = pyramid_path
+        bin_sizes = self.netcdf_line_utils.build_line_pyramid(['elevation'])
+        assert bin_sizes == AEM_PYRAMID_BIN_SIZES, 'Invalid bin sizes: {}'.format(bin_sizes)
+
+        print('Testing get_line_envelopes function')
+        elevation_array = self.netcdf_line_utils.netcdf_dataset.variables['elevation'][:]
+        line_start_point = 0
+        envelope_count = 0
+        for (line_number, envelope_dict), line_point_count in zip(self.netcdf_line_utils.get_line_envelopes(variables='elevation'),
+                                                                  AEM_LINE_POINT_COUNTS):
+            envelope_count += 1
+            bin_start_points = np.arange(line_start_point, line_start_point + line_point_count, bin_sizes[0])
+            line_values = elevation_array[line_start_point:line_start_point + line_point_count]
+            assert np.array_equal(envelope_dict['start_point'], bin_start_points), 'Invalid bin start points for line {}'.format(line_number)
+            assert np.array_equal(envelope_dict['elevation_min'], [np.min(line_values[bin_start:bin_start + bin_sizes[0]])
+                                                                   for bin_start in range(0, line_point_count, bin_sizes[0])]), 'Invalid minima'
+            assert np.array_equal(envelope_dict['elevation_max'], [np.max(line_values[bin_start:bin_start + bin_sizes[0]])
+                                                                   for bin_start in range(0, line_point_count, bin_sizes[0])]), 'Invalid maxima'
+            line_start_point += line_point_count
+        assert envelope_count == len(AEM_LINE_POINT_COUNTS), 'Invalid number of envelopes: {}'.format(envelope_count)
+
+        for line_number, envelope_dict in self.netcdf_line_utils.get_line_envelopes(variables='elevation', max_bins=AEM_PYRAMID_MAX_BINS):
+            assert len(envelope_dict['point_count']) <= AEM_PYRAMID_MAX_BINS, 'Too many bins for line {}'.format(line_number)
+            assert np.min(envelope_dict['elevation_min']) == np.min(elevation_array) and np.max(envelope_dict['elevation_max']) == np.max(elevation_array), \
+                'Coarse envelope does not span line values'
+
+        print('Testing interrupted build_line_pyramid')
+        with mock.patch.object(self.netcdf_line_utils, 'fetch_array', side_effect=KeyboardInterrupt('Simulated interruption')):
+            self.assertRaises(KeyboardInterrupt, self.netcdf_line_utils.build_line_pyramid, ['elevation', 'longitude'])
+        assert not os.path.exists(pyramid_path + '.tmp'), 'Temporary pyramid not removed'
+        self.assertRaises(AssertionError, self.netcdf_line_utils.build_line_pyramid, ['elevation', 'conductivity'])
+        with netCDF4.Dataset(pyramid_path) as pyramid_dataset:
+            assert pyramid_dataset.variables_built == 'elevation', 'Previous pyramid not preserved'
+
+        print('Testing get_line_envelopes after source is rewritten')
+        source_stat = os.stat(self.netcdf_line_utils.nc_path)
+        os.utime(self.netcdf_line_utils.nc_path, ns=(source_stat.st_atime_ns, source_stat.st_mtime_ns + 10**9))
+        with mock.patch.object(self.netcdf_line_utils, 'build_line_pyramid', wraps=self.netcdf_line_utils.build_line_pyramid) as build_line_pyramid:
+            list(self.netcdf_line_utils.get_line_envelopes(variables='elevation'))
+            assert build_line_pyramid.call_count == 1, 'Stale pyramid not rebuilt'
+            list(self.netcdf_line_utils.get_line_envelopes(variables='elevation'))
+            assert build_line_pyramid.call_count == 1, 'Current pyramid rebuilt'
+
+
 # Define test suites
 def test_suite():
     """Returns a test suite of all the tests in this module."""
 
     test_classes = [TestNetCDFLineUtilsConstructor,
                     TestNetCDFLineUtilsFunctions1,
-                    TestNetCDFLineUtilsFunctions2
+                    TestNetCDFLineUtilsFunctions2,
+                    TestNetCDFLineUtilsSections
                     ]
 
     suite_list = map(unittest.defaultTestLoader.loadTestsFromTestCase,
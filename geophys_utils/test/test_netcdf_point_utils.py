@@ -25,9 +25,11 @@ Created on 15/11/2016
 import unittest
 import os
 import re
+import tempfile
 import netCDF4
 import numpy as np
 from geophys_utils._netcdf_point_utils import NetCDFPointUtils
+from geophys_utils._io_stats import IOStats
 
 netcdf_point_utils = None
 
@@ -61,6 +63,41 @@ TEST_GRID_RESULTS = (('GEOGCS["GDA94",DATUM["Geocentric_Datum_of_Australia_1994"
                       )
                      )
 
+LAYERED_GRID_SHAPE = (20, 20) # Rows & columns of synthetic points
+LAYERED_POINT_SPACING = 0.01
+LAYERED_ORIGIN = (140.0, -30.0)
+LAYERED_THICKNESSES = [5.0, 10.0, 20.0, 40.0, 80.0]
+LAYERED_GRID_BOUNDS = (140.0, -30.15, 140.19, -30.05) # Spans a subset of point rows
+LAYERED_VERTICAL_RANGE = (0.0, 60.0)
+LAYERED_VERTICAL_RESOLUTION = 10.0
+LAYERED_MAX_BYTES = 400 # Read (point, layer) variables in several pieces
+
+
+def create_layered_test_dataset(nc_path):
+    '''
+    Function to create a small synthetic point dataset with (point, layer) conductivity on a regular pattern of points
+    Conductivity value for each layer is layer index + 10 * (longitude - 140), so linear gridding is exact
+    '''
+    point_count = int(np.prod(LAYERED_GRID_SHAPE))
+    layer_count = len(LAYERED_THICKNESSES)
+    longitudes = LAYERED_ORIGIN[0] + np.tile(np.arange(LAYERED_GRID_SHAPE[1]), LAYERED_GRID_SHAPE[0]) * LAYERED_POINT_SPACING
+    latitudes = LAYERED_ORIGIN[1] - np.repeat(np.arange(LAYERED_GRID_SHAPE[0]), LAYERED_GRID_SHAPE[1]) * LAYERED_POINT_SPACING
+
+    nc_dataset = netCDF4.Dataset(nc_path, 'w')
+    nc_dataset.createDimension('point', point_count)
+    nc_dataset.createDimension('layer', layer_count)
+
+    crs_variable = nc_dataset.createVariable('crs', 'i1')
+    crs_variable.spatial_ref = 'GEOGCS["WGS 84",DATUM["WGS_1984",SPHEROID["WGS 84",6378137,298.257223563]],PRIMEM["Greenwich",0],UNIT["degree",0.0174532925199433],AUTHORITY["EPSG","4326"]]'
+
+    nc_dataset.createVariable('longitude', 'f8', ('point',))[:] = longitudes
+    nc_dataset.createVariable('latitude', 'f8', ('point',))[:] = latitudes
+    nc_dataset.createVariable('thickness', 'f4', ('point', 'layer'))[:] = np.tile(LAYERED_THICKNESSES, (point_count, 1))
+    conductivity_variable = nc_dataset.createVariable('conductivity', 'f4', ('point', 'layer'), fill_value=-9999.0)
+    conductivity_variable.units = 'S/m'
+    conductivity_variable[:] = np.arange(layer_count)[np.newaxis,:] + 10.0 * (longitudes[:,np.newaxis] - LAYERED_ORIGIN[0])
+    nc_dataset.close()
+
    
 class TestNetCDFPointUtilsConstructor(unittest.TestCase):
     """Unit tests for TestNetCDFPointUtils Constructor.
@@ -114,6 +151,63 @@ class TestNetCDFPointUtilsGridFunctions(unittest.TestCase):
         assert (crs, geotransform, grids.shape) == TEST_GRID_RESULTS[1], 'Invalid grid results: {} != {}'.format((crs, geotransform, grids.shape), TEST_GRID_RESULTS[1])
 
 
+class TestNetCDFPointUtilsLayeredGridding(unittest.TestCase):
+    """Unit tests for geophys_utils._netcdf_point_utils layered gridding using a synthetic dataset"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.temp_dir = tempfile.TemporaryDirectory()
+        nc_path = os.path.join(cls.temp_dir.name, 'test_layered.nc')
+        create_layered_test_dataset(nc_path)
+        cls.netcdf_point_utils = NetCDFPointUtils(netCDF4.Dataset(nc_path), enable_disk_cache=False)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.netcdf_point_utils.netcdf_dataset.close()
+        cls.temp_dir.cleanup()
+
+    def test_grid_layered_points(self):
+        print('Testing grid_layered_points function')
+        point_utils = self.netcdf_point_utils
+        point_utils.max_bytes = LAYERED_MAX_BYTES
+        point_utils.io_stats = IOStats()
+        output_path = os.path.join(self.temp_dir.name, 'test_layered_grid.nc')
+        try:
+            wkt, geotransform = point_utils.grid_layered_points(LAYERED_POINT_SPACING,
+                                                                output_path,
+                                                                LAYERED_VERTICAL_RANGE,
+                                                                LAYERED_VERTICAL_RESOLUTION,
+                                                                native_grid_bounds=LAYERED_GRID_BOUNDS)
+            conductivity_io_totals = point_utils.io_stats.variable_totals['conductivity']['read']
+        finally:
+            point_utils.io_stats = None
+
+        # Only the range of points spanning the grid subset should be read, in more than one piece
+        _pixel_centre_bounds, point_subset_mask, _coordinates = point_utils.get_grid_point_subset(LAYERED_POINT_SPACING,
+                                                                                                 native_grid_bounds=LAYERED_GRID_BOUNDS)
+        subset_indices = np.flatnonzero(point_subset_mask)
+        conductivity_variable = point_utils.netcdf_dataset.variables['conductivity']
+        point_bytes = conductivity_variable.dtype.itemsize * conductivity_variable.shape[1]
+        assert conductivity_io_totals[1] == (subset_indices[-1] + 1 - subset_indices[0]) * point_bytes, \
+            'Read {} bytes instead of subset range'.format(conductivity_io_totals[1])
+        assert conductivity_io_totals[0] > 1, 'Variable not read in pieces'
+
+        layer_top_depths = np.cumsum([0.0] + LAYERED_THICKNESSES[:-1])
+        with netCDF4.Dataset(output_path) as grid_dataset:
+            slice_depths = grid_dataset.variables['depth'][:]
+            assert np.allclose(slice_depths, np.arange(LAYERED_VERTICAL_RANGE[0], LAYERED_VERTICAL_RANGE[1] + 1.0, LAYERED_VERTICAL_RESOLUTION)), \
+                'Incorrect slice depths: {}'.format(slice_depths)
+            grid_array = np.ma.filled(grid_dataset.variables['conductivity'][:].astype('float64'), np.nan)
+
+        assert np.isfinite(grid_array).any(), 'No values gridded'
+        grid_longitudes = geotransform[0] + (np.arange(grid_array.shape[2]) + 0.5) * geotransform[1]
+        expected_array = ((np.searchsorted(layer_top_depths, slice_depths, side='right') - 1)[:,np.newaxis,np.newaxis]
+                          + 10.0 * (grid_longitudes[np.newaxis,np.newaxis,:] - LAYERED_ORIGIN[0]))
+        valid_mask = np.isfinite(grid_array)
+        assert np.allclose(grid_array[valid_mask], np.broadcast_to(expected_array, grid_array.shape)[valid_mask], atol=1.0e-4), \
+            'Incorrect gridded values'
+
+
 
 # Define test suites
 def test_suite():
@@ -121,7 +215,8 @@ def test_suite():
 
     test_classes = [TestNetCDFPointUtilsConstructor,
                     TestNetCDFPointUtilsFunctions1,
-                    TestNetCDFPointUtilsGridFunctions
+                    TestNetCDFPointUtilsGridFunctions,
+                    TestNetCDFPointUtilsLayeredGridding
                     ]
 
     suite_list = map(unittest.defaultTestLoader.loadTestsFromTestCase,
@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+
+#===============================================================================
+#    Copyright 2026 Geoscience Australia
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+#===============================================================================
+"""
+Unit tests for geophys_utils._netcdf_utils module
+
+Created on 18Oct.,2026
+
+@author: agent
+"""
+import unittest
+import os
+import shutil
+import tempfile
+import netCDF4
+import numpy as np
+from geophys_utils._netcdf_utils import NetCDFUtils
+from geophys_utils._chunk_utils import get_chunk_shape
+
+TEST_3D_DIMENSIONS = [('time', 11), ('depth', 37), ('station', 29)]
+TEST_3D_INPUT_CHUNKSIZES = [3, 10, 7]
+TEST_3D_COPY_CHUNKSIZES = [4, 8, 16] # Not aligned with input chunks in any dimension
+TEST_3D_COPY_PIECE_BYTES = 4000
+TEST_3D_ACCESS_PATTERN = 'time_series'
+
+
+def create_3d_test_dataset(nc_path):
+    '''
+    Function to create a small non-grid netCDF dataset with a chunked 3D data variable and 1D coordinate variables
+    @return data_array: array of values written to data variable
+    '''
+    nc_dataset = netCDF4.Dataset(nc_path, 'w')
+    for dimension_name, dimension_size in TEST_3D_DIMENSIONS:
+        nc_dataset.createDimension(dimension_name, dimension_size)
+        nc_dataset.createVariable(dimension_name, 'f8', (dimension_name,))[:] = np.arange(dimension_size) * 10.0
+
+    data_shape = tuple(dimension_size for _dimension_name, dimension_size in TEST_3D_DIMENSIONS)
+    data_array = np.arange(np.prod(data_shape), dtype='float32').reshape(data_shape)
+    data_variable = nc_dataset.createVariable('temperature', 'f4', [dimension_name for dimension_name, _dimension_size in TEST_3D_DIMENSIONS],
+                                              zlib=True, chunksizes=TEST_3D_INPUT_CHUNKSIZES, fill_value=-9999.0)
+    data_variable[:] = data_array
+    nc_dataset.close()
+    return data_array
+
+
+class TestNetCDFUtils(unittest.TestCase):
+    """Unit tests for geophys_utils._netcdf_utils module."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.nc_path = os.path.join(self.temp_dir, 'input_3d.nc')
+        self.data_array = create_3d_test_dataset(self.nc_path)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_get_data_variable_names(self):
+        print('Testing get_data_variable_names function')
+        netcdf_utils = NetCDFUtils(self.nc_path)
+        try:
+            data_variable_names = netcdf_utils.get_data_variable_names()
+            assert data_variable_names == ['temperature'], 'Incorrect data variables: {}'.format(data_variable_names)
+        finally:
+            netcdf_utils.close()
+
+    def test_chunked_copy_3d(self):
+        netcdf_utils = NetCDFUtils(self.nc_path)
+        try:
+            for workers in [None, 2]:
+                for copy_arguments, expected_chunking in [({'variable_options_dict': {'temperature': {'chunksizes': list(TEST_3D_COPY_CHUNKSIZES)}}},
+                                                           TEST_3D_COPY_CHUNKSIZES),
+                                                          ({'access_pattern': TEST_3D_ACCESS_PATTERN},
+                                                           get_chunk_shape(self.data_array.shape, self.data_array.dtype, TEST_3D_ACCESS_PATTERN))
+                                                          ]:
+                    print('Testing NetCDFUtils 3D chunked copy with workers={} and {}'.format(workers, list(copy_arguments.keys())[0]))
+                    copy_path = os.path.join(self.temp_dir, 'copy_3d.nc')
+                    netcdf_utils.copy(copy_path,
+                                      piece_bytes=TEST_3D_COPY_PIECE_BYTES,
+                                      workers=workers,
+                                      **copy_arguments)
+                    with netCDF4.Dataset(copy_path) as copy_dataset:
+                        assert copy_dataset.variables['temperature'].chunking() == list(expected_chunking), \
+                            'Incorrect output chunking: {}'.format(copy_dataset.variables['temperature'].chunking())
+                        assert np.array_equal(np.ma.getdata(copy_dataset.variables['temperature'][:]), self.data_array), \
+                            'Copied 3D values differ with workers={}'.format(workers)
+                        for dimension_name, _dimension_size in TEST_3D_DIMENSIONS:
+                            assert np.array_equal(copy_dataset.variables[dimension_name][:],
+                                                  netcdf_utils.netcdf_dataset.variables[dimension_name][:]), \
+                                'Copied {} values differ'.format(dimension_name)
+        finally:
+            netcdf_utils.close()
+
+
+# Define test suites
+def test_suite():
+    """Returns a test suite of all the tests in this module."""
+
+    test_classes = [TestNetCDFUtils]
+
+    suite_list = map(unittest.defaultTestLoader.loadTestsFromTestCase,
+                     test_classes)
+
+    suite = unittest.TestSuite(suite_list)
+
+    return suite
+
+
+# Define main function
+def main():
+    unittest.TextTestRunner(verbosity=2).run(test_suite())
+
+if __name__ == '__main__':
+    main()
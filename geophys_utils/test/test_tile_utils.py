@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+
+#===============================================================================
+#    Copyright 2026 Geoscience Australia
+#
+#    Licensed under the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS,
+#    WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    See the License for the specific language governing permissions and
+#    limitations under the License.
+#===============================================================================
+"""
+Unit tests for geophys_utils._tile_utils module
+
+Created on 18Oct.,2026
+
+@author: agent
+"""
+import unittest
+import os
+import struct
+import zlib
+import numpy as np
+from geophys_utils._netcdf_grid_utils import NetCDFGridUtils
+from geophys_utils._crs_utils import transform_coords
+from geophys_utils._tile_utils import GridTileRenderer, get_tile_pixel_coords, TILE_SIZE, WEB_MERCATOR_WKT, WEB_MERCATOR_EXTENT
+
+NC_PATH = 'test_grid.nc'
+TEST_TILE = (12, 3736, 2482) # Zoom 12 tile overlapping test grid
+TEST_VALUE_RANGE = (-500.0, 500.0)
+
+def decode_png_alpha(png_bytes):
+    '''
+    Helper function to check PNG chunk CRCs and return alpha band of an 8-bit RGBA PNG with no filtering
+    '''
+    assert png_bytes[:8] == b'\x89PNG\r\n\x1a\n', 'Invalid PNG signature'
+    position = 8
+    idat_bytes = b''
+    while position < len(png_bytes):
+        chunk_length = struct.unpack('>I', png_bytes[position:position+4])[0]
+        chunk_type = png_bytes[position+4:position+8]
+        chunk_data = png_bytes[position+8:position+8+chunk_length]
+        assert zlib.crc32(chunk_type + chunk_data) & 0xffffffff == struct.unpack('>I', png_bytes[position+8+chunk_length:position+12+chunk_length])[0], 'Invalid CRC'
+        if chunk_type == b'IHDR':
+            width, height = struct.unpack('>II', chunk_data[:8])
+        elif chunk_type == b'IDAT':
+            idat_bytes += chunk_data
+        position += 12 + chunk_length
+
+    scanline_array = np.frombuffer(zlib.decompress(idat_bytes), dtype='uint8').reshape((height, width * 4 + 1))
+    return scanline_array[:,1:].reshape((height, width, 4))[...,3]
+
+class TestTileUtils(unittest.TestCase):
+    """Unit tests for geophys_utils._tile_utils module."""
+
+    def test_web_mercator_crs(self):
+        print('Testing Web Mercator CRS resolution')
+        geographic_coords = transform_coords([[0.0, 0.0], [WEB_MERCATOR_EXTENT, 0.0]], WEB_MERCATOR_WKT, 'EPSG:4326')
+        assert np.allclose(geographic_coords, [[0.0, 0.0], [180.0, 0.0]]), 'Incorrect Web Mercator transformation: {}'.format(geographic_coords)
+
+    def test_render_tile(self):
+        print('Testing GridTileRenderer tile rendering')
+        netcdf_grid_utils = NetCDFGridUtils(os.path.join(os.path.dirname(__file__), NC_PATH), lazy=True)
+        tile_renderer = GridTileRenderer(netcdf_grid_utils, value_range=TEST_VALUE_RANGE)
+
+        status, content_type, raw_bytes = tile_renderer.handle_tile_request('/{}/{}/{}.raw'.format(*TEST_TILE))
+        assert status == 200 and content_type == 'application/octet-stream', 'Raw tile request failed'
+        tile_array = np.frombuffer(raw_bytes, dtype='<f4').reshape((TILE_SIZE, TILE_SIZE))
+        assert np.any(np.isfinite(tile_array)), 'No valid values in tile'
+
+        # Compare with point sampling at tile pixel centres
+        expected_array = netcdf_grid_utils.get_values_at_coords(get_tile_pixel_coords(*TEST_TILE), wkt='EPSG:3857')[:,0].reshape((TILE_SIZE, TILE_SIZE))
+        assert np.array_equal(tile_array, expected_array.astype('float32'), equal_nan=True), 'Tile values differ from sampled values'
+
+        status, content_type, png_bytes = tile_renderer.handle_tile_request('/{}/{}/{}.png'.format(*TEST_TILE))
+        assert status == 200 and content_type == 'image/png', 'PNG tile request failed'
+        alpha_array = decode_png_alpha(png_bytes)
+        assert (alpha_array == np.where(np.isfinite(tile_array), 255, 0)).all(), 'PNG transparency does not match no-data'
+
+        print('Testing GridTileRenderer tile cache')
+        tile_renderer.handle_tile_request('/{}/{}/{}.png'.format(*TEST_TILE))
+        assert tile_renderer.tile_cache.statistics['hits'] == 1, 'Tile not served from cache'
+
+        print('Testing GridTileRenderer invalid requests')
+        assert tile_renderer.handle_tile_request('/1/2/0.png')[0] == 404, 'Out of range tile accepted'
+        assert tile_renderer.handle_tile_request('/1/0/0.jpg')[0] == 404, 'Invalid format accepted'
+
+        netcdf_grid_utils.close()
+
+
+# Define test suites
+def test_suite():
+    """Returns a test suite of all the tests in this module."""
+
+    test_classes = [TestTileUtils]
+
+    suite_list = map(unittest.defaultTestLoader.loadTestsFromTestCase,
+                     test_classes)
+
+    suite = unittest.TestSuite(suite_list)
+
+    return suite
+
+
+# Define main function
+def main():
+    unittest.TextTestRunner(verbosity=2).run(test_suite())
+
+if __name__ == '__main__':
+    main()
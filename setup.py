@@ -15,7 +15,10 @@
 #    See the License for the specific language governing permissions and
 #    limitations under the License.
 #===============================================================================
-from distutils.core import setup
+try:
+    from setuptools import setup # Required for extras_require
+except ImportError:
+    from distutils.core import setup
 import os
 
 version = '0.0.1'
@@ -66,6 +69,7 @@ setup(name='geophys_utils',
             'yaml'
             'unidecode'
             ],
+      extras_require={'parallel_compression': ['h5py']},
       url='https://github.com/geoscienceaustralia/geophys_utils',
       author='Alex Ip - Geoscience Australia',
       maintainer='Alex Ip - Geoscience Australia',